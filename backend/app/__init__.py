@@ -2,6 +2,7 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
+from sqlalchemy import text
 from config import config
 import os
 
@@ -18,10 +19,42 @@ def create_app(config_name=None):
     app.config.from_object(config[config_name])
     
     # Initialize extensions
+    from app.utils.engine import configure_engine_options, register_engine_events
+    configure_engine_options(app)
     db.init_app(app)
+    register_engine_events(app)
     jwt.init_app(app)
     CORS(app, origins=app.config['FRONTEND_URL'])
     
+    from app.utils.auth import init_auth
+    from app.utils.compression import init_compression
+    from app.utils.json_provider import init_json
+    from app.utils.metrics import init_metrics
+    from app.utils.password_hashing import password_hasher
+    from app.utils.profiler import request_profiler
+    from app.utils.query_stats import query_stats
+    # First, so the request timing includes the other hooks
+    init_metrics(app)
+    init_auth(app)
+    init_json(app)
+    init_compression(app)
+    password_hasher.init_app(app)
+    query_stats.init_app(app)
+    request_profiler.init_app(app)
+    
+    from app.services.ingest_queue import ingest_queue
+    from app.services.telemetry_journal import telemetry_journal
+    ingest_queue.init_app(app)
+    telemetry_journal.init_app(app)
+    
+    from app.services.geofence_engine import geofence_engine
+    from app.services.map_matcher import map_matcher
+    geofence_engine.init_app(app)
+    map_matcher.init_app(app)
+    
+    from app.services.scheduler import scheduler
+    scheduler.init_app(app)
+    
     # Register blueprints
     from app.routes import register_routes
     register_routes(app)
@@ -40,4 +73,19 @@ def create_app(config_name=None):
     def health_check():
         return {'status': 'healthy'}, 200
     
+    @app.route('/health/live')
+    def liveness_check():
+        """The process is up and serving requests."""
+        return {'status': 'alive', 'pid': os.getpid()}, 200
+    
+    @app.route('/health/ready')
+    def readiness_check():
+        """The worker can reach the database and accept traffic."""
+        try:
+            db.session.execute(text('SELECT 1'))
+        except Exception as e:
+            db.session.rollback()
+            return {'status': 'unavailable', 'database': str(e)}, 503
+        return {'status': 'ready', 'database': 'ok'}, 200
+    
     return app
@@ -5,5 +5,14 @@ from .vehicle import Vehicle
 from .mission import Mission
 from .location import Location
 from .anomaly import Anomaly
+from .trip_track import TripTrack
+from .scheduled_job import ScheduledJob
+from .geofence import Geofence
+from .geofence_presence import GeofencePresence
+from .geofence_event import GeofenceEvent
+from .trip import Trip
+from .stop import Stop
+from .vehicle_trip_state import VehicleTripState
 
-__all__ = ['User', 'Vehicle', 'Mission', 'Location', 'Anomaly', 'Reimbursement']
+__all__ = ['User', 'Vehicle', 'Mission', 'Location', 'Anomaly', 'Reimbursement', 'TripTrack', 'ScheduledJob',
+           'Geofence', 'GeofencePresence', 'GeofenceEvent', 'Trip', 'Stop', 'VehicleTripState']
@@ -3,16 +3,19 @@ from datetime import datetime
 
 class Anomaly(db.Model):
     __tablename__ = 'anomalies'
+    __table_args__ = (
+        db.Index('ix_anomalies_detected_at_id', 'detected_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     type = db.Column(db.String(50), nullable=False)  # 'excessive_fuel', 'personal_use', 'route_deviation', etc.
     description = db.Column(db.Text, nullable=False)
-    severity = db.Column(db.String(20), default='medium')  # 'low', 'medium', 'high', 'critical'
+    severity = db.Column(db.String(20), default='medium', index=True)  # 'low', 'medium', 'high', 'critical'
     detected_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     
     # Foreign keys
-    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False)
-    mission_id = db.Column(db.Integer, db.ForeignKey('missions.id'), nullable=True)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False, index=True)
+    mission_id = db.Column(db.Integer, db.ForeignKey('missions.id'), nullable=True, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     
     # Additional fields for specific anomaly types
@@ -28,6 +31,7 @@ class Anomaly(db.Model):
     
     # Metadata
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def to_dict(self):
         """Convert anomaly to dictionary."""
@@ -47,7 +51,8 @@ class Anomaly(db.Model):
             'is_resolved': self.is_resolved,
             'resolution_notes': self.resolution_notes,
             'resolved_at': self.resolved_at.isoformat() if self.resolved_at else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
     
     def __repr__(self):
@@ -0,0 +1,61 @@
+from app import db
+from datetime import datetime
+import json
+
+class Geofence(db.Model):
+    """Admin-defined zone: a polygon of [lat, lon] vertices or a circle around a center."""
+    __tablename__ = 'geofences'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    category = db.Column(db.String(20), nullable=False, default='client_site')  # 'depot', 'restricted', 'client_site'
+    shape = db.Column(db.String(10), nullable=False)  # 'polygon', 'circle'
+    points = db.Column(db.Text)  # JSON [[lat, lon], ...] of a polygon
+    center_latitude = db.Column(db.Float)
+    center_longitude = db.Column(db.Float)
+    radius_m = db.Column(db.Float)
+    dwell_minutes = db.Column(db.Integer)  # a longer stay records a dwell event, None disables it
+    is_active = db.Column(db.Boolean, default=True, nullable=False)
+    
+    # Bounding box, kept with the geometry for the index prefilter
+    min_latitude = db.Column(db.Float, nullable=False)
+    max_latitude = db.Column(db.Float, nullable=False)
+    min_longitude = db.Column(db.Float, nullable=False)
+    max_longitude = db.Column(db.Float, nullable=False)
+    
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    
+    # Metadata
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    @property
+    def vertices(self):
+        return json.loads(self.points) if self.points else None
+    
+    def to_dict(self):
+        """Convert geofence to dictionary."""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'category': self.category,
+            'shape': self.shape,
+            'points': self.vertices,
+            'center_latitude': self.center_latitude,
+            'center_longitude': self.center_longitude,
+            'radius_m': self.radius_m,
+            'dwell_minutes': self.dwell_minutes,
+            'is_active': self.is_active,
+            'bbox': {
+                'south': self.min_latitude,
+                'west': self.min_longitude,
+                'north': self.max_latitude,
+                'east': self.max_longitude
+            },
+            'created_by': self.created_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+    
+    def __repr__(self):
+        return f'<Geofence {self.name}>'
@@ -0,0 +1,42 @@
+from app import db
+from datetime import datetime
+
+class GeofenceEvent(db.Model):
+    """A vehicle entering, leaving or staying too long in a geofence."""
+    __tablename__ = 'geofence_events'
+    __table_args__ = (
+        db.Index('ix_geofence_events_vehicle_occurred', 'vehicle_id', 'occurred_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    event = db.Column(db.String(10), nullable=False)  # 'enter', 'exit', 'dwell'
+    occurred_at = db.Column(db.DateTime, nullable=False, index=True)  # timestamp of the location point
+    latitude = db.Column(db.Float, nullable=False)
+    longitude = db.Column(db.Float, nullable=False)
+    duration_seconds = db.Column(db.Float)  # time inside, for exit and dwell
+    
+    # Foreign keys
+    geofence_id = db.Column(db.Integer, db.ForeignKey('geofences.id'), nullable=False, index=True)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False)
+    mission_id = db.Column(db.Integer, db.ForeignKey('missions.id'), nullable=True, index=True)
+    
+    # Metadata
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        """Convert geofence event to dictionary."""
+        return {
+            'id': self.id,
+            'event': self.event,
+            'occurred_at': self.occurred_at.isoformat() if self.occurred_at else None,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'duration_seconds': self.duration_seconds,
+            'geofence_id': self.geofence_id,
+            'vehicle_id': self.vehicle_id,
+            'mission_id': self.mission_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+    
+    def __repr__(self):
+        return f'<GeofenceEvent {self.event} vehicle={self.vehicle_id} geofence={self.geofence_id}>'
@@ -0,0 +1,24 @@
+from app import db
+
+class GeofencePresence(db.Model):
+    """A vehicle currently inside a geofence, from its entry until its exit."""
+    __tablename__ = 'geofence_presences'
+    
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), primary_key=True)
+    geofence_id = db.Column(db.Integer, db.ForeignKey('geofences.id'), primary_key=True, index=True)
+    mission_id = db.Column(db.Integer, db.ForeignKey('missions.id'), nullable=True)
+    entered_at = db.Column(db.DateTime, nullable=False)
+    dwell_recorded = db.Column(db.Boolean, default=False, nullable=False)
+    
+    def to_dict(self):
+        """Convert presence to dictionary."""
+        return {
+            'vehicle_id': self.vehicle_id,
+            'geofence_id': self.geofence_id,
+            'mission_id': self.mission_id,
+            'entered_at': self.entered_at.isoformat() if self.entered_at else None,
+            'dwell_recorded': self.dwell_recorded
+        }
+    
+    def __repr__(self):
+        return f'<GeofencePresence vehicle={self.vehicle_id} geofence={self.geofence_id}>'
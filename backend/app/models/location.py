@@ -3,6 +3,10 @@ from datetime import datetime
 
 class Location(db.Model):
     __tablename__ = 'locations'
+    __table_args__ = (
+        # One point per vehicle and instant, lets replays skip points already stored
+        db.Index('uq_locations_vehicle_timestamp', 'vehicle_id', 'timestamp', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     latitude = db.Column(db.Float, nullable=False)
@@ -3,11 +3,15 @@ from datetime import datetime
 
 class Mission(db.Model):
     __tablename__ = 'missions'
+    __table_args__ = (
+        db.Index('ix_missions_created_at_id', 'created_at', 'id'),
+        db.Index('ix_missions_scheduled_start_id', 'scheduled_start', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
-    status = db.Column(db.String(20), default='pending')  # 'pending', 'in_progress', 'completed', 'cancelled'
+    status = db.Column(db.String(20), default='pending', index=True)  # 'pending', 'in_progress', 'completed', 'cancelled'
     priority = db.Column(db.String(20), default='medium')  # 'low', 'medium', 'high', 'urgent'
     
     # Location details
@@ -25,8 +29,8 @@ class Mission(db.Model):
     actual_end = db.Column(db.DateTime)
     
     # Foreign keys
-    assigned_user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False)
+    assigned_user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False, index=True)
     created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     
     # Metadata
@@ -37,9 +41,9 @@ class Mission(db.Model):
     locations = db.relationship('Location', backref='mission', lazy=True)
     anomalies = db.relationship('Anomaly', backref='mission', lazy=True)
     
-    def to_dict(self):
-        """Convert mission to dictionary."""
-        return {
+    def to_dict(self, expand=('assigned_user', 'vehicle')):
+        """Convert mission to dictionary, embedding the relations listed in `expand`."""
+        data = {
             'id': self.id,
             'title': self.title,
             'description': self.description,
@@ -58,11 +62,16 @@ class Mission(db.Model):
             'assigned_user_id': self.assigned_user_id,
             'vehicle_id': self.vehicle_id,
             'created_by': self.created_by,
-            'assigned_user': self.assigned_user.to_dict() if self.assigned_user else None,
-            'vehicle': self.vehicle.to_dict() if self.vehicle else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+        
+        if 'assigned_user' in expand:
+            data['assigned_user'] = self.assigned_user.to_dict() if self.assigned_user else None
+        if 'vehicle' in expand:
+            data['vehicle'] = self.vehicle.to_dict() if self.vehicle else None
+        
+        return data
     
     def start_mission(self):
         """Start the mission."""
@@ -3,10 +3,13 @@ from datetime import datetime
 
 class Reimbursement(db.Model):
     __tablename__ = 'reimbursements'
+    __table_args__ = (
+        db.Index('ix_reimbursements_created_at_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    mission_id = db.Column(db.Integer, db.ForeignKey('missions.id'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    mission_id = db.Column(db.Integer, db.ForeignKey('missions.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     grade = db.Column(db.String(50), nullable=False)  # 'agent_execution', 'agent_maitrise', etc.
     
     # Détails du remboursement
@@ -17,7 +20,7 @@ class Reimbursement(db.Model):
     total_amount = db.Column(db.Float, nullable=False)
     
     # Statut et notes
-    status = db.Column(db.String(20), default='pending')  # 'pending', 'approved', 'paid', 'rejected'
+    status = db.Column(db.String(20), default='pending', index=True)  # 'pending', 'approved', 'paid', 'rejected'
     rejection_reason = db.Column(db.Text)
     notes = db.Column(db.Text)
     
@@ -31,9 +34,9 @@ class Reimbursement(db.Model):
     mission = db.relationship('Mission', backref='reimbursements')
     user = db.relationship('User', backref='reimbursements')
     
-    def to_dict(self):
-        """Convert reimbursement to dictionary."""
-        return {
+    def to_dict(self, expand=('mission', 'user')):
+        """Convert reimbursement to dictionary, embedding the relations listed in `expand`."""
+        data = {
             'id': self.id,
             'mission_id': self.mission_id,
             'user_id': self.user_id,
@@ -49,10 +52,15 @@ class Reimbursement(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'approved_at': self.approved_at.isoformat() if self.approved_at else None,
-            'paid_at': self.paid_at.isoformat() if self.paid_at else None,
-            'mission': self.mission.to_dict() if self.mission else None,
-            'user': self.user.to_dict() if self.user else None
+            'paid_at': self.paid_at.isoformat() if self.paid_at else None
         }
+        
+        if 'mission' in expand:
+            data['mission'] = self.mission.to_dict() if self.mission else None
+        if 'user' in expand:
+            data['user'] = self.user.to_dict() if self.user else None
+        
+        return data
     
     def approve(self):
         """Approve the reimbursement."""
@@ -0,0 +1,46 @@
+from app import db
+
+class ScheduledJob(db.Model):
+    """Schedule and lease of one background job, shared by every worker process.
+
+    A process runs the job only after moving `next_run_at` forward and taking
+    the lease (`locked_by` until `locked_until`) in a single UPDATE, so each
+    slot runs once and never alongside a previous run still in progress.
+    """
+    __tablename__ = 'scheduled_jobs'
+
+    name = db.Column(db.String(100), primary_key=True)
+    trigger = db.Column(db.String(100), nullable=False)  # as configured, a change resets next_run_at
+    next_run_at = db.Column(db.DateTime)  # None: only run on demand
+    locked_by = db.Column(db.String(100))  # host-pid of the process running it
+    locked_until = db.Column(db.DateTime)
+
+    last_started_at = db.Column(db.DateTime)
+    last_finished_at = db.Column(db.DateTime)
+    last_status = db.Column(db.String(20))  # 'ok', 'error'
+    last_error = db.Column(db.Text)
+    last_duration = db.Column(db.Float)  # seconds
+    runs = db.Column(db.Integer, default=0, nullable=False)
+    failures = db.Column(db.Integer, default=0, nullable=False)
+    skipped = db.Column(db.Integer, default=0, nullable=False)  # slots dropped because a run was in progress
+
+    def to_dict(self):
+        """Convert scheduled job to dictionary."""
+        return {
+            'name': self.name,
+            'trigger': self.trigger,
+            'next_run_at': self.next_run_at.isoformat() if self.next_run_at else None,
+            'locked_by': self.locked_by,
+            'locked_until': self.locked_until.isoformat() if self.locked_until else None,
+            'last_started_at': self.last_started_at.isoformat() if self.last_started_at else None,
+            'last_finished_at': self.last_finished_at.isoformat() if self.last_finished_at else None,
+            'last_status': self.last_status,
+            'last_error': self.last_error,
+            'last_duration': self.last_duration,
+            'runs': self.runs,
+            'failures': self.failures,
+            'skipped': self.skipped
+        }
+
+    def __repr__(self):
+        return f'<ScheduledJob {self.name}>'
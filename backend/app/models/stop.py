@@ -0,0 +1,49 @@
+from app import db
+from datetime import datetime
+
+class Stop(db.Model):
+    """A vehicle staying in one place, cut by the trip segmenter from its location points."""
+    __tablename__ = 'stops'
+    __table_args__ = (
+        db.Index('uq_stops_vehicle_started', 'vehicle_id', 'started_at', unique=True),
+        db.Index('ix_stops_started_at', 'started_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    started_at = db.Column(db.DateTime, nullable=False)
+    ended_at = db.Column(db.DateTime, nullable=False)  # last point so far while open
+    latitude = db.Column(db.Float, nullable=False)  # centroid of the points
+    longitude = db.Column(db.Float, nullable=False)
+    duration_seconds = db.Column(db.Float, nullable=False, default=0)
+    point_count = db.Column(db.Integer, nullable=False, default=0)
+    mission_endpoint = db.Column(db.String(10))  # 'start' or 'end' of its mission, when at one
+    is_open = db.Column(db.Boolean, default=True, nullable=False, index=True)  # the vehicle is still there
+    
+    # Foreign keys
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False)
+    mission_id = db.Column(db.Integer, db.ForeignKey('missions.id'), nullable=True, index=True)
+    geofence_id = db.Column(db.Integer, db.ForeignKey('geofences.id'), nullable=True, index=True)
+    
+    # Metadata
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        """Convert stop to dictionary."""
+        return {
+            'id': self.id,
+            'vehicle_id': self.vehicle_id,
+            'mission_id': self.mission_id,
+            'geofence_id': self.geofence_id,
+            'mission_endpoint': self.mission_endpoint,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'ended_at': self.ended_at.isoformat() if self.ended_at else None,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'duration_seconds': self.duration_seconds,
+            'point_count': self.point_count,
+            'is_open': self.is_open
+        }
+    
+    def __repr__(self):
+        return f'<Stop vehicle={self.vehicle_id} started={self.started_at}>'
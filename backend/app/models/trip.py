@@ -0,0 +1,69 @@
+from app import db
+from datetime import datetime
+
+class Trip(db.Model):
+    """A vehicle's movement between two stops, cut by the trip segmenter from its location points."""
+    __tablename__ = 'trips'
+    __table_args__ = (
+        db.Index('uq_trips_vehicle_started', 'vehicle_id', 'started_at', unique=True),
+        db.Index('ix_trips_started_at', 'started_at'),
+        db.Index('ix_trips_matched_at', 'matched_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    started_at = db.Column(db.DateTime, nullable=False)
+    ended_at = db.Column(db.DateTime, nullable=False)  # last point so far while open
+    start_latitude = db.Column(db.Float, nullable=False)
+    start_longitude = db.Column(db.Float, nullable=False)
+    end_latitude = db.Column(db.Float, nullable=False)
+    end_longitude = db.Column(db.Float, nullable=False)
+    distance_m = db.Column(db.Float, nullable=False, default=0)  # along the raw points
+    duration_seconds = db.Column(db.Float, nullable=False, default=0)
+    max_speed = db.Column(db.Float)  # km/h, as reported
+    avg_speed = db.Column(db.Float)  # km/h, distance over duration
+    point_count = db.Column(db.Integer, nullable=False, default=0)
+    is_open = db.Column(db.Boolean, default=True, nullable=False)  # the vehicle is still on this trip
+    
+    # Snapped to the road graph once closed, see MapMatcher
+    matched_distance_m = db.Column(db.Float)  # along the roads
+    matched_geometry = db.Column(db.Text)  # encoded polyline
+    matched_ratio = db.Column(db.Float)  # share of the points used that matched a road
+    matched_at = db.Column(db.DateTime)
+    
+    # Foreign keys
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False)
+    mission_id = db.Column(db.Integer, db.ForeignKey('missions.id'), nullable=True, index=True)
+    
+    # Metadata
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self, include_geometry=False):
+        """Convert trip to dictionary, with the matched geometry as [lat, lon] pairs if asked."""
+        data = {
+            'id': self.id,
+            'vehicle_id': self.vehicle_id,
+            'mission_id': self.mission_id,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'ended_at': self.ended_at.isoformat() if self.ended_at else None,
+            'start_latitude': self.start_latitude,
+            'start_longitude': self.start_longitude,
+            'end_latitude': self.end_latitude,
+            'end_longitude': self.end_longitude,
+            'distance_m': self.distance_m,
+            'duration_seconds': self.duration_seconds,
+            'max_speed': self.max_speed,
+            'avg_speed': self.avg_speed,
+            'point_count': self.point_count,
+            'is_open': self.is_open,
+            'matched_distance_m': self.matched_distance_m,
+            'matched_ratio': self.matched_ratio,
+            'matched_at': self.matched_at.isoformat() if self.matched_at else None
+        }
+        if include_geometry:
+            from app.utils.road_graph import decode_polyline
+            data['matched_geometry'] = decode_polyline(self.matched_geometry) if self.matched_geometry else None
+        return data
+    
+    def __repr__(self):
+        return f'<Trip vehicle={self.vehicle_id} started={self.started_at}>'
@@ -0,0 +1,40 @@
+from app import db
+from datetime import datetime
+
+class TripTrack(db.Model):
+    """Location points of one mission, or of one vehicle-day without mission, compacted into a columnar blob."""
+    __tablename__ = 'trip_tracks'
+    __table_args__ = (
+        db.Index('ix_trip_tracks_vehicle_started', 'vehicle_id', 'started_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False)
+    mission_id = db.Column(db.Integer, db.ForeignKey('missions.id'), nullable=True, index=True)
+    started_at = db.Column(db.DateTime, nullable=False)
+    ended_at = db.Column(db.DateTime, nullable=False)
+    point_count = db.Column(db.Integer, nullable=False)
+    codec = db.Column(db.String(10), nullable=False, default='zlib')
+    data = db.Column(db.LargeBinary, nullable=False)  # see app/utils/track_codec.py
+    
+    # Metadata
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        """Convert trip track to dictionary, without the encoded points."""
+        return {
+            'id': self.id,
+            'vehicle_id': self.vehicle_id,
+            'mission_id': self.mission_id,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'ended_at': self.ended_at.isoformat() if self.ended_at else None,
+            'point_count': self.point_count,
+            'codec': self.codec,
+            'size_bytes': len(self.data) if self.data is not None else 0,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+    
+    def __repr__(self):
+        return f'<TripTrack vehicle={self.vehicle_id} mission={self.mission_id} points={self.point_count}>'
@@ -1,5 +1,4 @@
 from app import db
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 
 class User(db.Model):
@@ -24,11 +23,18 @@ class User(db.Model):
     
     def set_password(self, password):
         """Hash and set password."""
-        self.password_hash = generate_password_hash(password)
+        from app.utils.password_hashing import password_hasher
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
         """Check if password matches hash."""
-        return check_password_hash(self.password_hash, password)
+        from app.utils.password_hashing import password_hasher
+        return password_hasher.verify(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        """Check if the stored hash uses outdated hashing parameters."""
+        from app.utils.password_hashing import password_hasher
+        return password_hasher.needs_rehash(self.password_hash)
     
     def to_dict(self):
         """Convert user to dictionary."""
@@ -3,6 +3,9 @@ from datetime import datetime
 
 class Vehicle(db.Model):
     __tablename__ = 'vehicles'
+    __table_args__ = (
+        db.Index('ix_vehicles_created_at_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     license_plate = db.Column(db.String(20), unique=True, nullable=False)
@@ -11,10 +14,11 @@ class Vehicle(db.Model):
     year = db.Column(db.Integer)
     color = db.Column(db.String(30))
     fuel_type = db.Column(db.String(20))  # 'gasoline', 'diesel', 'electric', 'hybrid'
-    status = db.Column(db.String(20), default='available')  # 'available', 'in_use', 'maintenance', 'out_of_service'
+    status = db.Column(db.String(20), default='available', index=True)  # 'available', 'in_use', 'maintenance', 'out_of_service'
     current_latitude = db.Column(db.Float)
     current_longitude = db.Column(db.Float)
     last_location_update = db.Column(db.DateTime)
+    geofence_checked_at = db.Column(db.DateTime)  # newest point checked against the geofences
     driver_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -24,9 +28,9 @@ class Vehicle(db.Model):
     locations = db.relationship('Location', backref='vehicle', lazy=True)
     anomalies = db.relationship('Anomaly', backref='vehicle', lazy=True)
     
-    def to_dict(self):
-        """Convert vehicle to dictionary."""
-        return {
+    def to_dict(self, expand=('driver',)):
+        """Convert vehicle to dictionary, embedding the relations listed in `expand`."""
+        data = {
             'id': self.id,
             'license_plate': self.license_plate,
             'brand': self.brand,
@@ -39,10 +43,14 @@ class Vehicle(db.Model):
             'current_longitude': self.current_longitude,
             'last_location_update': self.last_location_update.isoformat() if self.last_location_update else None,
             'driver_id': self.driver_id,
-            'driver': self.driver.to_dict() if self.driver else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+        
+        if 'driver' in expand:
+            data['driver'] = self.driver.to_dict() if self.driver else None
+        
+        return data
     
     def update_location(self, latitude, longitude):
         """Update vehicle location."""
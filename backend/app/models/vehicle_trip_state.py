@@ -0,0 +1,13 @@
+from app import db
+
+class VehicleTripState(db.Model):
+    """Where the trip segmenter stands for one vehicle: last point read and the trip or stop in progress."""
+    __tablename__ = 'vehicle_trip_states'
+    
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), primary_key=True)
+    last_location_id = db.Column(db.Integer, nullable=False, index=True)  # the highest of all is the read cursor
+    last_timestamp = db.Column(db.DateTime)
+    state = db.Column(db.Text, nullable=False)  # JSON, see TripSegmenter
+    
+    def __repr__(self):
+        return f'<VehicleTripState vehicle={self.vehicle_id}>'
@@ -6,6 +6,10 @@ from .anomaly_routes import anomaly_bp
 from .map_routes import map_bp
 from .dashboard_routes import dashboard_bp
 from .reimbursement_routes import reimbursement_bp
+from .spatial_routes import spatial_bp
+from .export_routes import export_bp
+from .geofence_routes import geofence_bp
+from .trip_routes import trip_bp
 
 def register_routes(app):
     """Register all blueprint routes with the Flask app."""
@@ -17,3 +21,7 @@ def register_routes(app):
     app.register_blueprint(map_bp, url_prefix='/api/map')
     app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
     app.register_blueprint(reimbursement_bp, url_prefix='/api/reimbursements')
+    app.register_blueprint(spatial_bp, url_prefix='/api/spatial')
+    app.register_blueprint(export_bp, url_prefix='/api/exports')
+    app.register_blueprint(geofence_bp, url_prefix='/api/geofences')
+    app.register_blueprint(trip_bp, url_prefix='/api/trips')
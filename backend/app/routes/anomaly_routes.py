@@ -1,5 +1,8 @@
 from flask import Blueprint, request, jsonify
+from datetime import datetime
 from app.services.anomaly_service import AnomalyService
+from app.utils.serialization import parse_serialization_args, serialize
+from app.utils.pagination import parse_page_args
 
 anomaly_bp = Blueprint('anomaly', __name__)
 
@@ -10,14 +13,20 @@ def get_anomalies():
         vehicle_id = request.args.get('vehicle_id', type=int)
         mission_id = request.args.get('mission_id', type=int)
         severity = request.args.get('severity')
+        options = parse_serialization_args('anomalies')
+        page = parse_page_args('anomalies')
         
         result, status_code = AnomalyService.get_anomalies(
             vehicle_id=vehicle_id,
             mission_id=mission_id,
-            severity=severity
+            severity=severity,
+            serialization=options,
+            page=page
         )
         return jsonify(result), status_code
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -26,9 +35,12 @@ def get_recent_anomalies():
     """Get recent anomalies."""
     try:
         hours = request.args.get('hours', 24, type=int)
-        result, status_code = AnomalyService.get_recent_anomalies(hours)
+        page = parse_page_args('anomalies')
+        result, status_code = AnomalyService.get_recent_anomalies(hours, page)
         return jsonify(result), status_code
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -110,6 +122,7 @@ def resolve_anomaly(anomaly_id):
         data = request.json or {}
         anomaly.is_resolved = True
         anomaly.resolution_notes = data.get('notes', '')
+        anomaly.resolved_at = datetime.utcnow()
         
         db.session.commit()
         
@@ -138,10 +151,17 @@ def get_anomalies_no_auth():
     """Get anomalies without authentication for development."""
     try:
         from app.models.anomaly import Anomaly
-        anomalies = Anomaly.query.all()
-        return jsonify({
-            'data': [anomaly.to_dict() for anomaly in anomalies]
-        }), 200
+        options = parse_serialization_args('anomalies')
+        page = parse_page_args('anomalies')
+        anomalies, pagination = page.apply(Anomaly.query.options(*options.load_options()))
+        data, included = serialize(anomalies, options)
+        
+        response = {'data': data, 'pagination': pagination}
+        if included is not None:
+            response['included'] = included
+        return jsonify(response), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from marshmallow import ValidationError
 from app.schemas.user_schema import UserRegistrationSchema, UserLoginSchema
 from app.services.auth_service import AuthService
+from app.utils.auth import admin_required
+from app.utils.password_hashing import PasswordHashingBusy, password_hasher
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -17,6 +19,8 @@ def register():
         
     except ValidationError as e:
         return jsonify({'error': 'Validation error', 'details': e.messages}), 400
+    except PasswordHashingBusy as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -34,6 +38,8 @@ def login():
         
     except ValidationError as e:
         return jsonify({'error': 'Validation error', 'details': e.messages}), 400
+    except PasswordHashingBusy as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -71,9 +77,17 @@ def change_password():
         result, status_code = AuthService.change_password(current_password, new_password)
         return jsonify(result), status_code
         
+    except PasswordHashingBusy as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@auth_bp.route('/hashing-stats', methods=['GET'])
+@admin_required
+def get_hashing_stats(current_user):
+    """Password hashing pool statistics."""
+    return jsonify(password_hasher.stats()), 200
+
 @auth_bp.route('/login-simple', methods=['POST'])
 def login_simple():
     """Simple login endpoint without JWT for testing."""
@@ -104,5 +118,7 @@ def login_simple():
             'message': 'Login successful'
         }), 200
         
+    except PasswordHashingBusy as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from flask_jwt_extended import jwt_required
 from app.models.user import User
 from app.models.vehicle import Vehicle
@@ -7,6 +7,11 @@ from app.models.location import Location
 from app.models.anomaly import Anomaly
 from datetime import datetime, timedelta
 from sqlalchemy import func
+from app.utils.auth import admin_required
+from app.utils.profiler import request_profiler, to_pstats, to_speedscope
+from app.utils.query_stats import query_stats
+from app.services.scheduler import scheduler
+from app.services.trip_service import TripService
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
@@ -225,3 +230,85 @@ def get_vehicle_analytics():
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+@dashboard_bp.route('/idle-analytics', methods=['GET'])
+@jwt_required()
+def get_idle_analytics():
+    """Time stopped per vehicle and geofence over the last ?hours=24, stops of ?min_minutes= or more."""
+    try:
+        hours = request.args.get('hours', 24, type=float)
+        min_minutes = request.args.get('min_minutes', 0, type=float)
+        if hours <= 0 or min_minutes < 0:
+            raise ValueError('hours must be positive and min_minutes not negative')
+        
+        result, status_code = TripService.idle_analytics(hours, min_minutes)
+        return jsonify(result), status_code
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@dashboard_bp.route('/query-stats', methods=['GET'])
+@admin_required
+def get_query_stats(current_user):
+    """SQL queries and database time per endpoint, with the statements repeated within one request."""
+    return jsonify(query_stats.stats()), 200
+
+@dashboard_bp.route('/profiles', methods=['GET'])
+@admin_required
+def get_profiles(current_user):
+    """Stored request profiles, newest first, without their samples."""
+    return jsonify({'enabled': request_profiler.enabled, 'profiles': request_profiler.summaries()}), 200
+
+@dashboard_bp.route('/profiles/<profile_id>', methods=['GET'])
+@admin_required
+def download_profile(current_user, profile_id):
+    """Download one profile, or 'all' of them, as speedscope JSON or pstats (?format=)."""
+    try:
+        output = request.args.get('format', 'speedscope')
+        if output not in ('speedscope', 'pstats'):
+            raise ValueError("format must be 'speedscope' or 'pstats'")
+        
+        if profile_id == 'all':
+            profiles = request_profiler.profiles()
+        else:
+            profile = request_profiler.get(profile_id)
+            profiles = [profile] if profile else []
+        if not profiles:
+            return jsonify({'error': 'Profile not found'}), 404
+        
+        if output == 'pstats':
+            body, mimetype, extension = to_pstats(profiles), 'application/octet-stream', 'prof'
+        else:
+            body, mimetype, extension = jsonify(to_speedscope(profiles)).get_data(), 'application/json', \
+                'speedscope.json'
+        headers = {'Content-Disposition': f'attachment; filename=profile-{profile_id}.{extension}'}
+        return Response(body, mimetype=mimetype, headers=headers)
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@dashboard_bp.route('/jobs', methods=['GET'])
+@admin_required
+def get_jobs(current_user):
+    """Background jobs: trigger, next run, lease and outcome of the last runs."""
+    try:
+        return jsonify(scheduler.stats()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@dashboard_bp.route('/jobs/<name>/run', methods=['POST'])
+@admin_required
+def run_job(current_user, name):
+    """Start a background job now, unless a run of it is in progress."""
+    try:
+        started, job = scheduler.run_now(name)
+        message = f'Job {name} started' if started else f'Job {name} is already running'
+        return jsonify({'message': message, 'started': started, 'job': job}), 202
+    except KeyError:
+        return jsonify({'error': 'Job not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,96 @@
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from flask_jwt_extended import jwt_required
+from datetime import datetime, timedelta, timezone
+from app.models.mission import Mission
+from app.models.vehicle import Vehicle
+from app.services.route_export import FORMATS, route_points, stream_fleet_zip, stream_route
+from app.utils.auth import manager_required
+
+export_bp = Blueprint('export', __name__)
+
+def _format_arg():
+    file_format = request.args.get('format', 'gpx').lower()
+    if file_format not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    return file_format
+
+def _datetime_arg(name):
+    """An ISO 8601 query argument as a naive UTC datetime, like the stored timestamps."""
+    try:
+        value = datetime.fromisoformat(request.args[name])
+    except ValueError:
+        raise ValueError(f'Invalid {name} date format, use ISO 8601')
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def _range_args():
+    """Read ?start=&end= (ISO 8601), start defaults to ?hours= (24) before end."""
+    end = _datetime_arg('end') if request.args.get('end') else datetime.utcnow()
+    start = _datetime_arg('start') if request.args.get('start') else None
+    if start is None:
+        start = end - timedelta(hours=request.args.get('hours', 24, type=int))
+    if start > end:
+        raise ValueError('start must be before end')
+    return start, end
+
+def _download(chunks, mimetype, filename):
+    # stream_with_context keeps the app context (and its database connection) for the whole response
+    return Response(stream_with_context(chunks), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+@export_bp.route('/missions/<int:mission_id>', methods=['GET'])
+@jwt_required()
+def export_mission_route(mission_id):
+    """Download the track of a mission as GPX, KML or GeoJSON."""
+    try:
+        file_format = _format_arg()
+        mission = Mission.query.get(mission_id)
+        if not mission:
+            return jsonify({'error': 'Mission not found'}), 404
+
+        mimetype, extension = FORMATS[file_format]
+        chunks = stream_route(file_format, mission.title or f'Mission {mission_id}',
+                              route_points(mission_id=mission_id))
+        return _download(chunks, mimetype, f'mission-{mission_id}{extension}')
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@export_bp.route('/vehicles/<int:vehicle_id>', methods=['GET'])
+@jwt_required()
+def export_vehicle_route(vehicle_id):
+    """Download the track of a vehicle over a time range."""
+    try:
+        file_format = _format_arg()
+        start, end = _range_args()
+        vehicle = Vehicle.query.get(vehicle_id)
+        if not vehicle:
+            return jsonify({'error': 'Vehicle not found'}), 404
+
+        mimetype, extension = FORMATS[file_format]
+        chunks = stream_route(file_format, vehicle.license_plate or f'Vehicle {vehicle_id}',
+                              route_points(vehicle_id=vehicle_id, start=start, end=end))
+        return _download(chunks, mimetype, f'vehicle-{vehicle_id}-{start:%Y%m%d}-{end:%Y%m%d}{extension}')
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@export_bp.route('/fleet', methods=['GET'])
+@manager_required
+def export_fleet_routes(current_user):
+    """Download a zip with the track of every vehicle over a time range."""
+    try:
+        file_format = _format_arg()
+        start, end = _range_args()
+        return _download(stream_fleet_zip(file_format, start, end), 'application/zip',
+                         f'fleet-{start:%Y%m%d}-{end:%Y%m%d}-{file_format}.zip')
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
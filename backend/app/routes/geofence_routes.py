@@ -0,0 +1,129 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from app.services.geofence_service import GeofenceService
+from app.utils.auth import admin_required
+from app.utils.pagination import parse_page_args
+
+geofence_bp = Blueprint('geofence', __name__)
+
+@geofence_bp.route('', methods=['GET'])
+@jwt_required()
+def get_geofences():
+    """Get geofences, ?category= and ?active=true|false."""
+    try:
+        category = request.args.get('category')
+        active = request.args.get('active')
+        if active is not None:
+            active = active.lower() == 'true'
+        
+        result, status_code = GeofenceService.get_geofences(category, active)
+        return jsonify(result), status_code
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@geofence_bp.route('', methods=['POST'])
+@admin_required
+def create_geofence(current_user):
+    """Create a geofence: a polygon of [lat, lon] points or a circle."""
+    try:
+        data = request.get_json()
+        if not isinstance(data, dict):
+            raise ValueError('A JSON object is required')
+        
+        result, status_code = GeofenceService.create_geofence(data, current_user.id)
+        return jsonify(result), status_code
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@geofence_bp.route('/<int:geofence_id>', methods=['GET'])
+@jwt_required()
+def get_geofence(geofence_id):
+    """Get one geofence."""
+    try:
+        result, status_code = GeofenceService.get_geofence(geofence_id)
+        return jsonify(result), status_code
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@geofence_bp.route('/<int:geofence_id>', methods=['PUT'])
+@admin_required
+def update_geofence(current_user, geofence_id):
+    """Update a geofence."""
+    try:
+        data = request.get_json()
+        if not isinstance(data, dict):
+            raise ValueError('A JSON object is required')
+        
+        result, status_code = GeofenceService.update_geofence(geofence_id, data)
+        return jsonify(result), status_code
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@geofence_bp.route('/<int:geofence_id>', methods=['DELETE'])
+@admin_required
+def delete_geofence(current_user, geofence_id):
+    """Delete a geofence and its events."""
+    try:
+        result, status_code = GeofenceService.delete_geofence(geofence_id)
+        return jsonify(result), status_code
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@geofence_bp.route('/<int:geofence_id>/vehicles', methods=['GET'])
+@jwt_required()
+def get_vehicles_inside(geofence_id):
+    """Get the vehicles currently inside a geofence."""
+    try:
+        result, status_code = GeofenceService.get_vehicles_inside(geofence_id)
+        return jsonify(result), status_code
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@geofence_bp.route('/events', methods=['GET'])
+@jwt_required()
+def get_geofence_events():
+    """Get enter, exit and dwell events, ?vehicle_id=, ?mission_id=, ?geofence_id=, ?event=."""
+    try:
+        page = parse_page_args('geofence_events')
+        result, status_code = GeofenceService.get_events(page)
+        return jsonify(result), status_code
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@geofence_bp.route('/check', methods=['GET'])
+@jwt_required()
+def check_point():
+    """Get the active geofences containing ?lat=&lon=."""
+    try:
+        lat = request.args.get('lat', type=float)
+        lon = request.args.get('lon', type=float)
+        if lat is None or lon is None:
+            raise ValueError('lat and lon are required and must be numbers')
+        
+        result, status_code = GeofenceService.check_point(lat, lon)
+        return jsonify(result), status_code
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@geofence_bp.route('/stats', methods=['GET'])
+@admin_required
+def get_geofence_stats(current_user):
+    """Points checked, events recorded and time per point of this process."""
+    from app.services.geofence_engine import geofence_engine
+    return jsonify(geofence_engine.stats()), 200
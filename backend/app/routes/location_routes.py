@@ -2,6 +2,13 @@ from flask import Blueprint, request, jsonify
 from marshmallow import ValidationError
 from app.schemas.location_schema import LocationSchema, LocationCreateSchema
 from app.services.location_service import LocationService
+from app.services.track_service import TrackService
+from app.services.ingest_queue import IngestQueueFull, ingest_queue
+from app.services.telemetry_journal import telemetry_journal
+from app.utils.auth import admin_required
+from app.utils.conditional import conditional_get, fleet_version
+from app.utils.serialization import POINT_COLUMNS, wants_columns
+import math
 
 location_bp = Blueprint('location', __name__)
 
@@ -17,10 +24,22 @@ def add_location():
         
     except ValidationError as e:
         return jsonify({'error': 'Validation error', 'details': e.messages}), 400
+    except IngestQueueFull as e:
+        retry_after = max(1, math.ceil(ingest_queue.flush_interval))
+        return jsonify({'error': str(e)}), 429, {'Retry-After': str(retry_after)}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@location_bp.route('/ingest/stats', methods=['GET'])
+@admin_required
+def get_ingest_stats(current_user):
+    """Ingest queue depth, throughput and commit latency, or journal replay progress."""
+    if telemetry_journal.enabled:
+        return jsonify(telemetry_journal.stats()), 200
+    return jsonify(ingest_queue.stats()), 200
+
 @location_bp.route('/current', methods=['GET'])
+@conditional_get(fleet_version)
 def get_all_current_locations():
     """Get current locations for all vehicles."""
     try:
@@ -35,9 +54,14 @@ def get_vehicle_locations(vehicle_id):
     """Get locations for a specific vehicle."""
     try:
         hours = request.args.get('hours', 24, type=int)
-        result, status_code = LocationService.get_vehicle_locations(vehicle_id, hours)
+        columns = wants_columns()
+        result, status_code = LocationService.get_vehicle_locations(
+            vehicle_id, hours, columns=tuple(POINT_COLUMNS) if columns else None
+        )
         return jsonify(result), status_code
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -45,9 +69,14 @@ def get_vehicle_locations(vehicle_id):
 def get_mission_locations(mission_id):
     """Get locations for a specific mission."""
     try:
-        result, status_code = LocationService.get_mission_locations(mission_id)
+        columns = wants_columns()
+        result, status_code = LocationService.get_mission_locations(
+            mission_id, columns=tuple(POINT_COLUMNS) if columns else None
+        )
         return jsonify(result), status_code
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -57,12 +86,27 @@ def get_location_history(vehicle_id):
     try:
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
+        columns = wants_columns()
         
         result, status_code = LocationService.get_location_history(
-            vehicle_id, start_date, end_date
+            vehicle_id, start_date, end_date, columns=tuple(POINT_COLUMNS) if columns else None
         )
         return jsonify(result), status_code
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@location_bp.route('/compact', methods=['POST'])
+@admin_required
+def compact_locations(current_user):
+    """Compact finished missions and old mission-less points into trip tracks."""
+    try:
+        days = request.args.get('days', type=int)
+        result, status_code = TrackService.compact(days)
+        return jsonify(result), status_code
+        
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -4,13 +4,26 @@ from datetime import datetime
 from app.services.location_service import LocationService
 from app.services.map_service import MapService
 from app.services.geolocation_service import GeolocationService
+from app.services.spatial_service import SpatialService
+from app.services.track_service import TrackService
 from app.models.vehicle import Vehicle
 from app.models.mission import Mission
 from app.models.location import Location
+from app.utils.conditional import conditional_get, fleet_version, route_version
+from app.utils.serialization import wants_columns
+from app.utils.spatial import postgis_enabled
+from app.utils.track_codec import column_values
 
 map_bp = Blueprint('map', __name__)
 
+# Point columns of a route requested with ?shape=columns
+ROUTE_COLUMNS = ('ts', 'lat', 'lon', 'speed')
+
+# Grid cell of the heatmap aggregated by PostGIS, about 100 m
+HEATMAP_CELL_DEG = 0.001
+
 @map_bp.route('/fleet', methods=['GET'])
+@conditional_get(fleet_version)
 def get_fleet_map():
     """Get fleet map with all vehicle locations and active missions."""
     try:
@@ -120,12 +133,16 @@ def get_fleet_map():
 
 @map_bp.route('/vehicle/<int:vehicle_id>/route', methods=['GET'])
 @jwt_required()
+@conditional_get(route_version)
 def get_vehicle_route(vehicle_id):
     """Get route for a specific vehicle."""
     try:
         hours = request.args.get('hours', 24, type=int)
+        columns = wants_columns()
         
-        result, status_code = LocationService.get_vehicle_locations(vehicle_id, hours)
+        result, status_code = LocationService.get_vehicle_locations(
+            vehicle_id, hours, columns=ROUTE_COLUMNS if columns else None
+        )
         
         if status_code != 200:
             return jsonify(result), status_code
@@ -133,13 +150,13 @@ def get_vehicle_route(vehicle_id):
         locations = result['locations']
         vehicle = result['vehicle']
         
-        if not locations:
+        if not (locations['ts'] if columns else locations):
             return jsonify({'error': 'No location data found for this vehicle'}), 404
         
         # Create route data
         route_data = {
             'vehicle': vehicle,
-            'route': [
+            'route': locations if columns else [
                 {
                     'latitude': loc['latitude'],
                     'longitude': loc['longitude'],
@@ -152,21 +169,28 @@ def get_vehicle_route(vehicle_id):
         
         return jsonify(route_data), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @map_bp.route('/mission/<int:mission_id>/route', methods=['GET'])
 @jwt_required()
+@conditional_get(route_version)
 def get_mission_route(mission_id):
     """Get route for a specific mission."""
     try:
+        columns = wants_columns()
+        
         # Get mission details
         mission = Mission.query.get(mission_id)
         if not mission:
             return jsonify({'error': 'Mission not found'}), 404
         
         # Get mission locations
-        result, status_code = LocationService.get_mission_locations(mission_id)
+        result, status_code = LocationService.get_mission_locations(
+            mission_id, columns=ROUTE_COLUMNS if columns else None
+        )
         
         if status_code != 200:
             return jsonify(result), status_code
@@ -188,7 +212,7 @@ def get_mission_route(mission_id):
                     'address': mission.end_address
                 }
             },
-            'actual_route': [
+            'actual_route': locations if columns else [
                 {
                     'latitude': loc['latitude'],
                     'longitude': loc['longitude'],
@@ -201,6 +225,8 @@ def get_mission_route(mission_id):
         
         return jsonify(route_data), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -211,6 +237,13 @@ def get_heatmap_data():
     try:
         hours = request.args.get('hours', 24, type=int)
         
+        # PostGIS counts the points per grid cell in the database
+        if postgis_enabled():
+            result, status_code = SpatialService.heatmap(hours, HEATMAP_CELL_DEG)
+            if status_code != 200:
+                return jsonify(result), status_code
+            return jsonify({'heatmap_data': result['cells']}), 200
+        
         # Get all recent locations
         from datetime import datetime, timedelta
         time_threshold = datetime.utcnow() - timedelta(hours=hours)
@@ -227,6 +260,11 @@ def get_heatmap_data():
                 'intensity': 1
             })
         
+        # Compacted points of the period, read column by column
+        for _, _, track in TrackService.track_columns(start=time_threshold):
+            for latitude, longitude in zip(column_values(track, 'latitude'), column_values(track, 'longitude')):
+                heatmap_data.append({'latitude': latitude, 'longitude': longitude, 'intensity': 1})
+        
         return jsonify({'heatmap_data': heatmap_data}), 200
         
     except Exception as e:
@@ -519,6 +557,7 @@ def get_fleet_analysis():
         return jsonify({'error': str(e)}), 500
 
 @map_bp.route('/real-time-tracking', methods=['GET'])
+@conditional_get(fleet_version)
 def get_real_time_tracking():
     """Obtenir les données de suivi en temps réel."""
     try:
@@ -548,6 +587,7 @@ def simulate_real_time():
         return jsonify({'error': str(e)}), 500
 
 @map_bp.route('/folium-embed', methods=['GET'])
+@conditional_get(fleet_version)
 def get_folium_embed():
     """Renvoie la carte Folium en HTML pour l'intégration dans le frontend."""
     try:
@@ -719,44 +759,16 @@ def update_mission_position(mission_id):
 def simulate_all_missions():
     """Simulate movement for all active missions."""
     try:
-        from app.services.mission_service import MissionService
-        
-        # Get all active missions
-        active_missions = Mission.query.filter(
-            Mission.status == 'in_progress'
-        ).all()
+        from app.services.scheduler import scheduler
         
-        updated_missions = []
-        
-        for mission in active_missions:
-            try:
-                # Update tracking for each mission
-                MissionService._start_mission_tracking(mission.id)
-                
-                # Get updated location
-                current_location = Location.query.filter_by(
-                    vehicle_id=mission.vehicle_id
-                ).order_by(Location.timestamp.desc()).first()
-                
-                updated_missions.append({
-                    'mission_id': mission.id,
-                    'title': mission.title,
-                    'current_location': {
-                        'latitude': current_location.latitude,
-                        'longitude': current_location.longitude,
-                        'timestamp': current_location.timestamp.isoformat(),
-                        'speed': current_location.speed
-                    } if current_location else None
-                })
-            except Exception as e:
-                print(f"Error updating mission {mission.id}: {str(e)}")
-                continue
+        # 30 seconds of driving for the vehicles on a mission in progress, on a scheduler thread
+        started, job = scheduler.run_now('simulation_tick', seconds=30)
         
         return jsonify({
-            'message': 'All active missions updated',
-            'updated_missions': updated_missions,
-            'count': len(updated_missions)
-        }), 200
+            'message': 'Mission simulation started' if started else 'A simulation step is already running',
+            'started': started,
+            'job': job
+        }), 202
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -4,6 +4,13 @@ from marshmallow import ValidationError
 from app.schemas.mission_schema import MissionSchema, MissionCreateSchema
 from app.services.mission_service import MissionService
 from app.services.map_service import MapService
+from app.services.trip_service import TripService
+from app.utils.serialization import parse_serialization_args, serialize
+from app.utils.pagination import parse_page_args
+from app.utils.conditional import conditional_get, table_version
+from app.models.mission import Mission
+from app.models.user import User
+from app.models.vehicle import Vehicle
 
 mission_bp = Blueprint('mission', __name__)
 
@@ -25,12 +32,17 @@ def create_mission():
 
 @mission_bp.route('', methods=['GET'])
 @jwt_required()
+@conditional_get(table_version(Mission, User, Vehicle))
 def get_missions():
     """Get all missions."""
     try:
-        result, status_code = MissionService.get_missions()
+        options = parse_serialization_args('missions')
+        page = parse_page_args('missions')
+        result, status_code = MissionService.get_missions(options, page)
         return jsonify(result), status_code
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -57,6 +69,17 @@ def get_mission_map(mission_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@mission_bp.route('/<int:mission_id>/report', methods=['GET'])
+@jwt_required()
+def get_mission_report(mission_id):
+    """Distance, driving and stopped time of a mission from its trips and stops."""
+    try:
+        result, status_code = TripService.mission_report(mission_id)
+        return jsonify(result), status_code
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @mission_bp.route('/<int:mission_id>', methods=['PUT'])
 @jwt_required()
 def update_mission(mission_id):
@@ -122,10 +145,17 @@ def get_missions_no_auth():
     """Get all missions without authentication for development."""
     try:
         from app.models.mission import Mission
-        missions = Mission.query.all()
-        return jsonify({
-            'missions': [mission.to_dict() for mission in missions]
-        }), 200
+        options = parse_serialization_args('missions')
+        page = parse_page_args('missions')
+        missions, pagination = page.apply(Mission.query.options(*options.load_options()))
+        data, included = serialize(missions, options)
+        
+        response = {'missions': data, 'pagination': pagination}
+        if included is not None:
+            response['included'] = included
+        return jsonify(response), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -4,6 +4,8 @@ from app.models.reimbursement import Reimbursement
 from app.models.mission import Mission
 from app.models.user import User
 from app import db
+from app.utils.serialization import parse_serialization_args, serialize
+from app.utils.pagination import parse_page_args
 from datetime import datetime
 
 reimbursement_bp = Blueprint('reimbursement', __name__)
@@ -20,11 +22,23 @@ REIMBURSEMENT_RATES = {
 def get_reimbursements():
     """Get all reimbursements."""
     try:
-        reimbursements = Reimbursement.query.all()
-        return jsonify({
+        options = parse_serialization_args('reimbursements')
+        page = parse_page_args('reimbursements')
+        reimbursements, pagination = page.apply(
+            Reimbursement.query.options(*options.load_options())
+        )
+        data, included = serialize(reimbursements, options)
+        
+        response = {
             'message': 'Reimbursements retrieved successfully',
-            'data': [r.to_dict() for r in reimbursements]
-        }), 200
+            'data': data,
+            'pagination': pagination
+        }
+        if included is not None:
+            response['included'] = included
+        return jsonify(response), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -0,0 +1,87 @@
+from flask import Blueprint, request, jsonify
+from app.services.spatial_service import SpatialService
+
+spatial_bp = Blueprint('spatial', __name__)
+
+def _required_float(name):
+    value = request.args.get(name, type=float)
+    if value is None:
+        raise ValueError(f'{name} is required and must be a number')
+    return value
+
+def _bbox_args(required=True):
+    """Read ?south=&west=&north=&east=, returns None when absent and optional."""
+    names = ('south', 'west', 'north', 'east')
+    if not required and not any(name in request.args for name in names):
+        return None
+    bbox = {name: _required_float(name) for name in names}
+    if bbox['south'] > bbox['north'] or bbox['west'] > bbox['east']:
+        raise ValueError('Invalid bounding box')
+    return bbox
+
+@spatial_bp.route('/nearest', methods=['GET'])
+def get_nearest_vehicles():
+    """Get the vehicles closest to a point."""
+    try:
+        lat = _required_float('lat')
+        lon = _required_float('lon')
+        limit = min(request.args.get('limit', 5, type=int), 100)
+        radius = request.args.get('radius', type=float)
+        status = request.args.get('status')
+        
+        result, status_code = SpatialService.nearest_vehicles(lat, lon, limit, radius, status)
+        return jsonify(result), status_code
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@spatial_bp.route('/bbox', methods=['GET'])
+def get_locations_in_bbox():
+    """Get location points inside a bounding box."""
+    try:
+        bbox = _bbox_args()
+        hours = request.args.get('hours', 24, type=int)
+        vehicle_id = request.args.get('vehicle_id', type=int)
+        limit = min(request.args.get('limit', 5000, type=int), 50000)
+        
+        result, status_code = SpatialService.locations_in_bbox(
+            hours=hours, vehicle_id=vehicle_id, limit=limit, **bbox
+        )
+        return jsonify(result), status_code
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@spatial_bp.route('/heatmap', methods=['GET'])
+def get_heatmap():
+    """Get location density aggregated on a grid."""
+    try:
+        hours = request.args.get('hours', 24, type=int)
+        cell = request.args.get('cell', 0.005, type=float)
+        if cell <= 0:
+            raise ValueError('cell must be positive')
+        bbox = _bbox_args(required=False)
+        
+        result, status_code = SpatialService.heatmap(hours, cell, bbox)
+        return jsonify(result), status_code
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@spatial_bp.route('/missions/<int:mission_id>/deviation', methods=['GET'])
+def get_mission_deviation(mission_id):
+    """Get how far a mission's track strayed from its planned line."""
+    try:
+        threshold = request.args.get('threshold', 2000, type=float)
+        
+        result, status_code = SpatialService.mission_deviation(mission_id, threshold)
+        return jsonify(result), status_code
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
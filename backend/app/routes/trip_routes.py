@@ -0,0 +1,81 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from app.services.trip_service import TripService
+from app.utils.auth import admin_required
+from app.utils.pagination import parse_page_args
+from datetime import datetime, timedelta
+
+trip_bp = Blueprint('trip', __name__)
+
+def _parse_time(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        raise ValueError(f'{name} must be an ISO 8601 date')
+
+@trip_bp.route('', methods=['GET'])
+@jwt_required()
+def get_trips():
+    """Get trips, ?vehicle_id=, ?mission_id=, ?is_open=, ?started_at__gte=."""
+    try:
+        page = parse_page_args('trips')
+        result, status_code = TripService.get_trips(page)
+        return jsonify(result), status_code
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@trip_bp.route('/<int:trip_id>', methods=['GET'])
+@jwt_required()
+def get_trip(trip_id):
+    """Get one trip, with its geometry matched to the roads as [lat, lon] points."""
+    try:
+        result, status_code = TripService.get_trip(trip_id)
+        return jsonify(result), status_code
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@trip_bp.route('/stops', methods=['GET'])
+@jwt_required()
+def get_stops():
+    """Get stops, ?vehicle_id=, ?mission_id=, ?geofence_id=, ?is_open=, ?duration_seconds__gte=."""
+    try:
+        page = parse_page_args('stops')
+        result, status_code = TripService.get_stops(page)
+        return jsonify(result), status_code
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@trip_bp.route('/vehicles/<int:vehicle_id>/timeline', methods=['GET'])
+@jwt_required()
+def get_vehicle_timeline(vehicle_id):
+    """Trips and stops of a vehicle between ?start= and ?end=, by default the last ?hours=24."""
+    try:
+        end = _parse_time('end') or datetime.utcnow()
+        start = _parse_time('start') or end - timedelta(hours=request.args.get('hours', 24, type=float))
+        if start > end:
+            raise ValueError('start must be before end')
+        
+        result, status_code = TripService.vehicle_timeline(vehicle_id, start, end)
+        return jsonify(result), status_code
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@trip_bp.route('/map-matching/stats', methods=['GET'])
+@admin_required
+def get_map_matching_stats(current_user):
+    """Trips and points matched to the roads, and time per point, by this process."""
+    from app.services.map_matcher import map_matcher
+    return jsonify(map_matcher.stats()), 200
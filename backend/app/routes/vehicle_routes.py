@@ -3,6 +3,11 @@ from flask_jwt_extended import jwt_required
 from marshmallow import ValidationError
 from app.schemas.vehicle_schema import VehicleSchema, VehicleCreateSchema
 from app.services.vehicle_service import VehicleService
+from app.utils.serialization import parse_serialization_args, serialize
+from app.utils.pagination import parse_page_args
+from app.utils.conditional import conditional_get, table_version
+from app.models.user import User
+from app.models.vehicle import Vehicle
 
 vehicle_bp = Blueprint('vehicle', __name__)
 
@@ -24,23 +29,33 @@ def create_vehicle():
 
 @vehicle_bp.route('', methods=['GET'])
 @jwt_required()
+@conditional_get(table_version(Vehicle, User))
 def get_vehicles():
     """Get all vehicles."""
     try:
-        result, status_code = VehicleService.get_vehicles()
+        options = parse_serialization_args('vehicles')
+        page = parse_page_args('vehicles')
+        result, status_code = VehicleService.get_vehicles(options, page)
         return jsonify(result), status_code
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @vehicle_bp.route('/available', methods=['GET'])
 @jwt_required()
+@conditional_get(table_version(Vehicle, User))
 def get_available_vehicles():
     """Get available vehicles."""
     try:
-        result, status_code = VehicleService.get_available_vehicles()
+        options = parse_serialization_args('vehicles')
+        page = parse_page_args('vehicles')
+        result, status_code = VehicleService.get_available_vehicles(options, page)
         return jsonify(result), status_code
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -122,10 +137,17 @@ def get_vehicles_no_auth():
     """Get all vehicles without authentication for development."""
     try:
         from app.models.vehicle import Vehicle
-        vehicles = Vehicle.query.all()
-        return jsonify({
-            'vehicles': [vehicle.to_dict() for vehicle in vehicles]
-        }), 200
+        options = parse_serialization_args('vehicles')
+        page = parse_page_args('vehicles')
+        vehicles, pagination = page.apply(Vehicle.query.options(*options.load_options()))
+        data, included = serialize(vehicles, options)
+        
+        response = {'vehicles': data, 'pagination': pagination}
+        if included is not None:
+            response['included'] = included
+        return jsonify(response), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
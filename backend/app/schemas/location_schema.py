@@ -1,4 +1,9 @@
-from marshmallow import Schema, fields
+from datetime import datetime, timedelta, timezone
+from marshmallow import Schema, fields, post_load
+from marshmallow.exceptions import ValidationError
+
+# Device clocks drift, points stamped further ahead than this are rejected
+MAX_CLOCK_SKEW = timedelta(minutes=5)
 
 class LocationSchema(Schema):
     id = fields.Int(dump_only=True)
@@ -22,3 +27,18 @@ class LocationCreateSchema(Schema):
     accuracy = fields.Float()
     vehicle_id = fields.Int(required=True)
     mission_id = fields.Int()
+    # Time the device recorded the point (ISO 8601), defaults to the time it is received
+    timestamp = fields.DateTime()
+    
+    @post_load
+    def normalize_timestamp(self, data, **kwargs):
+        timestamp = data.get('timestamp')
+        if timestamp is None:
+            return data
+        # Stored as naive UTC like every other DateTime column
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        if timestamp > datetime.utcnow() + MAX_CLOCK_SKEW:
+            raise ValidationError('Timestamp is in the future', 'timestamp')
+        data['timestamp'] = timestamp
+        return data
@@ -4,6 +4,8 @@ from .vehicle_service import VehicleService
 from .location_service import LocationService
 from .anomaly_service import AnomalyService
 from .map_service import MapService
+from .spatial_service import SpatialService
+from .track_service import TrackService
 
 __all__ = [
     'AuthService',
@@ -11,5 +13,7 @@ __all__ = [
     'VehicleService',
     'LocationService',
     'AnomalyService',
-    'MapService'
+    'MapService',
+    'SpatialService',
+    'TrackService'
 ]
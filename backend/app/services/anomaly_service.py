@@ -1,12 +1,21 @@
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from app.models.anomaly import Anomaly
 from app.models.mission import Mission
 from app.models.vehicle import Vehicle
 from app.models.location import Location
-from app.models.user import User
+from app.models.stop import Stop
 from app import db
+from app.services.spatial_service import SpatialService
+from app.utils.auth import current_user_has_role
+from app.utils.metrics import ANOMALIES, DETECTION_DURATION
+from app.utils.serialization import SerializationOptions, serialize
+from app.utils.spatial import postgis_enabled
 from datetime import datetime, timedelta
 import math
+import time
+
+# Unresolved anomalies returned by POST /api/anomalies/detect, most recent first
+OPEN_ANOMALIES_LIMIT = 100
 
 class AnomalyService:
     
@@ -24,6 +33,16 @@ class AnomalyService:
         
         return R * c
     
+    @staticmethod
+    def mission_end_distances(mission, lat, lon):
+        """Distances in km from a point to the mission's start and end, by PostGIS when enabled."""
+        if postgis_enabled():
+            start_m, end_m = SpatialService.distances_to_mission_ends(mission.id, lat, lon)
+            return start_m / 1000, end_m / 1000
+        
+        return (AnomalyService.calculate_distance(lat, lon, mission.start_latitude, mission.start_longitude),
+                AnomalyService.calculate_distance(lat, lon, mission.end_latitude, mission.end_longitude))
+    
     @staticmethod
     def detect_route_deviation(vehicle_id, mission_id, current_lat, current_lon, threshold_km=2):
         """Detect if vehicle has deviated from planned route."""
@@ -32,16 +51,9 @@ class AnomalyService:
             if not mission:
                 return None
             
-            # Calculate distance from start point
-            distance_from_start = AnomalyService.calculate_distance(
-                current_lat, current_lon,
-                mission.start_latitude, mission.start_longitude
-            )
-            
-            # Calculate distance from end point
-            distance_from_end = AnomalyService.calculate_distance(
-                current_lat, current_lon,
-                mission.end_latitude, mission.end_longitude
+            # Distances from the start and end points
+            distance_from_start, distance_from_end = AnomalyService.mission_end_distances(
+                mission, current_lat, current_lon
             )
             
             # Simple deviation check - if too far from both start and end points
@@ -115,29 +127,28 @@ class AnomalyService:
     
     @staticmethod
     def detect_idle_time(vehicle_id, mission_id, threshold_minutes=30):
-        """Detect if vehicle has been idle for too long."""
+        """Detect if vehicle has been idle for too long.
+        
+        Reads the vehicle's stop in progress from the trip segmenter; a stop at
+        the start or end of the mission is loading or delivery, not idling.
+        Without scheduled segmentation, compares the vehicle's recent locations.
+        """
         try:
-            # Get recent locations for the vehicle
-            time_threshold = datetime.utcnow() - timedelta(minutes=threshold_minutes)
-            
-            locations = Location.query.filter(
-                Location.vehicle_id == vehicle_id,
-                Location.timestamp >= time_threshold
-            ).order_by(Location.timestamp.desc()).limit(2).all()
-            
-            if len(locations) >= 2:
-                # Check if vehicle hasn't moved significantly
-                distance = AnomalyService.calculate_distance(
-                    locations[0].latitude, locations[0].longitude,
-                    locations[1].latitude, locations[1].longitude
+            from app.services.scheduler import scheduler
+            
+            if not scheduler.is_scheduled('trip_segmentation'):
+                return AnomalyService._detect_idle_from_locations(vehicle_id, mission_id, threshold_minutes)
+            
+            stop = Stop.query.filter_by(vehicle_id=vehicle_id, is_open=True).order_by(Stop.started_at.desc()).first()
+            
+            if (stop and stop.mission_endpoint is None
+                    and stop.duration_seconds >= threshold_minutes * 60):
+                return AnomalyService.create_anomaly(
+                    vehicle_id, mission_id, 'idle',
+                    f'Vehicle idle for {stop.duration_seconds / 60:.0f} minutes '
+                    f'at ({stop.latitude:.5f}, {stop.longitude:.5f})',
+                    'medium'
                 )
-                
-                if distance < 0.1:  # Less than 100 meters
-                    return AnomalyService.create_anomaly(
-                        vehicle_id, mission_id, 'idle',
-                        f'Vehicle idle for more than {threshold_minutes} minutes',
-                        'medium'
-                    )
             
             return None
             
@@ -145,6 +156,33 @@ class AnomalyService:
             print(f"Error detecting idle time: {e}")
             return None
     
+    @staticmethod
+    def _detect_idle_from_locations(vehicle_id, mission_id, threshold_minutes):
+        """Idle when the vehicle's two latest locations of the last minutes are less than 100 m apart."""
+        # Get recent locations for the vehicle
+        time_threshold = datetime.utcnow() - timedelta(minutes=threshold_minutes)
+        
+        locations = Location.query.filter(
+            Location.vehicle_id == vehicle_id,
+            Location.timestamp >= time_threshold
+        ).order_by(Location.timestamp.desc()).limit(2).all()
+        
+        if len(locations) >= 2:
+            # Check if vehicle hasn't moved significantly
+            distance = AnomalyService.calculate_distance(
+                locations[0].latitude, locations[0].longitude,
+                locations[1].latitude, locations[1].longitude
+            )
+            
+            if distance < 0.1:  # Less than 100 meters
+                return AnomalyService.create_anomaly(
+                    vehicle_id, mission_id, 'idle',
+                    f'Vehicle idle for more than {threshold_minutes} minutes',
+                    'medium'
+                )
+        
+        return None
+    
     @staticmethod
     def create_anomaly(vehicle_id, mission_id, anomaly_type, description, severity):
         """Create a new anomaly record."""
@@ -159,6 +197,7 @@ class AnomalyService:
             
             db.session.add(anomaly)
             db.session.commit()
+            ANOMALIES.inc(anomaly_type)
             
             return anomaly
             
@@ -168,10 +207,11 @@ class AnomalyService:
             return None
     
     @staticmethod
-    def get_anomalies(vehicle_id=None, mission_id=None, severity=None):
-        """Get anomalies with optional filters."""
+    def get_anomalies(vehicle_id=None, mission_id=None, severity=None, serialization=None, page=None):
+        """Get anomalies with optional filters, one page at a time when `page` is given."""
         try:
-            query = Anomaly.query
+            serialization = serialization or SerializationOptions('anomalies')
+            query = Anomaly.query.options(*serialization.load_options())
             
             if vehicle_id:
                 query = query.filter_by(vehicle_id=vehicle_id)
@@ -182,25 +222,41 @@ class AnomalyService:
             if severity:
                 query = query.filter_by(severity=severity)
             
-            anomalies = query.order_by(Anomaly.detected_at.desc()).all()
+            pagination = None
+            if page is not None:
+                anomalies, pagination = page.apply(query)
+            else:
+                anomalies = query.order_by(Anomaly.detected_at.desc()).all()
             
-            return {
-                'anomalies': [anomaly.to_dict() for anomaly in anomalies]
-            }, 200
+            data, included = serialize(anomalies, serialization)
+            result = {'anomalies': data}
+            if pagination is not None:
+                result['pagination'] = pagination
+            if included is not None:
+                result['included'] = included
+            
+            return result, 200
             
         except Exception as e:
             return {'error': str(e)}, 500
     
     @staticmethod
     @jwt_required()
-    def get_recent_anomalies(hours=24):
-        """Get anomalies from the last X hours."""
+    def get_recent_anomalies(hours=24, page=None):
+        """Get anomalies from the last X hours, one page at a time when `page` is given."""
         try:
             time_threshold = datetime.utcnow() - timedelta(hours=hours)
             
-            anomalies = Anomaly.query.filter(
-                Anomaly.detected_at >= time_threshold
-            ).order_by(Anomaly.detected_at.desc()).all()
+            query = Anomaly.query.filter(Anomaly.detected_at >= time_threshold)
+            
+            if page is not None:
+                anomalies, pagination = page.apply(query)
+                return {
+                    'anomalies': [anomaly.to_dict() for anomaly in anomalies],
+                    'pagination': pagination
+                }, 200
+            
+            anomalies = query.order_by(Anomaly.detected_at.desc()).all()
             
             return {
                 'anomalies': [anomaly.to_dict() for anomaly in anomalies]
@@ -212,57 +268,110 @@ class AnomalyService:
     @staticmethod
     @jwt_required()
     def run_anomaly_detection():
-        """Run anomaly detection for all active missions."""
+        """Start anomaly and schedule delay detection on the scheduler's threads.
+        
+        Answers at once with the unresolved anomalies found so far; the ones
+        this run finds appear in /api/anomalies.
+        """
         try:
-            current_user_id = get_jwt_identity()
-            current_user = User.query.get(current_user_id)
-            
-            if not current_user or current_user.role not in ['admin', 'manager']:
+            if not current_user_has_role('admin', 'manager'):
                 return {'error': 'Insufficient permissions'}, 403
             
-            # Get all in-progress missions
-            missions = Mission.query.filter_by(status='in_progress').all()
-            detected_anomalies = []
+            from app.services.scheduler import scheduler
             
-            for mission in missions:
-                # Get latest location for the vehicle
-                latest_location = Location.query.filter_by(
-                    vehicle_id=mission.vehicle_id
-                ).order_by(Location.timestamp.desc()).first()
-                
-                if latest_location:
-                    # Check for route deviation
-                    deviation = AnomalyService.detect_route_deviation(
-                        mission.vehicle_id, mission.id,
-                        latest_location.latitude, latest_location.longitude
-                    )
-                    if deviation:
-                        detected_anomalies.append(deviation.to_dict())
-                    
-                    # Check for speeding
-                    if latest_location.speed:
-                        speeding = AnomalyService.detect_speed_anomaly(
-                            mission.vehicle_id, mission.id, latest_location.speed
-                        )
-                        if speeding:
-                            detected_anomalies.append(speeding.to_dict())
-                    
-                    # Check for idle time
-                    idle = AnomalyService.detect_idle_time(
-                        mission.vehicle_id, mission.id
-                    )
-                    if idle:
-                        detected_anomalies.append(idle.to_dict())
-                
-                # Check for schedule delays
-                delay = AnomalyService.detect_schedule_delay(mission.id)
-                if delay:
-                    detected_anomalies.append(delay.to_dict())
+            jobs = {}
+            for name in ('anomaly_detection', 'schedule_delays'):
+                started, job = scheduler.run_now(name)
+                jobs[name] = dict(job, started=started)
+            
+            open_anomalies = Anomaly.query.filter(Anomaly.is_resolved.is_(False)).order_by(
+                Anomaly.detected_at.desc()
+            ).limit(OPEN_ANOMALIES_LIMIT).all()
             
             return {
-                'message': f'Anomaly detection completed. Found {len(detected_anomalies)} anomalies.',
-                'anomalies': detected_anomalies
-            }, 200
+                'message': 'Anomaly detection started, new anomalies will appear in /api/anomalies',
+                'anomalies': [anomaly.to_dict() for anomaly in open_anomalies],
+                'jobs': jobs
+            }, 202
             
         except Exception as e:
             return {'error': str(e)}, 500
+    
+    @staticmethod
+    def _open_anomalies(mission_ids):
+        """(mission_id, type) of the unresolved anomalies of these missions."""
+        if not mission_ids:
+            return set()
+        rows = db.session.query(Anomaly.mission_id, Anomaly.type).filter(
+            Anomaly.mission_id.in_(mission_ids),
+            Anomaly.is_resolved.is_(False)
+        ).distinct().all()
+        return {(mission_id, anomaly_type) for mission_id, anomaly_type in rows}
+    
+    @staticmethod
+    def detect_anomalies():
+        """Check route deviation, speeding and idle time of every mission in progress (scheduled job).
+        
+        A rule is not checked again for a mission while one of its anomalies is unresolved.
+        """
+        started = time.perf_counter()
+        missions = Mission.query.filter_by(status='in_progress').all()
+        open_anomalies = AnomalyService._open_anomalies([mission.id for mission in missions])
+        detected_anomalies = []
+        
+        for mission in missions:
+            # Get latest location for the vehicle
+            latest_location = Location.query.filter_by(
+                vehicle_id=mission.vehicle_id
+            ).order_by(Location.timestamp.desc()).first()
+            if not latest_location:
+                continue
+            
+            if (mission.id, 'deviation') not in open_anomalies:
+                deviation = AnomalyService.detect_route_deviation(
+                    mission.vehicle_id, mission.id,
+                    latest_location.latitude, latest_location.longitude
+                )
+                if deviation:
+                    detected_anomalies.append(deviation.to_dict())
+            
+            if latest_location.speed and (mission.id, 'speeding') not in open_anomalies:
+                speeding = AnomalyService.detect_speed_anomaly(
+                    mission.vehicle_id, mission.id, latest_location.speed
+                )
+                if speeding:
+                    detected_anomalies.append(speeding.to_dict())
+            
+            if (mission.id, 'idle') not in open_anomalies:
+                idle = AnomalyService.detect_idle_time(mission.vehicle_id, mission.id)
+                if idle:
+                    detected_anomalies.append(idle.to_dict())
+        
+        DETECTION_DURATION.observe(time.perf_counter() - started)
+        return {
+            'message': f'Anomaly detection completed. Found {len(detected_anomalies)} anomalies.',
+            'anomalies': detected_anomalies
+        }, 200
+    
+    @staticmethod
+    def detect_schedule_delays():
+        """Record a delay for missions not started or not finished on schedule (scheduled job)."""
+        now = datetime.utcnow()
+        missions = Mission.query.filter(db.or_(
+            db.and_(Mission.status == 'pending', Mission.scheduled_start < now),
+            db.and_(Mission.status == 'in_progress', Mission.scheduled_end < now)
+        )).all()
+        open_anomalies = AnomalyService._open_anomalies([mission.id for mission in missions])
+        detected_anomalies = []
+        
+        for mission in missions:
+            if (mission.id, 'delay') in open_anomalies:
+                continue
+            delay = AnomalyService.detect_schedule_delay(mission.id)
+            if delay:
+                detected_anomalies.append(delay.to_dict())
+        
+        return {
+            'message': f'Schedule check completed. Found {len(detected_anomalies)} delays.',
+            'anomalies': detected_anomalies
+        }, 200
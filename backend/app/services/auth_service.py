@@ -1,6 +1,8 @@
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import create_access_token, jwt_required
 from app.models.user import User
 from app import db
+from app.utils.auth import get_current_user
+from app.utils.password_hashing import PasswordHashingBusy, password_hasher
 from werkzeug.security import generate_password_hash
 from datetime import timedelta
 
@@ -34,6 +36,9 @@ class AuthService:
             
             return {'message': 'User registered successfully', 'user': user.to_dict()}, 201
             
+        except PasswordHashingBusy:
+            db.session.rollback()
+            raise
         except Exception as e:
             db.session.rollback()
             return {'error': str(e)}, 500
@@ -50,9 +55,20 @@ class AuthService:
             if not user.is_active:
                 return {'error': 'Account is deactivated'}, 401
             
-            # Create JWT token
+            # Upgrade hashes made with older parameters while the plain password is known
+            if user.password_needs_rehash():
+                try:
+                    user.set_password(password)
+                    db.session.commit()
+                    password_hasher.count_rehash()
+                except PasswordHashingBusy:
+                    # The login itself succeeded, retry the upgrade next time
+                    db.session.rollback()
+            
+            # Create JWT token, the role claim lets authorization skip the user lookup
             access_token = create_access_token(
                 identity=user.id,
+                additional_claims={'role': user.role},
                 expires_delta=timedelta(hours=24)
             )
             
@@ -62,6 +78,9 @@ class AuthService:
                 'user': user.to_dict()
             }, 200
             
+        except PasswordHashingBusy:
+            db.session.rollback()
+            raise
         except Exception as e:
             return {'error': str(e)}, 500
     
@@ -70,8 +89,7 @@ class AuthService:
     def get_current_user():
         """Get current authenticated user."""
         try:
-            user_id = get_jwt_identity()
-            user = User.query.get(user_id)
+            user = get_current_user()
             
             if not user or not user.is_active:
                 return {'error': 'User not found or inactive'}, 404
@@ -86,8 +104,7 @@ class AuthService:
     def update_user_profile(user_data):
         """Update user profile."""
         try:
-            user_id = get_jwt_identity()
-            user = User.query.get(user_id)
+            user = get_current_user()
             
             if not user:
                 return {'error': 'User not found'}, 404
@@ -110,8 +127,7 @@ class AuthService:
     def change_password(current_password, new_password):
         """Change user password."""
         try:
-            user_id = get_jwt_identity()
-            user = User.query.get(user_id)
+            user = get_current_user()
             
             if not user:
                 return {'error': 'User not found'}, 404
@@ -124,6 +140,9 @@ class AuthService:
             
             return {'message': 'Password changed successfully'}, 200
             
+        except PasswordHashingBusy:
+            db.session.rollback()
+            raise
         except Exception as e:
             db.session.rollback()
             return {'error': str(e)}, 500
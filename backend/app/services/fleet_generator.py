@@ -0,0 +1,444 @@
+import csv
+import io
+import math
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import func
+from app import db
+from app.models.mission import Mission
+from app.models.user import User
+from app.models.vehicle import Vehicle
+from app.routes.reimbursement_routes import REIMBURSEMENT_RATES
+from app.utils.password_hashing import password_hasher
+
+# Home cities: name, center latitude/longitude, street grid orientation (degrees)
+CITIES = [
+    ('Rabat', 34.0209, -6.8416, 12),
+    ('Casablanca', 33.5731, -7.5898, 35),
+    ('Fès', 34.0181, -5.0078, 0),
+    ('Marrakech', 31.6295, -7.9811, 20),
+    ('Tanger', 35.7595, -5.8340, 8)
+]
+BRANDS = {
+    'Dacia': ['Logan', 'Duster', 'Dokker'],
+    'Renault': ['Clio', 'Kangoo', 'Master'],
+    'Peugeot': ['208', 'Partner', 'Boxer'],
+    'Toyota': ['Hilux', 'Corolla', 'Land Cruiser'],
+    'Hyundai': ['Accent', 'Tucson', 'H-1']
+}
+FIRST_NAMES = ['Youssef', 'Fatima', 'Mohamed', 'Khadija', 'Omar', 'Salma', 'Hamza', 'Imane', 'Karim', 'Nadia',
+               'Amine', 'Sara', 'Rachid', 'Laila', 'Mehdi', 'Zineb']
+LAST_NAMES = ['Benali', 'El Idrissi', 'Alaoui', 'Bennani', 'Tazi', 'Chraibi', 'Berrada', 'El Fassi', 'Amrani',
+              'Lahlou', 'Sqalli', 'Ouazzani']
+MISSION_TITLES = ['Intervention réseau', 'Relevé compteurs', 'Maintenance poste', 'Livraison matériel',
+                  'Inspection ligne', 'Dépannage client']
+
+METERS_PER_DEGREE = 111320.0
+ACCELERATION = 1.5   # m/s²
+DECELERATION = 2.0   # m/s²
+SPEED_LIMIT = 80     # km/h, as AnomalyService.detect_speed_anomaly
+STEP = 5.0           # meters between points of the speed profile
+
+
+class BulkWriter:
+    """Inserts row tuples with the fastest path of the dialect: COPY on
+    PostgreSQL, one DBAPI executemany elsewhere. No ORM objects, no per-row
+    type processing, so values must already be in their stored form."""
+
+    def __init__(self, connection, table, columns):
+        self.connection = connection
+        self.table = table
+        self.columns = columns
+        dialect = connection.dialect
+        self.copy = dialect.name == 'postgresql'
+        marker = '?' if dialect.paramstyle == 'qmark' else '%s'
+        self.sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join([marker] * len(columns))})"
+
+    def write(self, rows):
+        if not rows:
+            return
+        if self.copy:
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            cursor = self.connection.connection.cursor()
+            cursor.copy_expert(f"COPY {self.table} ({', '.join(self.columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+            cursor.close()
+        else:
+            self.connection.exec_driver_sql(self.sql, rows)
+
+
+def _stamp(value):
+    """A datetime as stored by SQLAlchemy's DateTime on SQLite (and accepted by PostgreSQL)."""
+    return value.strftime('%Y-%m-%d %H:%M:%S.%f') if value is not None else None
+
+
+class FleetGenerator:
+    """Synthetic fleet activity written straight to the database.
+
+    Every vehicle drives `driving_hours` per day at `hz` points per second
+    along street-grid paths around its home city: accelerating out of turns,
+    braking before them, stopping at some intersections, with GPS noise.
+    About `mission_share` of the trips are missions; speeding, delays and
+    fuel overuse produce anomalies, completed missions reimbursements.
+    Results only depend on `seed`.
+    """
+
+    def __init__(self, vehicles=100, days=7, hz=1.0, driving_hours=8.0, seed=42, end=None,
+                 batch_size=100000, password='password123', mission_share=0.6):
+        self.vehicles = vehicles
+        self.days = days
+        self.hz = hz
+        self.driving_hours = driving_hours
+        self.seed = seed
+        self.end = end or datetime.utcnow()
+        self.batch_size = batch_size
+        self.password = password
+        self.mission_share = mission_share
+        self.rng = np.random.default_rng(seed)
+        self.tag = f'sim{seed}'
+        self.counts = {'users': 0, 'vehicles': 0, 'missions': 0, 'locations': 0, 'anomalies': 0,
+                       'reimbursements': 0}
+
+    def estimated_points(self):
+        return int(self.vehicles * self.days * self.driving_hours * 3600 * self.hz)
+
+    # Trajectories
+
+    def _path(self, city, origin, destination):
+        """Street-grid polyline from origin to destination, (x, y) meters from the city center."""
+        angle = math.radians(city[3])
+        cos, sin = math.cos(angle), math.sin(angle)
+        # Into grid axes (u along the streets, v across), walk, then back
+        u, v = origin[0] * cos - origin[1] * sin, origin[0] * sin + origin[1] * cos
+        u1, v1 = destination[0] * cos - destination[1] * sin, destination[0] * sin + destination[1] * cos
+        nodes = [(u, v)]
+        along_u = self.rng.random() < 0.5
+        while abs(u1 - u) >= 30 or abs(v1 - v) >= 30:
+            remaining = (u1 - u) if along_u else (v1 - v)
+            if abs(remaining) >= 30:
+                step = math.copysign(min(abs(remaining), self.rng.uniform(150, 1500)), remaining)
+                if abs(remaining - step) < 30:
+                    step = remaining
+                # Streets are not perfectly straight
+                jitter = self.rng.normal(0, 4)
+                u, v = (u + step, v + jitter) if along_u else (u + jitter, v + step)
+                nodes.append((u, v))
+            along_u = not along_u if self.rng.random() < 0.8 else along_u
+        if len(nodes) > 1:
+            nodes[-1] = (u1, v1)
+        else:
+            nodes.append((u1, v1))
+        return np.array([(a * cos + b * sin, -a * sin + b * cos) for a, b in nodes])
+
+    def _drive(self, nodes):
+        """Time (s), distance (m) and speed (m/s) profile along a polyline."""
+        lengths = np.hypot(*np.diff(nodes, axis=0).T)
+        keep = lengths > 0.5
+        lengths = lengths[keep]
+        legs = len(lengths)
+        # Cruise speed by street length, now and then far too fast on a long one
+        cruise = np.where(lengths < 400, self.rng.uniform(25, 35, legs),
+                          np.where(lengths < 1000, self.rng.uniform(40, 55, legs), self.rng.uniform(55, 78, legs)))
+        speeding = (lengths >= 1000) & (self.rng.random(legs) < 0.01)
+        cruise = np.where(speeding, self.rng.uniform(90, 125, legs), cruise) / 3.6
+        # Speed through each node: stopped at both ends and at red lights, slowed down by turns
+        stops = self.rng.random(legs + 1) < 0.25
+        stops[0] = stops[-1] = True
+        node_speed = np.where(stops, 0.0, self.rng.uniform(2, 6, legs + 1))
+        dwell = np.where(stops[1:-1], self.rng.uniform(5, 50, legs - 1), 0.0)
+
+        samples = np.maximum(2, np.ceil(lengths / STEP).astype(int) + 1)
+        leg = np.repeat(np.arange(legs), samples)
+        first = np.repeat(np.cumsum(samples) - samples, samples)
+        local = (np.arange(len(leg)) - first) * (lengths / (samples - 1))[leg]
+        speed = np.minimum.reduce([
+            cruise[leg],
+            np.sqrt(node_speed[leg] ** 2 + 2 * ACCELERATION * local),
+            np.sqrt(node_speed[leg + 1] ** 2 + 2 * DECELERATION * np.maximum(lengths[leg] - local, 0))
+        ])
+        distance = np.concatenate([[0], np.cumsum(lengths)])[leg] + local
+        step = np.diff(distance)
+        elapsed = step / np.maximum((speed[:-1] + speed[1:]) / 2, 0.3)
+        # Leg boundaries (zero distance) carry the time stopped at that node
+        boundaries = np.cumsum(samples)[:-1] - 1
+        elapsed[boundaries] += dwell
+        return np.concatenate([[0], np.cumsum(elapsed)]), distance, speed, nodes[np.concatenate([[True], keep])]
+
+    def _trip(self, city, origin, destination, start):
+        """GPS fixes of one drive: dict of column arrays, timestamps in µs since the epoch."""
+        nodes = self._path(city, origin, destination)
+        elapsed, distance, speed, nodes = self._drive(nodes)
+        seconds = np.arange(0, elapsed[-1], 1 / self.hz)
+        along = np.interp(seconds, elapsed, distance)
+        node_distance = np.concatenate([[0], np.cumsum(np.hypot(*np.diff(nodes, axis=0).T))])
+        x = np.interp(along, node_distance, nodes[:, 0])
+        y = np.interp(along, node_distance, nodes[:, 1])
+
+        legs = np.clip(np.searchsorted(node_distance, along, side='right') - 1, 0, len(nodes) - 2)
+        delta = np.diff(nodes, axis=0)
+        heading = (np.degrees(np.arctan2(delta[:, 0], delta[:, 1]))[legs] + self.rng.normal(0, 2, len(x))) % 360
+
+        count = len(seconds)
+        accuracy = self.rng.uniform(3, 8, count)
+        multipath = self.rng.random(count) < 0.01
+        accuracy[multipath] = self.rng.uniform(15, 35, multipath.sum())
+        x = x + self.rng.normal(0, 1, count) * accuracy / 2
+        y = y + self.rng.normal(0, 1, count) * accuracy / 2
+        latitude = city[1] + y / METERS_PER_DEGREE
+        longitude = city[2] + x / (METERS_PER_DEGREE * math.cos(math.radians(city[1])))
+        altitude = 40 + 25 * np.sin(x / 1700) + 15 * np.cos(y / 2300) + self.rng.normal(0, 1.5, count)
+        kmh = np.maximum(np.interp(seconds, elapsed, speed) * 3.6 + self.rng.normal(0, 0.8, count), 0)
+        return {
+            'timestamp': start + (seconds * 1e6).astype(np.int64),
+            'latitude': np.round(latitude, 7),
+            'longitude': np.round(longitude, 7),
+            'altitude': np.round(altitude, 1),
+            'speed': np.round(kmh, 1),
+            'heading': np.round(heading, 1),
+            'accuracy': np.round(accuracy, 1),
+            'distance_km': node_distance[-1] / 1000,
+            'duration': elapsed[-1]
+        }
+
+    def _destination(self, origin=None):
+        """A random place around the city center, at least 300 m from `origin`."""
+        while True:
+            radius = min(self.rng.gamma(2.0, 3000.0), 18000.0)
+            bearing = self.rng.uniform(0, 2 * math.pi)
+            point = radius * math.sin(bearing), radius * math.cos(bearing)
+            if origin is None or math.hypot(point[0] - origin[0], point[1] - origin[1]) > 300:
+                return point
+
+    # Rows
+
+    def _people(self, first_id, count, role):
+        names = [(FIRST_NAMES[self.rng.integers(len(FIRST_NAMES))], LAST_NAMES[self.rng.integers(len(LAST_NAMES))])
+                 for _ in range(count)]
+        now = _stamp(self.end - timedelta(days=self.days + 30))
+        return [
+            (first_id + i, f'{self.tag}-{role}-{i + 1:05d}', f'{self.tag}.{role}{i + 1}@fleet.example',
+             self.password_hash, role, first, last, f'06{self.rng.integers(10 ** 7, 10 ** 8)}', True, now, now)
+            for i, (first, last) in enumerate(names)
+        ]
+
+    def _fleet(self, first_id, driver_ids):
+        rows = []
+        created = _stamp(self.end - timedelta(days=self.days + 30))
+        for i, driver_id in enumerate(driver_ids):
+            brand = list(BRANDS)[self.rng.integers(len(BRANDS))]
+            model = BRANDS[brand][self.rng.integers(3)]
+            fuel = ['diesel', 'diesel', 'gasoline', 'hybrid', 'electric'][self.rng.integers(5)]
+            rows.append((first_id + i, f"{i + 1:05d}-{'ABDHWE'[i % 6]}-{self.seed}", brand, model,
+                         int(self.rng.integers(2015, 2025)), ['Blanc', 'Gris', 'Bleu', 'Rouge'][self.rng.integers(4)],
+                         fuel, 'available', driver_id, created, created))
+        return rows
+
+    def _mission(self, mission_id, vehicle_id, driver_id, manager_id, city, trip, origin, destination, start, end):
+        to_degrees = lambda point: (city[1] + point[1] / METERS_PER_DEGREE,
+                                    city[2] + point[0] / (METERS_PER_DEGREE * math.cos(math.radians(city[1]))))
+        (start_lat, start_lon), (end_lat, end_lon) = to_degrees(origin), to_degrees(destination)
+        scheduled_start = start - timedelta(minutes=float(self.rng.uniform(0, 10)))
+        # Planned with some slack, missions underestimated by the planner run late
+        planned = timedelta(seconds=float(trip['duration'] * self.rng.uniform(0.8, 1.5)) + 600)
+        scheduled_end = scheduled_start + planned
+        status = 'completed' if end <= self.end else 'in_progress'
+        title = f"{MISSION_TITLES[self.rng.integers(len(MISSION_TITLES))]} - {city[0]}"
+        priority = ['low', 'medium', 'medium', 'high', 'urgent'][self.rng.integers(5)]
+        row = (mission_id, title, None, status, priority, round(start_lat, 7), round(start_lon, 7), None,
+               round(end_lat, 7), round(end_lon, 7), None, _stamp(scheduled_start), _stamp(scheduled_end),
+               _stamp(start), _stamp(end) if status == 'completed' else None, driver_id, vehicle_id, manager_id,
+               _stamp(scheduled_start - timedelta(days=1)), _stamp(min(end, self.end)))
+        return row, scheduled_end
+
+    def _anomalies(self, vehicle_id, mission_id, driver_id, trip, end, scheduled_end):
+        rows = []
+        detected = lambda offset: self.end if offset > self.end else offset
+        top = float(trip['speed'].max()) if len(trip['speed']) else 0
+        if top > SPEED_LIMIT:
+            index = int(trip['speed'].argmax())
+            at = datetime(1970, 1, 1) + timedelta(microseconds=int(trip['timestamp'][index]))
+            rows.append(('speeding', f'Vehicle exceeded speed limit: {top:.1f} km/h (limit: {SPEED_LIMIT} km/h)',
+                         'high' if top > SPEED_LIMIT * 1.5 else 'medium', at, vehicle_id, mission_id, driver_id,
+                         None, None, float(trip['latitude'][index]), float(trip['longitude'][index])))
+        if mission_id is not None and end > scheduled_end:
+            late = (end - scheduled_end).total_seconds() / 60
+            rows.append(('delay', f'Mission overdue by {late:.0f} minutes', 'high' if late > 120 else 'medium',
+                         detected(end), vehicle_id, mission_id, driver_id, None, None, None, None))
+        if mission_id is not None and self.rng.random() < 0.02:
+            expected = round(trip['distance_km'] * 0.09, 2)
+            consumed = round(expected * self.rng.uniform(1.3, 1.9), 2)
+            rows.append(('excessive_fuel', f'Fuel consumed {consumed} L, expected {expected} L', 'medium',
+                         detected(end), vehicle_id, mission_id, driver_id, consumed, expected, None, None))
+        if mission_id is None and end.hour >= 21:
+            rows.append(('personal_use', 'Vehicle used outside working hours without a mission', 'low',
+                         detected(end), vehicle_id, None, driver_id, None, None, None, None))
+
+        anomalies = []
+        for kind, description, severity, at, *rest in rows:
+            resolved = at < self.end - timedelta(days=2) and self.rng.random() < 0.6
+            resolved_at = at + timedelta(hours=float(self.rng.uniform(2, 48))) if resolved else None
+            anomalies.append((kind, description, severity, _stamp(at), *rest, resolved,
+                              'Vérifié avec le conducteur' if resolved else None, _stamp(resolved_at), _stamp(at),
+                              _stamp(resolved_at or at)))
+        return anomalies
+
+    def _reimbursement(self, mission_id, driver_id, end):
+        grade = list(REIMBURSEMENT_RATES)[self.rng.integers(len(REIMBURSEMENT_RATES))]
+        rates = REIMBURSEMENT_RATES[grade]
+        days_count = 1 if self.rng.random() < 0.85 else int(self.rng.integers(2, 4))
+        lunch, dinner = rates['dejeuner'] * days_count, rates['dinner'] * days_count
+        lodging = rates['hebergement'] * max(0, days_count - 1)
+        status = ['pending', 'approved', 'paid', 'rejected'][self.rng.choice(4, p=[0.4, 0.25, 0.3, 0.05])]
+        approved_at = end + timedelta(days=1) if status in ('approved', 'paid') else None
+        paid_at = end + timedelta(days=5) if status == 'paid' else None
+        return (mission_id, driver_id, grade, days_count, lunch, dinner, lodging, lunch + dinner + lodging, status,
+                'Justificatifs manquants' if status == 'rejected' else None, None, _stamp(end), _stamp(end),
+                _stamp(approved_at), _stamp(paid_at))
+
+    # Database
+
+    def _next_id(self, connection, model):
+        return (connection.execute(db.select(func.max(model.id))).scalar() or 0) + 1
+
+    def _flush(self, connection, writers, buffers):
+        """Write buffered rows, parents first, in one transaction."""
+        points = buffers.pop('points')
+        if points:
+            columns = {name: np.concatenate([trip[name] for trip, _, _ in points]) for name in
+                       ('timestamp', 'latitude', 'longitude', 'altitude', 'speed', 'heading', 'accuracy')}
+            stamps = np.datetime_as_string(columns['timestamp'].astype('datetime64[us]'), unit='us')
+            stamps = np.char.replace(stamps, 'T', ' ').tolist()
+            vehicle_ids = np.concatenate([np.full(len(trip['timestamp']), vehicle_id) for trip, vehicle_id, _ in points])
+            mission_ids = [mission_id for trip, _, mission_id in points for _ in range(len(trip['timestamp']))]
+            buffers['locations'] = list(zip(
+                vehicle_ids.tolist(), mission_ids, stamps, columns['latitude'].tolist(),
+                columns['longitude'].tolist(), columns['altitude'].tolist(), columns['speed'].tolist(),
+                columns['heading'].tolist(), columns['accuracy'].tolist(), stamps
+            ))
+        for name in ('missions', 'locations', 'anomalies', 'reimbursements'):
+            rows = buffers.get(name, [])
+            writers[name].write(rows)
+            self.counts[name] += len(rows)
+        connection.commit()
+        buffers.clear()
+        buffers.update({'points': [], 'missions': [], 'anomalies': [], 'reimbursements': []})
+
+    def run(self, progress=print):
+        """Generate and insert everything, returns row counts per table."""
+        if User.query.filter(User.username.like(f'{self.tag}-%')).first():
+            raise ValueError(f'Data for seed {self.seed} already exists, pick another seed')
+        self.password_hash = password_hasher.hash(self.password)
+        started = time.perf_counter()
+
+        with db.engine.connect() as connection:
+            user_id = self._next_id(connection, User)
+            vehicle_id = self._next_id(connection, Vehicle)
+            mission_id = self._next_id(connection, Mission)
+
+            managers = self._people(user_id, max(1, self.vehicles // 25), 'manager')
+            drivers = self._people(user_id + len(managers), self.vehicles, 'employee')
+            fleet = self._fleet(vehicle_id, [row[0] for row in drivers])
+            user_columns = ('id', 'username', 'email', 'password_hash', 'role', 'first_name', 'last_name', 'phone',
+                            'is_active', 'created_at', 'updated_at')
+            BulkWriter(connection, 'users', user_columns).write(managers + drivers)
+            BulkWriter(connection, 'vehicles', ('id', 'license_plate', 'brand', 'model', 'year', 'color', 'fuel_type',
+                                                'status', 'driver_id', 'created_at', 'updated_at')).write(fleet)
+            connection.commit()
+            self.counts['users'] = len(managers) + len(drivers)
+            self.counts['vehicles'] = len(fleet)
+
+            writers = {
+                'missions': BulkWriter(connection, 'missions', (
+                    'id', 'title', 'description', 'status', 'priority', 'start_latitude', 'start_longitude',
+                    'start_address', 'end_latitude', 'end_longitude', 'end_address', 'scheduled_start',
+                    'scheduled_end', 'actual_start', 'actual_end', 'assigned_user_id', 'vehicle_id', 'created_by',
+                    'created_at', 'updated_at')),
+                'locations': BulkWriter(connection, 'locations', (
+                    'vehicle_id', 'mission_id', 'timestamp', 'latitude', 'longitude', 'altitude', 'speed', 'heading',
+                    'accuracy', 'created_at')),
+                'anomalies': BulkWriter(connection, 'anomalies', (
+                    'type', 'description', 'severity', 'detected_at', 'vehicle_id', 'mission_id', 'user_id',
+                    'fuel_consumed', 'expected_fuel', 'location_latitude', 'location_longitude', 'is_resolved',
+                    'resolution_notes', 'resolved_at', 'created_at', 'updated_at')),
+                'reimbursements': BulkWriter(connection, 'reimbursements', (
+                    'mission_id', 'user_id', 'grade', 'days_count', 'dejeuner_amount', 'dinner_amount',
+                    'hebergement_amount', 'total_amount', 'status', 'rejection_reason', 'notes', 'created_at',
+                    'updated_at', 'approved_at', 'paid_at'))
+            }
+            buffers = {'points': [], 'missions': [], 'anomalies': [], 'reimbursements': []}
+            pending = 0
+            positions = []
+            epoch = datetime(1970, 1, 1)
+            first_day = datetime(self.end.year, self.end.month, self.end.day) - timedelta(days=self.days - 1)
+
+            for index, vehicle in enumerate(fleet):
+                vehicle_id, driver_id = vehicle[0], vehicle[8]
+                manager_id = managers[index % len(managers)][0]
+                city = CITIES[index % len(CITIES)]
+                depot = self._destination()
+                last = None
+                for day in range(self.days):
+                    day_start = first_day + timedelta(days=day)
+                    clock = day_start + timedelta(hours=7, minutes=float(self.rng.normal(30, 20)))
+                    position, driven = depot, 0.0
+                    day_end = min(self.end, day_start + timedelta(hours=22))
+                    while driven < self.driving_hours * 3600 and clock < day_end:
+                        destination = self._destination(position)
+                        start_us = (clock - epoch) // timedelta(microseconds=1)
+                        trip = self._trip(city, position, destination, start_us)
+                        end = clock + timedelta(seconds=float(trip['duration']))
+                        if end > self.end:
+                            keep = trip['timestamp'] < (self.end - epoch) // timedelta(microseconds=1)
+                            trip = dict(trip, **{name: values[keep] for name, values in trip.items()
+                                                 if isinstance(values, np.ndarray)})
+                        if not len(trip['timestamp']):
+                            break
+
+                        trip_mission, scheduled_end = None, end
+                        if self.rng.random() < self.mission_share:
+                            trip_mission = mission_id
+                            mission_id += 1
+                            row, scheduled_end = self._mission(trip_mission, vehicle_id, driver_id, manager_id, city,
+                                                               trip, position, destination, clock, end)
+                            buffers['missions'].append(row)
+                            if end <= self.end and self.rng.random() < 0.3:
+                                buffers['reimbursements'].append(self._reimbursement(trip_mission, driver_id, end))
+                        buffers['anomalies'].extend(self._anomalies(vehicle_id, trip_mission, driver_id, trip, end,
+                                                                    scheduled_end))
+                        buffers['points'].append((trip, vehicle_id, trip_mission))
+                        pending += len(trip['timestamp'])
+                        last = (float(trip['latitude'][-1]), float(trip['longitude'][-1]),
+                                epoch + timedelta(microseconds=int(trip['timestamp'][-1])))
+
+                        driven += trip['duration']
+                        position = destination
+                        clock = end + timedelta(minutes=float(self.rng.uniform(2, 20)))
+
+                        if pending >= self.batch_size:
+                            self._flush(connection, writers, buffers)
+                            pending = 0
+
+                if last:
+                    positions.append((last[0], last[1], _stamp(last[2]), vehicle_id))
+                if progress and (index + 1) % max(1, self.vehicles // 10) == 0:
+                    elapsed = time.perf_counter() - started
+                    progress(f"  {index + 1}/{self.vehicles} vehicles, "
+                             f"{self.counts['locations'] + pending} points, {elapsed:.0f}s")
+
+            self._flush(connection, writers, buffers)
+            marker = '?' if connection.dialect.paramstyle == 'qmark' else '%s'
+            connection.exec_driver_sql(
+                f'UPDATE vehicles SET current_latitude = {marker}, current_longitude = {marker}, '
+                f'last_location_update = {marker} WHERE id = {marker}', positions
+            ) if positions else None
+            if connection.dialect.name == 'postgresql':
+                # Ids were assigned here, move the sequences past them
+                for table in ('users', 'vehicles', 'missions'):
+                    connection.exec_driver_sql(
+                        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"
+                    )
+            connection.commit()
+
+        return dict(self.counts, seconds=round(time.perf_counter() - started, 1))
@@ -0,0 +1,402 @@
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from app import db
+from app.models.mission import Mission
+from app.models.vehicle import Vehicle
+from app.services.fleet_generator import ACCELERATION, DECELERATION, METERS_PER_DEGREE
+
+# Vehicles without any known position start around here, as with the former random walkers
+DEFAULT_CENTER = (48.8566, 2.3522)
+TURN_SPEED = 4.0          # m/s through the corner of a path
+ARRIVED = 1.0             # meters from the target
+HEARTBEAT_SECONDS = 60.0  # between two fixes of a parked vehicle
+DWELL_SECONDS = (30.0, 300.0)
+MISSION_START_RADIUS = 200.0  # meters, closer than this a mission is driven from where the vehicle is
+
+
+class FleetSimulator:
+    """Discrete-event simulation of the whole fleet on its own clock.
+
+    State is one numpy array per attribute with one slot per vehicle, and
+    step() moves every vehicle at once. A vehicle with a mission in progress
+    drives to the mission start, if it is not there yet, then to its end;
+    the others roam between random destinations around their position
+    (`roam`) or stay parked. Paths follow a street grid: along one axis, a
+    slowed-down turn, along the other. Vehicles accelerate to a cruise speed
+    that depends on the trip length and brake before the turn and the target.
+    """
+
+    def __init__(self, seed=None, roam=True, vehicle_limit=None):
+        self.rng = np.random.default_rng(seed)
+        self.roam = roam
+        self.vehicle_limit = vehicle_limit
+        self.clock = datetime.utcnow()
+        self.elapsed = 0.0
+        self.titles = {}
+        self._lock = threading.RLock()
+        self._resize(np.zeros(0, dtype=np.int64), [])
+
+    # State
+
+    def _resize(self, ids, plates, keep=None):
+        """New state arrays for `ids`; `keep` maps new slots to old ones (-1 for a new vehicle)."""
+        n = len(ids)
+        defaults = {
+            'latitude': np.nan, 'longitude': np.nan, 'speed': 0.0, 'heading': 0.0, 'cruise': 0.0,
+            'origin_lat': 0.0, 'origin_lon': 0.0, 'cos': 1.0, 'leg1_x': 0.0, 'leg1_y': 0.0, 'leg2_x': 0.0,
+            'leg2_y': 0.0, 'travelled': 0.0, 'moving': False, 'parked_until': 0.0, 'last_fix': -np.inf,
+            'fixed_at': np.nan, 'mission': -1.0, 'final_lat': np.nan, 'final_lon': np.nan
+        }
+        state = {}
+        for name, default in defaults.items():
+            values = np.full(n, default)
+            if keep is not None and n:
+                old = keep >= 0
+                values[old] = self.state[name][keep[old]]
+            state[name] = values
+        self.state = state
+        self.ids = ids
+        self.plates = plates
+        self._slots = {int(vehicle_id): slot for slot, vehicle_id in enumerate(ids)}
+
+    def load(self):
+        """Sync the fleet with the database: vehicles, their last stored position and missions in progress.
+
+        Vehicles keep their simulated state, unless another process stored a
+        newer position for them. Two queries whatever the fleet size.
+        """
+        with self._lock:
+            query = db.select(Vehicle.id, Vehicle.license_plate, Vehicle.current_latitude,
+                              Vehicle.current_longitude, Vehicle.last_location_update).order_by(Vehicle.id)
+            if self.vehicle_limit:
+                query = query.limit(self.vehicle_limit)
+            vehicles = db.session.execute(query).all()
+            missions = db.session.execute(
+                db.select(Mission.id, Mission.vehicle_id, Mission.title, Mission.start_latitude,
+                          Mission.start_longitude, Mission.end_latitude, Mission.end_longitude)
+                .where(Mission.status == 'in_progress').order_by(Mission.actual_start)
+            ).all()
+
+            ids = np.array([row.id for row in vehicles], dtype=np.int64)
+            keep = np.array([self._slots.get(row.id, -1) for row in vehicles], dtype=np.int64)
+            self._resize(ids, [row.license_plate for row in vehicles], keep)
+            s = self.state
+
+            # Stored positions: new vehicles, or one moved by another process since our last fix
+            epoch = datetime(1970, 1, 1)
+            stored = np.array([(row.last_location_update - epoch).total_seconds() if row.last_location_update
+                               else np.nan for row in vehicles])
+            latitude = np.array([row.current_latitude if row.current_latitude is not None else np.nan
+                                 for row in vehicles])
+            longitude = np.array([row.current_longitude if row.current_longitude is not None else np.nan
+                                  for row in vehicles])
+            moved = ~np.isnan(latitude) & (np.isnan(s['latitude']) | (stored > np.nan_to_num(s['fixed_at'], nan=-1)))
+            s['latitude'][moved], s['longitude'][moved] = latitude[moved], longitude[moved]
+            unknown = np.isnan(s['latitude'])
+            s['latitude'][unknown] = DEFAULT_CENTER[0] + self.rng.uniform(-0.05, 0.05, unknown.sum())
+            s['longitude'][unknown] = DEFAULT_CENTER[1] + self.rng.uniform(-0.05, 0.05, unknown.sum())
+            s['fixed_at'][moved] = stored[moved]
+            # Trips in progress go on from the stored position
+            resume = np.flatnonzero(moved & s['moving'])
+            if len(resume):
+                self._start_trips(resume, *self._target(resume))
+
+            mission = np.full(len(ids), -1, dtype=np.int64)
+            final = np.full((len(ids), 2), np.nan)
+            start = np.full((len(ids), 2), np.nan)
+            self.titles = {}
+            for row in missions:
+                slot = self._slots.get(row.vehicle_id)
+                if slot is not None:
+                    mission[slot] = row.id
+                    final[slot] = row.end_latitude, row.end_longitude
+                    start[slot] = row.start_latitude, row.start_longitude
+                    self.titles[row.id] = row.title
+            new = np.flatnonzero((mission >= 0) & (mission != s['mission']))
+            s['mission'] = mission.astype(float)
+            s['final_lat'], s['final_lon'] = final[:, 0], final[:, 1]
+            if len(new):
+                far = self._distance(new, start[new, 0], start[new, 1]) > MISSION_START_RADIUS
+                target = np.where(far[:, None], start[new], final[new])
+                self._start_trips(new, target[:, 0], target[:, 1])
+            return len(ids)
+
+    def place(self, vehicle_id, latitude, longitude):
+        """Put a vehicle somewhere (the start of the mission it just started) and send it to its target."""
+        with self._lock:
+            self.load()
+            slot = self._slots.get(vehicle_id)
+            if slot is None:
+                return
+            s = self.state
+            s['latitude'][slot], s['longitude'][slot] = latitude, longitude
+            s['speed'][slot] = 0.0
+            s['fixed_at'][slot] = (self.clock - datetime(1970, 1, 1)).total_seconds()
+            slots = np.array([slot])
+            if s['mission'][slot] >= 0:
+                self._start_trips(slots, s['final_lat'][slots], s['final_lon'][slots])
+            else:
+                s['moving'][slot] = False
+
+    # Motion
+
+    def _distance(self, slots, latitude, longitude):
+        s = self.state
+        dy = (latitude - s['latitude'][slots]) * METERS_PER_DEGREE
+        dx = (longitude - s['longitude'][slots]) * METERS_PER_DEGREE * np.cos(np.radians(s['latitude'][slots]))
+        return np.hypot(dx, dy)
+
+    def _target(self, slots):
+        """Where the trips of `slots` end: (latitude, longitude) arrays."""
+        s = self.state
+        lat0, lon0, cos = s['origin_lat'][slots], s['origin_lon'][slots], s['cos'][slots]
+        x, y = s['leg1_x'][slots] + s['leg2_x'][slots], s['leg1_y'][slots] + s['leg2_y'][slots]
+        return lat0 + y / METERS_PER_DEGREE, lon0 + x / (METERS_PER_DEGREE * cos)
+
+    def _start_trips(self, slots, latitude, longitude):
+        """Send vehicles from where they are to (latitude, longitude) along a two-leg grid path."""
+        s = self.state
+        lat0, lon0 = s['latitude'][slots], s['longitude'][slots]
+        cos = np.cos(np.radians(lat0))
+        dx = (longitude - lon0) * METERS_PER_DEGREE * cos
+        dy = (latitude - lat0) * METERS_PER_DEGREE
+        x_first = self.rng.random(len(slots)) < 0.5
+        s['origin_lat'][slots], s['origin_lon'][slots], s['cos'][slots] = lat0, lon0, cos
+        s['leg1_x'][slots], s['leg1_y'][slots] = np.where(x_first, dx, 0.0), np.where(x_first, 0.0, dy)
+        s['leg2_x'][slots], s['leg2_y'][slots] = np.where(x_first, 0.0, dx), np.where(x_first, dy, 0.0)
+        s['travelled'][slots] = 0.0
+        s['moving'][slots] = True
+        # City streets for short trips, main roads for longer ones (km/h)
+        length = np.abs(dx) + np.abs(dy)
+        kmh = np.where(length < 1000, self.rng.uniform(25, 40, len(slots)),
+                       np.where(length < 5000, self.rng.uniform(35, 55, len(slots)),
+                                self.rng.uniform(50, 75, len(slots))))
+        s['cruise'][slots] = kmh / 3.6
+
+    def _next_trips(self):
+        """Parked vehicles whose stop is over leave for the mission end, or a random destination."""
+        s = self.state
+        ready = ~s['moving'] & (s['parked_until'] <= self.elapsed)
+        on_mission = ready & ~np.isnan(s['final_lat'])
+        slots = np.flatnonzero(on_mission)
+        if len(slots):
+            # Already at the mission end: stay until the mission is completed
+            away = self._distance(slots, s['final_lat'][slots], s['final_lon'][slots]) > ARRIVED
+            slots = slots[away]
+            self._start_trips(slots, s['final_lat'][slots], s['final_lon'][slots])
+        if self.roam:
+            slots = np.flatnonzero(ready & np.isnan(s['final_lat']))
+            if len(slots):
+                radius = np.minimum(self.rng.gamma(2.0, 1500.0, len(slots)), 15000.0)
+                bearing = self.rng.uniform(0, 2 * math.pi, len(slots))
+                latitude = s['latitude'][slots] + radius * np.cos(bearing) / METERS_PER_DEGREE
+                longitude = s['longitude'][slots] + radius * np.sin(bearing) / (
+                    METERS_PER_DEGREE * np.cos(np.radians(s['latitude'][slots])))
+                self._start_trips(slots, latitude, longitude)
+
+    def step(self, seconds, everyone=False, at=None, only=None):
+        """Advance the clock by `seconds` and return the GPS fixes emitted, as ingest point dicts.
+
+        Moving vehicles report at every step, parked ones every
+        HEARTBEAT_SECONDS (every step with `everyone`). `only` is a boolean
+        mask of the vehicles to advance, the others keep still. `at` stamps
+        the fixes instead of the simulation clock (calls driven by wall time).
+        """
+        with self._lock:
+            s = self.state
+            self.elapsed += seconds
+            self.clock = at or self.clock + timedelta(seconds=seconds)
+            self._next_trips()
+
+            moving = s['moving'] if only is None else s['moving'] & only
+            len1 = np.abs(s['leg1_x']) + np.abs(s['leg1_y'])
+            len2 = np.abs(s['leg2_x']) + np.abs(s['leg2_y'])
+            remaining = len1 + len2 - s['travelled']
+            to_corner = len1 - s['travelled']
+            speed = np.minimum.reduce([
+                s['cruise'],
+                s['speed'] + ACCELERATION * seconds,
+                np.where(to_corner > 0, np.sqrt(TURN_SPEED ** 2 + 2 * DECELERATION * np.maximum(to_corner, 0)),
+                         np.inf),
+                np.sqrt(2 * DECELERATION * np.maximum(remaining, 0))
+            ])
+            speed = np.maximum(speed, 0.5)
+            travelled = np.minimum(s['travelled'] + (s['speed'] + speed) / 2 * seconds, len1 + len2)
+            s['travelled'] = np.where(moving, travelled, s['travelled'])
+            s['speed'] = np.where(moving, speed, s['speed'])
+
+            # Position along the path, in meters from the trip origin
+            on_first = s['travelled'] <= len1
+            first = np.where(len1 > 0, np.minimum(s['travelled'], len1) / np.maximum(len1, 1e-9), 0.0)
+            second = np.where(len2 > 0, np.maximum(s['travelled'] - len1, 0) / np.maximum(len2, 1e-9), 0.0)
+            x = s['leg1_x'] * first + s['leg2_x'] * second
+            y = s['leg1_y'] * first + s['leg2_y'] * second
+            latitude = s['origin_lat'] + y / METERS_PER_DEGREE
+            longitude = s['origin_lon'] + x / (METERS_PER_DEGREE * s['cos'])
+            s['latitude'] = np.where(moving, latitude, s['latitude'])
+            s['longitude'] = np.where(moving, longitude, s['longitude'])
+            leg_x = np.where(on_first & (len1 > 0), s['leg1_x'], s['leg2_x'])
+            leg_y = np.where(on_first & (len1 > 0), s['leg1_y'], s['leg2_y'])
+            s['heading'] = np.where(moving & ((leg_x != 0) | (leg_y != 0)),
+                                    np.degrees(np.arctan2(leg_x, leg_y)) % 360, s['heading'])
+
+            arrived = moving & (len1 + len2 - s['travelled'] <= ARRIVED)
+            if arrived.any():
+                s['moving'][arrived] = False
+                s['speed'][arrived] = 0.0
+                s['parked_until'][arrived] = self.elapsed + self.rng.uniform(*DWELL_SECONDS, arrived.sum())
+
+            report = moving | arrived
+            if everyone:
+                report = np.ones(len(self.ids), dtype=bool) if only is None else only
+            else:
+                report = report | (self.elapsed - s['last_fix'] >= HEARTBEAT_SECONDS)
+            return self._fixes(np.flatnonzero(report))
+
+    def _fixes(self, slots):
+        s = self.state
+        s['last_fix'][slots] = self.elapsed
+        s['fixed_at'][slots] = (self.clock - datetime(1970, 1, 1)).total_seconds()
+        count = len(slots)
+        if not count:
+            return []
+        # GPS noise, larger now and then (multipath)
+        accuracy = self.rng.uniform(3, 8, count)
+        accuracy[self.rng.random(count) < 0.01] *= 4
+        noise = self.rng.normal(0, 1, (2, count)) * accuracy / 2
+        latitude = s['latitude'][slots] + noise[0] / METERS_PER_DEGREE
+        longitude = s['longitude'][slots] + noise[1] / (METERS_PER_DEGREE * np.cos(np.radians(s['latitude'][slots])))
+        kmh = np.where(s['speed'][slots] > 0,
+                       np.maximum(s['speed'][slots] * 3.6 + self.rng.normal(0, 0.8, count), 0), 0.0)
+        missions = [int(value) if value >= 0 else None for value in s['mission'][slots].tolist()]
+        clock = self.clock
+        return [
+            {'vehicle_id': vehicle_id, 'mission_id': mission_id, 'timestamp': clock, 'latitude': lat,
+             'longitude': lon, 'altitude': None, 'speed': speed, 'heading': heading, 'accuracy': acc}
+            for vehicle_id, mission_id, lat, lon, speed, heading, acc in zip(
+                self.ids[slots].tolist(), missions, np.round(latitude, 7).tolist(),
+                np.round(longitude, 7).tolist(), np.round(kmh, 1).tolist(),
+                np.round(s['heading'][slots], 1).tolist(), np.round(accuracy, 1).tolist())
+        ]
+
+    # Driving the simulation
+
+    def advance(self, seconds, missions_only=False):
+        """One step driven by an API call: sync with the database, move, ingest the fixes stamped now."""
+        from app.services.location_service import LocationService
+
+        with self._lock:
+            self.load()
+            only = self.state['mission'] >= 0 if missions_only else None
+            points = self.step(seconds, everyone=True, at=datetime.utcnow(), only=only)
+        LocationService.ingest_points(points)
+        return points
+
+    def run(self, duration, hz=1.0, speedup=1.0, rate=None, sink=None, reload_seconds=60.0, progress=print):
+        """Simulate `duration` seconds at `hz` fixes per second and per moving vehicle, sending them to `sink`.
+
+        `speedup` is simulated seconds per wall second (0 for as fast as
+        possible) and `rate` an upper bound on points per wall second. `sink`
+        takes a list of points and returns how many it accepted, by default
+        the in-process ingest path; refused points are retried. Returns
+        throughput figures.
+        """
+        from app.services.location_service import LocationService
+
+        sink = sink or LocationService.ingest_points
+        interval = 1.0 / hz
+        started = time.perf_counter()
+        simulated = emitted = retries = steps = 0
+        sink_seconds = 0.0
+        next_reload = reload_seconds
+        next_report = 10.0
+        while simulated < duration:
+            points = self.step(interval)
+            simulated += interval
+            steps += 1
+            while points:
+                sent = time.perf_counter()
+                accepted = sink(points)
+                sink_seconds += time.perf_counter() - sent
+                emitted += accepted
+                points = points[accepted:]
+                if points:
+                    # Back pressure from the ingest path
+                    retries += 1
+                    time.sleep(0.05)
+
+            if reload_seconds and simulated >= next_reload:
+                self.load()
+                next_reload += reload_seconds
+            target = simulated / speedup if speedup else 0.0
+            if rate:
+                target = max(target, emitted / rate)
+            wait = started + target - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+
+            wall = time.perf_counter() - started
+            if progress and wall >= next_report:
+                progress(f"  {simulated:.0f}s simulated, {emitted} points, {emitted / wall:,.0f} points/s")
+                next_report += 10.0
+
+        wall = time.perf_counter() - started
+        return {
+            'vehicles': len(self.ids),
+            'moving': int(self.state['moving'].sum()),
+            'simulated_seconds': round(simulated, 1),
+            'wall_seconds': round(wall, 2),
+            'steps': steps,
+            'points': emitted,
+            'points_per_second': round(emitted / wall, 1) if wall else None,
+            'sink_seconds': round(sink_seconds, 2),
+            'retries': retries
+        }
+
+
+class HttpSink:
+    """Sends points to POST /api/locations of a running server, one request per point over
+    `workers` keep-alive connections: a load generator for the whole HTTP stack."""
+
+    # Back pressure or no answer: the point is sent again. Any other refusal is dropped.
+    RETRY_STATUSES = (0, 429, 503)
+
+    def __init__(self, base_url, token, workers=8):
+        import requests
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.url = base_url.rstrip('/') + '/api/locations'
+        self.headers = {'Authorization': f'Bearer {token}'}
+        self.pool = ThreadPoolExecutor(workers)
+        self.requests = requests
+        self._local = threading.local()
+        self.statuses = {}
+        self.dropped = 0
+
+    def _post(self, point):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self.requests.Session()
+        body = {key: value for key, value in point.items() if value is not None}
+        body['timestamp'] = point['timestamp'].isoformat()
+        try:
+            return session.post(self.url, json=body, headers=self.headers, timeout=30).status_code
+        except self.requests.RequestException:
+            return 0
+
+    def __call__(self, points):
+        statuses = list(self.pool.map(self._post, points))
+        for status in statuses:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+        # Everything from the first point to retry (429 queue full, 503, connection error) on is
+        # sent again, points stored twice are upserted on (vehicle_id, timestamp)
+        done = next((i for i, status in enumerate(statuses) if status in self.RETRY_STATUSES), len(points))
+        # A permanent refusal (400 clock skew, 403, 404) would fail forever, it counts as sent
+        self.dropped += sum(1 for status in statuses[:done] if status not in (200, 201, 202))
+        return done
+
+
+fleet_simulator = FleetSimulator()
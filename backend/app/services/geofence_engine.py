@@ -0,0 +1,349 @@
+import threading
+import time
+from sqlalchemy import and_, bindparam, func, or_, tuple_, update
+from app import db
+from app.models.anomaly import Anomaly
+from app.models.geofence import Geofence
+from app.models.geofence_event import GeofenceEvent
+from app.models.geofence_presence import GeofencePresence
+from app.models.vehicle import Vehicle
+from app.utils.geofence_index import CompiledFence, GeofenceIndex
+from app.utils.location_writes import UPSERT_DIALECTS
+from app.utils.metrics import ANOMALIES, GEOFENCE_CHECK, GEOFENCE_EVENTS
+
+# Rows per batched presence statement, under SQLite's bound parameter limit
+PRESENCE_CHUNK = 900
+
+CATEGORY_LABELS = {'depot': 'depot', 'restricted': 'restricted zone', 'client_site': 'client site'}
+
+
+def compile_fence(geofence):
+    if geofence.shape == 'polygon':
+        geometry = {'points': [tuple(vertex) for vertex in geofence.vertices]}
+    else:
+        geometry = {'center': (geofence.center_latitude, geofence.center_longitude), 'radius_m': geofence.radius_m}
+    bounds = (geofence.min_latitude, geofence.min_longitude, geofence.max_latitude, geofence.max_longitude)
+    return CompiledFence(geofence.id, geofence.name, geofence.category, bounds,
+                         dwell_minutes=geofence.dwell_minutes, **geometry)
+
+
+class GeofenceEngine:
+    """Checks committed location points against the active geofences.
+
+    Every write path (sync, ingest queue, journal replay) hands its points
+    over once they are committed. Each vehicle's points are walked in time
+    order against its current presences (`geofence_presences`), and the
+    changes become enter, exit and dwell events. Entering a restricted zone
+    and overstaying a fence's dwell_minutes also record anomalies. A point
+    not newer than the last one checked for its vehicle (a late or replayed
+    point) changes nothing. Presence rows only change from the state they
+    were read in, so two processes seeing the same crossing record one event. The index is rebuilt when the
+    fences change, checked every GEOFENCE_REFRESH_SECONDS.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.cell_deg = 0.01
+        self.refresh_seconds = 10.0
+        self._index = None
+        self._signature = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._stats = {'points': 0, 'batches': 0, 'seconds': 0.0, 'enter': 0, 'exit': 0, 'dwell': 0,
+                       'late': 0, 'rebuilds': 0, 'errors': 0, 'last_error': None}
+
+    def init_app(self, app):
+        config = app.config
+        self.enabled = config['GEOFENCES_ENABLED']
+        self.cell_deg = config['GEOFENCE_CELL_DEG']
+        self.refresh_seconds = config['GEOFENCE_REFRESH_SECONDS']
+        self._index = None
+        self._signature = None
+
+    def invalidate(self):
+        """Check for changed fences on the next batch instead of after the refresh interval."""
+        self._checked_at = 0.0
+
+    def index(self):
+        """The index of the active fences, rebuilt when a fence was added, changed or deleted."""
+        if self._index is not None and time.monotonic() - self._checked_at < self.refresh_seconds:
+            return self._index
+        with self._lock:
+            if self._index is not None and time.monotonic() - self._checked_at < self.refresh_seconds:
+                return self._index
+            signature = tuple(db.session.query(func.count(Geofence.id), func.max(Geofence.updated_at)).one())
+            if self._index is None or signature != self._signature:
+                fences = Geofence.query.filter_by(is_active=True).all()
+                self._index = GeofenceIndex([compile_fence(fence) for fence in fences], self.cell_deg)
+                self._signature = signature
+                self._stats['rebuilds'] += 1
+            self._checked_at = time.monotonic()
+            return self._index
+
+    def containing(self, latitude, longitude):
+        return [{'id': fence.id, 'name': fence.name, 'category': fence.category}
+                for fence in self.index().containing(latitude, longitude)]
+
+    def process(self, points):
+        """Record the geofence events of committed points, in a transaction of its own.
+
+        Never raises: a failure is logged and leaves the points stored.
+        Returns the number of events recorded.
+        """
+        if not self.enabled or not points:
+            return 0
+        started = time.perf_counter()
+        try:
+            counts = self._process(points)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            with self._lock:
+                self._stats['errors'] += 1
+                self._stats['last_error'] = str(e)
+            print(f"Geofence check failed for {len(points)} points: {e}")
+            return 0
+
+        elapsed = time.perf_counter() - started
+        GEOFENCE_CHECK.observe(elapsed)
+        late = counts.pop('late', 0)
+        with self._lock:
+            self._stats['points'] += len(points)
+            self._stats['late'] += late
+            self._stats['batches'] += 1
+            self._stats['seconds'] += elapsed
+            for event, count in counts.items():
+                self._stats[event] += count
+        for event, count in counts.items():
+            GEOFENCE_EVENTS.inc(event, amount=count)
+        return sum(counts.values())
+
+    def _process(self, points):
+        index = self.index()
+        if not len(index):
+            return {}
+
+        by_vehicle = {}
+        for point in points:
+            by_vehicle.setdefault(point['vehicle_id'], []).append(point)
+        checked = self._checked(by_vehicle)
+        counts = {}
+        for vehicle_id in list(by_vehicle):
+            last = checked.get(vehicle_id)
+            if last is not None:
+                kept = [point for point in by_vehicle[vehicle_id] if point['timestamp'] > last]
+                if len(kept) < len(by_vehicle[vehicle_id]):
+                    counts['late'] = counts.get('late', 0) + len(by_vehicle[vehicle_id]) - len(kept)
+                by_vehicle[vehicle_id] = kept
+            if not by_vehicle[vehicle_id]:
+                del by_vehicle[vehicle_id]
+        if not by_vehicle:
+            return counts
+        self._advance_checked(by_vehicle)
+        stored = self._presences(by_vehicle)
+
+        changes = []  # (vehicle id, fence id, stored presence, new presence, events)
+        events, anomalies = [], []
+        for vehicle_id, vehicle_points in by_vehicle.items():
+            before = stored.get(vehicle_id, {})
+            if len(vehicle_points) > 1:
+                vehicle_points.sort(key=lambda point: point['timestamp'])
+            hits = [index.containing(point['latitude'], point['longitude']) for point in vehicle_points]
+            if not before and not any(hits):
+                continue
+            inside = {fence_id: dict(presence) for fence_id, presence in before.items()}
+
+            pending = {}  # fence id -> [(event, point, duration)] of this batch
+            for point, fences in zip(vehicle_points, hits):
+                at = point['timestamp']
+                now_in = {fence.id: fence for fence in fences}
+                for fence_id in list(inside):
+                    # Presences of fences out of the index (being deactivated) are left alone
+                    if fence_id not in now_in and fence_id in index.fences:
+                        presence = inside.pop(fence_id)
+                        duration = (at - presence['entered_at']).total_seconds()
+                        pending.setdefault(fence_id, []).append(('exit', point, duration))
+                for fence_id, fence in now_in.items():
+                    presence = inside.get(fence_id)
+                    if presence is None:
+                        inside[fence_id] = {'entered_at': at, 'dwell_recorded': False,
+                                            'mission_id': point.get('mission_id')}
+                        pending.setdefault(fence_id, []).append(('enter', point, None))
+                    elif fence.dwell_seconds and not presence['dwell_recorded']:
+                        duration = (at - presence['entered_at']).total_seconds()
+                        if duration >= fence.dwell_seconds:
+                            presence['dwell_recorded'] = True
+                            pending.setdefault(fence_id, []).append(('dwell', point, duration))
+
+            for fence_id, fence_events in pending.items():
+                changes.append((vehicle_id, fence_id, before.get(fence_id), inside.get(fence_id), fence_events))
+
+        saved = self._save_presences(changes)
+        for vehicle_id, fence_id, _, _, fence_events in changes:
+            if (vehicle_id, fence_id) not in saved:
+                continue  # another process recorded this change first
+            fence = index.fences[fence_id]
+            for event, point, duration in fence_events:
+                counts[event] = counts.get(event, 0) + 1
+                events.append({
+                    'event': event,
+                    'occurred_at': point['timestamp'],
+                    'latitude': point['latitude'],
+                    'longitude': point['longitude'],
+                    'duration_seconds': duration,
+                    'geofence_id': fence_id,
+                    'vehicle_id': vehicle_id,
+                    'mission_id': point.get('mission_id')
+                })
+                anomaly = self._anomaly(fence, event, point, duration)
+                if anomaly:
+                    anomalies.append(anomaly)
+
+        if events:
+            db.session.execute(GeofenceEvent.__table__.insert(), events)
+        if anomalies:
+            db.session.execute(Anomaly.__table__.insert(), anomalies)
+            for anomaly in anomalies:
+                ANOMALIES.inc(anomaly['type'])
+        return counts
+
+    def _checked(self, by_vehicle):
+        """{vehicle_id: timestamp of the newest point already checked} of the vehicles in the batch."""
+        vehicle_ids = list(by_vehicle)
+        checked = {}
+        for start in range(0, len(vehicle_ids), PRESENCE_CHUNK):
+            checked.update(db.session.query(Vehicle.id, Vehicle.geofence_checked_at).filter(
+                Vehicle.id.in_(vehicle_ids[start:start + PRESENCE_CHUNK])
+            ).all())
+        return checked
+
+    def _advance_checked(self, by_vehicle):
+        """Move each vehicle's watermark to its newest point, never back (another process may be ahead)."""
+        table = Vehicle.__table__
+        db.session.execute(
+            update(table)
+            .where(and_(
+                table.c.id == bindparam('vehicle'),
+                or_(table.c.geofence_checked_at.is_(None), table.c.geofence_checked_at < bindparam('at'))
+            ))
+            .values(geofence_checked_at=bindparam('at'), updated_at=table.c.updated_at),
+            [{'vehicle': vehicle_id, 'at': max(point['timestamp'] for point in vehicle_points)}
+             for vehicle_id, vehicle_points in by_vehicle.items()]
+        )
+
+    def _presences(self, by_vehicle):
+        """{vehicle_id: {geofence_id: presence}} of the vehicles in the batch.
+
+        A batch of many vehicles reads the whole table, which only holds the
+        vehicles currently inside a fence, rather than looking them all up.
+        """
+        table = GeofencePresence.__table__
+        vehicle_ids = list(by_vehicle)
+        query = table.select()
+        if len(vehicle_ids) <= PRESENCE_CHUNK:
+            query = query.where(table.c.vehicle_id.in_(vehicle_ids))
+
+        presences = {}
+        for row in db.session.execute(query):
+            if row.vehicle_id in by_vehicle:
+                presences.setdefault(row.vehicle_id, {})[row.geofence_id] = {
+                    'entered_at': row.entered_at,
+                    'dwell_recorded': row.dwell_recorded,
+                    'mission_id': row.mission_id
+                }
+        return presences
+
+    def _save_presences(self, changes):
+        """Move each stored presence from its old to its new state.
+
+        Returns the (vehicle id, fence id) pairs changed here: a pair whose
+        row was no longer in its old state, or already inserted, was changed
+        by another process, which records the events.
+        """
+        table = GeofencePresence.__table__
+        saved = set()
+        inserts, deletes = [], []
+        for vehicle_id, geofence_id, before, after, _ in changes:
+            if before is None and after is None:
+                saved.add((vehicle_id, geofence_id))  # in and out within the batch
+            elif before is None:
+                inserts.append(dict(after, vehicle_id=vehicle_id, geofence_id=geofence_id))
+            elif after is None:
+                deletes.append((vehicle_id, geofence_id, before['entered_at'], before['dwell_recorded']))
+            elif db.session.execute(
+                update(table).where(self._unchanged(vehicle_id, geofence_id, before)).values(**after)
+            ).rowcount == 1:
+                saved.add((vehicle_id, geofence_id))
+
+        # Batched with RETURNING where the dialect has it, one guarded statement per row otherwise
+        insert = UPSERT_DIALECTS.get(db.engine.dialect.name)
+        key = (table.c.vehicle_id, table.c.geofence_id)
+        for start in range(0, len(inserts), PRESENCE_CHUNK):
+            chunk = inserts[start:start + PRESENCE_CHUNK]
+            if insert is None:
+                db.session.execute(table.insert(), chunk)
+                saved.update((row['vehicle_id'], row['geofence_id']) for row in chunk)
+                continue
+            statement = insert(table).on_conflict_do_nothing(index_elements=['vehicle_id', 'geofence_id'])
+            saved.update(tuple(row) for row in db.session.execute(statement.returning(*key), chunk))
+        for start in range(0, len(deletes), PRESENCE_CHUNK):
+            chunk = deletes[start:start + PRESENCE_CHUNK]
+            if insert is None:
+                for vehicle_id, geofence_id, entered_at, dwell_recorded in chunk:
+                    before = {'entered_at': entered_at, 'dwell_recorded': dwell_recorded}
+                    if db.session.execute(
+                        table.delete().where(self._unchanged(vehicle_id, geofence_id, before))
+                    ).rowcount == 1:
+                        saved.add((vehicle_id, geofence_id))
+                continue
+            statement = table.delete().where(
+                tuple_(*key, table.c.entered_at, table.c.dwell_recorded).in_(chunk)
+            ).returning(*key)
+            saved.update(tuple(row) for row in db.session.execute(statement))
+        return saved
+
+    @staticmethod
+    def _unchanged(vehicle_id, geofence_id, before):
+        table = GeofencePresence.__table__
+        return and_(table.c.vehicle_id == vehicle_id, table.c.geofence_id == geofence_id,
+                    table.c.entered_at == before['entered_at'],
+                    table.c.dwell_recorded == before['dwell_recorded'])
+
+    @staticmethod
+    def _anomaly(fence, event, point, duration):
+        label = CATEGORY_LABELS.get(fence.category, fence.category)
+        if event == 'enter' and fence.category == 'restricted':
+            anomaly_type, severity = 'geofence_entry', 'high'
+            description = f'Vehicle entered restricted zone "{fence.name}"'
+        elif event == 'dwell':
+            anomaly_type = 'geofence_dwell'
+            severity = 'high' if fence.category == 'restricted' else 'medium'
+            description = (f'Vehicle stayed {duration / 60:.0f} minutes in {label} "{fence.name}" '
+                           f'(limit: {fence.dwell_seconds / 60:.0f} minutes)')
+        else:
+            return None
+        now = point['timestamp']
+        return {
+            'type': anomaly_type,
+            'description': description,
+            'severity': severity,
+            'vehicle_id': point['vehicle_id'],
+            'mission_id': point.get('mission_id'),
+            'location_latitude': point['latitude'],
+            'location_longitude': point['longitude'],
+            'is_resolved': False,
+            'detected_at': now,
+            'created_at': now
+        }
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['enabled'] = self.enabled
+        stats['fences'] = len(self._index) if self._index is not None else None
+        stats['cells'] = len(self._index.cells) if self._index is not None else None
+        stats['avg_point_us'] = round(stats['seconds'] / stats['points'] * 1e6, 2) if stats['points'] else None
+        return stats
+
+
+geofence_engine = GeofenceEngine()
@@ -0,0 +1,204 @@
+from app.models.geofence import Geofence
+from app.models.geofence_event import GeofenceEvent
+from app.models.geofence_presence import GeofencePresence
+from app import db
+from app.services.geofence_engine import geofence_engine
+from app.utils.geofence_index import validate_geometry
+import json
+
+CATEGORIES = ('depot', 'restricted', 'client_site')
+
+class GeofenceService:
+
+    @staticmethod
+    def _apply(geofence, data):
+        """Copy the fields present in `data` onto the geofence and recompute its bounds. Raises ValueError."""
+        if 'name' in data:
+            if not data['name'] or not str(data['name']).strip():
+                raise ValueError('name is required')
+            geofence.name = str(data['name']).strip()[:100]
+
+        if 'category' in data:
+            if data['category'] not in CATEGORIES:
+                raise ValueError(f"category must be one of: {', '.join(CATEGORIES)}")
+            geofence.category = data['category']
+
+        if 'dwell_minutes' in data:
+            dwell = data['dwell_minutes']
+            if dwell is not None and (not isinstance(dwell, int) or isinstance(dwell, bool) or dwell <= 0):
+                raise ValueError('dwell_minutes must be a positive integer or null')
+            geofence.dwell_minutes = dwell
+
+        if 'is_active' in data:
+            geofence.is_active = bool(data['is_active'])
+
+        geometry_fields = ('shape', 'points', 'center_latitude', 'center_longitude', 'radius_m')
+        if any(field in data for field in geometry_fields) or geofence.min_latitude is None:
+            shape = data.get('shape', geofence.shape)
+            if shape == 'polygon':
+                points = data.get('points', geofence.vertices)
+                bounds = validate_geometry(shape, points=points)
+                geofence.points = json.dumps([[float(lat), float(lon)] for lat, lon in points])
+                geofence.center_latitude = geofence.center_longitude = geofence.radius_m = None
+            else:
+                center_latitude = data.get('center_latitude', geofence.center_latitude)
+                center_longitude = data.get('center_longitude', geofence.center_longitude)
+                radius_m = data.get('radius_m', geofence.radius_m)
+                try:
+                    center_latitude, center_longitude, radius_m = (
+                        None if value is None else float(value)
+                        for value in (center_latitude, center_longitude, radius_m)
+                    )
+                except (TypeError, ValueError):
+                    raise ValueError('center_latitude, center_longitude and radius_m must be numbers')
+                bounds = validate_geometry(shape, center_latitude=center_latitude,
+                                           center_longitude=center_longitude, radius_m=radius_m)
+                geofence.points = None
+                geofence.center_latitude, geofence.center_longitude = center_latitude, center_longitude
+                geofence.radius_m = radius_m
+            geofence.shape = shape
+            geofence.min_latitude, geofence.min_longitude, geofence.max_latitude, geofence.max_longitude = bounds
+
+    @staticmethod
+    def get_geofences(category=None, active=None):
+        """Get geofences, optionally by category and active state."""
+        try:
+            query = Geofence.query
+
+            if category:
+                query = query.filter_by(category=category)
+
+            if active is not None:
+                query = query.filter_by(is_active=active)
+
+            geofences = query.order_by(Geofence.id).all()
+
+            return {'geofences': [geofence.to_dict() for geofence in geofences]}, 200
+
+        except Exception as e:
+            return {'error': str(e)}, 500
+
+    @staticmethod
+    def get_geofence(geofence_id):
+        """Get one geofence."""
+        try:
+            geofence = Geofence.query.get(geofence_id)
+            if not geofence:
+                return {'error': 'Geofence not found'}, 404
+
+            return {'geofence': geofence.to_dict()}, 200
+
+        except Exception as e:
+            return {'error': str(e)}, 500
+
+    @staticmethod
+    def create_geofence(data, user_id=None):
+        """Create a polygon or circle geofence."""
+        try:
+            if not data.get('name'):
+                return {'error': 'name is required'}, 400
+
+            geofence = Geofence(category='client_site', is_active=True, created_by=user_id)
+            try:
+                GeofenceService._apply(geofence, data)
+            except ValueError as e:
+                return {'error': str(e)}, 400
+
+            db.session.add(geofence)
+            db.session.commit()
+            geofence_engine.invalidate()
+
+            return {'message': 'Geofence created successfully', 'geofence': geofence.to_dict()}, 201
+
+        except Exception as e:
+            db.session.rollback()
+            return {'error': str(e)}, 500
+
+    @staticmethod
+    def update_geofence(geofence_id, data):
+        """Update a geofence; a deactivated one forgets the vehicles inside it."""
+        try:
+            geofence = Geofence.query.get(geofence_id)
+            if not geofence:
+                return {'error': 'Geofence not found'}, 404
+
+            try:
+                GeofenceService._apply(geofence, data)
+            except ValueError as e:
+                db.session.rollback()
+                return {'error': str(e)}, 400
+
+            if not geofence.is_active:
+                GeofencePresence.query.filter_by(geofence_id=geofence_id).delete()
+
+            db.session.commit()
+            geofence_engine.invalidate()
+
+            return {'message': 'Geofence updated successfully', 'geofence': geofence.to_dict()}, 200
+
+        except Exception as e:
+            db.session.rollback()
+            return {'error': str(e)}, 500
+
+    @staticmethod
+    def delete_geofence(geofence_id):
+        """Delete a geofence with its presences and events."""
+        try:
+            geofence = Geofence.query.get(geofence_id)
+            if not geofence:
+                return {'error': 'Geofence not found'}, 404
+
+            GeofencePresence.query.filter_by(geofence_id=geofence_id).delete()
+            GeofenceEvent.query.filter_by(geofence_id=geofence_id).delete()
+            db.session.delete(geofence)
+            db.session.commit()
+            geofence_engine.invalidate()
+
+            return {'message': 'Geofence deleted successfully'}, 200
+
+        except Exception as e:
+            db.session.rollback()
+            return {'error': str(e)}, 500
+
+    @staticmethod
+    def get_vehicles_inside(geofence_id):
+        """Get the vehicles currently inside a geofence."""
+        try:
+            geofence = Geofence.query.get(geofence_id)
+            if not geofence:
+                return {'error': 'Geofence not found'}, 404
+
+            presences = GeofencePresence.query.filter_by(geofence_id=geofence_id).order_by(
+                GeofencePresence.entered_at
+            ).all()
+
+            return {
+                'geofence': geofence.to_dict(),
+                'vehicles': [presence.to_dict() for presence in presences]
+            }, 200
+
+        except Exception as e:
+            return {'error': str(e)}, 500
+
+    @staticmethod
+    def get_events(page):
+        """Get geofence events, one page at a time."""
+        try:
+            events, pagination = page.apply(GeofenceEvent.query)
+
+            return {
+                'events': [event.to_dict() for event in events],
+                'pagination': pagination
+            }, 200
+
+        except Exception as e:
+            return {'error': str(e)}, 500
+
+    @staticmethod
+    def check_point(latitude, longitude):
+        """Get the active geofences containing a point."""
+        try:
+            return {'geofences': geofence_engine.containing(latitude, longitude)}, 200
+
+        except Exception as e:
+            return {'error': str(e)}, 500
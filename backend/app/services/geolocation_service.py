@@ -14,11 +14,11 @@ from app.models.vehicle import Vehicle
 from app.models.location import Location
 from app.models.mission import Mission
 from app import db
+from app.utils.metrics import FOLIUM_RENDER
 from datetime import datetime, timedelta
 import json
 import base64
 from io import StringIO
-import random
 import math
 
 class GeolocationService:
@@ -275,6 +275,7 @@ class GeolocationService:
             return {'error': f'Erreur lors de l\'analyse: {str(e)}'}
     
     @staticmethod
+    @FOLIUM_RENDER.time()
     def generate_folium_map_html(vehicles_data=None, route_data=None, heatmap_data=None):
         """Générer le HTML complet de la carte Folium."""
         
@@ -366,56 +367,19 @@ class GeolocationService:
     @staticmethod
     def simulate_real_time_movement():
         """Simuler des mouvements en temps réel pour la démonstration."""
+        from app.services.fleet_simulator import fleet_simulator
         
         try:
-            vehicles = Vehicle.query.all()
-            movements = []
-            
-            for vehicle in vehicles:
-                # Obtenir la dernière position
-                last_location = Location.query.filter_by(
-                    vehicle_id=vehicle.id
-                ).order_by(Location.timestamp.desc()).first()
-                
-                if last_location:
-                    # Simuler un petit déplacement
-                    lat_change = random.uniform(-0.001, 0.001)
-                    lon_change = random.uniform(-0.001, 0.001)
-                    
-                    new_lat = last_location.latitude + lat_change
-                    new_lon = last_location.longitude + lon_change
-                    speed = random.uniform(0, 60)
-                    heading = random.uniform(0, 360)
-                else:
-                    # Position initiale aléatoire dans Paris
-                    new_lat = 48.8566 + random.uniform(-0.05, 0.05)
-                    new_lon = 2.3522 + random.uniform(-0.05, 0.05)
-                    speed = random.uniform(10, 50)
-                    heading = random.uniform(0, 360)
-                
-                # Créer nouvelle location
-                new_location = Location(
-                    vehicle_id=vehicle.id,
-                    latitude=new_lat,
-                    longitude=new_lon,
-                    speed=speed,
-                    heading=heading,
-                    timestamp=datetime.utcnow()
-                )
-                
-                db.session.add(new_location)
-                
-                movements.append({
-                    'vehicle_id': vehicle.id,
-                    'license_plate': vehicle.license_plate,
-                    'latitude': new_lat,
-                    'longitude': new_lon,
-                    'speed': speed,
-                    'heading': heading
-                })
-            
-            db.session.commit()
-            return movements
+            points = fleet_simulator.advance(5)
+            plates = dict(zip(fleet_simulator.ids.tolist(), fleet_simulator.plates))
+            return [{
+                'vehicle_id': point['vehicle_id'],
+                'license_plate': plates.get(point['vehicle_id']),
+                'latitude': point['latitude'],
+                'longitude': point['longitude'],
+                'speed': point['speed'],
+                'heading': point['heading']
+            } for point in points]
             
         except Exception as e:
             db.session.rollback()
@@ -0,0 +1,297 @@
+import glob
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, and_, or_, select
+from app import db
+from app.models.anomaly import Anomaly
+from app.models.location import Location
+from app.models.mission import Mission
+from app.models.trip_track import TripTrack
+from app.utils.track_codec import EPOCH, decode_track, slice_track
+
+# Exportable datasets: source table, column partitioning the files by day
+# (and filtered by --start/--end) and how the incremental watermark advances:
+# 'id' for append-only tables, (timestamp column, id) for rows that change
+DATASETS = {
+    'locations': {'model': Location, 'time_column': 'timestamp', 'watermark': 'id'},
+    'anomalies': {'model': Anomaly, 'time_column': 'detected_at', 'watermark': 'updated_at'},
+    'missions': {'model': Mission, 'time_column': 'scheduled_start', 'watermark': 'updated_at'},
+    # Points compacted into trip tracks, re-exported whole when a track is rewritten
+    'trip_points': {'model': TripTrack, 'time_column': 'timestamp', 'watermark': 'updated_at'}
+}
+
+FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+STATE_FILE = '_export_state.json'
+TRIP_POINT_COLUMNS = ('track_id', 'vehicle_id', 'mission_id', 'timestamp', 'latitude', 'longitude',
+                      'altitude', 'speed', 'heading', 'accuracy')
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError('Exports need pyarrow: pip install pyarrow')
+    return pyarrow
+
+
+def _arrow_type(pa, column_type):
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    if isinstance(column_type, Integer):
+        return pa.int64()
+    if isinstance(column_type, Float):
+        return pa.float64()
+    if isinstance(column_type, DateTime):
+        return pa.timestamp('us')
+    if isinstance(column_type, Date):
+        return pa.date32()
+    return pa.string()
+
+
+def arrow_schema(dataset):
+    pa = _pyarrow()
+    if dataset == 'trip_points':
+        types = {'track_id': pa.int64(), 'vehicle_id': pa.int64(), 'mission_id': pa.int64(),
+                 'timestamp': pa.timestamp('us')}
+        return pa.schema([(name, types.get(name, pa.float64())) for name in TRIP_POINT_COLUMNS])
+    table = DATASETS[dataset]['model'].__table__
+    return pa.schema([(column.name, _arrow_type(pa, column.type)) for column in table.columns])
+
+
+class PartitionedWriter:
+    """Writes record batches of one dataset to day-partitioned files.
+
+    Rows are buffered per partition and written in row groups of
+    `row_group_size`. Files are written under a temporary name and only
+    renamed into place by commit(), so a crash never leaves a partial file
+    looking complete.
+    """
+
+    def __init__(self, directory, dataset, schema, file_format='parquet', row_group_size=100000,
+                 compression='zstd'):
+        self.pa = _pyarrow()
+        self.directory = os.path.join(directory, dataset)
+        self.dataset = dataset
+        self.schema = schema
+        self.file_format = file_format
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.run = time.strftime('%Y%m%dT%H%M%S')
+        self.sequence = 0
+        self._writers = {}   # partition -> (writer, temporary path, final path)
+        self._buffers = {}   # partition -> [tables], rows
+        self.rows = 0
+        self.files = []
+
+    def write(self, table, time_column):
+        """Buffer a table, split by the day of `time_column`."""
+        pa = self.pa
+        days = pa.compute.strftime(table[time_column], format='%Y-%m-%d')
+        days = pa.compute.fill_null(days, 'unknown')
+        for day in pa.compute.unique(days).to_pylist():
+            part = table.filter(pa.compute.equal(days, day))
+            tables, rows = self._buffers.get(day, ([], 0))
+            tables.append(part)
+            rows += part.num_rows
+            self._buffers[day] = (tables, rows)
+            if rows >= self.row_group_size:
+                self._flush(day)
+        self.rows += table.num_rows
+
+    def _flush(self, partition):
+        tables, rows = self._buffers.pop(partition, ([], 0))
+        if not rows:
+            return
+        table = self.pa.concat_tables(tables)
+        writer = self._writer(partition)
+        for offset in range(0, table.num_rows, self.row_group_size):
+            chunk = table.slice(offset, self.row_group_size)
+            if self.file_format == 'parquet':
+                writer.write_table(chunk, row_group_size=self.row_group_size)
+            else:
+                writer.write_table(chunk, max_chunksize=self.row_group_size)
+
+    def _writer(self, partition):
+        if partition not in self._writers:
+            directory = os.path.join(self.directory, f'date={partition}')
+            os.makedirs(directory, exist_ok=True)
+            self.sequence += 1
+            final = os.path.join(directory, f'part-{self.run}-{self.sequence:05d}{FORMATS[self.file_format]}')
+            temporary = f'{final}.tmp'
+            if self.file_format == 'parquet':
+                writer = self.pa.parquet.ParquetWriter(temporary, self.schema, compression=self.compression)
+            else:
+                writer = self.pa.ipc.new_file(temporary, self.schema)
+            self._writers[partition] = (writer, temporary, final)
+        return self._writers[partition][0]
+
+    def commit(self):
+        """Write what is buffered, close the open files and move them into place."""
+        for partition in list(self._buffers):
+            self._flush(partition)
+        for writer, temporary, final in self._writers.values():
+            writer.close()
+            os.replace(temporary, final)
+            self.files.append(final)
+        self._writers = {}
+
+
+def load_state(directory):
+    try:
+        with open(os.path.join(directory, STATE_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(directory, state):
+    path = os.path.join(directory, STATE_FILE)
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(f'{path}.tmp', path)
+
+
+def _table_batches(dataset, watermark, start, end, batch_size):
+    """Stream rows of a table past the watermark with a server-side cursor, in batches.
+
+    An id watermark also keeps the unused ids of the last EXPORT_ID_OVERLAP
+    below it ('gaps'): they are read again, for rows whose transaction
+    committed after higher ids were exported.
+    """
+    spec = DATASETS[dataset]
+    table = spec['model'].__table__
+    time_column = table.c[spec['time_column']]
+    query = select(*table.columns)
+    if start is not None:
+        query = query.where(time_column >= start)
+    if end is not None:
+        query = query.where(time_column < end)
+
+    if spec['watermark'] == 'id':
+        overlap = current_app.config['EXPORT_ID_OVERLAP']
+        high = watermark['id'] if watermark else 0
+        gaps = set(watermark.get('gaps', ())) if watermark else set()
+        if watermark:
+            query = query.where(table.c.id >= min(gaps) if gaps else table.c.id > high)
+        query = query.order_by(table.c.id)
+    else:
+        column = table.c[spec['watermark']]
+        # A watermark saved while the dataset advanced by id starts the export over
+        if watermark and 'timestamp' in watermark:
+            after = datetime.fromisoformat(watermark['timestamp'])
+            query = query.where(or_(column > after, and_(column == after, table.c.id > watermark['id'])))
+        query = query.order_by(column, table.c.id)
+
+    names = [column.name for column in table.columns]
+    with db.engine.connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+        for rows in result.partitions():
+            if spec['watermark'] == 'id':
+                # Skip the rows below the watermark that were exported already
+                rows = [row for row in rows if row.id > high or row.id in gaps]
+                for row in rows:
+                    if row.id > high:
+                        gaps.update(range(max(high + 1, row.id - overlap), row.id))
+                        high = row.id
+                    else:
+                        gaps.discard(row.id)
+                gaps = {gap for gap in gaps if gap > high - overlap}
+                if not rows:
+                    continue
+            columns = {name: list(values) for name, values in zip(names, zip(*rows))}
+            last = rows[-1]._mapping
+            if spec['watermark'] == 'id':
+                mark = {'id': high, 'gaps': sorted(gaps)}
+            else:
+                value = last[spec['watermark']]
+                mark = {'timestamp': value.isoformat() if value else EPOCH.isoformat(), 'id': last['id']}
+            yield columns, mark
+
+
+def _trip_point_batches(watermark, start, end, batch_size):
+    """Decoded trip track points, one batch per track, tracks ordered by (updated_at, id)."""
+    table = TripTrack.__table__
+    query = select(table.c.id, table.c.vehicle_id, table.c.mission_id, table.c.updated_at, table.c.data)
+    if start is not None:
+        query = query.where(table.c.ended_at >= start)
+    if end is not None:
+        query = query.where(table.c.started_at < end)
+    if watermark:
+        after = datetime.fromisoformat(watermark['timestamp'])
+        query = query.where(or_(table.c.updated_at > after,
+                                and_(table.c.updated_at == after, table.c.id > watermark['id'])))
+    query = query.order_by(table.c.updated_at, table.c.id)
+
+    with db.engine.connect() as connection:
+        # Tracks are large rows, a few per fetch keeps memory bounded
+        result = connection.execution_options(stream_results=True, yield_per=16).execute(query)
+        for track in result:
+            # slice_track() includes its end, the export range does not
+            columns = slice_track(decode_track(track.data), start,
+                                  end - timedelta(microseconds=1) if end is not None else None)
+            count = len(columns['timestamp'])
+            columns = dict(columns, track_id=[track.id] * count, vehicle_id=[track.vehicle_id] * count,
+                           mission_id=[track.mission_id] * count)
+            updated_at = track.updated_at.isoformat() if track.updated_at else EPOCH.isoformat()
+            yield columns, {'timestamp': updated_at, 'id': track.id}
+
+
+def export_dataset(directory, dataset, start=None, end=None, file_format='parquet', row_group_size=100000,
+                   checkpoint_rows=1000000, compression='zstd', incremental=True):
+    """Export one dataset into `directory`/<dataset>/date=YYYY-MM-DD/ files.
+
+    With `incremental`, the export starts after the watermark saved by the
+    previous run and saves a new one each time `checkpoint_rows` rows are
+    safely on disk, so an interrupted export resumes where it stopped.
+    Returns a summary dict.
+    """
+    pa = _pyarrow()
+    if dataset not in DATASETS:
+        raise ValueError(f'Unknown dataset: {dataset}')
+    if file_format not in FORMATS:
+        raise ValueError(f'Unknown format: {file_format}')
+
+    os.makedirs(directory, exist_ok=True)
+    # Files of an interrupted run were never committed
+    for path in glob.glob(os.path.join(directory, dataset, '*', '*.tmp')):
+        os.remove(path)
+
+    state = load_state(directory) if incremental else {}
+    watermark = state.get(dataset)
+    schema = arrow_schema(dataset)
+    writer = PartitionedWriter(directory, dataset, schema, file_format, row_group_size, compression)
+    batch_size = min(row_group_size, 50000)
+
+    if dataset == 'trip_points':
+        batches = _trip_point_batches(watermark, start, end, batch_size)
+    else:
+        batches = _table_batches(dataset, watermark, start, end, batch_size)
+
+    pending = 0
+    for columns, mark in batches:
+        # from_pandas turns the NaN of decoded track columns into nulls
+        table = pa.Table.from_arrays(
+            [pa.array(columns[field.name], type=field.type, from_pandas=True) for field in schema], schema=schema
+        )
+        writer.write(table, DATASETS[dataset]['time_column'])
+        watermark = mark
+        pending += table.num_rows
+        if pending >= checkpoint_rows:
+            writer.commit()
+            pending = 0
+            if incremental:
+                state[dataset] = watermark
+                save_state(directory, state)
+
+    writer.commit()
+    if incremental and watermark:
+        state[dataset] = watermark
+        save_state(directory, state)
+
+    return {'dataset': dataset, 'rows': writer.rows, 'files': len(writer.files), 'watermark': watermark}
@@ -0,0 +1,358 @@
+import atexit
+import glob
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from datetime import datetime
+from app import db
+from app.models.vehicle import Vehicle
+from app.services.geofence_engine import geofence_engine
+from app.utils.location_writes import advance_vehicle_positions, commit_isolating, upsert_locations
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to checking the owner pid
+    fcntl = None
+
+# Columns accepted from an ingest request and written to `locations`
+POINT_FIELDS = ('latitude', 'longitude', 'altitude', 'speed', 'heading', 'accuracy',
+                'vehicle_id', 'mission_id', 'timestamp')
+
+
+class IngestQueueFull(Exception):
+    """Raised when the ingest queue is at capacity, the client should retry later."""
+
+
+class IngestQueue:
+    """Bounded in-process queue with a background writer that group-commits points.
+
+    Requests enqueue points and return immediately; the writer thread commits
+    them in one transaction every INGEST_FLUSH_INTERVAL_MS or as soon as
+    INGEST_BATCH_SIZE points are waiting. Points the database rejects (a
+    broken constraint) are isolated by bisecting the batch and dropped to the
+    log and to `rejected.jsonl` in the spool directory. Any other failure is
+    retried with backoff while the queue absorbs new points; once it is full,
+    submit() raises IngestQueueFull. With INGEST_SPOOL_DIR set, accepted
+    points are also appended to a spool file of the process, named after
+    its host, pid and start time and locked while it runs, that another
+    process replays once the lock is released.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.batch_size = 500
+        self.flush_interval = 0.2
+        self.spool_dir = None
+        self.spool_fsync = False
+        self._queue = None
+        self._thread = None
+        self._thread_pid = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._spool_lock = threading.Lock()
+        self._spool_file = None
+        self._spool_name = None
+        self._known_vehicles = set()
+        self._stats = {
+            'accepted': 0,
+            'rejected': 0,
+            'committed': 0,
+            'batches': 0,
+            'commit_errors': 0,
+            'dead_lettered': 0,
+            'replayed': 0,
+            'last_batch_size': 0,
+            'last_commit_seconds': 0.0,
+            'max_commit_seconds': 0.0,
+            'total_commit_seconds': 0.0
+        }
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config['INGEST_MODE'] == 'queued'
+        self.batch_size = app.config['INGEST_BATCH_SIZE']
+        self.flush_interval = app.config['INGEST_FLUSH_INTERVAL_MS'] / 1000
+        self.spool_dir = app.config['INGEST_SPOOL_DIR']
+        self.spool_fsync = app.config['INGEST_SPOOL_FSYNC']
+        self._queue = queue.Queue(maxsize=app.config['INGEST_QUEUE_SIZE'])
+        if self.enabled:
+            atexit.register(self.stop)
+            # Start the writer (and replay spools) in each serving process
+            app.before_request(self._ensure_writer)
+
+    # Request side
+
+    def is_known_vehicle(self, vehicle_id):
+        """Check a vehicle id, hitting the database only the first time it is seen."""
+        if vehicle_id in self._known_vehicles:
+            return True
+        if db.session.get(Vehicle, vehicle_id) is None:
+            return False
+        self._known_vehicles.add(vehicle_id)
+        return True
+
+    def submit(self, point):
+        """Queue a point for the writer thread. Raises IngestQueueFull at capacity."""
+        self._ensure_writer()
+        point = {field: point.get(field) for field in POINT_FIELDS}
+        if point['timestamp'] is None:
+            point['timestamp'] = datetime.utcnow()
+
+        try:
+            self._queue.put_nowait(point)
+        except queue.Full:
+            self._record('rejected', 1)
+            raise IngestQueueFull('Ingest queue is full')
+
+        # Spooled after queueing: a truncation racing with this write can leave
+        # an already committed point in the spool, but never drop a pending one
+        if self.spool_dir:
+            self._spool(point)
+        self._record('accepted', 1)
+        return point
+
+    # Writer side
+
+    def _ensure_writer(self):
+        # A thread started before fork() does not exist in the child
+        thread = self._thread
+        if thread is not None and self._thread_pid == os.getpid() and thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._spool_file = None
+            # A restarted container reuses pids, the start time tells this process from its predecessor
+            self._spool_name = f'ingest-{socket.gethostname()}-{os.getpid()}-{int(time.time())}.jsonl'
+            self._thread_pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='ingest-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        with self.app.app_context():
+            self._replay_orphan_spools()
+            backoff = 0.5
+            batch = []
+            while not self._stop.is_set() or batch or not self._queue.empty():
+                if not batch:
+                    batch = self._collect()
+                    if not batch:
+                        continue
+
+                try:
+                    self._dead_letter(commit_isolating(batch, self._commit))
+                except Exception as e:
+                    db.session.rollback()
+                    self._record('commit_errors', 1)
+                    print(f"Ingest commit of {len(batch)} points failed, retrying in {backoff:.1f}s: {e}")
+                    if self._stop.wait(backoff) and backoff >= 4:
+                        # Shutting down and the database keeps failing, the spool keeps the points
+                        return
+                    backoff = min(backoff * 2, 30)
+                    continue
+
+                backoff = 0.5
+                batch = []
+                self._truncate_spool_if_idle()
+
+    def _collect(self):
+        """Wait for a first point, then gather more until the batch is full or the interval ends."""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _commit(self, batch):
+        started = time.perf_counter()
+        # Retried points replace the stored one, late points never move the vehicle back
+        upsert_locations(batch)
+        advance_vehicle_positions(batch)
+        db.session.commit()
+        geofence_engine.process(batch)
+
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._stats['committed'] += len(batch)
+            self._stats['batches'] += 1
+            self._stats['last_batch_size'] = len(batch)
+            self._stats['last_commit_seconds'] = elapsed
+            self._stats['max_commit_seconds'] = max(self._stats['max_commit_seconds'], elapsed)
+            self._stats['total_commit_seconds'] += elapsed
+
+    def _dead_letter(self, points):
+        """Drop points the database rejected, keeping a copy in the spool directory."""
+        if not points:
+            return
+        self._record('dead_lettered', len(points))
+        # The vehicle may have been deleted since it was checked
+        for point in points:
+            self._known_vehicles.discard(point['vehicle_id'])
+        lines = [json.dumps(point, default=lambda value: value.isoformat()) for point in points]
+        print(f"Ingest dropped {len(points)} rejected points: {', '.join(lines[:5])}")
+        if self.spool_dir:
+            with self._spool_lock, open(os.path.join(self.spool_dir, 'rejected.jsonl'), 'a', encoding='utf-8') as f:
+                f.write(''.join(line + '\n' for line in lines))
+
+    def stop(self, timeout=10):
+        """Flush what is queued and stop the writer thread."""
+        if self._thread is None or self._thread_pid != os.getpid():
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+
+    # Spool file
+
+    def _spool_path(self):
+        return os.path.join(self.spool_dir, self._spool_name)
+
+    def _spool(self, point):
+        line = json.dumps(point, default=lambda value: value.isoformat()) + '\n'
+        with self._spool_lock:
+            if self._spool_file is None:
+                os.makedirs(self.spool_dir, exist_ok=True)
+                self._spool_file = _create_locked(self._spool_path())
+            self._spool_file.write(line)
+            self._spool_file.flush()
+            if self.spool_fsync:
+                os.fsync(self._spool_file.fileno())
+
+    def _truncate_spool_if_idle(self):
+        """Everything spooled so far is committed once the queue is empty."""
+        if not self.spool_dir or self._spool_file is None:
+            return
+        with self._spool_lock:
+            if self._queue.empty() and self._spool_file is not None:
+                self._spool_file.truncate(0)
+                self._spool_file.seek(0)
+
+    def _replay_orphan_spools(self):
+        """Commit points left in the spool files of processes that no longer run."""
+        if not self.spool_dir:
+            return
+
+        for path in glob.glob(os.path.join(self.spool_dir, 'ingest-*.jsonl')):
+            if os.path.basename(path) == self._spool_name:
+                continue
+            lock = _try_lock_spool(path)
+            if lock is None:
+                continue  # its process still runs, or another one claimed it first
+            try:
+                self._replay_spool(path)
+            finally:
+                lock.close()
+
+    def _replay_spool(self, path):
+        """Commit the points of a spool file this process holds the lock of, then remove it."""
+        claimed = f'{path}.replay-{os.getpid()}'
+        try:
+            os.rename(path, claimed)
+        except OSError:
+            return
+
+        points = []
+        with open(claimed, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    point = json.loads(line)
+                except ValueError:
+                    continue  # torn last line
+                point['timestamp'] = datetime.fromisoformat(point['timestamp'])
+                points.append(point)
+
+        try:
+            for start in range(0, len(points), self.batch_size):
+                self._dead_letter(commit_isolating(points[start:start + self.batch_size], self._commit))
+        except Exception as e:
+            db.session.rollback()
+            os.rename(claimed, path)
+            print(f"Could not replay {os.path.basename(path)}, keeping it for the next start: {e}")
+            return
+        # Removed while still locked, no other process can be replaying it
+        os.remove(claimed)
+        if not points:
+            return
+        self._record('replayed', len(points))
+        print(f"Replayed {len(points)} spooled points from {os.path.basename(path)}")
+
+    # Metrics
+
+    def _record(self, key, value):
+        with self._lock:
+            self._stats[key] += value
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        batches = stats['batches']
+        stats['mode'] = 'queued' if self.enabled else 'sync'
+        stats['depth'] = self._queue.qsize() if self._queue is not None else 0
+        stats['capacity'] = self._queue.maxsize if self._queue is not None else 0
+        stats['avg_commit_seconds'] = stats['total_commit_seconds'] / batches if batches else 0.0
+        stats['writer_alive'] = bool(self._thread and self._thread.is_alive())
+        return stats
+
+
+def _create_locked(path):
+    """Open a new spool file already locked: created under another name, locked, then renamed into place."""
+    temporary = f'{path}.new'
+    spool = open(temporary, 'a', encoding='utf-8')
+    if fcntl is not None:
+        fcntl.flock(spool, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    os.rename(temporary, path)
+    return spool
+
+
+def _try_lock_spool(path):
+    """Lock the spool file of a process that is gone, or return None if it is still in use."""
+    if fcntl is not None:
+        try:
+            spool = open(path, 'a', encoding='utf-8')
+        except OSError:
+            return None
+        try:
+            fcntl.flock(spool, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            spool.close()
+            return None
+        return spool
+
+    # ingest-<host>-<pid>-<start>.jsonl, the pid only tells about processes of this host
+    parts = os.path.basename(path)[len('ingest-'):-len('.jsonl')].rsplit('-', 2)
+    if len(parts) != 3 or parts[0] != socket.gethostname():
+        return None
+    try:
+        pid = int(parts[1])
+    except ValueError:
+        return None
+    if pid == os.getpid() or _process_alive(pid):
+        return None
+    return open(path, 'a', encoding='utf-8')
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+ingest_queue = IngestQueue()
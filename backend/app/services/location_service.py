@@ -1,8 +1,14 @@
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from app.models.location import Location
 from app.models.vehicle import Vehicle
-from app.models.user import User
 from app import db
+from app.utils.auth import current_user_has_role
+from app.services.geofence_engine import geofence_engine
+from app.services.ingest_queue import IngestQueueFull, POINT_FIELDS, ingest_queue
+from app.services.telemetry_journal import telemetry_journal
+from app.services.track_service import TrackService
+from app.utils.location_writes import advance_vehicle_positions, upsert_locations
+from app.utils.metrics import INGEST_POINTS
 from datetime import datetime, timedelta
 
 class LocationService:
@@ -12,49 +18,107 @@ class LocationService:
     def add_location(location_data):
         """Add a new location point."""
         try:
+            # Write-behind mode: accept now, the ingest writer commits in batches
+            if ingest_queue.enabled:
+                if not ingest_queue.is_known_vehicle(location_data['vehicle_id']):
+                    return {'error': 'Vehicle not found'}, 404
+                
+                point = ingest_queue.submit(location_data)
+                INGEST_POINTS.inc('queued')
+                location = dict(point, timestamp=point['timestamp'].isoformat())
+                return {'message': 'Location accepted', 'queued': True, 'location': location}, 202
+            
+            # Journal mode: the point is durable on disk, the replayer commits it
+            if telemetry_journal.enabled:
+                if not ingest_queue.is_known_vehicle(location_data['vehicle_id']):
+                    return {'error': 'Vehicle not found'}, 404
+                
+                point = {field: location_data.get(field) for field in POINT_FIELDS}
+                point['timestamp'] = point['timestamp'] or datetime.utcnow()
+                telemetry_journal.append(point)
+                INGEST_POINTS.inc('journal')
+                location = dict(point, timestamp=point['timestamp'].isoformat())
+                return {'message': 'Location accepted', 'journaled': True, 'location': location}, 202
+            
             # Validate vehicle exists
             vehicle = Vehicle.query.get(location_data['vehicle_id'])
             if not vehicle:
                 return {'error': 'Vehicle not found'}, 404
             
-            # Create location
-            location = Location(
-                latitude=location_data['latitude'],
-                longitude=location_data['longitude'],
-                altitude=location_data.get('altitude'),
-                speed=location_data.get('speed'),
-                heading=location_data.get('heading'),
-                accuracy=location_data.get('accuracy'),
-                vehicle_id=location_data['vehicle_id'],
-                mission_id=location_data.get('mission_id')
-            )
-            
-            # Update vehicle's current location
-            vehicle.update_location(location_data['latitude'], location_data['longitude'])
-            
-            db.session.add(location)
+            point = {field: location_data.get(field) for field in POINT_FIELDS}
+            point['timestamp'] = point['timestamp'] or datetime.utcnow()
+            key = {'vehicle_id': point['vehicle_id'], 'timestamp': point['timestamp']}
+            
+            # A retried point (same vehicle and timestamp) replaces the stored one
+            existed = db.session.query(Location.id).filter_by(**key).first() is not None
+            upsert_locations([point])
+            
+            # Only a point newer than the vehicle's current position moves it
+            advance_vehicle_positions([point])
             db.session.commit()
+            INGEST_POINTS.inc('sync')
+            geofence_engine.process([point])
             
+            location = Location.query.filter_by(**key).one()
+            if existed:
+                return {'message': 'Location already recorded, updated', 'location': location.to_dict()}, 200
             return {'message': 'Location added successfully', 'location': location.to_dict()}, 201
             
+        except IngestQueueFull:
+            raise
         except Exception as e:
             db.session.rollback()
             return {'error': str(e)}, 500
-    
+
+    @staticmethod
+    def ingest_points(points):
+        """Record trusted points (the fleet simulator) in bulk, through the same ingest mode as add_location.
+
+        Vehicles are not checked one by one. Returns how many points were
+        accepted, fewer than given when the ingest queue is full.
+        """
+        if ingest_queue.enabled:
+            accepted = 0
+            try:
+                for point in points:
+                    ingest_queue.submit(point)
+                    accepted += 1
+            except IngestQueueFull:
+                pass
+            INGEST_POINTS.inc('queued', amount=accepted)
+            return accepted
+
+        if telemetry_journal.enabled:
+            for point in points:
+                telemetry_journal.append(point)
+            INGEST_POINTS.inc('journal', amount=len(points))
+            return len(points)
+
+        try:
+            upsert_locations(points)
+            advance_vehicle_positions(points)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        INGEST_POINTS.inc('sync', amount=len(points))
+        geofence_engine.process(points)
+        return len(points)
+
     @staticmethod
     @jwt_required()
-    def get_vehicle_locations(vehicle_id, hours=24):
+    def get_vehicle_locations(vehicle_id, hours=24, columns=None):
         """Get locations for a specific vehicle within the last X hours (JWT required)."""
-        return LocationService._get_vehicle_locations_internal(vehicle_id, hours)
+        return LocationService._get_vehicle_locations_internal(vehicle_id, hours, columns)
     
     @staticmethod
-    def get_vehicle_locations_public(vehicle_id, hours=24):
+    def get_vehicle_locations_public(vehicle_id, hours=24, columns=None):
         """Get locations for a specific vehicle within the last X hours (public access)."""
-        return LocationService._get_vehicle_locations_internal(vehicle_id, hours)
+        return LocationService._get_vehicle_locations_internal(vehicle_id, hours, columns)
     
     @staticmethod
-    def _get_vehicle_locations_internal(vehicle_id, hours=24):
-        """Internal method to get locations for a specific vehicle."""
+    def _get_vehicle_locations_internal(vehicle_id, hours=24, columns=None):
+        """Internal method to get locations for a specific vehicle, as columns when `columns` names them."""
         try:
             vehicle = Vehicle.query.get(vehicle_id)
             if not vehicle:
@@ -69,7 +133,8 @@ class LocationService:
             ).order_by(Location.timestamp.desc()).all()
             
             return {
-                'locations': [location.to_dict() for location in locations],
+                'locations': LocationService._merge_compacted(locations, columns, vehicle_id=vehicle_id,
+                                                              start=time_threshold),
                 'vehicle': vehicle.to_dict()
             }, 200
             
@@ -78,18 +143,25 @@ class LocationService:
     
     @staticmethod
     @jwt_required()
-    def get_mission_locations(mission_id):
-        """Get locations for a specific mission."""
+    def get_mission_locations(mission_id, columns=None):
+        """Get locations for a specific mission, as columns when `columns` names them."""
         try:
             locations = Location.query.filter_by(mission_id=mission_id).order_by(Location.timestamp.desc()).all()
             
             return {
-                'locations': [location.to_dict() for location in locations]
+                'locations': LocationService._merge_compacted(locations, columns, mission_id=mission_id)
             }, 200
             
         except Exception as e:
             return {'error': str(e)}, 500
     
+    @staticmethod
+    def _merge_compacted(locations, columns, **track_filters):
+        """Location rows and the matching compacted points, newest first, as dicts or as columns."""
+        if columns:
+            return TrackService.merge_columns(locations, TrackService.track_columns(**track_filters), columns)
+        return TrackService.merge_locations(locations, TrackService.track_locations(**track_filters))
+    
     @staticmethod
     @jwt_required()
     def get_all_current_locations():
@@ -123,13 +195,19 @@ class LocationService:
     
     @staticmethod
     @jwt_required()
-    def get_location_history(vehicle_id, start_date=None, end_date=None):
-        """Get location history for a vehicle within a date range."""
+    def get_location_history(vehicle_id, start_date=None, end_date=None, columns=None):
+        """Get location history for a vehicle within a date range, as columns when `columns` names them."""
         try:
             vehicle = Vehicle.query.get(vehicle_id)
             if not vehicle:
                 return {'error': 'Vehicle not found'}, 404
             
+            try:
+                start_date = datetime.fromisoformat(start_date) if start_date else None
+                end_date = datetime.fromisoformat(end_date) if end_date else None
+            except ValueError:
+                return {'error': 'Invalid date format, use ISO 8601'}, 400
+            
             query = Location.query.filter_by(vehicle_id=vehicle_id)
             
             if start_date:
@@ -141,7 +219,8 @@ class LocationService:
             locations = query.order_by(Location.timestamp.desc()).all()
             
             return {
-                'locations': [location.to_dict() for location in locations],
+                'locations': LocationService._merge_compacted(locations, columns, vehicle_id=vehicle_id,
+                                                              start=start_date, end=end_date),
                 'vehicle': vehicle.to_dict()
             }, 200
             
@@ -151,25 +230,38 @@ class LocationService:
     @staticmethod
     @jwt_required()
     def delete_old_locations(days=30):
-        """Delete location data older than specified days."""
+        """Start deleting location data older than specified days on the scheduler's threads."""
         try:
-            current_user_id = get_jwt_identity()
-            current_user = User.query.get(current_user_id)
-            
-            if not current_user or current_user.role not in ['admin']:
+            if not current_user_has_role('admin'):
                 return {'error': 'Insufficient permissions'}, 403
+            if days <= 0:
+                return {'error': 'days must be positive'}, 400
             
-            # Calculate time threshold
-            time_threshold = datetime.utcnow() - timedelta(days=days)
-            
-            # Delete old locations
-            deleted_count = Location.query.filter(Location.timestamp < time_threshold).count()
-            Location.query.filter(Location.timestamp < time_threshold).delete()
-            
-            db.session.commit()
+            from app.services.scheduler import scheduler
             
-            return {'message': f'Deleted {deleted_count} old location records'}, 200
+            started, job = scheduler.run_now('location_retention', days=days)
+            message = (f'Deleting locations older than {days} days' if started
+                       else 'A location cleanup is already running')
+            return {'message': message, 'started': started, 'job': job}, 202
             
         except Exception as e:
-            db.session.rollback()
             return {'error': str(e)}, 500
+    
+    @staticmethod
+    def purge_locations(days):
+        """Delete location data older than specified days (scheduled job)."""
+        if days <= 0:
+            raise ValueError('days must be positive')
+        
+        # Calculate time threshold
+        time_threshold = datetime.utcnow() - timedelta(days=days)
+        
+        try:
+            deleted_count = Location.query.filter(Location.timestamp < time_threshold).delete()
+            compacted_count = TrackService.purge(time_threshold)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        
+        return {'message': f'Deleted {deleted_count} old location records and {compacted_count} compacted points'}, 200
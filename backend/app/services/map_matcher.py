@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+from datetime import datetime
+from app import db
+from app.models.location import Location
+from app.models.trip import Trip
+
+
+class MapMatcher:
+    """Snaps closed trips to the roads of a local OpenStreetMap extract.
+
+    The road graph is read from ROAD_GRAPH_PATH the first time it is needed
+    and cached next to it as `<path>.graph.npz`, rebuilt when the extract is
+    newer. Each run of the `map_matching` job takes the closed trips not
+    matched yet, oldest first, and stores the distance along the roads, the
+    matched geometry (an encoded polyline) and the share of the points used
+    that found a road. Trips whose points are already compacted are read
+    from their tracks. No network access is needed.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.options = {}
+        self.batch = 200
+        self._graph = None
+        self._lock = threading.Lock()
+        self._stats = {'trips': 0, 'points': 0, 'unmatched': 0, 'seconds': 0.0, 'graph_seconds': None,
+                       'errors': 0, 'last_error': None}
+
+    def init_app(self, app):
+        config = app.config
+        self.path = config['ROAD_GRAPH_PATH']
+        self.enabled = bool(self.path)
+        self.options = {
+            'sigma_m': config['MAP_MATCH_SIGMA_M'],
+            'beta_m': config['MAP_MATCH_BETA_M'],
+            'radius_m': config['MAP_MATCH_RADIUS_M'],
+            'candidates': config['MAP_MATCH_CANDIDATES'],
+            'spacing_m': config['MAP_MATCH_SPACING_M'],
+            'max_speed_kmh': config['MAP_MATCH_MAX_SPEED_KMH'],
+        }
+        self.batch = config['MAP_MATCH_BATCH']
+        self._graph = None
+
+    def graph(self):
+        """The road graph, from the cache when it is newer than the extract."""
+        if self._graph is not None:
+            return self._graph
+        with self._lock:
+            if self._graph is not None:
+                return self._graph
+            from app.utils.road_graph import build_graph, load_graph, read_osm, save_graph
+
+            started = time.perf_counter()
+            cache = f'{self.path}.graph.npz'
+            graph = None
+            if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(self.path):
+                try:
+                    graph = load_graph(cache)
+                except Exception as e:
+                    print(f"Road graph cache {cache} ignored: {e}")
+            if graph is None:
+                graph = build_graph(*read_osm(self.path))
+                try:
+                    save_graph(graph, cache)
+                except OSError as e:
+                    print(f"Could not save the road graph cache {cache}: {e}")
+            self._stats['graph_seconds'] = round(time.perf_counter() - started, 3)
+            print(f"Road graph loaded from {self.path}: {len(graph)} edges")
+            self._graph = graph
+            return graph
+
+    @staticmethod
+    def _points(trip):
+        """(timestamps, latitudes, longitudes) of a trip in time order, stored and compacted points merged."""
+        rows = db.session.query(Location.timestamp, Location.latitude, Location.longitude).filter(
+            Location.vehicle_id == trip.vehicle_id,
+            Location.timestamp >= trip.started_at,
+            Location.timestamp <= trip.ended_at
+        ).all()
+        points = {timestamp: (latitude, longitude) for timestamp, latitude, longitude in rows}
+        if len(points) < trip.point_count:
+            from app.services.track_service import TrackService
+            for timestamp, location in TrackService.track_locations(trip.vehicle_id, None, trip.started_at,
+                                                                    trip.ended_at):
+                points.setdefault(timestamp, (location['latitude'], location['longitude']))
+        timestamps = sorted(points)
+        return timestamps, [points[moment][0] for moment in timestamps], [points[moment][1] for moment in timestamps]
+
+    def match_trip(self, trip, now=None):
+        """Match one trip to the roads and set its matched columns. Does not commit."""
+        from app.utils.road_graph import encode_polyline
+
+        timestamps, latitudes, longitudes = self._points(trip)
+        times = [(moment - trip.started_at).total_seconds() for moment in timestamps]
+        latitudes, longitudes, length, matched, used = self.graph().match(
+            latitudes, longitudes, times=times, **self.options
+        )
+        trip.matched_at = now or datetime.utcnow()
+        trip.matched_ratio = round(matched / used, 3) if used else 0.0
+        if matched:
+            trip.matched_distance_m = round(length, 1)
+            trip.matched_geometry = encode_polyline(latitudes, longitudes)
+        else:
+            trip.matched_distance_m = trip.matched_geometry = None
+        return len(timestamps), matched
+
+    def match_trips(self, limit=None):
+        """Match the closed trips not matched yet, oldest first (scheduled job)."""
+        summary = {'trips': 0, 'points': 0, 'unmatched': 0}
+        if not self.enabled:
+            return summary
+
+        trips = Trip.query.filter(Trip.is_open.is_(False), Trip.matched_at.is_(None)).order_by(
+            Trip.ended_at
+        ).limit(limit or self.batch).all()
+        if not trips:
+            return summary
+        self.graph()
+
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        for trip in trips:
+            try:
+                points, matched = self.match_trip(trip, now)
+            except Exception as e:
+                # Not retried: a trip the matcher fails on would hold back the ones after it
+                print(f"Map matching failed for trip {trip.id}: {e}")
+                trip.matched_at, trip.matched_ratio = now, 0.0
+                trip.matched_distance_m = trip.matched_geometry = None
+                points, matched = 0, 0
+                with self._lock:
+                    self._stats['errors'] += 1
+                    self._stats['last_error'] = str(e)
+            summary['trips'] += 1
+            summary['points'] += points
+            summary['unmatched'] += 0 if matched else 1
+        db.session.commit()
+
+        with self._lock:
+            for key, value in summary.items():
+                self._stats[key] += value
+            self._stats['seconds'] += time.perf_counter() - started
+        return summary
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['enabled'] = self.enabled
+        stats['path'] = self.path
+        stats['edges'] = len(self._graph) if self._graph is not None else None
+        stats['seconds'] = round(stats['seconds'], 3)
+        stats['avg_point_us'] = round(stats['seconds'] / stats['points'] * 1e6, 2) if stats['points'] else None
+        return stats
+
+
+map_matcher = MapMatcher()
@@ -4,7 +4,6 @@ from app.models.mission import Mission
 from app import db
 from datetime import datetime, timedelta
 import random
-import math
 
 class MapService:
     
@@ -34,64 +33,11 @@ class MapService:
     
     @staticmethod
     def simulate_vehicle_movement():
-        """Simulate realistic vehicle movement for real-time updates."""
-        vehicles = Vehicle.query.all()
-        
-        for vehicle in vehicles:
-            # Get the last location
-            last_location = Location.query.filter_by(vehicle_id=vehicle.id).order_by(Location.timestamp.desc()).first()
-            
-            if last_location:
-                # Calculate small movement (simulate realistic driving)
-                speed_kmh = random.uniform(10, 50)  # Speed between 10-50 km/h
-                time_interval = 5  # 5 seconds
-                
-                # Convert speed to meters per second
-                speed_ms = speed_kmh * 1000 / 3600
-                
-                # Calculate distance moved in meters
-                distance_moved = speed_ms * time_interval
-                
-                # Convert to approximate lat/lon change (rough approximation)
-                # 1 degree latitude ≈ 111,000 meters
-                # 1 degree longitude ≈ 111,000 * cos(latitude) meters
-                lat_change = (distance_moved / 111000) * random.choice([-1, 1])
-                lon_change = (distance_moved / (111000 * math.cos(math.radians(last_location.latitude)))) * random.choice([-1, 1])
-                
-                # Add some randomness to make it more realistic
-                lat_change += random.uniform(-0.0001, 0.0001)
-                lon_change += random.uniform(-0.0001, 0.0001)
-                
-                new_lat = last_location.latitude + lat_change
-                new_lon = last_location.longitude + lon_change
-                
-                # Keep within reasonable bounds (Paris area)
-                new_lat = max(48.8, min(48.9, new_lat))
-                new_lon = max(2.2, min(2.5, new_lon))
-                
-                heading = random.uniform(0, 360)
-                
-            else:
-                # No previous location, start with random location in Paris
-                new_lat = 48.8566 + (random.random() - 0.5) * 0.1
-                new_lon = 2.3522 + (random.random() - 0.5) * 0.1
-                speed_kmh = random.uniform(10, 50)
-                heading = random.uniform(0, 360)
-            
-            # Create new location record
-            location = Location(
-                vehicle_id=vehicle.id,
-                latitude=new_lat,
-                longitude=new_lon,
-                timestamp=datetime.utcnow(),
-                speed=speed_kmh,
-                heading=heading
-            )
-            
-            db.session.add(location)
+        """Simulate realistic vehicle movement for real-time updates (5 seconds of driving per call)."""
+        from app.services.fleet_simulator import fleet_simulator
         
-        db.session.commit()
-        return {'message': 'Vehicle movements simulated'}
+        points = fleet_simulator.advance(5)
+        return {'message': 'Vehicle movements simulated', 'count': len(points)}
     
     @staticmethod
     def get_mission_map(mission_id):
@@ -100,8 +46,10 @@ class MapService:
             from app.models.user import User
             from flask_jwt_extended import get_jwt_identity
             
+            from app.utils.auth import get_current_identity
+            
             current_user_id = get_jwt_identity()
-            current_user = User.query.get(current_user_id)
+            current_user = get_current_identity()
             
             mission = Mission.query.get(mission_id)
             if not mission:
@@ -3,6 +3,8 @@ from app.models.mission import Mission
 from app.models.user import User
 from app.models.vehicle import Vehicle
 from app import db
+from app.utils.serialization import SerializationOptions, serialize
+from app.utils.auth import get_current_identity, current_user_has_role
 from datetime import datetime
 
 class MissionService:
@@ -13,9 +15,8 @@ class MissionService:
         """Create a new mission."""
         try:
             current_user_id = get_jwt_identity()
-            current_user = User.query.get(current_user_id)
             
-            if not current_user or current_user.role not in ['admin', 'manager']:
+            if not current_user_has_role('admin', 'manager'):
                 return {'error': 'Insufficient permissions'}, 403
             
             # Validate assigned user exists
@@ -63,24 +64,36 @@ class MissionService:
     
     @staticmethod
     @jwt_required()
-    def get_missions():
-        """Get all missions."""
+    def get_missions(serialization=None, page=None):
+        """Get all missions, one page at a time when `page` is given."""
         try:
             current_user_id = get_jwt_identity()
-            current_user = User.query.get(current_user_id)
+            current_user = get_current_identity()
             
             if not current_user:
                 return {'error': 'User not found'}, 404
             
+            serialization = serialization or SerializationOptions('missions')
+            query = Mission.query.options(*serialization.load_options())
+            
             # Filter missions based on user role
-            if current_user.role in ['admin', 'manager']:
-                missions = Mission.query.all()
+            if current_user.role not in ['admin', 'manager']:
+                query = query.filter_by(assigned_user_id=current_user_id)
+            
+            pagination = None
+            if page is not None:
+                missions, pagination = page.apply(query)
             else:
-                missions = Mission.query.filter_by(assigned_user_id=current_user_id).all()
+                missions = query.all()
+            
+            data, included = serialize(missions, serialization)
+            result = {'missions': data}
+            if pagination is not None:
+                result['pagination'] = pagination
+            if included is not None:
+                result['included'] = included
             
-            return {
-                'missions': [mission.to_dict() for mission in missions]
-            }, 200
+            return result, 200
             
         except Exception as e:
             return {'error': str(e)}, 500
@@ -91,7 +104,7 @@ class MissionService:
         """Get a specific mission."""
         try:
             current_user_id = get_jwt_identity()
-            current_user = User.query.get(current_user_id)
+            current_user = get_current_identity()
             
             mission = Mission.query.get(mission_id)
             if not mission:
@@ -112,10 +125,7 @@ class MissionService:
     def update_mission(mission_id, mission_data):
         """Update a mission."""
         try:
-            current_user_id = get_jwt_identity()
-            current_user = User.query.get(current_user_id)
-            
-            if not current_user or current_user.role not in ['admin', 'manager']:
+            if not current_user_has_role('admin', 'manager'):
                 return {'error': 'Insufficient permissions'}, 403
             
             mission = Mission.query.get(mission_id)
@@ -214,66 +224,15 @@ class MissionService:
     
     @staticmethod
     def _start_mission_tracking(mission_id):
-        """Start real-time position tracking for a mission."""
+        """Hand a started mission's vehicle to the fleet simulator, which drives it to the mission end."""
         try:
-            from app.models.location import Location
-            import random
-            import math
+            from app.services.fleet_simulator import fleet_simulator
             
             mission = Mission.query.get(mission_id)
             if not mission or mission.status != 'in_progress':
                 return
             
-            # Get the last location for this vehicle
-            last_location = Location.query.filter_by(vehicle_id=mission.vehicle_id).order_by(Location.timestamp.desc()).first()
-            
-            if last_location:
-                # Calculate movement towards destination
-                start_lat = last_location.latitude
-                start_lon = last_location.longitude
-                end_lat = mission.end_latitude
-                end_lon = mission.end_longitude
-                
-                # Calculate bearing towards destination
-                lat1_rad = math.radians(start_lat)
-                lat2_rad = math.radians(end_lat)
-                dlon_rad = math.radians(end_lon - start_lon)
-                
-                y = math.sin(dlon_rad) * math.cos(lat2_rad)
-                x = (math.cos(lat1_rad) * math.sin(lat2_rad) - 
-                     math.sin(lat1_rad) * math.cos(lat2_rad) * math.cos(dlon_rad))
-                
-                bearing = math.degrees(math.atan2(y, x))
-                bearing = (bearing + 360) % 360  # Normalize to 0-360
-                
-                # Simulate movement in that direction
-                speed_kmh = random.uniform(20, 60)  # Realistic city speed
-                time_interval = 30  # 30 seconds
-                speed_ms = speed_kmh * 1000 / 3600
-                distance_moved = speed_ms * time_interval
-                
-                # Convert to lat/lon change
-                lat_change = (distance_moved / 111000) * math.cos(math.radians(bearing))
-                lon_change = (distance_moved / (111000 * math.cos(math.radians(start_lat)))) * math.sin(math.radians(bearing))
-                
-                # Add some randomness for realistic movement
-                lat_change += random.uniform(-0.0002, 0.0002)
-                lon_change += random.uniform(-0.0002, 0.0002)
-                
-                new_lat = start_lat + lat_change
-                new_lon = start_lon + lon_change
-                
-                # Create new location
-                new_location = Location(
-                    vehicle_id=mission.vehicle_id,
-                    latitude=new_lat,
-                    longitude=new_lon,
-                    timestamp=datetime.utcnow(),
-                    speed=speed_kmh,
-                    heading=bearing
-                )
-                db.session.add(new_location)
-                db.session.commit()
+            fleet_simulator.place(mission.vehicle_id, mission.start_latitude, mission.start_longitude)
         
         except Exception as e:
             print(f"Error in mission tracking: {str(e)}")
@@ -317,10 +276,7 @@ class MissionService:
     def cancel_mission(mission_id):
         """Cancel a mission."""
         try:
-            current_user_id = get_jwt_identity()
-            current_user = User.query.get(current_user_id)
-            
-            if not current_user or current_user.role not in ['admin', 'manager']:
+            if not current_user_has_role('admin', 'manager'):
                 return {'error': 'Insufficient permissions'}, 403
             
             mission = Mission.query.get(mission_id)
@@ -350,10 +306,7 @@ class MissionService:
     def delete_mission(mission_id):
         """Delete a mission."""
         try:
-            current_user_id = get_jwt_identity()
-            current_user = User.query.get(current_user_id)
-            
-            if not current_user or current_user.role not in ['admin', 'manager']:
+            if not current_user_has_role('admin', 'manager'):
                 return {'error': 'Insufficient permissions'}, 403
             
             mission = Mission.query.get(mission_id)
@@ -0,0 +1,185 @@
+import heapq
+import json
+import re
+import zipfile
+from xml.sax.saxutils import escape
+from sqlalchemy import select, union
+from app import db
+from app.models.location import Location
+from app.models.trip_track import TripTrack
+from app.models.vehicle import Vehicle
+from app.utils.track_codec import decode_track, slice_track, track_points
+
+# format -> (mimetype, file extension)
+FORMATS = {
+    'gpx': ('application/gpx+xml', '.gpx'),
+    'kml': ('application/vnd.google-earth.kml+xml', '.kml'),
+    'geojson': ('application/geo+json', '.geojson')
+}
+
+# Bytes gathered before a chunk is handed to the client, rows per cursor fetch
+CHUNK_SIZE = 64 * 1024
+FETCH_SIZE = 5000
+
+
+def _location_points(vehicle_id, mission_id, start, end):
+    """(timestamp, latitude, longitude, altitude) of location rows, ordered, from a server-side cursor."""
+    table = Location.__table__
+    query = select(table.c.timestamp, table.c.latitude, table.c.longitude, table.c.altitude)
+    if vehicle_id is not None:
+        query = query.where(table.c.vehicle_id == vehicle_id)
+    if mission_id is not None:
+        query = query.where(table.c.mission_id == mission_id)
+    if start is not None:
+        query = query.where(table.c.timestamp >= start)
+    if end is not None:
+        query = query.where(table.c.timestamp <= end)
+    query = query.order_by(table.c.timestamp)
+
+    with db.engine.connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=FETCH_SIZE).execute(query)
+        for row in result:
+            yield tuple(row)
+
+
+def _track_points(vehicle_id, mission_id, start, end):
+    """Same tuples for compacted points, decoding one trip track at a time."""
+    table = TripTrack.__table__
+    query = select(table.c.data)
+    if vehicle_id is not None:
+        query = query.where(table.c.vehicle_id == vehicle_id)
+    if mission_id is not None:
+        query = query.where(table.c.mission_id == mission_id)
+    if start is not None:
+        query = query.where(table.c.ended_at >= start)
+    if end is not None:
+        query = query.where(table.c.started_at <= end)
+    query = query.order_by(table.c.started_at)
+
+    with db.engine.connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=16).execute(query)
+        for (data,) in result:
+            for point in track_points(slice_track(decode_track(data), start, end)):
+                yield point[:4]
+
+
+def route_points(vehicle_id=None, mission_id=None, start=None, end=None):
+    """Points of a vehicle or mission ordered by timestamp, stored and compacted ones merged."""
+    return heapq.merge(_location_points(vehicle_id, mission_id, start, end),
+                       _track_points(vehicle_id, mission_id, start, end),
+                       key=lambda point: point[0])
+
+
+def _coordinate(value):
+    return repr(round(value, 7))
+
+
+def _time(timestamp):
+    return timestamp.isoformat() + 'Z'
+
+
+def _gpx(name, points):
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<gpx version="1.1" creator="Fleet Management" xmlns="http://www.topografix.com/GPX/1/1">\n'
+           f'<trk><name>{escape(name)}</name><trkseg>\n')
+    for timestamp, latitude, longitude, altitude in points:
+        elevation = f'<ele>{round(altitude, 1)}</ele>' if altitude is not None else ''
+        yield (f'<trkpt lat="{_coordinate(latitude)}" lon="{_coordinate(longitude)}">'
+               f'{elevation}<time>{_time(timestamp)}</time></trkpt>\n')
+    yield '</trkseg></trk>\n</gpx>\n'
+
+
+def _kml(name, points):
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<kml xmlns="http://www.opengis.net/kml/2.2"><Document>\n'
+           f'<name>{escape(name)}</name><Placemark><name>{escape(name)}</name>\n'
+           '<LineString><tessellate>1</tessellate><coordinates>\n')
+    for _, latitude, longitude, _ in points:
+        yield f'{_coordinate(longitude)},{_coordinate(latitude)}\n'
+    yield '</coordinates></LineString></Placemark>\n</Document></kml>\n'
+
+
+def _geojson(name, points):
+    # Properties come last: the point count and time span are only known once streamed
+    yield '{"type": "Feature", "geometry": {"type": "LineString", "coordinates": [\n'
+    count, first, last = 0, None, None
+    for timestamp, latitude, longitude, altitude in points:
+        position = [_coordinate(longitude), _coordinate(latitude)]
+        if altitude is not None:
+            position.append(repr(round(altitude, 1)))
+        yield f"{',' if count else ''}[{', '.join(position)}]\n"
+        count += 1
+        first = first or timestamp
+        last = timestamp
+    properties = {'name': name, 'points': count,
+                  'start': _time(first) if first else None, 'end': _time(last) if last else None}
+    yield f']}}, "properties": {json.dumps(properties)}}}\n'
+
+
+WRITERS = {'gpx': _gpx, 'kml': _kml, 'geojson': _geojson}
+
+
+def _chunks(pieces):
+    """Join small strings into CHUNK_SIZE byte chunks."""
+    buffer, size = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= CHUNK_SIZE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def stream_route(file_format, name, points):
+    """One route document as an iterator of byte chunks."""
+    return _chunks(WRITERS[file_format](name, points))
+
+
+class _ZipOutput:
+    """Write-only, unseekable file object collecting what zipfile writes until taken."""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def fleet_vehicles(start, end):
+    """Vehicles with stored or compacted points between start and end."""
+    stored = select(Location.vehicle_id).where(Location.timestamp >= start, Location.timestamp <= end)
+    compacted = select(TripTrack.vehicle_id).where(TripTrack.ended_at >= start, TripTrack.started_at <= end)
+    vehicle_ids = db.session.execute(union(stored, compacted)).scalars().all()
+    return Vehicle.query.filter(Vehicle.id.in_(vehicle_ids)).order_by(Vehicle.id).all()
+
+
+def stream_fleet_zip(file_format, start, end):
+    """A zip with one route file per vehicle, written entry by entry as it streams."""
+    vehicles = [(vehicle.id, vehicle.license_plate) for vehicle in fleet_vehicles(start, end)]
+    output = _ZipOutput()
+    # zipfile falls back to data descriptors on an unseekable output, entries need no size upfront
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for vehicle_id, license_plate in vehicles:
+            plate = re.sub(r'[^A-Za-z0-9_-]+', '_', license_plate or '') or 'vehicle'
+            filename = f'{plate}-{vehicle_id}{FORMATS[file_format][1]}'
+            with archive.open(filename, 'w') as entry:
+                for chunk in stream_route(file_format, license_plate or f'Vehicle {vehicle_id}',
+                                          route_points(vehicle_id=vehicle_id, start=start, end=end)):
+                    entry.write(chunk)
+                    data = output.take()
+                    if data:
+                        yield data
+    data = output.take()
+    if data:
+        yield data
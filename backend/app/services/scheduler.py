@@ -0,0 +1,438 @@
+import atexit
+import os
+import random
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.scheduled_job import ScheduledJob
+from app.utils.metrics import JOB_DURATION, JOB_RUNS
+
+_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+class IntervalTrigger:
+    """Every `seconds`, counted from the start of the previous run."""
+
+    def __init__(self, seconds):
+        if seconds <= 0:
+            raise ValueError(f'Interval must be positive: {seconds}')
+        self.seconds = seconds
+
+    def next_after(self, moment):
+        return moment + timedelta(seconds=self.seconds)
+
+    def __str__(self):
+        return f'every {self.seconds:g}s'
+
+
+class CronTrigger:
+    """Five-field cron expression in UTC: minute, hour, day of month, month, day of week.
+
+    Fields take *, numbers, ranges (1-5), steps (*/15, 0-30/10) and lists
+    (1,15); Sunday is 0 or 7. As with cron, when both day fields are
+    restricted a day matching either one fires.
+    """
+
+    FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f'Cron expression needs 5 fields: {expression!r}')
+        self.expression = ' '.join(parts)
+        minutes, hours, self.days, self.months, weekdays = [
+            _cron_field(part, low, high) for part, (low, high) in zip(parts, self.FIELDS)
+        ]
+        self.minutes, self.hours = sorted(minutes), sorted(hours)
+        self.weekdays = {day % 7 for day in weekdays}
+        self.any_day, self.any_weekday = parts[2] == '*', parts[4] == '*'
+
+    def _day_matches(self, day):
+        if day.month not in self.months:
+            return False
+        in_month = day.day in self.days
+        in_week = day.isoweekday() % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_month and in_week
+        return in_month or in_week
+
+    def next_after(self, moment):
+        start = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.replace(hour=0, minute=0)
+        # Up to 5 years: the 29th of February on a given weekday
+        for _ in range(366 * 5):
+            if self._day_matches(day):
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        candidate = day.replace(hour=hour, minute=minute)
+                        if candidate >= start:
+                            return candidate
+            day += timedelta(days=1)
+        raise ValueError(f'Cron expression never fires: {self.expression}')
+
+    def __str__(self):
+        return self.expression
+
+
+def _cron_field(part, low, high):
+    values = set()
+    for item in part.split(','):
+        step = 1
+        if '/' in item:
+            item, step = item.split('/', 1)
+            step = int(step)
+        if item == '*':
+            first, last = low, high
+        elif '-' in item:
+            first, last = (int(value) for value in item.split('-', 1))
+        else:
+            first = int(item)
+            last = high if step > 1 else first
+        if first < low or last > high or first > last or step < 1:
+            raise ValueError(f'Invalid cron field {part!r}, values go from {low} to {high}')
+        values.update(range(first, last + 1, step))
+    return values
+
+
+def parse_trigger(spec):
+    """'every 30s', 'every 5m', 'every 2h', a cron expression, or None for '' and 'off'."""
+    spec = (spec or '').strip()
+    if spec.lower() in ('', 'off', 'none', 'false'):
+        return None
+    if spec.lower().startswith('every '):
+        value = spec[len('every '):].strip().lower()
+        unit = value[-1] if value[-1] in _UNITS else 's'
+        return IntervalTrigger(float(value.rstrip(''.join(_UNITS))) * _UNITS[unit])
+    return CronTrigger(spec)
+
+
+class Job:
+    def __init__(self, name, func, trigger, jitter, lease_seconds):
+        self.name = name
+        self.func = func
+        self.trigger = trigger
+        self.jitter = jitter
+        self.lease_seconds = lease_seconds
+
+    @property
+    def description(self):
+        return str(self.trigger) if self.trigger else 'manual'
+
+
+class Scheduler:
+    """In-process job scheduler shared by the worker processes through the `scheduled_jobs` table.
+
+    Each process polls the table; a due job is claimed by one UPDATE that
+    moves its next run forward and takes a lease, so exactly one process
+    runs each slot, on a thread of its SCHEDULER_WORKERS pool. A slot that
+    comes while the previous run still holds the lease is skipped. Runs
+    start up to SCHEDULER_JITTER_SECONDS late, spreading the jobs out. The
+    lease is renewed while the job runs and expires if its process dies.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.workers = 2
+        self.poll_seconds = 10.0
+        self.lease_seconds = 600.0
+        self.jitter = 5.0
+        self.jobs = {}
+        self._thread = None
+        self._thread_pid = None
+        self._pool = None
+        self._pool_pid = None
+        self._rows_pid = None
+        self._running = {}
+        self._guard = threading.Lock()
+        self._stop = threading.Event()
+        self._durations = {}
+
+    def init_app(self, app):
+        config = app.config
+        self.app = app
+        self.enabled = config['SCHEDULER_ENABLED']
+        self.workers = config['SCHEDULER_WORKERS']
+        self.poll_seconds = config['SCHEDULER_POLL_SECONDS']
+        self.lease_seconds = config['SCHEDULER_LEASE_SECONDS']
+        self.jitter = config['SCHEDULER_JITTER_SECONDS']
+        self.jobs = {}
+        _register_jobs(self, app)
+        if self.enabled:
+            atexit.register(self.stop)
+            # Started by each serving process, not by a preloading master
+            app.before_request(self._ensure_started)
+
+    def add_job(self, name, func, trigger, jitter=None, lease_seconds=None):
+        """Run func() in an app context on `trigger`: a trigger or a parse_trigger() spec,
+        None for a job that only runs through run_now().
+
+        A (dict, status) result with an error status counts as a failure.
+        """
+        if trigger is None or isinstance(trigger, str):
+            trigger = parse_trigger(trigger)
+        job = Job(name, func, trigger, self.jitter if jitter is None else jitter,
+                  lease_seconds or self.lease_seconds)
+        self.jobs[name] = job
+        return job
+
+    @property
+    def owner(self):
+        return f'{socket.gethostname()}-{os.getpid()}'
+
+    # Polling
+
+    def _ensure_started(self):
+        thread = self._thread
+        if thread is not None and self._thread_pid == os.getpid() and thread.is_alive():
+            return
+        with self._guard:
+            if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread_pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='scheduler', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        pid = os.getpid()
+        with self.app.app_context():
+            backoff = self.poll_seconds
+            while not self._stop.is_set() and self._thread_pid == pid:
+                try:
+                    wait = self._tick()
+                    backoff = self.poll_seconds
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Scheduler poll failed, retrying in {backoff:.0f}s: {e}")
+                    wait = backoff
+                    backoff = min(backoff * 2, 300)
+                self._stop.wait(wait)
+
+    def _tick(self):
+        """Claim and start the due jobs, renew the leases of the running ones; returns seconds to sleep."""
+        self._ensure_rows()
+        now = datetime.utcnow()
+        rows = {row.name: (row.next_run_at, row.locked_until) for row in ScheduledJob.query.all()}
+        db.session.commit()
+
+        for name in list(self._running):
+            job = self.jobs[name]
+            self._update(job, ScheduledJob.locked_by == self.owner,
+                         locked_until=now + timedelta(seconds=job.lease_seconds))
+
+        wait = self.poll_seconds
+        for name, job in self.jobs.items():
+            next_run, locked_until = rows.get(name, (None, None))
+            if job.trigger is None or next_run is None:
+                continue
+            if next_run > now:
+                wait = min(wait, (next_run - now).total_seconds())
+                continue
+            following = self._next_run(job, now)
+            if self._claim(job, now, following, due=True):
+                self._submit(job, {})
+            elif self._update(job, ScheduledJob.next_run_at <= now, ScheduledJob.locked_until >= now,
+                              next_run_at=following, skipped=ScheduledJob.skipped + 1):
+                JOB_RUNS.inc(name, 'skipped')
+                print(f"Job {name} still running (lease until {locked_until}), run skipped")
+            wait = min(wait, max((following - now).total_seconds(), 0))
+        return max(wait, 0.2)
+
+    def _next_run(self, job, now):
+        if job.trigger is None:
+            return None
+        return job.trigger.next_after(now) + timedelta(seconds=random.uniform(0, job.jitter))
+
+    # Table
+
+    def _ensure_rows(self):
+        """One row per job, once per process; a changed trigger restarts the job's schedule."""
+        if self._rows_pid == os.getpid():
+            return
+        now = datetime.utcnow()
+        rows = {row.name: row.trigger for row in ScheduledJob.query.all()}
+        for job in self.jobs.values():
+            if job.name not in rows:
+                db.session.add(ScheduledJob(name=job.name, trigger=job.description,
+                                            next_run_at=self._next_run(job, now)))
+                try:
+                    db.session.commit()
+                except IntegrityError:
+                    db.session.rollback()  # created by another process meanwhile
+            elif rows[job.name] != job.description:
+                self._update(job, ScheduledJob.trigger != job.description, trigger=job.description,
+                             next_run_at=self._next_run(job, now))
+        db.session.commit()
+        self._rows_pid = os.getpid()
+
+    def _update(self, job, *conditions, **values):
+        """UPDATE the job's row where `conditions` hold and commit; True when it matched."""
+        table = ScheduledJob.__table__
+        result = db.session.execute(
+            update(table).where(and_(table.c.name == job.name, *conditions)).values(**values)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def _claim(self, job, now, next_run, due):
+        conditions = [or_(ScheduledJob.locked_until.is_(None), ScheduledJob.locked_until < now)]
+        values = {'locked_by': self.owner, 'locked_until': now + timedelta(seconds=job.lease_seconds),
+                  'last_started_at': now}
+        if due:
+            conditions.append(ScheduledJob.next_run_at <= now)
+            values['next_run_at'] = next_run
+        return self._update(job, *conditions, **values)
+
+    # Running
+
+    def _executor(self):
+        with self._guard:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix='scheduler-job')
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _submit(self, job, kwargs):
+        self._running[job.name] = True
+        self._executor().submit(self._execute, job, kwargs)
+
+    def _execute(self, job, kwargs):
+        with self.app.app_context():
+            self._run_job(job, kwargs)
+
+    def _run_job(self, job, kwargs):
+        """Run a claimed job and release its lease. Returns (result, error)."""
+        started = time.perf_counter()
+        status, error, result = 'ok', None, None
+        try:
+            result = job.func(**kwargs)
+            if isinstance(result, tuple) and len(result) == 2 and isinstance(result[1], int) and result[1] >= 400:
+                raise RuntimeError(result[0].get('error') if isinstance(result[0], dict) else result[0])
+        except Exception as e:
+            db.session.rollback()
+            status, error = 'error', str(e)
+            print(f"Job {job.name} failed: {e}")
+        duration = time.perf_counter() - started
+        try:
+            self._update(job, ScheduledJob.locked_by == self.owner, locked_by=None, locked_until=None,
+                         last_finished_at=datetime.utcnow(), last_status=status, last_error=error,
+                         last_duration=duration, runs=ScheduledJob.runs + 1,
+                         failures=ScheduledJob.failures + (1 if error else 0))
+        except Exception as e:
+            db.session.rollback()
+            print(f"Could not release job {job.name}, its lease will expire: {e}")
+        self._running.pop(job.name, None)
+        JOB_DURATION.observe(duration, job.name)
+        JOB_RUNS.inc(job.name, status)
+        with self._guard:
+            durations = self._durations.setdefault(job.name, [0, 0.0, 0.0])
+            durations[0] += 1
+            durations[1] += duration
+            durations[2] = max(durations[2], duration)
+        return result, error
+
+    def run_now(self, name, **kwargs):
+        """Start a job now on a scheduler thread, unless a run holds its lease in any process.
+
+        Returns (started, job status). Raises KeyError for an unknown job.
+        """
+        job = self.jobs[name]
+        self._ensure_rows()
+        started = self._claim(job, datetime.utcnow(), None, due=False)
+        if started:
+            self._submit(job, kwargs)
+        return started, self.job_status(name)
+
+    def is_scheduled(self, name):
+        """True when the job runs on its own, in this process or another one."""
+        job = self.jobs.get(name)
+        return self.enabled and job is not None and job.trigger is not None
+
+    def stop(self, timeout=10):
+        if self._thread is not None and self._thread_pid == os.getpid():
+            self._stop.set()
+            self._thread.join(timeout)
+        if self._pool is not None and self._pool_pid == os.getpid():
+            self._pool.shutdown(wait=False)
+
+    # Metrics
+
+    def job_status(self, name):
+        row = db.session.get(ScheduledJob, name)
+        status = row.to_dict() if row else {'name': name}
+        status['trigger'] = self.jobs[name].description
+        status['running_here'] = name in self._running
+        with self._guard:
+            runs, total, longest = self._durations.get(name, (0, 0.0, 0.0))
+        status['process_runs'] = runs
+        status['process_avg_duration'] = total / runs if runs else None
+        status['process_max_duration'] = longest if runs else None
+        return status
+
+    def stats(self):
+        self._ensure_rows()
+        return {
+            'enabled': self.enabled,
+            'owner': self.owner,
+            'poller_alive': bool(self._thread and self._thread_pid == os.getpid() and self._thread.is_alive()),
+            'jobs': [self.job_status(name) for name in self.jobs]
+        }
+
+
+def _detect_anomalies():
+    from app.services.anomaly_service import AnomalyService
+    return AnomalyService.detect_anomalies()
+
+
+def _detect_schedule_delays():
+    from app.services.anomaly_service import AnomalyService
+    return AnomalyService.detect_schedule_delays()
+
+
+def _compact_tracks(days=None):
+    from app.services.track_service import TrackService
+    return TrackService.compact(days)
+
+
+def _segment_trips(max_points=None):
+    from app.services.trip_service import TripService
+    return TripService.segment_locations(max_points)
+
+
+def _match_trips(limit=None):
+    from app.services.map_matcher import map_matcher
+    return map_matcher.match_trips(limit)
+
+
+def _register_jobs(scheduler, app):
+    """The application's periodic work, each job on the trigger configured for it."""
+    config = app.config
+    retention_days = config['LOCATION_RETENTION_DAYS']
+    tick_seconds = config['SIMULATION_TICK_SECONDS']
+
+    def purge_locations(days=retention_days or 30):
+        from app.services.location_service import LocationService
+        return LocationService.purge_locations(days)
+
+    def simulation_tick(seconds=tick_seconds or 30):
+        from app.services.fleet_simulator import fleet_simulator
+        return len(fleet_simulator.advance(seconds, missions_only=True))
+
+    scheduler.add_job('anomaly_detection', _detect_anomalies, config['SCHEDULE_ANOMALY_DETECTION'])
+    scheduler.add_job('schedule_delays', _detect_schedule_delays, config['SCHEDULE_SCHEDULE_DELAYS'])
+    scheduler.add_job('trip_compaction', _compact_tracks, config['SCHEDULE_TRIP_COMPACTION'])
+    scheduler.add_job('trip_segmentation', _segment_trips, config['SCHEDULE_TRIP_SEGMENTATION'])
+    scheduler.add_job('map_matching', _match_trips,
+                      config['SCHEDULE_MAP_MATCHING'] if config['ROAD_GRAPH_PATH'] else None)
+    scheduler.add_job('location_retention', purge_locations,
+                      config['SCHEDULE_LOCATION_RETENTION'] if retention_days else None)
+    scheduler.add_job('simulation_tick', simulation_tick, f'every {tick_seconds}s' if tick_seconds else None)
+
+
+scheduler = Scheduler()
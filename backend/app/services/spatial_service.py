@@ -0,0 +1,295 @@
+from flask_jwt_extended import jwt_required
+from sqlalchemy import text, func
+from app.models.vehicle import Vehicle
+from app.models.location import Location
+from app.models.mission import Mission
+from app import db
+from app.services.track_service import TrackService
+from app.utils.spatial import postgis_enabled
+from app.utils.track_codec import column_values
+from datetime import datetime, timedelta
+import math
+
+EARTH_RADIUS_M = 6371000
+
+# Geography literal for a query point, bound from :lat / :lon
+POINT_SQL = 'ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography'
+
+
+def _haversine_m(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def _distance_to_segment_m(lat, lon, start_lat, start_lon, end_lat, end_lon):
+    """Distance from a point to a short segment on a local equirectangular projection."""
+    scale = math.cos(math.radians((start_lat + end_lat) / 2))
+    px, py = (lon - start_lon) * scale, lat - start_lat
+    sx, sy = (end_lon - start_lon) * scale, end_lat - start_lat
+    length_sq = sx * sx + sy * sy
+    t = 0.0 if length_sq == 0 else max(0.0, min(1.0, (px * sx + py * sy) / length_sq))
+    dx, dy = px - t * sx, py - t * sy
+    return math.radians(math.sqrt(dx * dx + dy * dy)) * EARTH_RADIUS_M
+
+
+def _degrees_around(lat, radius_m):
+    """Half-size in degrees (lat, lon) of a box containing a circle of radius_m."""
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+    return dlat, dlon
+
+
+def _compacted_points(since=None, vehicle_id=None, mission_id=None, bbox=None):
+    """(vehicle_id, latitude, longitude, speed, ISO timestamp) of the compacted points, inside bbox when given."""
+    points = []
+    for track_vehicle_id, _, track in TrackService.track_columns(vehicle_id=vehicle_id, mission_id=mission_id,
+                                                                 start=since):
+        for latitude, longitude, speed, timestamp in zip(*(column_values(track, name) for name in
+                                                           ('latitude', 'longitude', 'speed', 'timestamp'))):
+            if bbox is None or (bbox['south'] <= latitude <= bbox['north']
+                                and bbox['west'] <= longitude <= bbox['east']):
+                points.append((track_vehicle_id, latitude, longitude, speed, timestamp))
+    return points
+
+
+class SpatialService:
+    """Spatial queries, executed by PostGIS when enabled and by plain SQL otherwise."""
+
+    @staticmethod
+    def backend_name():
+        return 'postgis' if postgis_enabled() else 'sql'
+
+    @staticmethod
+    @jwt_required()
+    def nearest_vehicles(lat, lon, limit=5, radius_m=None, status=None):
+        """Vehicles closest to a point, by their current position."""
+        try:
+            if postgis_enabled():
+                conditions = ['current_geog IS NOT NULL']
+                params = {'lat': lat, 'lon': lon, 'limit': limit}
+                if status:
+                    conditions.append('status = :status')
+                    params['status'] = status
+                if radius_m:
+                    conditions.append(f'ST_DWithin(current_geog, {POINT_SQL}, :radius)')
+                    params['radius'] = radius_m
+
+                rows = db.session.execute(text(
+                    f'SELECT id, license_plate, status, current_latitude, current_longitude, '
+                    f'ST_Distance(current_geog, {POINT_SQL}) AS distance_m '
+                    f'FROM vehicles WHERE {" AND ".join(conditions)} '
+                    f'ORDER BY current_geog <-> {POINT_SQL} LIMIT :limit'
+                ), params).all()
+            else:
+                query = db.session.query(
+                    Vehicle.id, Vehicle.license_plate, Vehicle.status,
+                    Vehicle.current_latitude, Vehicle.current_longitude
+                ).filter(Vehicle.current_latitude.isnot(None), Vehicle.current_longitude.isnot(None))
+                if status:
+                    query = query.filter(Vehicle.status == status)
+                if radius_m:
+                    dlat, dlon = _degrees_around(lat, radius_m)
+                    query = query.filter(
+                        Vehicle.current_latitude.between(lat - dlat, lat + dlat),
+                        Vehicle.current_longitude.between(lon - dlon, lon + dlon)
+                    )
+
+                rows = []
+                for row in query.all():
+                    distance = _haversine_m(lat, lon, row.current_latitude, row.current_longitude)
+                    if radius_m is None or distance <= radius_m:
+                        rows.append((*row, distance))
+                rows.sort(key=lambda row: row[5])
+                rows = rows[:limit]
+
+            vehicles = [{
+                'id': row[0],
+                'license_plate': row[1],
+                'status': row[2],
+                'latitude': row[3],
+                'longitude': row[4],
+                'distance_m': round(row[5], 1)
+            } for row in rows]
+
+            return {'vehicles': vehicles, 'backend': SpatialService.backend_name()}, 200
+
+        except Exception as e:
+            db.session.rollback()
+            return {'error': str(e)}, 500
+
+    @staticmethod
+    @jwt_required()
+    def locations_in_bbox(south, west, north, east, hours=24, vehicle_id=None, limit=5000):
+        """Location points inside a bounding box, most recent first."""
+        try:
+            since = datetime.utcnow() - timedelta(hours=hours)
+            columns = (Location.id, Location.vehicle_id, Location.latitude, Location.longitude,
+                       Location.speed, Location.timestamp)
+            query = db.session.query(*columns).filter(Location.timestamp >= since)
+            if vehicle_id:
+                query = query.filter(Location.vehicle_id == vehicle_id)
+
+            if postgis_enabled():
+                query = query.filter(text(
+                    'ST_Intersects(locations.geog, '
+                    'ST_MakeEnvelope(:west, :south, :east, :north, 4326)::geography)'
+                )).params(west=west, south=south, east=east, north=north)
+            else:
+                query = query.filter(
+                    Location.latitude.between(south, north),
+                    Location.longitude.between(west, east)
+                )
+
+            rows = query.order_by(Location.timestamp.desc()).limit(limit).all()
+            locations = [{
+                'id': row.id,
+                'vehicle_id': row.vehicle_id,
+                'latitude': row.latitude,
+                'longitude': row.longitude,
+                'speed': row.speed,
+                'timestamp': row.timestamp.isoformat() if row.timestamp else None
+            } for row in rows]
+
+            # Compacted points have no id; ISO timestamps sort like the datetimes
+            bbox = {'south': south, 'west': west, 'north': north, 'east': east}
+            locations += [{
+                'id': None,
+                'vehicle_id': point_vehicle_id,
+                'latitude': latitude,
+                'longitude': longitude,
+                'speed': speed,
+                'timestamp': timestamp
+            } for point_vehicle_id, latitude, longitude, speed, timestamp in
+                _compacted_points(since, vehicle_id=vehicle_id or None, bbox=bbox)]
+            locations.sort(key=lambda location: location['timestamp'] or '', reverse=True)
+            locations = locations[:limit]
+
+            return {
+                'locations': locations,
+                'count': len(locations),
+                'truncated': len(locations) == limit,
+                'backend': SpatialService.backend_name()
+            }, 200
+
+        except Exception as e:
+            db.session.rollback()
+            return {'error': str(e)}, 500
+
+    @staticmethod
+    @jwt_required()
+    def heatmap(hours=24, cell_deg=0.005, bbox=None):
+        """Point counts aggregated on a regular lat/lon grid of cell_deg degrees."""
+        try:
+            since = datetime.utcnow() - timedelta(hours=hours)
+
+            if postgis_enabled():
+                conditions = ['timestamp >= :since']
+                params = {'since': since, 'cell': cell_deg}
+                if bbox:
+                    conditions.append('ST_Intersects(geog, ST_MakeEnvelope(:west, :south, :east, :north, 4326)::geography)')
+                    params.update(bbox)
+                rows = db.session.execute(text(
+                    'SELECT ST_Y(cell) AS latitude, ST_X(cell) AS longitude, weight FROM ('
+                    '  SELECT ST_SnapToGrid(geog::geometry, :cell) AS cell, count(*) AS weight'
+                    f'  FROM locations WHERE {" AND ".join(conditions)} GROUP BY 1'
+                    ') cells'
+                ), params).all()
+            else:
+                lat_cell = func.round(Location.latitude / cell_deg)
+                lon_cell = func.round(Location.longitude / cell_deg)
+                query = db.session.query(
+                    (lat_cell * cell_deg).label('latitude'),
+                    (lon_cell * cell_deg).label('longitude'),
+                    func.count(Location.id).label('weight')
+                ).filter(Location.timestamp >= since)
+                if bbox:
+                    query = query.filter(
+                        Location.latitude.between(bbox['south'], bbox['north']),
+                        Location.longitude.between(bbox['west'], bbox['east'])
+                    )
+                rows = query.group_by(lat_cell, lon_cell).all()
+
+            # Compacted points are counted into the same cells
+            weights = {(round(row.latitude / cell_deg), round(row.longitude / cell_deg)): row.weight for row in rows}
+            for _, latitude, longitude, _, _ in _compacted_points(since, bbox=bbox):
+                cell = (round(latitude / cell_deg), round(longitude / cell_deg))
+                weights[cell] = weights.get(cell, 0) + 1
+
+            peak = max(weights.values(), default=0)
+            cells = [{
+                'latitude': round(lat_index * cell_deg, 6),
+                'longitude': round(lon_index * cell_deg, 6),
+                'weight': weight,
+                'intensity': round(weight / peak, 4) if peak else 0
+            } for (lat_index, lon_index), weight in weights.items()]
+
+            return {'cells': cells, 'cell_deg': cell_deg, 'backend': SpatialService.backend_name()}, 200
+
+        except Exception as e:
+            db.session.rollback()
+            return {'error': str(e)}, 500
+
+    @staticmethod
+    def distances_to_mission_ends(mission_id, lat, lon):
+        """Geodesic distances in meters from a point to a mission's start and end, computed by PostGIS."""
+        row = db.session.execute(text(
+            f'SELECT ST_Distance(start_geog, {POINT_SQL}) AS start_m, ST_Distance(end_geog, {POINT_SQL}) AS end_m '
+            'FROM missions WHERE id = :mission_id'
+        ), {'mission_id': mission_id, 'lat': lat, 'lon': lon}).one()
+        return row.start_m, row.end_m
+
+    @staticmethod
+    @jwt_required()
+    def mission_deviation(mission_id, threshold_m=2000):
+        """Distance of the mission's recorded points from the planned start-end line."""
+        try:
+            mission = db.session.get(Mission, mission_id)
+            if not mission:
+                return {'error': 'Mission not found'}, 404
+
+            if postgis_enabled():
+                row = db.session.execute(text(
+                    'SELECT count(*) AS points, max(d) AS max_m, avg(d) AS avg_m, '
+                    'sum(CASE WHEN d > :threshold THEN 1 ELSE 0 END) AS off_route '
+                    'FROM (SELECT ST_Distance(l.geog, m.route_geog) AS d '
+                    '      FROM locations l JOIN missions m ON m.id = l.mission_id '
+                    '      WHERE l.mission_id = :mission_id) distances'
+                ), {'mission_id': mission_id, 'threshold': threshold_m}).one()
+                stored = [] if row.max_m is None else [(row.points, row.max_m, row.avg_m, row.off_route or 0)]
+                coordinates = []
+            else:
+                stored = []
+                coordinates = db.session.query(Location.latitude, Location.longitude) \
+                    .filter(Location.mission_id == mission_id).all()
+
+            # Compacted points of a finished mission, measured like the plain SQL path
+            coordinates += [(lat, lon) for _, lat, lon, _, _ in _compacted_points(mission_id=mission_id)]
+            distances = [
+                _distance_to_segment_m(lat, lon, mission.start_latitude, mission.start_longitude,
+                                       mission.end_latitude, mission.end_longitude)
+                for lat, lon in coordinates
+            ]
+            if distances:
+                stored.append((len(distances), max(distances), sum(distances) / len(distances),
+                               sum(1 for distance in distances if distance > threshold_m)))
+
+            points = sum(part[0] for part in stored)
+            max_m = max((part[1] for part in stored), default=None)
+            avg_m = sum(part[0] * part[2] for part in stored) / points if points else None
+            off_route = sum(part[3] for part in stored)
+
+            return {
+                'mission_id': mission_id,
+                'points': points,
+                'max_deviation_m': round(max_m, 1) if max_m is not None else None,
+                'avg_deviation_m': round(avg_m, 1) if avg_m is not None else None,
+                'points_off_route': int(off_route or 0),
+                'threshold_m': threshold_m,
+                'deviated': bool(off_route),
+                'backend': SpatialService.backend_name()
+            }, 200
+
+        except Exception as e:
+            db.session.rollback()
+            return {'error': str(e)}, 500
@@ -0,0 +1,508 @@
+import atexit
+import glob
+import json
+import os
+import shutil
+import socket
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from app import db
+from app.models.location import Location
+from app.services.geofence_engine import geofence_engine
+from app.utils.location_writes import UPSERT_COLUMNS, advance_vehicle_positions, commit_isolating
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to checking the owner pid
+    fcntl = None
+
+# Segment layout: 8-byte header (magic, format version) followed by fixed-size
+# records, each a CRC32 of the payload then the payload itself:
+# vehicle_id, mission_id (-1 = none), timestamp (µs since epoch, UTC),
+# latitude, longitude, altitude, speed, heading, accuracy (NaN = none)
+SEGMENT_HEADER = struct.Struct('<4sI')
+SEGMENT_MAGIC = b'FMJ1'
+JOURNAL_VERSION = 1
+PAYLOAD = struct.Struct('<Iiqddffff')
+CRC = struct.Struct('<I')
+RECORD_SIZE = CRC.size + PAYLOAD.size
+
+EPOCH = datetime(1970, 1, 1)
+NAN = float('nan')
+FSYNC_POLICIES = ('always', 'interval', 'never')
+
+
+def _microseconds(value):
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def _float(value):
+    return NAN if value is None else value
+
+
+def encode_point(point):
+    """Encode a location point dict as one journal record."""
+    mission_id = point.get('mission_id')
+    payload = PAYLOAD.pack(
+        point['vehicle_id'],
+        -1 if mission_id is None else mission_id,
+        _microseconds(point['timestamp']),
+        point['latitude'],
+        point['longitude'],
+        _float(point.get('altitude')),
+        _float(point.get('speed')),
+        _float(point.get('heading')),
+        _float(point.get('accuracy'))
+    )
+    return CRC.pack(zlib.crc32(payload)) + payload
+
+
+def decode_records(buffer):
+    """Decode the complete records at the start of `buffer`.
+
+    Returns (rows, consumed, corrupt): payload tuples in PAYLOAD order, the
+    number of bytes they span, and whether decoding stopped on a CRC mismatch.
+    """
+    view = memoryview(buffer)
+    unpack = PAYLOAD.unpack_from
+    crc32 = zlib.crc32
+    rows = []
+    end = len(buffer) - len(buffer) % RECORD_SIZE
+    for start in range(0, end, RECORD_SIZE):
+        payload = view[start + CRC.size:start + RECORD_SIZE]
+        if crc32(payload) != CRC.unpack_from(view, start)[0]:
+            return rows, start, True
+        rows.append(unpack(payload))
+    return rows, end, False
+
+
+def row_to_point(row):
+    """Turn a decoded record back into a location point dict."""
+    vehicle_id, mission_id, timestamp, latitude, longitude, altitude, speed, heading, accuracy = row
+    optional = lambda value: None if value != value else value
+    return {
+        'vehicle_id': vehicle_id,
+        'mission_id': None if mission_id == -1 else mission_id,
+        'timestamp': EPOCH + timedelta(microseconds=timestamp),
+        'latitude': latitude,
+        'longitude': longitude,
+        'altitude': optional(altitude),
+        'speed': optional(speed),
+        'heading': optional(heading),
+        'accuracy': optional(accuracy)
+    }
+
+
+def segment_path(directory, sequence):
+    return os.path.join(directory, f'{sequence:012d}.seg')
+
+
+def list_segments(directory):
+    """Sequence numbers of the segments in a journal directory, oldest first."""
+    sequences = []
+    for path in glob.glob(os.path.join(directory, '*.seg')):
+        try:
+            sequences.append(int(os.path.basename(path)[:-len('.seg')]))
+        except ValueError:
+            continue
+    return sorted(sequences)
+
+
+def read_checkpoint(directory):
+    try:
+        with open(os.path.join(directory, 'checkpoint'), encoding='utf-8') as f:
+            data = json.load(f)
+        return data['segment'], data['offset']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def write_checkpoint(directory, segment, offset):
+    """Atomically record the position up to which the journal is in the database."""
+    path = os.path.join(directory, 'checkpoint')
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump({'segment': segment, 'offset': offset}, f)
+    os.replace(temporary, path)
+
+
+class JournalWriter:
+    """Appends records to numbered segment files of at most `segment_bytes`.
+
+    fsync policy: 'always' syncs every append, 'interval' at most once per
+    `fsync_interval` seconds, 'never' leaves it to the operating system.
+    """
+
+    def __init__(self, directory, segment_bytes=64 * 1024 * 1024, fsync='interval', fsync_interval=0.1):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f'Unknown fsync policy: {fsync}')
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._file = None
+        self._last_sync = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        existing = list_segments(directory)
+        self._sequence = existing[-1] + 1 if existing else 1
+        self._offset = 0
+
+    def _open_segment(self):
+        if self._file is not None:
+            self._sync()
+            self._file.close()
+            self._sequence += 1
+        self._file = open(segment_path(self.directory, self._sequence), 'ab')
+        self._file.write(SEGMENT_HEADER.pack(SEGMENT_MAGIC, JOURNAL_VERSION))
+        self._offset = SEGMENT_HEADER.size
+
+    def _sync(self):
+        self._file.flush()
+        if self.fsync != 'never':
+            os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+
+    def append(self, records):
+        """Append encoded records (bytes). Returns the position after them."""
+        with self._lock:
+            if self._file is None or self._offset + len(records) > self.segment_bytes:
+                self._open_segment()
+            self._file.write(records)
+            self._offset += len(records)
+
+            if self.fsync == 'always' or (
+                    self.fsync == 'interval' and time.monotonic() - self._last_sync >= self.fsync_interval):
+                self._sync()
+            else:
+                self._file.flush()
+            return self._sequence, self._offset
+
+    def position(self):
+        """(segment, offset) of the end of the data handed to the OS so far."""
+        with self._lock:
+            if self._file is None:
+                return self._sequence - 1, 0
+            return self._sequence, self._offset
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+                self._sequence += 1
+
+
+class LocationSink:
+    """Upserts decoded journal records into `locations` on their (vehicle_id, timestamp) key."""
+
+    COLUMNS = ('vehicle_id', 'mission_id', 'timestamp', 'latitude', 'longitude',
+               'altitude', 'speed', 'heading', 'accuracy', 'created_at')
+
+    def _on_conflict(self):
+        assignments = ', '.join(f'{column} = excluded.{column}' for column in UPSERT_COLUMNS)
+        return f'ON CONFLICT (vehicle_id, timestamp) DO UPDATE SET {assignments}'
+
+    def write(self, rows):
+        """Upsert rows and move vehicle positions. Returns the number of rows written. Does not commit."""
+        if not rows:
+            return 0
+
+        dialect = db.engine.dialect.name
+        created_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S.%f')
+        connection = db.session.connection()
+
+        if dialect == 'sqlite':
+            # Timestamps are converted by SQLite in the storage format SQLAlchemy uses
+            sql = (
+                f'INSERT INTO locations ({", ".join(self.COLUMNS)}) VALUES ('
+                '?1, NULLIF(?2, -1), '
+                "strftime('%Y-%m-%d %H:%M:%S', ?3 / 1000000, 'unixepoch') || printf('.%06d', ?3 % 1000000), "
+                f"?4, ?5, ?6, ?7, ?8, ?9, '{created_at}') {self._on_conflict()}"
+            )
+            cursor = connection.connection.dbapi_connection.cursor()
+            cursor.executemany(sql, rows)
+            written = cursor.rowcount
+        elif dialect == 'postgresql':
+            from psycopg2.extras import execute_values
+            sql = (
+                f'INSERT INTO locations ({", ".join(self.COLUMNS)}) VALUES %s {self._on_conflict()}'
+            )
+            template = (
+                "(%s, NULLIF(%s, -1), to_timestamp(%s / 1000000.0) AT TIME ZONE 'UTC', %s, %s, "
+                f"NULLIF(%s, 'NaN'), NULLIF(%s, 'NaN'), NULLIF(%s, 'NaN'), NULLIF(%s, 'NaN'), '{created_at}')"
+            )
+            # One statement may not update a row twice, the last copy of a point wins
+            rows = list({(row[0], row[2]): row for row in rows}.values())
+            cursor = connection.connection.dbapi_connection.cursor()
+            execute_values(cursor, sql, rows, template=template, page_size=len(rows))
+            written = cursor.rowcount
+        else:
+            connection.execute(Location.__table__.insert(), [row_to_point(row) for row in rows])
+            written = len(rows)
+
+        self._move_vehicles(rows)
+        return written
+
+    def committed(self, rows):
+        """Check the committed rows against the geofences."""
+        if geofence_engine.enabled:
+            geofence_engine.process([row_to_point(row) for row in rows])
+
+    def _move_vehicles(self, rows):
+        """Apply the newest point of each vehicle unless the vehicle already has a newer one."""
+        latest = {}
+        for row in rows:
+            current = latest.get(row[0])
+            if current is None or row[2] > current[2]:
+                latest[row[0]] = row
+
+        advance_vehicle_positions([row_to_point(row) for row in latest.values()])
+
+
+def quarantine(directory, rows):
+    """Append records the database rejected to quarantine.jsonl, next to the journal directories."""
+    path = os.path.join(os.path.dirname(os.path.abspath(directory)), 'quarantine.jsonl')
+    with open(path, 'a', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row_to_point(row), default=lambda value: value.isoformat()) + '\n')
+    print(f"Quarantined {len(rows)} journaled points rejected by the database in {path}")
+
+
+def replay_directory(directory, sink, batch_records=20000, until=None, delete_replayed=True):
+    """Replay a journal directory into the database from its checkpoint.
+
+    `until` bounds the replay to (segment, offset) for a journal that is still
+    being written; without it every segment is read to its end and a torn or
+    corrupt tail is skipped. Each batch is committed before the checkpoint
+    moves past it; records the database rejects are set aside with
+    quarantine() instead of holding the journal back. Returns (records read,
+    rows written, records quarantined).
+    """
+    checkpoint = read_checkpoint(directory) or (0, 0)
+    read = written = quarantined = 0
+
+    def commit(rows):
+        nonlocal written
+        count = sink.write(rows)
+        db.session.commit()
+        written += count
+        sink.committed(rows)
+
+    for sequence in list_segments(directory):
+        if sequence < checkpoint[0]:
+            os.remove(segment_path(directory, sequence))
+            continue
+        if until is not None and sequence > until[0]:
+            break
+
+        path = segment_path(directory, sequence)
+        offset = checkpoint[1] if sequence == checkpoint[0] else 0
+        limit = until[1] if until is not None and sequence == until[0] else None
+        sealed = limit is None
+
+        with open(path, 'rb') as f:
+            header = f.read(SEGMENT_HEADER.size)
+            if len(header) < SEGMENT_HEADER.size or SEGMENT_HEADER.unpack(header)[0] != SEGMENT_MAGIC:
+                print(f"Skipping journal segment with an invalid header: {path}")
+                offset = None
+            else:
+                offset = max(offset, SEGMENT_HEADER.size)
+                f.seek(offset)
+
+            while offset is not None:
+                size = batch_records * RECORD_SIZE
+                if limit is not None:
+                    size = min(size, limit - offset)
+                if size <= 0:
+                    break
+
+                chunk = f.read(size)
+                rows, consumed, corrupt = decode_records(chunk)
+                if rows:
+                    rejected = commit_isolating(rows, commit)
+                    if rejected:
+                        quarantine(directory, rejected)
+                        quarantined += len(rejected)
+                    read += len(rows)
+                    offset += consumed
+                    write_checkpoint(directory, sequence, offset)
+
+                if corrupt or len(chunk) < size:
+                    if corrupt or len(chunk) % RECORD_SIZE:
+                        print(f"Journal segment {path} ends with a torn or corrupt record at offset {offset}")
+                    break
+
+        if sealed and delete_replayed:
+            os.remove(path)
+            write_checkpoint(directory, sequence + 1, 0)
+
+    return read, written, quarantined
+
+
+class TelemetryJournal:
+    """Write-ahead journal for the location ingest path.
+
+    With INGEST_MODE=journal, requests append points to a per-process
+    journal directory and return; a replayer thread commits the journal into
+    `locations` and advances a checkpoint. Journals of processes that died
+    are claimed and replayed by the next process that starts. Records the
+    database rejects go to `quarantine.jsonl` in JOURNAL_DIR.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.directory = None
+        self.writer = None
+        self.sink = LocationSink()
+        self._lock_file = None
+        self._thread = None
+        self._thread_pid = None
+        self._guard = threading.Lock()
+        self._stop = threading.Event()
+        self._stats = {'appended': 0, 'replayed': 0, 'written': 0, 'replay_errors': 0, 'recovered': 0,
+                       'quarantined': 0}
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config['INGEST_MODE'] == 'journal'
+        self.directory = app.config['JOURNAL_DIR']
+        if self.enabled:
+            atexit.register(self.stop)
+            app.before_request(self._ensure_started)
+
+    def _ensure_started(self):
+        # Each process (also after fork) gets its own journal directory and replayer
+        thread = self._thread
+        if thread is not None and self._thread_pid == os.getpid() and thread.is_alive():
+            return
+        with self._guard:
+            if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+                return
+            config = self.app.config
+            name = f'{socket.gethostname()}-{os.getpid()}-{int(time.time())}'
+            own, staging = os.path.join(self.directory, name), os.path.join(self.directory, f'.{name}')
+            os.makedirs(staging, exist_ok=True)
+            self._lock_file = _lock_directory(staging)
+            # Renamed once locked: recover_orphans() never sees the directory unlocked
+            os.rename(staging, own)
+            self.writer = JournalWriter(
+                own,
+                segment_bytes=config['JOURNAL_SEGMENT_BYTES'],
+                fsync=config['JOURNAL_FSYNC'],
+                fsync_interval=config['JOURNAL_FSYNC_INTERVAL_MS'] / 1000
+            )
+            self._stop.clear()
+            self._thread_pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='journal-replayer', daemon=True)
+            self._thread.start()
+
+    def append(self, point):
+        """Journal one point, it is durable according to JOURNAL_FSYNC when this returns."""
+        self._ensure_started()
+        self.writer.append(encode_point(point))
+        with self._guard:
+            self._stats['appended'] += 1
+
+    def _run(self):
+        interval = self.app.config['JOURNAL_REPLAY_INTERVAL_MS'] / 1000
+        batch = self.app.config['JOURNAL_REPLAY_BATCH']
+        backoff = interval
+        with self.app.app_context():
+            while not self._stop.is_set():
+                try:
+                    self.recover_orphans(batch)
+                    read, written, quarantined = replay_directory(
+                        self.writer.directory, self.sink, batch, until=self.writer.position()
+                    )
+                    self._count(replayed=read, written=written, quarantined=quarantined)
+                    backoff = interval
+                except Exception as e:
+                    db.session.rollback()
+                    self._count(replay_errors=1)
+                    print(f"Journal replay failed, retrying in {backoff:.1f}s: {e}")
+                    backoff = min(backoff * 2, 30)
+                self._stop.wait(backoff)
+
+    def recover_orphans(self, batch_records=20000):
+        """Replay and remove the journal directories no running process owns."""
+        if not os.path.isdir(self.directory):
+            return 0
+        recovered = 0
+        own = self.writer.directory if self.writer else None
+        for entry in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, entry)
+            if path == own or entry.startswith('.') or not os.path.isdir(path):
+                continue  # a process being started keeps its directory under a dot name until locked
+            lock = _try_lock_orphan(path)
+            if lock is None:
+                continue
+            try:
+                read, written, quarantined = replay_directory(path, self.sink, batch_records)
+                recovered += read
+                self._count(recovered=read, written=written, quarantined=quarantined)
+                if read:
+                    print(f"Recovered {read} journaled points from {entry}")
+                shutil.rmtree(path, ignore_errors=True)
+            finally:
+                lock.close()
+        return recovered
+
+    def stop(self, timeout=10):
+        if self._thread is None or self._thread_pid != os.getpid():
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self.writer.close()
+
+    def _count(self, **values):
+        with self._guard:
+            for key, value in values.items():
+                self._stats[key] += value
+
+    def stats(self):
+        with self._guard:
+            stats = dict(self._stats)
+        stats['mode'] = 'journal' if self.enabled else 'off'
+        stats['directory'] = self.writer.directory if self.writer else None
+        stats['position'] = list(self.writer.position()) if self.writer else None
+        stats['replayer_alive'] = bool(self._thread and self._thread.is_alive())
+        return stats
+
+
+def _lock_directory(directory):
+    """Hold an exclusive lock on the directory for the life of the process."""
+    lock = open(os.path.join(directory, 'lock'), 'w')
+    lock.write(str(os.getpid()))
+    lock.flush()
+    if fcntl is not None:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    return lock
+
+
+def _try_lock_orphan(directory):
+    """Lock a journal directory whose owner is gone, or return None if it is still in use."""
+    path = os.path.join(directory, 'lock')
+    if fcntl is not None:
+        try:
+            lock = open(path, 'a')
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return lock
+        except OSError:
+            return None
+
+    try:
+        with open(path, encoding='utf-8') as f:
+            pid = int(f.read().strip() or 0)
+        os.kill(pid, 0)
+        return None
+    except (OSError, ValueError):
+        return open(path, 'a')
+
+
+telemetry_journal = TelemetryJournal()
@@ -0,0 +1,206 @@
+from flask import current_app
+from sqlalchemy import func
+from app.models.location import Location
+from app.models.mission import Mission
+from app.models.trip_track import TripTrack
+from app import db
+from app.utils.serialization import POINT_COLUMNS
+from app.utils.track_codec import (EPOCH, column_timestamps, column_values, decode_track, encode_track,
+                                   slice_track, track_points)
+from datetime import datetime, timedelta
+
+# Location columns kept in a track, in track_points() order
+TRACK_FIELDS = ('timestamp', 'latitude', 'longitude', 'altitude', 'speed', 'heading', 'accuracy')
+
+
+class TrackService:
+    """Compacts location points into columnar trip tracks and reads them back.
+
+    A track holds the points of one finished mission, or the mission-less
+    points of one vehicle over one UTC day. Compacted points are removed from
+    `locations`; points arriving later stay there until the next compaction
+    merges them into the existing track.
+    """
+
+    @staticmethod
+    def compact(older_than_days=None):
+        """Compact finished missions and mission-less days older than `older_than_days`."""
+        try:
+            config = current_app.config
+            days = config['TRIP_COMPACT_AFTER_DAYS'] if older_than_days is None else older_than_days
+            now = datetime.utcnow()
+            mission_cutoff = now - timedelta(hours=config['TRIP_COMPACT_MISSION_GRACE_HOURS'])
+            day_cutoff = datetime(now.year, now.month, now.day) - timedelta(days=days)
+            summary = {'tracks': 0, 'points': 0, 'bytes': 0}
+
+            missions = db.session.query(Location.vehicle_id, Location.mission_id).join(
+                Mission, Mission.id == Location.mission_id
+            ).filter(
+                Mission.status.in_(['completed', 'cancelled']),
+                func.coalesce(Mission.actual_end, Mission.updated_at) < mission_cutoff
+            ).distinct().all()
+            for vehicle_id, mission_id in missions:
+                TrackService._add(summary, TrackService._compact_group(vehicle_id, mission_id))
+
+            days = db.session.query(Location.vehicle_id, func.date(Location.timestamp)).filter(
+                Location.mission_id.is_(None),
+                Location.timestamp < day_cutoff
+            ).distinct().all()
+            for vehicle_id, day in days:
+                day = datetime.fromisoformat(str(day))
+                TrackService._add(summary, TrackService._compact_group(vehicle_id, None, day))
+
+            return {'message': f"Compacted {summary['points']} points into {summary['tracks']} tracks",
+                    **summary}, 200
+
+        except Exception as e:
+            db.session.rollback()
+            return {'error': str(e)}, 500
+
+    @staticmethod
+    def _add(summary, result):
+        points, size = result
+        if points:
+            summary['tracks'] += 1
+            summary['points'] += points
+            summary['bytes'] += size
+
+    @staticmethod
+    def _compact_group(vehicle_id, mission_id, day=None):
+        """Move the points of one mission (or one mission-less vehicle-day) into its track and commit."""
+        filters = [Location.vehicle_id == vehicle_id]
+        tracks = TripTrack.query.filter_by(vehicle_id=vehicle_id, mission_id=mission_id)
+        if mission_id is None:
+            filters += [Location.mission_id.is_(None),
+                        Location.timestamp >= day, Location.timestamp < day + timedelta(days=1)]
+            tracks = tracks.filter(TripTrack.started_at >= day, TripTrack.started_at < day + timedelta(days=1))
+        else:
+            filters.append(Location.mission_id == mission_id)
+
+        rows = db.session.query(Location.id, *[getattr(Location, field) for field in TRACK_FIELDS]) \
+            .filter(*filters).order_by(Location.timestamp).all()
+        if not rows:
+            return 0, 0
+        last_id = max(row[0] for row in rows)
+        points = {row[1]: dict(zip(TRACK_FIELDS, row[1:])) for row in rows}
+
+        # Late points are merged into the existing track, a stored point wins over the compacted one
+        track = tracks.first()
+        if track is not None:
+            for point in track_points(decode_track(track.data)):
+                points.setdefault(point[0], dict(zip(TRACK_FIELDS, point)))
+        else:
+            track = TripTrack(vehicle_id=vehicle_id, mission_id=mission_id)
+            db.session.add(track)
+
+        ordered = [points[timestamp] for timestamp in sorted(points)]
+        codec = current_app.config['TRIP_TRACK_CODEC']
+        track.data = encode_track(ordered, codec, current_app.config['TRIP_TRACK_LEVEL'])
+        track.codec = codec
+        track.point_count = len(ordered)
+        track.started_at = ordered[0]['timestamp']
+        track.ended_at = ordered[-1]['timestamp']
+
+        # Rows inserted after the SELECT have higher ids and are left for the next run
+        Location.query.filter(*filters, Location.id <= last_id).delete(synchronize_session=False)
+        db.session.commit()
+        return len(rows), len(track.data)
+
+    @staticmethod
+    def track_locations(vehicle_id=None, mission_id=None, start=None, end=None):
+        """Compacted points as (timestamp, location dict) pairs, the dicts shaped like Location.to_dict()."""
+        query = TripTrack.query
+        if vehicle_id is not None:
+            query = query.filter(TripTrack.vehicle_id == vehicle_id)
+        if mission_id is not None:
+            query = query.filter(TripTrack.mission_id == mission_id)
+        if start is not None:
+            query = query.filter(TripTrack.ended_at >= start)
+        if end is not None:
+            query = query.filter(TripTrack.started_at <= end)
+
+        locations = []
+        for track in query.order_by(TripTrack.started_at).all():
+            columns = slice_track(decode_track(track.data), start, end)
+            created_at = track.created_at.isoformat() if track.created_at else None
+            for timestamp, latitude, longitude, altitude, speed, heading, accuracy in track_points(columns):
+                locations.append((timestamp, {
+                    'id': None,
+                    'latitude': latitude,
+                    'longitude': longitude,
+                    'altitude': altitude,
+                    'speed': speed,
+                    'heading': heading,
+                    'accuracy': accuracy,
+                    'timestamp': timestamp.isoformat(),
+                    'vehicle_id': track.vehicle_id,
+                    'mission_id': track.mission_id,
+                    'created_at': created_at
+                }))
+        return locations
+
+    @staticmethod
+    def track_columns(vehicle_id=None, mission_id=None, start=None, end=None):
+        """Compacted points as (vehicle_id, mission_id, columns) per track, the columns sliced to start..end.
+
+        The columns stay as decoded (NumPy arrays, or lists without NumPy): no object per point.
+        """
+        query = db.session.query(TripTrack.vehicle_id, TripTrack.mission_id, TripTrack.data)
+        if vehicle_id is not None:
+            query = query.filter(TripTrack.vehicle_id == vehicle_id)
+        if mission_id is not None:
+            query = query.filter(TripTrack.mission_id == mission_id)
+        if start is not None:
+            query = query.filter(TripTrack.ended_at >= start)
+        if end is not None:
+            query = query.filter(TripTrack.started_at <= end)
+
+        tracks = []
+        for track_vehicle_id, track_mission_id, data in query.order_by(TripTrack.started_at).all():
+            columns = slice_track(decode_track(data), start, end)
+            if len(columns['timestamp']):
+                tracks.append((track_vehicle_id, track_mission_id, columns))
+        return tracks
+
+    @staticmethod
+    def merge_columns(locations, tracks, columns=tuple(POINT_COLUMNS), descending=True):
+        """Location rows and track_columns() as one columnar dict ({'ts': [...], ...}) ordered by timestamp."""
+        keys = [(location.timestamp - EPOCH) // timedelta(microseconds=1) for location in locations]
+        merged = {}
+        for name in columns:
+            field = POINT_COLUMNS[name]
+            values = [getattr(location, field) for location in locations]
+            merged[name] = [value.isoformat() for value in values] if field == 'timestamp' else values
+
+        for _, _, track in tracks:
+            keys.extend(column_timestamps(track))
+            for name in columns:
+                merged[name].extend(column_values(track, POINT_COLUMNS[name]))
+
+        order = sorted(range(len(keys)), key=keys.__getitem__, reverse=descending)
+        return {name: [values[index] for index in order] for name, values in merged.items()}
+
+    @staticmethod
+    def purge(cutoff):
+        """Delete the compacted points older than `cutoff`, trimming the tracks that straddle it. Does not commit."""
+        deleted = 0
+        for track in TripTrack.query.filter(TripTrack.started_at < cutoff).all():
+            if track.ended_at < cutoff:
+                deleted += track.point_count
+                db.session.delete(track)
+                continue
+
+            kept = [dict(zip(TRACK_FIELDS, point))
+                    for point in track_points(slice_track(decode_track(track.data), cutoff))]
+            deleted += track.point_count - len(kept)
+            track.data = encode_track(kept, track.codec, current_app.config['TRIP_TRACK_LEVEL'])
+            track.point_count = len(kept)
+            track.started_at = kept[0]['timestamp']
+        return deleted
+
+    @staticmethod
+    def merge_locations(locations, compacted, descending=True):
+        """Location rows and compacted points as one list of dicts ordered by timestamp."""
+        merged = [(location.timestamp, location.to_dict()) for location in locations] + compacted
+        merged.sort(key=lambda item: item[0], reverse=descending)
+        return [location for _, location in merged]
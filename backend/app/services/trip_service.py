@@ -0,0 +1,530 @@
+from flask import current_app
+from sqlalchemy import case, func, or_, select
+from app.models.location import Location
+from app.models.mission import Mission
+from app.models.stop import Stop
+from app.models.trip import Trip
+from app.models.vehicle import Vehicle
+from app.models.vehicle_trip_state import VehicleTripState
+from app import db
+from app.services.track_service import TrackService
+from app.utils.geofence_index import METERS_PER_DEGREE
+from app.utils.location_writes import UPSERT_DIALECTS
+from datetime import datetime, timedelta
+import json
+import math
+
+EPOCH = datetime(1970, 1, 1)
+
+# Vehicles whose state is looked up by id, more read the whole state table
+STATE_LOOKUP_LIMIT = 900
+
+# Location columns the segmenter reads
+SEGMENT_COLUMNS = ('id', 'vehicle_id', 'mission_id', 'timestamp', 'latitude', 'longitude', 'speed')
+
+UNMATCHED = {'matched_distance_m': None, 'matched_geometry': None, 'matched_ratio': None, 'matched_at': None}
+
+
+def _seconds(value):
+    return (value - EPOCH).total_seconds()
+
+
+def _datetime(seconds):
+    return EPOCH + timedelta(seconds=seconds)
+
+
+def _distance_m(lat1, lon1, lat2, lon2):
+    """Meters between two points on a local flat projection, exact enough between consecutive fixes."""
+    dx = (lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    return math.hypot(dx, lat2 - lat1) * METERS_PER_DEGREE
+
+
+def _count(counts, mission_id):
+    if mission_id is not None:
+        counts[str(mission_id)] = counts.get(str(mission_id), 0) + 1
+
+
+def _top(counts):
+    return int(max(counts, key=counts.get)) if counts else None
+
+
+class TripSegmenter:
+    """Streaming split of a vehicle's location points into trips and stops.
+
+    The state of a vehicle is a JSON-serializable dict carried from one
+    batch of points to the next. Its anchor is the first point of a run of
+    points staying within stop_radius_m of it, below moving_speed_kmh. An
+    anchor lasting stop_min_seconds becomes a stop, and the trip before it
+    ends where the anchor began. The first point away from the anchor ends
+    the stop, and a new trip starts from the stop's last point. After
+    silence longer than gap_seconds, a point elsewhere closes what was in
+    progress at the last point. A point back in the same place continues
+    the anchor, so a vehicle parked with the engine off keeps one stop.
+    """
+
+    def __init__(self, stop_radius_m=100, stop_min_seconds=180, moving_speed_kmh=5, gap_seconds=600):
+        self.stop_radius_m = stop_radius_m
+        self.stop_min_seconds = stop_min_seconds
+        self.moving_speed_kmh = moving_speed_kmh
+        self.gap_seconds = gap_seconds
+
+    def feed(self, state, points):
+        """Advance `state` ({} for a new vehicle) over the vehicle's points, in time order.
+
+        Returns (trips, stops, late): the trip and stop rows changed, keyed
+        by their start, and the number of points skipped for being older
+        than the last one read. A caller with late points feeds the vehicle
+        again, from a fresh state, from the trip or stop they fall in.
+        """
+        trips, stops, late = {}, {}, 0
+        for point in points:
+            t = _seconds(point['timestamp'])
+            lat, lon, speed, mission_id = point['latitude'], point['longitude'], point['speed'], point['mission_id']
+            last = state.get('last')
+            if last is not None and t <= last[0]:
+                late += 1
+                continue
+            state['last'] = [t, lat, lon]
+            anchor = state.get('anchor')
+            if anchor is None:
+                state['anchor'] = self._anchor(t, lat, lon, mission_id, None)
+                continue
+
+            step = _distance_m(last[1], last[2], lat, lon)
+            trip = state.get('trip')
+            still = (_distance_m(anchor['lat'], anchor['lon'], lat, lon) <= self.stop_radius_m
+                     and (speed is None or speed < self.moving_speed_kmh))
+            if still:
+                anchor['t1'] = t
+                anchor['slat'] += lat
+                anchor['slon'] += lon
+                anchor['n'] += 1
+                anchor['dist'] += step
+                _count(anchor['missions'], mission_id)
+                if state.get('stopped'):
+                    continue
+                if trip is not None:
+                    self._extend(trip, t, lat, lon, step, speed, mission_id)
+                if anchor['t1'] - anchor['t0'] >= self.stop_min_seconds:
+                    state['stopped'] = True
+                    if trip is not None:
+                        # The trip ended where the vehicle began to stay
+                        ended = dict(trip, **anchor['cut'])
+                        trips[ended['t0']] = self._trip_row(ended, is_open=False)
+                        anchor['arrival_mission'] = _top(ended['missions'])
+                        state['trip'] = None
+            elif t - last[0] > self.gap_seconds:
+                # Moved while silent: what was in progress ended at the last point
+                if state.get('stopped'):
+                    stops[anchor['t0']] = self._stop_row(anchor, is_open=False)
+                elif trip is not None:
+                    trips[trip['t0']] = self._trip_row(trip, is_open=False)
+                state['trip'] = None
+                state['stopped'] = False
+                state['anchor'] = self._anchor(t, lat, lon, mission_id, None)
+            else:
+                if state.get('stopped'):
+                    stops[anchor['t0']] = self._stop_row(anchor, is_open=False)
+                    trip = self._trip(last[0], last[1], last[2])
+                elif trip is None:
+                    # A halt too short for a stop, part of the trip it starts
+                    trip = self._trip(anchor['t0'], anchor['lat'], anchor['lon'])
+                    trip.update(t1=anchor['t1'], lat1=last[1], lon1=last[2], dist=anchor['dist'], n=anchor['n'],
+                                missions=dict(anchor['missions']))
+                self._extend(trip, t, lat, lon, step, speed, mission_id)
+                state['trip'] = trip
+                state['stopped'] = False
+                state['anchor'] = self._anchor(t, lat, lon, mission_id, trip)
+
+        # What is still in progress
+        if state.get('trip') is not None:
+            trips[state['trip']['t0']] = self._trip_row(state['trip'], is_open=True)
+        if state.get('stopped'):
+            stops[state['anchor']['t0']] = self._stop_row(state['anchor'], is_open=True)
+        return trips, stops, late
+
+    @staticmethod
+    def _anchor(t, lat, lon, mission_id, trip):
+        anchor = {'t0': t, 't1': t, 'lat': lat, 'lon': lon, 'slat': lat, 'slon': lon, 'n': 1, 'dist': 0.0,
+                  'missions': {}, 'cut': None}
+        _count(anchor['missions'], mission_id)
+        if trip is not None:
+            anchor['cut'] = {key: trip[key] for key in ('t1', 'lat1', 'lon1', 'dist', 'vmax', 'n')}
+        return anchor
+
+    @staticmethod
+    def _trip(t, lat, lon):
+        return {'t0': t, 'lat0': lat, 'lon0': lon, 't1': t, 'lat1': lat, 'lon1': lon, 'dist': 0.0, 'vmax': None,
+                'n': 1, 'missions': {}}
+
+    @staticmethod
+    def _extend(trip, t, lat, lon, step, speed, mission_id):
+        trip['t1'], trip['lat1'], trip['lon1'] = t, lat, lon
+        trip['dist'] += step
+        trip['n'] += 1
+        if speed is not None and (trip['vmax'] is None or speed > trip['vmax']):
+            trip['vmax'] = speed
+        _count(trip['missions'], mission_id)
+
+    @staticmethod
+    def _trip_row(trip, is_open):
+        duration = trip['t1'] - trip['t0']
+        return {
+            'started_at': _datetime(trip['t0']),
+            'ended_at': _datetime(trip['t1']),
+            'start_latitude': trip['lat0'],
+            'start_longitude': trip['lon0'],
+            'end_latitude': trip['lat1'],
+            'end_longitude': trip['lon1'],
+            'distance_m': round(trip['dist'], 1),
+            'duration_seconds': duration,
+            'max_speed': trip['vmax'],
+            'avg_speed': round(trip['dist'] / duration * 3.6, 1) if duration > 0 else None,
+            'point_count': trip['n'],
+            'mission_id': _top(trip['missions']),
+            'is_open': is_open
+        }
+
+    @staticmethod
+    def _stop_row(anchor, is_open):
+        return {
+            'started_at': _datetime(anchor['t0']),
+            'ended_at': _datetime(anchor['t1']),
+            'latitude': anchor['slat'] / anchor['n'],
+            'longitude': anchor['slon'] / anchor['n'],
+            'duration_seconds': anchor['t1'] - anchor['t0'],
+            'point_count': anchor['n'],
+            'mission_id': _top(anchor['missions']) or anchor.get('arrival_mission'),
+            'is_open': is_open
+        }
+
+
+def _upsert(model, rows, key):
+    """Insert rows, or update the stored row with the same `key` columns. Does not commit."""
+    if not rows:
+        return
+    table = model.__table__
+    insert = UPSERT_DIALECTS.get(db.engine.dialect.name)
+    if insert is None:
+        for row in rows:
+            db.session.execute(table.delete().where(*(table.c[column] == row[column] for column in key)))
+        db.session.execute(table.insert(), rows)
+        return
+    statement = insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(key),
+        set_={column: statement.excluded[column] for column in rows[0] if column not in key + ('created_at',)}
+    )
+    db.session.execute(statement, rows)
+
+
+class TripService:
+
+    @staticmethod
+    def segmenter():
+        config = current_app.config
+        return TripSegmenter(config['TRIP_STOP_RADIUS_M'], config['TRIP_STOP_MIN_SECONDS'],
+                             config['TRIP_MOVING_SPEED_KMH'], config['TRIP_GAP_SECONDS'])
+
+    @staticmethod
+    def segment_locations(max_points=None):
+        """Cut the location points stored since the last run into trips and stops (scheduled job).
+
+        Points are read in id order, batch by batch, each committed with the
+        vehicle states. Each run starts TRIP_SEGMENT_OVERLAP ids below the
+        highest id read, for the points whose transaction committed after
+        higher ids were read; the ids already fed are kept in the vehicle
+        states and skipped. A point older than the last one fed for its
+        vehicle cuts the vehicle again from the trip or stop it falls in.
+        """
+        config = current_app.config
+        batch_size = config['TRIP_SEGMENT_BATCH']
+        overlap = config['TRIP_SEGMENT_OVERLAP']
+        max_points = max_points or config['TRIP_SEGMENT_MAX_POINTS']
+        segmenter = TripService.segmenter()
+        summary = {'points': 0, 'late': 0, 'resegmented': 0, 'vehicles': 0, 'trips': 0, 'stops': 0}
+
+        cursor = db.session.query(func.max(VehicleTripState.last_location_id)).scalar() or 0
+        cursor = max(cursor - overlap, 0)
+        table = Location.__table__
+        columns = [table.c[column] for column in SEGMENT_COLUMNS]
+        read = 0
+        while read < max_points:
+            rows = db.session.execute(
+                select(*columns).where(table.c.id > cursor).order_by(table.c.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            try:
+                TripService._segment_batch(segmenter, rows, rows[-1].id - overlap, summary)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            cursor = rows[-1].id
+            read += len(rows)
+            if len(rows) < batch_size:
+                break
+
+        return summary, 200
+
+    @staticmethod
+    def _segment_batch(segmenter, rows, floor, summary):
+        """Feed a batch of location rows, in id order. Ids above `floor` are remembered as fed."""
+        by_vehicle = {}
+        for row in rows:
+            by_vehicle.setdefault(row.vehicle_id, []).append(row)
+
+        query = db.session.query(VehicleTripState.vehicle_id, VehicleTripState.last_location_id,
+                                 VehicleTripState.state)
+        if len(by_vehicle) <= STATE_LOOKUP_LIMIT:
+            query = query.filter(VehicleTripState.vehicle_id.in_(list(by_vehicle)))
+        states = {row.vehicle_id: row for row in query if row.vehicle_id in by_vehicle}
+
+        now = datetime.utcnow()
+        trips, stops, state_rows = [], [], []
+        for vehicle_id, vehicle_rows in by_vehicle.items():
+            stored = states.get(vehicle_id)
+            state = json.loads(stored.state) if stored else {}
+            # A state saved before the overlap existed read every id up to its last one
+            known = stored.last_location_id if stored and 'fed' not in state else 0
+            fed = set(state.pop('fed', ()))
+            new_rows = [row for row in vehicle_rows if row.id > known and row.id not in fed]
+            if not new_rows:
+                continue  # all read by an earlier run
+
+            last = state.get('last')
+            late = [row for row in new_rows if last is not None and _seconds(row.timestamp) <= last[0]]
+            if late:
+                start = TripService._resegment_start(vehicle_id, min(row.timestamp for row in late))
+                points = TripService._points_since(vehicle_id, start, rows[-1].id)
+                state = {}
+                summary['late'] += len(late)
+                summary['resegmented'] += 1
+            else:
+                points = sorted((row._mapping for row in new_rows), key=lambda point: point['timestamp'])
+
+            vehicle_trips, vehicle_stops, _ = segmenter.feed(state, points)
+            for trip in vehicle_trips.values():
+                # A rewritten trip is matched to the roads again once closed
+                trips.append(dict(trip, vehicle_id=vehicle_id, created_at=now, updated_at=now, **UNMATCHED))
+            for stop in vehicle_stops.values():
+                stops.append(dict(stop, vehicle_id=vehicle_id, created_at=now, updated_at=now))
+            fed.update(point['id'] for point in points if point['id'] is not None)
+            state['fed'] = sorted(location_id for location_id in fed if location_id > floor)
+            state_rows.append({
+                'vehicle_id': vehicle_id,
+                'last_location_id': max(new_rows[-1].id, stored.last_location_id if stored else 0),
+                'last_timestamp': _datetime(state['last'][0]) if state.get('last') else None,
+                'state': json.dumps(state, separators=(',', ':'))
+            })
+            summary['points'] += len(new_rows)
+
+        TripService._match_stops(stops)
+        _upsert(Trip, trips, ('vehicle_id', 'started_at'))
+        _upsert(Stop, stops, ('vehicle_id', 'started_at'))
+        _upsert(VehicleTripState, state_rows, ('vehicle_id',))
+        summary['vehicles'] += len(state_rows)
+        summary['trips'] += len(trips)
+        summary['stops'] += len(stops)
+
+    @staticmethod
+    def _resegment_start(vehicle_id, timestamp):
+        """Delete the vehicle's trips and stops from the first one not over at `timestamp`, and return its start."""
+        start = timestamp
+        for model in (Trip, Stop):
+            first = db.session.query(func.min(model.started_at)).filter(
+                model.vehicle_id == vehicle_id, model.ended_at >= timestamp
+            ).scalar()
+            if first is not None and first < start:
+                start = first
+        for model in (Trip, Stop):
+            model.query.filter(model.vehicle_id == vehicle_id, model.started_at >= start).delete()
+        return start
+
+    @staticmethod
+    def _points_since(vehicle_id, start, max_id):
+        """The vehicle's points from `start` in time order, stored up to location id `max_id` or compacted."""
+        table = Location.__table__
+        rows = db.session.execute(
+            select(*(table.c[column] for column in SEGMENT_COLUMNS))
+            .where(table.c.vehicle_id == vehicle_id, table.c.timestamp >= start, table.c.id <= max_id)
+        ).all()
+        points = [row._mapping for row in rows]
+        points.extend(dict(location, timestamp=timestamp)
+                      for timestamp, location in TrackService.track_locations(vehicle_id, start=start))
+        points.sort(key=lambda point: point['timestamp'])
+        return points
+
+    @staticmethod
+    def _match_stops(stops):
+        """Set the geofence each stop is in, and the end of its mission it is at."""
+        from app.services.geofence_engine import geofence_engine
+
+        index = geofence_engine.index() if geofence_engine.enabled and stops else None
+        mission_ids = {stop['mission_id'] for stop in stops if stop['mission_id'] is not None}
+        missions = {}
+        if mission_ids:
+            missions = {row.id: row for row in db.session.query(
+                Mission.id, Mission.start_latitude, Mission.start_longitude, Mission.end_latitude, Mission.end_longitude
+            ).filter(Mission.id.in_(mission_ids))}
+        radius = current_app.config['TRIP_ENDPOINT_RADIUS_M']
+
+        for stop in stops:
+            lat, lon = stop['latitude'], stop['longitude']
+            fences = index.containing(lat, lon) if index is not None else []
+            # The smallest of nested fences, a depot inside a restricted zone is the depot
+            stop['geofence_id'] = min(
+                fences, key=lambda fence: (fence.north - fence.south) * (fence.east - fence.west)
+            ).id if fences else None
+
+            stop['mission_endpoint'] = None
+            mission = missions.get(stop['mission_id'])
+            if mission is not None:
+                to_start = _distance_m(lat, lon, mission.start_latitude, mission.start_longitude)
+                to_end = _distance_m(lat, lon, mission.end_latitude, mission.end_longitude)
+                if min(to_start, to_end) <= radius:
+                    stop['mission_endpoint'] = 'end' if to_end <= to_start else 'start'
+
+    @staticmethod
+    def get_trips(page):
+        """Get trips, one page at a time."""
+        try:
+            trips, pagination = page.apply(Trip.query)
+            return {'trips': [trip.to_dict() for trip in trips], 'pagination': pagination}, 200
+        except Exception as e:
+            return {'error': str(e)}, 500
+
+    @staticmethod
+    def get_stops(page):
+        """Get stops, one page at a time."""
+        try:
+            stops, pagination = page.apply(Stop.query)
+            return {'stops': [stop.to_dict() for stop in stops], 'pagination': pagination}, 200
+        except Exception as e:
+            return {'error': str(e)}, 500
+
+    @staticmethod
+    def vehicle_timeline(vehicle_id, start, end):
+        """Trips and stops of a vehicle overlapping [start, end], in time order."""
+        try:
+            vehicle = Vehicle.query.get(vehicle_id)
+            if not vehicle:
+                return {'error': 'Vehicle not found'}, 404
+
+            timeline = []
+            for kind, model in (('trip', Trip), ('stop', Stop)):
+                rows = model.query.filter(
+                    model.vehicle_id == vehicle_id,
+                    model.started_at <= end,
+                    model.ended_at >= start
+                ).all()
+                timeline.extend(dict(row.to_dict(), kind=kind) for row in rows)
+            timeline.sort(key=lambda item: item['started_at'])
+
+            return {'vehicle': vehicle.to_dict(), 'timeline': timeline}, 200
+
+        except Exception as e:
+            return {'error': str(e)}, 500
+
+    @staticmethod
+    def get_trip(trip_id):
+        """Get one trip with its geometry matched to the roads."""
+        try:
+            trip = Trip.query.get(trip_id)
+            if not trip:
+                return {'error': 'Trip not found'}, 404
+
+            return {'trip': trip.to_dict(include_geometry=True)}, 200
+
+        except Exception as e:
+            return {'error': str(e)}, 500
+
+    @staticmethod
+    def mission_report(mission_id):
+        """Driving and stops of a mission from its trips and stops."""
+        try:
+            mission = Mission.query.get(mission_id)
+            if not mission:
+                return {'error': 'Mission not found'}, 404
+
+            trips = Trip.query.filter_by(mission_id=mission_id).order_by(Trip.started_at).all()
+            stops = Stop.query.filter_by(mission_id=mission_id).order_by(Stop.started_at).all()
+            driving_seconds = sum(trip.duration_seconds for trip in trips)
+            # Along the roads for the trips snapped to the road graph, else along the raw points
+            distance_m = sum(trip.distance_m if trip.matched_distance_m is None else trip.matched_distance_m
+                             for trip in trips)
+            arrival = next((stop for stop in stops if stop.mission_endpoint == 'end'), None)
+
+            return {
+                'mission': mission.to_dict(expand=()),
+                'summary': {
+                    'distance_km': round(distance_m / 1000, 2),
+                    'raw_distance_km': round(sum(trip.distance_m for trip in trips) / 1000, 2),
+                    'matched_trips': sum(1 for trip in trips if trip.matched_distance_m is not None),
+                    'driving_seconds': driving_seconds,
+                    'stopped_seconds': sum(stop.duration_seconds for stop in stops),
+                    'avg_speed': round(distance_m / driving_seconds * 3.6, 1) if driving_seconds else None,
+                    'max_speed': max((trip.max_speed for trip in trips if trip.max_speed is not None), default=None),
+                    'trips': len(trips),
+                    'stops': len(stops),
+                    'stops_outside_endpoints': sum(1 for stop in stops if stop.mission_endpoint is None),
+                    'arrived_at': arrival.started_at.isoformat() if arrival else None
+                },
+                'trips': [trip.to_dict() for trip in trips],
+                'stops': [stop.to_dict() for stop in stops]
+            }, 200
+
+        except Exception as e:
+            return {'error': str(e)}, 500
+
+    @staticmethod
+    def idle_analytics(hours=24, min_minutes=0):
+        """Time spent stopped per vehicle and per geofence, from the stops of the last `hours`."""
+        try:
+            since = datetime.utcnow() - timedelta(hours=hours)
+            recent = or_(Stop.started_at >= since, Stop.is_open.is_(True))
+            if min_minutes:
+                recent = recent & (Stop.duration_seconds >= min_minutes * 60)
+
+            per_vehicle = db.session.query(
+                Stop.vehicle_id,
+                func.count(Stop.id),
+                func.sum(Stop.duration_seconds),
+                func.max(Stop.duration_seconds),
+                func.sum(case((Stop.mission_endpoint.is_(None) & Stop.mission_id.isnot(None), Stop.duration_seconds),
+                              else_=0))
+            ).filter(recent).group_by(Stop.vehicle_id).all()
+            plates = dict(db.session.query(Vehicle.id, Vehicle.license_plate).filter(
+                Vehicle.id.in_([row[0] for row in per_vehicle])
+            ).all()) if per_vehicle else {}
+
+            per_geofence = db.session.query(
+                Stop.geofence_id, func.count(Stop.id), func.sum(Stop.duration_seconds)
+            ).filter(recent, Stop.geofence_id.isnot(None)).group_by(Stop.geofence_id).all()
+
+            current = Stop.query.filter(Stop.is_open.is_(True)).order_by(Stop.started_at).limit(100).all()
+
+            vehicles = [{
+                'vehicle_id': vehicle_id,
+                'license_plate': plates.get(vehicle_id),
+                'stops': count,
+                'stopped_minutes': round((total or 0) / 60, 1),
+                'longest_stop_minutes': round((longest or 0) / 60, 1),
+                'mission_idle_minutes': round((mission_idle or 0) / 60, 1)
+            } for vehicle_id, count, total, longest, mission_idle in per_vehicle]
+            vehicles.sort(key=lambda item: item['stopped_minutes'], reverse=True)
+
+            return {
+                'since': since.isoformat(),
+                'vehicles': vehicles,
+                'geofences': [{
+                    'geofence_id': geofence_id,
+                    'stops': count,
+                    'stopped_minutes': round((total or 0) / 60, 1)
+                } for geofence_id, count, total in per_geofence],
+                'currently_stopped': [stop.to_dict() for stop in current]
+            }, 200
+
+        except Exception as e:
+            return {'error': str(e)}, 500
@@ -1,7 +1,8 @@
-from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.vehicle import Vehicle
 from app.models.user import User
 from app import db
+from app.utils.auth import current_user_has_role
+from app.utils.serialization import SerializationOptions, serialize
 from datetime import datetime
 
 class VehicleService:
@@ -10,10 +11,7 @@ class VehicleService:
     def create_vehicle(vehicle_data):
         """Create a new vehicle."""
         try:
-            current_user_id = get_jwt_identity()
-            current_user = User.query.get(current_user_id)
-            
-            if not current_user or current_user.role not in ['admin', 'manager']:
+            if not current_user_has_role('admin', 'manager'):
                 return {'error': 'Insufficient permissions'}, 403
             
             # Check if license plate already exists
@@ -40,13 +38,26 @@ class VehicleService:
             return {'error': str(e)}, 500
     
     @staticmethod
-    def get_vehicles():
-        """Get all vehicles."""
+    def get_vehicles(serialization=None, page=None):
+        """Get all vehicles, one page at a time when `page` is given."""
         try:
-            vehicles = Vehicle.query.all()
-            return {
-                'vehicles': [vehicle.to_dict() for vehicle in vehicles]
-            }, 200
+            serialization = serialization or SerializationOptions('vehicles')
+            query = Vehicle.query.options(*serialization.load_options())
+            
+            pagination = None
+            if page is not None:
+                vehicles, pagination = page.apply(query)
+            else:
+                vehicles = query.all()
+            
+            data, included = serialize(vehicles, serialization)
+            result = {'vehicles': data}
+            if pagination is not None:
+                result['pagination'] = pagination
+            if included is not None:
+                result['included'] = included
+            
+            return result, 200
             
         except Exception as e:
             return {'error': str(e)}, 500
@@ -68,10 +79,7 @@ class VehicleService:
     def update_vehicle(vehicle_id, vehicle_data):
         """Update a vehicle."""
         try:
-            current_user_id = get_jwt_identity()
-            current_user = User.query.get(current_user_id)
-            
-            if not current_user or current_user.role not in ['admin', 'manager']:
+            if not current_user_has_role('admin', 'manager'):
                 return {'error': 'Insufficient permissions'}, 403
             
             vehicle = Vehicle.query.get(vehicle_id)
@@ -97,10 +105,7 @@ class VehicleService:
     def assign_driver(vehicle_id, driver_id):
         """Assign a driver to a vehicle."""
         try:
-            current_user_id = get_jwt_identity()
-            current_user = User.query.get(current_user_id)
-            
-            if not current_user or current_user.role not in ['admin', 'manager']:
+            if not current_user_has_role('admin', 'manager'):
                 return {'error': 'Insufficient permissions'}, 403
             
             vehicle = Vehicle.query.get(vehicle_id)
@@ -138,13 +143,26 @@ class VehicleService:
             return {'error': str(e)}, 500
     
     @staticmethod
-    def get_available_vehicles():
-        """Get all available vehicles."""
+    def get_available_vehicles(serialization=None, page=None):
+        """Get all available vehicles, one page at a time when `page` is given."""
         try:
-            vehicles = Vehicle.query.filter_by(status='available').all()
-            return {
-                'vehicles': [vehicle.to_dict() for vehicle in vehicles]
-            }, 200
+            serialization = serialization or SerializationOptions('vehicles')
+            query = Vehicle.query.options(*serialization.load_options()).filter_by(status='available')
+            
+            pagination = None
+            if page is not None:
+                vehicles, pagination = page.apply(query)
+            else:
+                vehicles = query.all()
+            
+            data, included = serialize(vehicles, serialization)
+            result = {'vehicles': data}
+            if pagination is not None:
+                result['pagination'] = pagination
+            if included is not None:
+                result['included'] = included
+            
+            return result, 200
             
         except Exception as e:
             return {'error': str(e)}, 500
@@ -153,10 +171,7 @@ class VehicleService:
     def delete_vehicle(vehicle_id):
         """Delete a vehicle."""
         try:
-            current_user_id = get_jwt_identity()
-            current_user = User.query.get(current_user_id)
-            
-            if not current_user or current_user.role not in ['admin']:
+            if not current_user_has_role('admin'):
                 return {'error': 'Insufficient permissions'}, 403
             
             vehicle = Vehicle.query.get(vehicle_id)
@@ -193,10 +208,7 @@ class VehicleService:
     def delete_vehicle_with_reassignment(vehicle_id, reassign_to_vehicle_id=None):
         """Delete a vehicle and reassign its missions."""
         try:
-            current_user_id = get_jwt_identity()
-            current_user = User.query.get(current_user_id)
-            
-            if not current_user or current_user.role not in ['admin']:
+            if not current_user_has_role('admin'):
                 return {'error': 'Insufficient permissions'}, 403
             
             vehicle = Vehicle.query.get(vehicle_id)
@@ -1,7 +1,139 @@
+import threading
+import time
 from functools import wraps
-from flask import jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import jsonify, g, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from sqlalchemy import event
+from app import db
 from app.models.user import User
+from app.utils.metrics import CACHE_REQUESTS
+
+# Process-wide cache of user_id -> (role, is_active, expires_at), see AUTH_USER_CACHE_TTL
+_user_status_cache = {}
+_user_status_lock = threading.Lock()
+
+def init_auth(app):
+    """Reset the request-scoped identity cache at the start of every request."""
+    @app.before_request
+    def reset_identity_cache():
+        g.pop('current_user', None)
+        g.pop('current_identity', None)
+
+def invalidate_user_cache(user_id=None):
+    """Drop cached identity data for one user, or for everyone when user_id is None."""
+    with _user_status_lock:
+        if user_id is None:
+            _user_status_cache.clear()
+        else:
+            _user_status_cache.pop(user_id, None)
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_on_change(mapper, connection, target):
+    invalidate_user_cache(target.id)
+
+def get_current_user():
+    """Authenticated user of this request, loaded from the database at most once per request."""
+    if 'current_user' not in g:
+        user_id = get_jwt_identity()
+        g.current_user = db.session.get(User, user_id) if user_id is not None else None
+    return g.current_user
+
+class CurrentUser:
+    """The authenticated caller as authorization knows it.
+
+    id, role and is_active come from the token and the user status cache;
+    any other attribute loads the User row, at most once per request.
+    """
+
+    def __init__(self, user_id, role, is_active):
+        self.id = user_id
+        self.role = role
+        self.is_active = is_active
+
+    def __getattr__(self, name):
+        user = get_current_user()
+        if user is None:
+            raise AttributeError(name)
+        return getattr(user, name)
+
+    def __repr__(self):
+        return f'<CurrentUser {self.id} {self.role}>'
+
+def get_current_identity():
+    """The caller of this request as a CurrentUser, or None if the user no longer exists."""
+    if 'current_identity' not in g:
+        user_id = get_jwt_identity()
+        status = get_user_status(user_id) if user_id is not None else None
+        g.current_identity = CurrentUser(user_id, *status) if status else None
+    return g.current_identity
+
+def get_user_status(user_id):
+    """Return (role, is_active) for a user, or None if the user does not exist.
+
+    Served from the request-scoped user when it is already loaded, then from
+    the short-TTL process cache, and only then with a narrow database query.
+    """
+    current = g.get('current_user')
+    if current is not None and current.id == user_id:
+        return current.role, current.is_active
+
+    ttl = current_app.config.get('AUTH_USER_CACHE_TTL', 0)
+    now = time.monotonic()
+    if ttl > 0:
+        with _user_status_lock:
+            cached = _user_status_cache.get(user_id)
+        if cached and cached[2] > now:
+            CACHE_REQUESTS.inc('auth_user', 'hit')
+            return cached[0], cached[1]
+        CACHE_REQUESTS.inc('auth_user', 'miss')
+
+    row = db.session.query(User.role, User.is_active).filter(User.id == user_id).first()
+    if row is None:
+        return None
+
+    if ttl > 0:
+        with _user_status_lock:
+            _user_status_cache[user_id] = (row.role, row.is_active, now + ttl)
+    return row.role, row.is_active
+
+def current_user_has_role(*roles):
+    """Check the role of the authenticated user.
+
+    The role claim embedded in the token rejects unauthorized callers without
+    touching the database; accepted callers are confirmed against the cached
+    user status so deactivations and role changes apply within the cache TTL.
+    """
+    claimed_role = get_jwt().get('role')
+    if claimed_role is not None and claimed_role not in roles:
+        return False
+
+    status = get_user_status(get_jwt_identity())
+    if status is None:
+        return False
+
+    role, is_active = status
+    return bool(is_active) and role in roles
+
+def _authorize(roles, error_message):
+    """Shared body of the decorators: returns (CurrentUser, None) or (None, error response).
+
+    Decided from the token's role claim and the cached user status, without
+    loading the user; handlers that need the full row get it on first use.
+    """
+    if roles:
+        claimed_role = get_jwt().get('role')
+        if claimed_role is not None and claimed_role not in roles:
+            return None, (jsonify({'error': error_message}), 403)
+
+    current_user = get_current_identity()
+    if not current_user or not current_user.is_active:
+        return None, (jsonify({'error': 'Invalid or inactive user'}), 401)
+
+    if roles and current_user.role not in roles:
+        return None, (jsonify({'error': error_message}), 403)
+
+    return current_user, None
 
 def token_required(f):
     """Decorator to require valid JWT token."""
@@ -9,16 +141,14 @@ def token_required(f):
     @jwt_required()
     def decorated_function(*args, **kwargs):
         try:
-            current_user_id = get_jwt_identity()
-            current_user = User.query.get(current_user_id)
-            
-            if not current_user or not current_user.is_active:
-                return jsonify({'error': 'Invalid or inactive user'}), 401
-            
+            current_user, error = _authorize((), None)
+            if error:
+                return error
+
             return f(current_user, *args, **kwargs)
         except Exception as e:
             return jsonify({'error': 'Token validation failed'}), 401
-    
+
     return decorated_function
 
 def admin_required(f):
@@ -27,19 +157,14 @@ def admin_required(f):
     @jwt_required()
     def decorated_function(*args, **kwargs):
         try:
-            current_user_id = get_jwt_identity()
-            current_user = User.query.get(current_user_id)
-            
-            if not current_user or not current_user.is_active:
-                return jsonify({'error': 'Invalid or inactive user'}), 401
-            
-            if current_user.role != 'admin':
-                return jsonify({'error': 'Admin privileges required'}), 403
-            
+            current_user, error = _authorize(('admin',), 'Admin privileges required')
+            if error:
+                return error
+
             return f(current_user, *args, **kwargs)
         except Exception as e:
             return jsonify({'error': 'Authorization failed'}), 401
-    
+
     return decorated_function
 
 def manager_required(f):
@@ -48,17 +173,12 @@ def manager_required(f):
     @jwt_required()
     def decorated_function(*args, **kwargs):
         try:
-            current_user_id = get_jwt_identity()
-            current_user = User.query.get(current_user_id)
-            
-            if not current_user or not current_user.is_active:
-                return jsonify({'error': 'Invalid or inactive user'}), 401
-            
-            if current_user.role not in ['admin', 'manager']:
-                return jsonify({'error': 'Manager privileges required'}), 403
-            
+            current_user, error = _authorize(('admin', 'manager'), 'Manager privileges required')
+            if error:
+                return error
+
             return f(current_user, *args, **kwargs)
         except Exception as e:
             return jsonify({'error': 'Authorization failed'}), 401
-    
+
     return decorated_function
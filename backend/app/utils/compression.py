@@ -0,0 +1,84 @@
+import gzip
+import zlib
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Mimetypes worth compressing, anything else (images, zip files) is sent as is
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/geo+json', 'application/gpx+xml',
+    'application/vnd.google-earth.kml+xml', 'application/javascript', 'application/xml',
+    'text/html', 'text/css', 'text/csv', 'text/plain', 'text/xml', 'image/svg+xml'
+}
+
+
+def _choose_encoding(accept_encodings):
+    """Best encoding the client accepts, brotli first on equal quality."""
+    candidates = (['br'] if brotli is not None else []) + ['gzip']
+    qualities = {encoding: accept_encodings[encoding] for encoding in candidates}
+    best = max(candidates, key=lambda encoding: qualities[encoding])
+    return best if qualities[best] > 0 else None
+
+
+def _compress(data, encoding, config):
+    if encoding == 'br':
+        return brotli.compress(data, quality=config['COMPRESS_BROTLI_QUALITY'])
+    return gzip.compress(data, compresslevel=config['COMPRESS_LEVEL'], mtime=0)
+
+
+def _compress_stream(chunks, encoding, config):
+    """Compress a streamed body chunk by chunk, flushing after each one so the client keeps receiving data."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=config['COMPRESS_BROTLI_QUALITY'])
+        compress, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(config['COMPRESS_LEVEL'], zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        compress, flush, finish = compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), \
+            compressor.flush
+    try:
+        for chunk in chunks:
+            data = compress(chunk.encode('utf-8') if isinstance(chunk, str) else chunk) + flush()
+            if data:
+                yield data
+        yield finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def init_compression(app):
+    """Compress responses with brotli or gzip, as negotiated with Accept-Encoding.
+
+    Bodies under COMPRESS_MIN_SIZE bytes and non-text mimetypes are left
+    alone; streamed responses are compressed on the fly.
+    """
+    if not app.config['COMPRESS_RESPONSES']:
+        return
+
+    @app.after_request
+    def compress_response(response):
+        if (response.status_code < 200 or response.status_code in (204, 206, 304)
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or response.direct_passthrough or 'Content-Encoding' in response.headers
+                or request.method == 'HEAD'):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = _choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        config = app.config
+        if response.is_streamed:
+            response.response = _compress_stream(response.response, encoding, config)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < config['COMPRESS_MIN_SIZE']:
+                return response
+            response.set_data(_compress(data, encoding, config))
+        response.headers['Content-Encoding'] = encoding
+        return response
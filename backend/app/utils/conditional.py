@@ -0,0 +1,95 @@
+import hashlib
+from datetime import datetime
+from functools import wraps
+from flask import make_response, request
+from sqlalchemy import func
+from app import db
+from app.models.location import Location
+from app.models.mission import Mission
+from app.models.trip_track import TripTrack
+from app.models.user import User
+from app.models.vehicle import Vehicle
+from app.utils.metrics import CACHE_REQUESTS
+
+
+def _table_state(model):
+    """(row count, latest updated_at) of a small table: changes on insert, update and delete."""
+    return tuple(db.session.query(func.count(model.id), func.max(model.updated_at)).one())
+
+
+def _latest_location():
+    """(id, created_at) of the newest location point, read from the primary key index."""
+    row = db.session.query(Location.id, Location.created_at).order_by(Location.id.desc()).first()
+    return tuple(row) if row else (None, None)
+
+
+def table_version(*models):
+    """Version function for list endpoints over `models` (and the tables they embed)."""
+    def version(**kwargs):
+        states = [_table_state(model) for model in models]
+        return states, max((latest for _, latest in states if latest), default=None)
+    return version
+
+
+def fleet_version(**kwargs):
+    """Fleet snapshots: vehicles, missions, users and the newest location point."""
+    location_id, location_at = _latest_location()
+    states = [_table_state(Vehicle), _table_state(Mission), _table_state(User)]
+    latest = [at for _, at in states if at] + ([location_at] if location_at else [])
+    return (location_id, states), max(latest, default=None)
+
+
+def route_version(**kwargs):
+    """Routes: newest location point, trip tracks, vehicles and missions, plus the current
+    minute since a route over the last N hours also changes as old points leave the window."""
+    location_id, _ = _latest_location()
+    tracks = db.session.query(func.max(TripTrack.updated_at)).scalar()
+    minute = datetime.utcnow().replace(second=0, microsecond=0)
+    return (location_id, tracks, _table_state(Vehicle), _table_state(Mission), minute), None
+
+
+def _etag(marker):
+    # The query string and the caller's credentials are part of what the response depends on
+    key = repr((marker, request.full_path, request.headers.get('Authorization')))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def conditional_get(version):
+    """Answer 304 Not Modified, without running the view, while the data is unchanged.
+
+    `version(**view_kwargs)` returns (marker, last_modified) from a few cheap
+    queries; the weak ETag hashes the marker with the request, Last-Modified
+    is sent when known. Put it under the auth decorators so they still run.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            try:
+                marker, last_modified = version(**kwargs)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Conditional GET disabled for {request.path}: {e}")
+                return f(*args, **kwargs)
+
+            etag = _etag(marker)
+            if last_modified is not None:
+                last_modified = last_modified.replace(microsecond=0)
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            elif last_modified is not None and request.if_modified_since:
+                not_modified = last_modified <= request.if_modified_since.replace(tzinfo=None)
+            else:
+                not_modified = False
+
+            CACHE_REQUESTS.inc('conditional_get', 'hit' if not_modified else 'miss')
+            response = make_response('', 304) if not_modified else make_response(f(*args, **kwargs))
+            if response.status_code in (200, 304):
+                response.set_etag(etag, weak=True)
+                if last_modified is not None:
+                    response.last_modified = last_modified
+                # Clients may keep the body but must revalidate before using it
+                response.cache_control.no_cache = True
+            return response
+        return decorated_function
+    return decorator
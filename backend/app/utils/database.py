@@ -1,9 +1,59 @@
+from sqlalchemy import inspect, text
 from app import db
 from app.models.user import User
 from app.models.vehicle import Vehicle
 from app.models.mission import Mission
 from app.models.location import Location
 from app.models.anomaly import Anomaly
+from app.utils.spatial import ensure_spatial_schema
+
+def ensure_indexes():
+    """Create indexes declared on the models that are missing from an existing database.
+
+    Writes rely on the unique indexes (ON CONFLICT upserts), so failing to
+    create one stops the startup.
+    """
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=db.engine, checkfirst=True)
+            except Exception as e:
+                if index.unique:
+                    raise RuntimeError(f"Could not create unique index {index.name}: {e}") from e
+                print(f"Could not create index {index.name}: {e}")
+
+def dedupe_locations():
+    """Keep the newest copy of each (vehicle_id, timestamp) point of a database older than its unique index."""
+    inspector = inspect(db.engine)
+    if not inspector.has_table('locations'):
+        return
+    if any(index['name'] == 'uq_locations_vehicle_timestamp' for index in inspector.get_indexes('locations')):
+        return
+    with db.engine.begin() as connection:
+        result = connection.execute(text(
+            'DELETE FROM locations WHERE EXISTS (SELECT 1 FROM locations newer '
+            'WHERE newer.vehicle_id = locations.vehicle_id AND newer.timestamp = locations.timestamp '
+            'AND newer.id > locations.id)'
+        ))
+    if result.rowcount:
+        print(f"Removed {result.rowcount} duplicate (vehicle_id, timestamp) locations before indexing them")
+
+def ensure_columns():
+    """Add nullable columns declared on the models that are missing from an existing table."""
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            try:
+                with db.engine.begin() as connection:
+                    connection.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+            except Exception as e:
+                print(f"Could not add column {table.name}.{column.name}: {e}")
 
 def init_db(app):
     """Initialize database with app context."""
@@ -12,6 +62,14 @@ def init_db(app):
         # Create all tables
         db.create_all()
         
+        # create_all() skips tables that already exist, add their new columns and indexes
+        ensure_columns()
+        dedupe_locations()
+        ensure_indexes()
+        
+        # Geography columns and GiST indexes when SPATIAL_BACKEND=postgis
+        ensure_spatial_schema()
+        
         # Create default admin user if not exists
         admin_user = User.query.filter_by(username='admin').first()
         if not admin_user:
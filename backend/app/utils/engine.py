@@ -0,0 +1,68 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from app import db
+
+
+def configure_engine_options(app):
+    """Fill SQLALCHEMY_ENGINE_OPTIONS from the DB_* settings before the engine is created.
+
+    Options set explicitly in SQLALCHEMY_ENGINE_OPTIONS win. Pool sizing only
+    applies to server databases, SQLite gets a busy timeout on the driver.
+    """
+    config = app.config
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+
+    if url.get_backend_name() == 'sqlite':
+        connect_args = dict(options.get('connect_args') or {})
+        if config['SQLITE_BUSY_TIMEOUT'] not in (None, ''):
+            connect_args.setdefault('timeout', int(config['SQLITE_BUSY_TIMEOUT']) / 1000)
+        options['connect_args'] = connect_args
+    else:
+        options.setdefault('pool_size', config['DB_POOL_SIZE'])
+        options.setdefault('max_overflow', config['DB_MAX_OVERFLOW'])
+        options.setdefault('pool_timeout', config['DB_POOL_TIMEOUT'])
+        options.setdefault('pool_recycle', config['DB_POOL_RECYCLE'])
+        options.setdefault('pool_pre_ping', config['DB_POOL_PRE_PING'])
+
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def _integer(value):
+    """Integer pragma values, parsed so a typo fails at startup instead of going into SQL."""
+    return None if value in (None, '') else int(value)
+
+
+def sqlite_pragmas(config):
+    """PRAGMA statements run on every new SQLite connection, empty settings are skipped."""
+    settings = [
+        ('journal_mode', config['SQLITE_JOURNAL_MODE']),
+        ('synchronous', config['SQLITE_SYNCHRONOUS']),
+        ('busy_timeout', _integer(config['SQLITE_BUSY_TIMEOUT'])),
+        ('cache_size', _integer(config['SQLITE_CACHE_SIZE'])),
+        ('mmap_size', _integer(config['SQLITE_MMAP_SIZE'])),
+        ('foreign_keys', 'ON' if config['SQLITE_FOREIGN_KEYS'] else None)
+    ]
+    return [f'PRAGMA {name}={value}' for name, value in settings if value not in (None, '')]
+
+
+def register_engine_events(app):
+    """Apply the SQLite pragmas to every connection opened by the app's engine."""
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+
+    pragmas = sqlite_pragmas(app.config)
+    if engine.url.database in (None, '', ':memory:'):
+        # WAL and mmap do not apply to in-memory databases
+        pragmas = [p for p in pragmas if not p.startswith(('PRAGMA journal_mode', 'PRAGMA mmap_size'))]
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
@@ -0,0 +1,146 @@
+"""In-memory spatial index of geofences for point-in-zone tests on ingested points.
+
+Fences are registered in the cells of a uniform lat/lon grid that their
+bounding box overlaps. A point looks up its cell, checks the bounding box of
+each fence registered there, then runs the exact test: a distance on a local
+equirectangular projection for circles, ray casting for polygons, whose
+edges are split in latitude bands so a point only crosses the edges of its
+band. Fences are small next to the Earth: neither the poles nor polygons
+crossing the antimeridian are handled.
+"""
+import math
+
+METERS_PER_DEGREE = 6371000 * math.pi / 180
+
+# A fence spanning more cells than this is checked against every point instead
+MAX_CELLS_PER_FENCE = 4096
+
+# Edges per latitude band of a polygon, on average
+EDGES_PER_BAND = 8
+
+
+def circle_bounds(latitude, longitude, radius_m):
+    """(south, west, north, east) of a box containing the circle."""
+    dlat = radius_m / METERS_PER_DEGREE
+    dlon = dlat / max(math.cos(math.radians(latitude)), 1e-6)
+    return latitude - dlat, longitude - dlon, latitude + dlat, longitude + dlon
+
+
+def polygon_bounds(vertices):
+    latitudes = [vertex[0] for vertex in vertices]
+    longitudes = [vertex[1] for vertex in vertices]
+    return min(latitudes), min(longitudes), max(latitudes), max(longitudes)
+
+
+def validate_geometry(shape, points=None, center_latitude=None, center_longitude=None, radius_m=None):
+    """Check a fence geometry and return its bounds. Raises ValueError."""
+    if shape == 'circle':
+        if center_latitude is None or center_longitude is None or radius_m is None:
+            raise ValueError('A circle needs center_latitude, center_longitude and radius_m')
+        if not -90 <= center_latitude <= 90 or not -180 <= center_longitude <= 180:
+            raise ValueError('Circle center out of range')
+        if radius_m <= 0:
+            raise ValueError('radius_m must be positive')
+        return circle_bounds(center_latitude, center_longitude, radius_m)
+
+    if shape == 'polygon':
+        if not isinstance(points, list) or len(points) < 3:
+            raise ValueError('A polygon needs at least 3 [lat, lon] points')
+        for point in points:
+            if (not isinstance(point, (list, tuple)) or len(point) != 2
+                    or not all(isinstance(value, (int, float)) for value in point)):
+                raise ValueError('Polygon points must be [lat, lon] pairs')
+            if not -90 <= point[0] <= 90 or not -180 <= point[1] <= 180:
+                raise ValueError('Polygon point out of range')
+        return polygon_bounds(points)
+
+    raise ValueError("shape must be 'polygon' or 'circle'")
+
+
+class CompiledFence:
+    """One fence ready for containment tests; `contains` assumes the bbox check passed."""
+
+    __slots__ = ('id', 'name', 'category', 'dwell_seconds', 'south', 'west', 'north', 'east',
+                 'contains', '_center', '_radius_sq', '_scale', '_bands', '_band_height')
+
+    def __init__(self, id, name, category, bounds, dwell_minutes=None, points=None,
+                 center=None, radius_m=None):
+        self.id = id
+        self.name = name
+        self.category = category
+        self.dwell_seconds = dwell_minutes * 60 if dwell_minutes else None
+        self.south, self.west, self.north, self.east = bounds
+        if points is not None:
+            self._compile_polygon(points)
+            self.contains = self._in_polygon
+        else:
+            self._center = center
+            self._radius_sq = radius_m * radius_m
+            self._scale = math.cos(math.radians(center[0]))
+            self.contains = self._in_circle
+
+    def _compile_polygon(self, points):
+        edges = []
+        for index, (lat1, lon1) in enumerate(points):
+            lat2, lon2 = points[index - 1]
+            if lat1 != lat2:  # horizontal edges never cross a horizontal ray
+                edges.append((min(lat1, lat2), max(lat1, lat2), lat1, lon1, (lon2 - lon1) / (lat2 - lat1)))
+
+        count = max(1, len(edges) // EDGES_PER_BAND)
+        height = (self.north - self.south) / count or 1.0
+        bands = [[] for _ in range(count)]
+        for edge in edges:
+            first = min(count - 1, int((edge[0] - self.south) / height))
+            last = min(count - 1, int((edge[1] - self.south) / height))
+            for band in range(first, last + 1):
+                bands[band].append(edge)
+        self._bands = [tuple(band) for band in bands]
+        self._band_height = height
+
+    def _in_polygon(self, lat, lon):
+        band = min(len(self._bands) - 1, int((lat - self.south) / self._band_height))
+        inside = False
+        for low, high, lat1, lon1, slope in self._bands[band]:
+            # Half-open on latitude so a ray through a vertex crosses one of its edges only
+            if low <= lat < high and lon < lon1 + (lat - lat1) * slope:
+                inside = not inside
+        return inside
+
+    def _in_circle(self, lat, lon):
+        dy = (lat - self._center[0]) * METERS_PER_DEGREE
+        dx = (lon - self._center[1]) * METERS_PER_DEGREE * self._scale
+        return dx * dx + dy * dy <= self._radius_sq
+
+
+class GeofenceIndex:
+    """Uniform grid of `cell_deg` degrees over compiled fences."""
+
+    def __init__(self, fences, cell_deg=0.01):
+        self.cell_deg = cell_deg
+        self.fences = {fence.id: fence for fence in fences}
+        self.cells = {}
+        self.large = []
+        for fence in self.fences.values():
+            rows = range(math.floor(fence.south / cell_deg), math.floor(fence.north / cell_deg) + 1)
+            columns = range(math.floor(fence.west / cell_deg), math.floor(fence.east / cell_deg) + 1)
+            if len(rows) * len(columns) > MAX_CELLS_PER_FENCE:
+                self.large.append(fence)
+                continue
+            for row in rows:
+                for column in columns:
+                    self.cells.setdefault((row, column), []).append(fence)
+        self.large = tuple(self.large)
+
+    def __len__(self):
+        return len(self.fences)
+
+    def containing(self, lat, lon):
+        """The fences containing the point."""
+        key = (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+        found = []
+        for candidates in (self.cells.get(key, ()), self.large):
+            for fence in candidates:
+                if (fence.south <= lat <= fence.north and fence.west <= lon <= fence.east
+                        and fence.contains(lat, lon)):
+                    found.append(fence)
+        return found
@@ -0,0 +1,98 @@
+from sqlalchemy import and_, bindparam, or_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.models.location import Location
+from app.models.vehicle import Vehicle
+
+# Columns a repeated (vehicle_id, timestamp) point overwrites
+UPSERT_COLUMNS = ('latitude', 'longitude', 'altitude', 'speed', 'heading', 'accuracy', 'mission_id')
+
+UPSERT_DIALECTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def is_rejected(error):
+    """True when the database refused the data itself (a constraint or a bad value), so retrying cannot help.
+
+    Matches the DB-API IntegrityError and DataError classes (and their
+    subclasses), raised by a driver or wrapped by SQLAlchemy.
+    """
+    error = getattr(error, 'orig', None) or error
+    return any(cls.__name__ in ('IntegrityError', 'DataError') for cls in type(error).__mro__)
+
+
+def commit_isolating(items, commit):
+    """Run commit(items); when the data is rejected, bisect so that only the items at fault are left out.
+
+    Returns the items that are rejected on their own, for the caller to
+    dead-letter. Other errors propagate: the caller retries the whole batch.
+    """
+    try:
+        commit(items)
+        return []
+    except Exception as e:
+        db.session.rollback()
+        if not is_rejected(e):
+            raise
+        if len(items) == 1:
+            print(f"Rejected by the database: {e}")
+            return list(items)
+    middle = len(items) // 2
+    return commit_isolating(items[:middle], commit) + commit_isolating(items[middle:], commit)
+
+
+def upsert_locations(points):
+    """Insert points, a point whose (vehicle_id, timestamp) is already stored replaces its values.
+
+    Uses INSERT ... ON CONFLICT on SQLite and PostgreSQL and a plain insert on
+    other databases. Does not commit.
+    """
+    if not points:
+        return
+    # A statement may not update the same row twice, the last copy of a point wins
+    points = list({(point['vehicle_id'], point['timestamp']): point for point in points}.values())
+    table = Location.__table__
+    insert = UPSERT_DIALECTS.get(db.engine.dialect.name)
+    if insert is None:
+        db.session.execute(table.insert(), points)
+        return
+
+    statement = insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=['vehicle_id', 'timestamp'],
+        set_={column: statement.excluded[column] for column in UPSERT_COLUMNS}
+    )
+    db.session.execute(statement, points)
+
+
+def latest_per_vehicle(points):
+    """The most recent point of each vehicle in a batch."""
+    latest = {}
+    for point in points:
+        current = latest.get(point['vehicle_id'])
+        if current is None or point['timestamp'] >= current['timestamp']:
+            latest[point['vehicle_id']] = point
+    return latest
+
+
+def advance_vehicle_positions(points):
+    """Move each vehicle to its newest point, unless it already has a more recent position.
+
+    The comparison runs in the UPDATE itself, so late or replayed points and
+    concurrent writers never move a vehicle back in time. Does not commit.
+    """
+    latest = latest_per_vehicle(points)
+    if not latest:
+        return
+    table = Vehicle.__table__
+    db.session.execute(
+        update(table)
+        .where(and_(
+            table.c.id == bindparam('vehicle'),
+            or_(table.c.last_location_update.is_(None), table.c.last_location_update <= bindparam('at'))
+        ))
+        .values(current_latitude=bindparam('lat'),
+                current_longitude=bindparam('lon'),
+                last_location_update=bindparam('at')),
+        [{'vehicle': vehicle_id, 'lat': point['latitude'], 'lon': point['longitude'],
+          'at': point['timestamp']} for vehicle_id, point in latest.items()]
+    )
@@ -0,0 +1,388 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from flask import Response, current_app, request
+
+try:
+    import fcntl
+except ImportError:  # Windows: merges of dead workers' snapshots are not serialized
+    fcntl = None
+
+# Totals of the workers that are gone, in METRICS_DIR
+AGGREGATE_SNAPSHOT = 'aggregate.json'
+
+# Seconds, from a cached 304 to a heavy map render
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Metric:
+    """Values are kept per thread, so recording never takes a lock: /metrics adds the shards up."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        registry.register(self)
+
+    def _shard(self):
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._shards_lock:
+                self._shards.append(values)
+            return values
+
+    def samples(self):
+        totals = {}
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for key, value in list(shard.items()):
+                totals[key] = self._merge(totals.get(key), value)
+        return totals
+
+    @staticmethod
+    def _merge(total, value):
+        return value if total is None else total + value
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *label_values, amount=1):
+        shard = self._shard()
+        shard[label_values] = shard.get(label_values, 0) + amount
+
+
+class Histogram(_Metric):
+    """Counts per pre-computed bucket plus the sum: observe() is a bisect and two additions."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DURATION_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labels)
+
+    def observe(self, value, *label_values):
+        shard = self._shard()
+        counts = shard.get(label_values)
+        if counts is None:
+            # One slot per bucket, one for +Inf, then the sum
+            counts = shard[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    @contextmanager
+    def time(self, *label_values):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *label_values)
+
+    @staticmethod
+    def _merge(total, value):
+        value = list(value)
+        return value if total is None else [a + b for a, b in zip(total, value)]
+
+
+class Collected:
+    """Gauge or counter read from a function at scrape time, which returns {label values: value}."""
+
+    def __init__(self, name, documentation, kind, labels, collect):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.labels = tuple(labels)
+        self.collect = collect
+        registry.register(self)
+
+    def samples(self):
+        try:
+            return {tuple(str(v) for v in key): value for key, value in self.collect().items()}
+        except Exception as e:
+            print(f"Metric {self.name} unavailable: {e}")
+            return {}
+
+
+class MetricsRegistry:
+    """All metrics of the process, rendered in the Prometheus text format.
+
+    With several worker processes each one writes its snapshot to
+    METRICS_DIR every METRICS_SYNC_SECONDS and /metrics adds them up:
+    counters and histograms of every snapshot, gauges only of the live
+    processes. The counters and histograms of a dead worker are added to
+    AGGREGATE_SNAPSHOT and its snapshot deleted, so totals survive worker
+    restarts without the directory growing.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self.directory = None
+        self.sync_seconds = 5.0
+        self._writer_pid = None
+        self._snapshot_name = None
+
+    def register(self, metric):
+        # A second app (scripts, benchmarks) replaces the collectors bound to the first one
+        self._metrics = [existing for existing in self._metrics if existing.name != metric.name]
+        self._metrics.append(metric)
+        return metric
+
+    def snapshot(self):
+        return {'pid': os.getpid(), 'metrics': {
+            metric.name: [[list(key), value] for key, value in metric.samples().items()]
+            for metric in self._metrics
+        }}
+
+    # Worker processes
+
+    def ensure_writer(self):
+        if self.directory is None or self._writer_pid == os.getpid():
+            return
+        self._writer_pid = os.getpid()
+        # A restarted worker may get a dead one's pid, the start time keeps their snapshots apart
+        self._snapshot_name = f'{os.getpid()}-{int(time.time())}.json'
+        os.makedirs(self.directory, exist_ok=True)
+        threading.Thread(target=self._write_loop, name='metrics-writer', daemon=True).start()
+
+    def _write_loop(self):
+        pid = os.getpid()
+        while self._writer_pid == pid:
+            try:
+                self._write_snapshot()
+            except Exception as e:
+                print(f"Could not write the metrics snapshot: {e}")
+            time.sleep(self.sync_seconds)
+
+    def _write_snapshot(self):
+        path = os.path.join(self.directory, self._snapshot_name)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(path + '.tmp', path)
+
+    def _read_snapshot(self, name):
+        try:
+            with open(os.path.join(self.directory, name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _other_snapshots(self):
+        if self.directory is None or not os.path.isdir(self.directory):
+            return []
+        self._merge_dead_snapshots()
+        snapshots = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json') or name == self._snapshot_name:
+                continue
+            snapshot = self._read_snapshot(name)
+            if snapshot is not None:
+                snapshots.append(snapshot)
+        return snapshots
+
+    def _merge_dead_snapshots(self):
+        """Fold the counters and histograms of dead workers into AGGREGATE_SNAPSHOT, delete their snapshots."""
+        dead = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json') or name in (self._snapshot_name, AGGREGATE_SNAPSHOT):
+                continue
+            try:
+                pid = int(name[:-len('.json')].split('-')[0])
+            except ValueError:
+                continue
+            if not _process_alive(pid):
+                dead.append(name)
+        if not dead:
+            return
+
+        kinds = {metric.name: metric.kind for metric in self._metrics}
+        with _locked(os.path.join(self.directory, '.lock')):
+            aggregate = self._read_snapshot(AGGREGATE_SNAPSHOT) or {'pid': None, 'metrics': {}, 'merged': []}
+            # Snapshots merged but not deleted yet (a crash in between) are not added twice
+            merged = {name for name in aggregate['merged'] if os.path.exists(os.path.join(self.directory, name))}
+            for name in dead:
+                snapshot = None if name in merged else self._read_snapshot(name)
+                if snapshot is None:
+                    continue
+                for metric_name, samples in snapshot['metrics'].items():
+                    kind = kinds.get(metric_name)
+                    if kind not in ('counter', 'histogram'):
+                        continue
+                    totals = {tuple(key): value for key, value in aggregate['metrics'].get(metric_name, [])}
+                    for key, value in samples:
+                        key = tuple(key)
+                        totals[key] = (Histogram._merge(totals.get(key), value) if kind == 'histogram'
+                                       else totals.get(key, 0) + value)
+                    aggregate['metrics'][metric_name] = [[list(key), value] for key, value in totals.items()]
+                merged.add(name)
+            aggregate['merged'] = sorted(merged)
+
+            path = os.path.join(self.directory, AGGREGATE_SNAPSHOT)
+            with open(path + '.tmp', 'w') as f:
+                json.dump(aggregate, f)
+            os.replace(path + '.tmp', path)
+            for name in dead:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    # Exposition
+
+    def render(self):
+        snapshots = [self.snapshot()] + self._other_snapshots()
+        lines = []
+        for metric in self._metrics:
+            totals = {}
+            for snapshot in snapshots:
+                if metric.kind == 'gauge' and snapshot['pid'] not in (None, os.getpid()) \
+                        and not _process_alive(snapshot['pid']):
+                    continue
+                for key, value in snapshot['metrics'].get(metric.name, []):
+                    key = tuple(key)
+                    if metric.kind == 'histogram':
+                        totals[key] = Histogram._merge(totals.get(key), value)
+                    else:
+                        totals[key] = totals.get(key, 0) + value
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for key in sorted(totals):
+                labels = list(zip(metric.labels, key))
+                if metric.kind == 'histogram':
+                    lines.extend(_histogram_lines(metric, labels, totals[key]))
+                else:
+                    lines.append(f'{metric.name}{_labels(labels)} {_number(totals[key])}')
+        return '\n'.join(lines) + '\n'
+
+
+def _histogram_lines(metric, labels, counts):
+    cumulative = 0
+    for bound, count in zip(list(metric.buckets) + ['+Inf'], counts[:-1]):
+        cumulative += count
+        le = bound if bound == '+Inf' else _number(bound)
+        yield f'{metric.name}_bucket{_labels(labels + [("le", le)])} {cumulative}'
+    yield f'{metric.name}_sum{_labels(labels)} {_number(counts[-1])}'
+    yield f'{metric.name}_count{_labels(labels)} {cumulative}'
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    escape = lambda value: str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+@contextmanager
+def _locked(path):
+    with open(path, 'a') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+registry = MetricsRegistry()
+
+REQUEST_DURATION = Histogram('fleet_http_request_duration_seconds', 'Time to build the response',
+                             ('blueprint', 'route', 'method'))
+REQUESTS = Counter('fleet_http_requests_total', 'Requests answered', ('blueprint', 'route', 'method', 'status'))
+INGEST_POINTS = Counter('fleet_ingest_points_total', 'Location points accepted', ('mode',))
+DETECTION_DURATION = Histogram('fleet_anomaly_detection_seconds', 'Duration of an anomaly detection cycle')
+ANOMALIES = Counter('fleet_anomalies_detected_total', 'Anomalies recorded, per rule', ('type',))
+FOLIUM_RENDER = Histogram('fleet_folium_render_seconds', 'Time to render a Folium map to HTML')
+CACHE_REQUESTS = Counter('fleet_cache_requests_total', 'Cache lookups', ('cache', 'result'))
+JOB_DURATION = Histogram('fleet_scheduler_job_duration_seconds', 'Duration of a background job run', ('job',),
+                         buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900))
+JOB_RUNS = Counter('fleet_scheduler_job_runs_total', 'Background job runs, per outcome', ('job', 'status'))
+GEOFENCE_CHECK = Histogram('fleet_geofence_check_seconds', 'Time to check a batch of points against the geofences')
+GEOFENCE_EVENTS = Counter('fleet_geofence_events_total', 'Geofence transitions recorded', ('event',))
+
+
+def init_metrics(app):
+    """Time every request per blueprint and route and serve the metrics at /metrics.
+
+    The clock starts in the WSGI layer and stops in an after_request hook
+    registered before the others, which run in reverse order: the timing
+    covers the whole of Flask's work up to the response (not the streaming
+    of a streamed body).
+    """
+    if not app.config['METRICS_ENABLED']:
+        return
+    registry.directory = app.config['METRICS_DIR']
+    registry.sync_seconds = app.config['METRICS_SYNC_SECONDS']
+    _register_collectors(app)
+
+    wsgi_app = app.wsgi_app
+
+    def timed_wsgi_app(environ, start_response):
+        environ['fleet.metrics_started'] = time.perf_counter()
+        if registry.directory is not None:
+            registry.ensure_writer()
+        return wsgi_app(environ, start_response)
+
+    app.wsgi_app = timed_wsgi_app
+
+    @app.after_request
+    def record_request(response):
+        # One context lookup, the attributes are then read from the request itself
+        current = request._get_current_object()
+        started = current.environ.get('fleet.metrics_started')
+        if started is not None:
+            rule = current.url_rule
+            labels = (current.blueprint or '', rule.rule if rule is not None else 'unmatched', current.method)
+            REQUEST_DURATION.observe(time.perf_counter() - started, *labels)
+            REQUESTS.inc(*labels, response.status_code)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        token = current_app.config['METRICS_TOKEN']
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return {'error': 'Invalid metrics token'}, 401
+        return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def _register_collectors(app):
+    """Gauges and counters already kept by the ingest queue, the journal and the connection pool."""
+    from app import db
+    from app.services.ingest_queue import ingest_queue
+    from app.services.telemetry_journal import telemetry_journal
+
+    with app.app_context():
+        pool = db.engine.pool
+
+    Collected('fleet_ingest_queue_depth', 'Points waiting for the ingest writer', 'gauge', (),
+              lambda: {(): ingest_queue.stats()['depth']} if ingest_queue.enabled else {})
+    Collected('fleet_ingest_committed_points_total', 'Points committed by the ingest writer or journal replayer',
+              'counter', ('mode',), lambda: {
+                  ('queued',): ingest_queue.stats()['committed'],
+                  ('journal',): telemetry_journal.stats()['replayed']
+              })
+    Collected('fleet_db_pool_connections', 'Database pool connections per state', 'gauge', ('state',),
+              lambda: {('checked_out',): pool.checkedout(), ('checked_in',): pool.checkedin(),
+                       ('overflow',): max(pool.overflow(), 0)} if hasattr(pool, 'checkedout') else {})
+    Collected('fleet_db_pool_size', 'Configured database pool size', 'gauge', (),
+              lambda: {(): pool.size()} if hasattr(pool, 'size') else {})
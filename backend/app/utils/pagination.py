@@ -0,0 +1,318 @@
+import base64
+import json
+from datetime import datetime
+from flask import current_app, request
+from sqlalchemy import select, func, or_, text, tuple_
+from app import db
+from app.models.vehicle import Vehicle
+from app.models.mission import Mission
+from app.models.anomaly import Anomaly
+from app.models.reimbursement import Reimbursement
+from app.models.geofence_event import GeofenceEvent
+from app.models.stop import Stop
+from app.models.trip import Trip
+
+# Query arguments that are never treated as filters
+RESERVED_ARGS = {'limit', 'cursor', 'sort', 'count', 'expand', 'depth', 'fields'}
+
+FILTER_OPERATORS = {
+    'eq': lambda column, value: column == value,
+    'ne': lambda column, value: column != value,
+    'gt': lambda column, value: column > value,
+    'gte': lambda column, value: column >= value,
+    'lt': lambda column, value: column < value,
+    'lte': lambda column, value: column <= value,
+    'in': lambda column, value: column.in_(value)
+}
+
+# Per-resource whitelists. Every sort key is backed by an index on (column, id)
+# declared on the model, so keyset pages cost the same at any depth. Rows whose
+# sort column is NULL come after all the others, by id in the sort direction.
+LIST_SPECS = {
+    'vehicles': {
+        'model': Vehicle,
+        'filters': {
+            'status': Vehicle.status,
+            'fuel_type': Vehicle.fuel_type,
+            'driver_id': Vehicle.driver_id
+        },
+        'sorts': {'id': Vehicle.id, 'created_at': Vehicle.created_at},
+        'default_sort': 'id'
+    },
+    'missions': {
+        'model': Mission,
+        'filters': {
+            'status': Mission.status,
+            'priority': Mission.priority,
+            'vehicle_id': Mission.vehicle_id,
+            'assigned_user_id': Mission.assigned_user_id,
+            'created_at': Mission.created_at,
+            'scheduled_start': Mission.scheduled_start
+        },
+        'sorts': {
+            'id': Mission.id,
+            'created_at': Mission.created_at,
+            'scheduled_start': Mission.scheduled_start
+        },
+        'default_sort': '-created_at'
+    },
+    'anomalies': {
+        'model': Anomaly,
+        'filters': {
+            'type': Anomaly.type,
+            'severity': Anomaly.severity,
+            'vehicle_id': Anomaly.vehicle_id,
+            'mission_id': Anomaly.mission_id,
+            'is_resolved': Anomaly.is_resolved,
+            'detected_at': Anomaly.detected_at
+        },
+        'sorts': {'id': Anomaly.id, 'detected_at': Anomaly.detected_at},
+        'default_sort': '-detected_at'
+    },
+    'reimbursements': {
+        'model': Reimbursement,
+        'filters': {
+            'status': Reimbursement.status,
+            'grade': Reimbursement.grade,
+            'mission_id': Reimbursement.mission_id,
+            'user_id': Reimbursement.user_id,
+            'created_at': Reimbursement.created_at
+        },
+        'sorts': {'id': Reimbursement.id, 'created_at': Reimbursement.created_at},
+        'default_sort': '-created_at'
+    },
+    'geofence_events': {
+        'model': GeofenceEvent,
+        'filters': {
+            'event': GeofenceEvent.event,
+            'geofence_id': GeofenceEvent.geofence_id,
+            'vehicle_id': GeofenceEvent.vehicle_id,
+            'mission_id': GeofenceEvent.mission_id,
+            'occurred_at': GeofenceEvent.occurred_at
+        },
+        'sorts': {'id': GeofenceEvent.id, 'occurred_at': GeofenceEvent.occurred_at},
+        'default_sort': '-occurred_at'
+    },
+    'trips': {
+        'model': Trip,
+        'filters': {
+            'vehicle_id': Trip.vehicle_id,
+            'mission_id': Trip.mission_id,
+            'is_open': Trip.is_open,
+            'started_at': Trip.started_at,
+            'distance_m': Trip.distance_m
+        },
+        'sorts': {'id': Trip.id, 'started_at': Trip.started_at},
+        'default_sort': '-started_at'
+    },
+    'stops': {
+        'model': Stop,
+        'filters': {
+            'vehicle_id': Stop.vehicle_id,
+            'mission_id': Stop.mission_id,
+            'geofence_id': Stop.geofence_id,
+            'mission_endpoint': Stop.mission_endpoint,
+            'is_open': Stop.is_open,
+            'started_at': Stop.started_at,
+            'duration_seconds': Stop.duration_seconds
+        },
+        'sorts': {'id': Stop.id, 'started_at': Stop.started_at},
+        'default_sort': '-started_at'
+    }
+}
+
+
+def _coerce(column, raw):
+    """Convert a query string value to the Python type of `column`."""
+    python_type = column.type.python_type
+    if python_type is bool:
+        if raw.lower() in ('1', 'true', 'yes'):
+            return True
+        if raw.lower() in ('0', 'false', 'no'):
+            return False
+        raise ValueError(f'Invalid boolean value: {raw}')
+    if python_type is datetime:
+        return datetime.fromisoformat(raw.replace('Z', '+00:00')).replace(tzinfo=None)
+    return python_type(raw)
+
+
+def encode_cursor(sort, value, row_id):
+    """Opaque cursor pointing just after the row (value, row_id) for `sort`."""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort, value, row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        sort, value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    return sort, value, row_id
+
+
+class PageRequest:
+    """Limit, keyset cursor, sort and filters requested for a list endpoint."""
+
+    def __init__(self, resource, limit, cursor=None, sort=None, filters=None, count='estimate'):
+        spec = LIST_SPECS[resource]
+        self.resource = resource
+        self.spec = spec
+        self.limit = limit
+        self.sort = sort or spec['default_sort']
+        self.filters = filters or []
+        self.count = count
+
+        sort_key = self.sort.lstrip('-')
+        if sort_key not in spec['sorts']:
+            raise ValueError(f'Cannot sort {resource} by {sort_key}')
+        self.sort_column = spec['sorts'][sort_key]
+        self.descending = self.sort.startswith('-')
+
+        self.after = None
+        if cursor:
+            cursor_sort, value, row_id = decode_cursor(cursor)
+            if cursor_sort != self.sort:
+                raise ValueError('Cursor does not match the requested sort')
+            if value is not None:
+                value = _coerce(self.sort_column, str(value))
+            self.after = (value, row_id)
+
+    def filtered(self, query):
+        for column, operator, value in self.filters:
+            query = query.filter(FILTER_OPERATORS[operator](column, value))
+        return query
+
+    def apply(self, query):
+        """Filter, sort and slice `query`. Returns (items, pagination metadata)."""
+        model = self.spec['model']
+        query = self.filtered(query)
+        base_query = query
+
+        column = self.sort_column
+        nullable = column is not model.id and column.nullable
+        if self.after is not None:
+            value, row_id = self.after
+            after_id = model.id < row_id if self.descending else model.id > row_id
+            if column is model.id:
+                query = query.filter(after_id)
+            elif value is None:
+                # Already in the NULL rows, which come last
+                query = query.filter(column.is_(None), after_id)
+            else:
+                # Row-value comparison so the (column, id) index drives the scan
+                key = tuple_(column, model.id)
+                bound = tuple_(value, row_id)
+                condition = key < bound if self.descending else key > bound
+                query = query.filter(or_(condition, column.is_(None)) if nullable else condition)
+
+        order = column.desc() if self.descending else column.asc()
+        if nullable:
+            order = order.nulls_last()
+        order = [order, model.id.desc() if self.descending else model.id.asc()]
+        if column is model.id:
+            order = order[1:]
+
+        rows = query.order_by(*order).limit(self.limit + 1).all()
+        has_more = len(rows) > self.limit
+        items = rows[:self.limit]
+
+        next_cursor = None
+        if has_more and items:
+            last = items[-1]
+            next_cursor = encode_cursor(self.sort, getattr(last, self.sort_column.key), last.id)
+
+        meta = {
+            'limit': self.limit,
+            'sort': self.sort,
+            'has_more': has_more,
+            'next_cursor': next_cursor
+        }
+        meta.update(count_rows(base_query, model, mode=self.count))
+        return items, meta
+
+
+def count_rows(query, model, mode='estimate'):
+    """Total row count for a list query.
+
+    'exact' runs COUNT(*). 'estimate' uses the planner statistics on PostgreSQL
+    for unfiltered tables and otherwise counts at most COUNT_ESTIMATE_CAP rows,
+    which keeps the cost bounded on large tables. 'none' skips counting.
+    """
+    if mode == 'none':
+        return {}
+
+    if mode == 'exact':
+        return {'total': query.order_by(None).count(), 'total_is_estimate': False}
+
+    if db.engine.dialect.name == 'postgresql' and query.whereclause is None:
+        estimate = db.session.execute(
+            text('SELECT reltuples::bigint FROM pg_class WHERE relname = :table'),
+            {'table': model.__tablename__}
+        ).scalar()
+        if estimate is not None and estimate >= 0:
+            return {'total': int(estimate), 'total_is_estimate': True}
+
+    cap = current_app.config['COUNT_ESTIMATE_CAP']
+    capped = query.order_by(None).with_entities(model.id).limit(cap).subquery()
+    total = db.session.execute(select(func.count()).select_from(capped)).scalar()
+    return {'total': total, 'total_is_estimate': total >= cap}
+
+
+def parse_page_args(resource, args=None):
+    """Build a PageRequest from ?limit=, ?cursor=, ?sort=, ?count= and whitelisted filters.
+
+    Filters use the field name for equality and a double-underscore suffix for
+    other operators: ?status=pending, ?created_at__gte=2024-01-01,
+    ?severity__in=high,critical. Unknown arguments are ignored so endpoint
+    specific parameters keep working. Raises ValueError on invalid values.
+    """
+    args = request.args if args is None else args
+    spec = LIST_SPECS[resource]
+    config = current_app.config
+
+    try:
+        limit = int(args.get('limit', config['DEFAULT_PAGE_SIZE']))
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    limit = min(limit, config['MAX_PAGE_SIZE'])
+
+    count = args.get('count', 'estimate')
+    if count not in ('exact', 'estimate', 'none'):
+        raise ValueError('count must be one of: exact, estimate, none')
+
+    filters = []
+    for key in args.keys():
+        if key in RESERVED_ARGS or key.startswith('fields['):
+            continue
+
+        name, _, operator = key.partition('__')
+        operator = operator or 'eq'
+        if name not in spec['filters']:
+            continue
+        if operator not in FILTER_OPERATORS:
+            raise ValueError(f'Unknown filter operator: {operator}')
+
+        column = spec['filters'][name]
+        raw = args.get(key)
+        try:
+            if operator == 'in':
+                value = [_coerce(column, item) for item in raw.split(',') if item]
+            else:
+                value = _coerce(column, raw)
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid value for {key}: {raw}')
+        filters.append((column, operator, value))
+
+    return PageRequest(
+        resource,
+        limit,
+        cursor=args.get('cursor'),
+        sort=args.get('sort'),
+        filters=filters,
+        count=count
+    )
@@ -0,0 +1,143 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when the hashing queue is full and the caller should retry later."""
+
+
+def _timed(function, *args):
+    """Run a hashing function in a pool worker and report when it started and how long it ran."""
+    started_at = time.time()
+    result = function(*args)
+    return result, started_at, time.time() - started_at
+
+
+class PasswordHasher:
+    """Password hashing off the request threads.
+
+    Hashes are computed in a bounded process pool so a burst of logins cannot
+    occupy every request thread or CPU core. At most PASSWORD_HASH_MAX_PENDING
+    operations are queued or running; beyond that PasswordHashingBusy is raised.
+    With PASSWORD_HASH_WORKERS = 0 hashing runs inline on the calling thread.
+    """
+
+    def __init__(self):
+        self.method = 'pbkdf2:sha256:600000'
+        self.workers = 0
+        self.timeout = 10
+        self._pending = None
+        self._pool = None
+        self._pool_pid = None
+        self._method_prefix = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'submitted': 0,
+            'completed': 0,
+            'rejected': 0,
+            'timed_out': 0,
+            'rehashed': 0,
+            'in_flight': 0,
+            'queue_wait_seconds_total': 0.0,
+            'queue_wait_seconds_max': 0.0,
+            'hash_seconds_total': 0.0
+        }
+
+    def init_app(self, app):
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self.timeout = app.config['PASSWORD_HASH_TIMEOUT']
+        self._pending = threading.BoundedSemaphore(app.config['PASSWORD_HASH_MAX_PENDING'])
+        self._method_prefix = None
+
+    def _get_pool(self):
+        # A pool inherited through fork() is unusable, create one per process
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _record(self, key, value):
+        with self._stats_lock:
+            self._stats[key] += value
+
+    def _run(self, function, *args):
+        if self.workers <= 0 or self._pending is None:
+            started = time.perf_counter()
+            result = function(*args)
+            self._record('hash_seconds_total', time.perf_counter() - started)
+            return result
+
+        if not self._pending.acquire(blocking=False):
+            self._record('rejected', 1)
+            raise PasswordHashingBusy('Too many password operations in progress')
+
+        self._record('submitted', 1)
+        self._record('in_flight', 1)
+        submitted_at = time.time()
+        try:
+            future = self._get_pool().submit(_timed, function, *args)
+        except Exception:
+            self._release(None)
+            raise
+        # The slot is held until the worker is done, even when the caller gave up waiting
+        future.add_done_callback(self._release)
+        try:
+            result, started_at, duration = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            self._record('timed_out', 1)
+            raise PasswordHashingBusy('Password hashing timed out')
+
+        wait = max(0.0, started_at - submitted_at)
+        with self._stats_lock:
+            self._stats['completed'] += 1
+            self._stats['queue_wait_seconds_total'] += wait
+            self._stats['queue_wait_seconds_max'] = max(self._stats['queue_wait_seconds_max'], wait)
+            self._stats['hash_seconds_total'] += duration
+        return result
+
+    def _release(self, future):
+        self._record('in_flight', -1)
+        self._pending.release()
+
+    def hash(self, password):
+        """Hash a password with the configured method."""
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        """Check a password against a stored hash."""
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True when the stored hash was produced with other parameters than PASSWORD_HASH_METHOD.
+
+        Werkzeug expands a method ('scrypt' into 'scrypt:32768:8:1'), so stored
+        hashes are compared with the prefix of one hash made with the method,
+        computed once per process. While the pool is busy nothing is rehashed.
+        """
+        if self._method_prefix is None:
+            try:
+                self._method_prefix = self.hash('').split('$', 1)[0]
+            except PasswordHashingBusy:
+                return False
+        return password_hash.split('$', 1)[0] != self._method_prefix
+
+    def count_rehash(self):
+        self._record('rehashed', 1)
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['workers'] = self.workers
+        stats['method'] = self.method.split(':', 1)[0]
+        completed = stats['completed']
+        stats['queue_wait_seconds_avg'] = stats['queue_wait_seconds_total'] / completed if completed else 0.0
+        return stats
+
+
+password_hasher = PasswordHasher()
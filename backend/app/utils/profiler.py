@@ -0,0 +1,267 @@
+import itertools
+import json
+import marshal
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from flask import g, request
+
+# Frames kept per sample, from the leaf; deeper stacks lose their outermost frames
+MAX_DEPTH = 128
+
+
+class _Capture:
+    __slots__ = ('started', 'sampled', 'last', 'stacks')
+
+    def __init__(self, started, sampled):
+        self.started = started
+        self.sampled = sampled
+        self.last = started
+        self.stacks = []
+
+
+def _stack(frame, keys):
+    """(name, file, first line) of every function on the stack, outermost first."""
+    stack = []
+    while frame is not None and len(stack) < MAX_DEPTH:
+        code = frame.f_code
+        key = keys.get(code)
+        if key is None:
+            key = keys[code] = (code.co_name, code.co_filename, code.co_firstlineno)
+        stack.append(key)
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+class RequestProfiler:
+    """Opt-in statistical profiler for requests (PROFILING_ENABLED).
+
+    A single background thread reads the stack of every thread serving a
+    request each PROFILE_INTERVAL_MS. When a request ends its samples are
+    kept if it took PROFILE_SLOW_MS or more, or was drawn with probability
+    PROFILE_SAMPLE_RATE, and dropped otherwise. The last PROFILE_BUFFER_SIZE
+    profiles are kept in memory, or in PROFILE_DIR to share them between
+    worker processes.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._active = {}
+        self._profiles = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._sampler_pid = None
+        self._ids = itertools.count(1)
+
+    def init_app(self, app):
+        config = app.config
+        self.enabled = config['PROFILING_ENABLED']
+        self.sample_rate = config['PROFILE_SAMPLE_RATE']
+        self.slow_seconds = config['PROFILE_SLOW_MS'] / 1000
+        self.interval = config['PROFILE_INTERVAL_MS'] / 1000
+        self.buffer_size = config['PROFILE_BUFFER_SIZE']
+        self.directory = config['PROFILE_DIR']
+        self._profiles = deque(maxlen=self.buffer_size)
+        if self.enabled:
+            # Registered after the query stats hooks, so this one runs first and still sees g.query_log
+            app.before_request(self._start_request)
+            app.after_request(self._finish_request)
+            app.teardown_request(self._teardown_request)
+
+    # Sampling
+
+    def _ensure_sampler(self):
+        with self._lock:
+            if self._sampler_pid == os.getpid():
+                return
+            self._sampler_pid = os.getpid()
+        threading.Thread(target=self._sample_loop, name='request-profiler', daemon=True).start()
+
+    def _sample_loop(self):
+        pid = os.getpid()
+        keys = {}
+        while self._sampler_pid == pid:
+            self._wake.clear()
+            if not self._active:
+                self._wake.wait(1.0)
+                continue
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            now = time.perf_counter()
+            for ident, capture in list(self._active.items()):
+                frame = frames.get(ident)
+                if frame is not None:
+                    # Weighted by the time since the previous sample: a busy GIL delays the sampler
+                    capture.stacks.append((_stack(frame, keys), now - capture.last))
+                    capture.last = now
+            del frames
+
+    # Requests
+
+    def _start_request(self):
+        if self._sampler_pid != os.getpid():
+            self._ensure_sampler()
+        self._active[threading.get_ident()] = _Capture(time.perf_counter(), random.random() < self.sample_rate)
+        self._wake.set()
+
+    def _finish_request(self, response):
+        capture = self._active.pop(threading.get_ident(), None)
+        if capture is None:
+            return response
+        seconds = time.perf_counter() - capture.started
+        slow = seconds >= self.slow_seconds
+        if slow or capture.sampled:
+            try:
+                self._store(capture, seconds, response.status_code, 'slow' if slow else 'sampled')
+            except Exception as e:
+                print(f"Could not store the profile of {request.path}: {e}")
+        return response
+
+    def _teardown_request(self, exc):
+        # after_request does not run when the request failed before producing a response
+        self._active.pop(threading.get_ident(), None)
+
+    def _store(self, capture, seconds, status, reason):
+        frames, index, samples, weights, counts = [], {}, [], [], []
+        for stack, elapsed in list(capture.stacks):
+            sample = []
+            for key in stack:
+                if key not in index:
+                    index[key] = len(frames)
+                    frames.append(list(key))
+                sample.append(index[key])
+            # Consecutive identical stacks are stored once with a larger weight
+            if samples and samples[-1] == sample:
+                weights[-1] += elapsed * 1000
+                counts[-1] += 1
+            else:
+                samples.append(sample)
+                weights.append(elapsed * 1000)
+                counts.append(1)
+
+        log = g.get('query_log')
+        profile = {
+            'id': f'{time.time_ns() // 1000000}-{os.getpid()}-{next(self._ids)}',
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'endpoint': request.url_rule.rule if request.url_rule else None,
+            'status': status,
+            'reason': reason,
+            'started_at': datetime.utcnow().isoformat(),
+            'duration_ms': round(seconds * 1000, 2),
+            'queries': log.count if log is not None else None,
+            'db_ms': round(log.seconds * 1000, 2) if log is not None else None,
+            'interval_ms': self.interval * 1000,
+            'frames': frames,
+            'samples': samples,
+            'weights': [round(weight, 3) for weight in weights],
+            'counts': counts
+        }
+        if self.directory is None:
+            self._profiles.append(profile)
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{profile['id']}.json")
+        with open(path + '.tmp', 'w') as f:
+            json.dump(profile, f)
+        os.replace(path + '.tmp', path)
+        # Oldest first: the ids start with the time in milliseconds
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith('.json'))
+        for name in names[:-self.buffer_size]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    # Reading
+
+    def profiles(self):
+        """Stored profiles, newest first."""
+        if self.directory is None:
+            return list(reversed(self._profiles))
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in sorted((name for name in os.listdir(self.directory) if name.endswith('.json')), reverse=True):
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return profiles
+
+    def summaries(self):
+        return [{key: value for key, value in profile.items() if key not in ('frames', 'samples', 'weights', 'counts')}
+                for profile in self.profiles()]
+
+    def get(self, profile_id):
+        return next((profile for profile in self.profiles() if profile['id'] == profile_id), None)
+
+
+def to_speedscope(profiles):
+    """Speedscope file (https://www.speedscope.app) with one sampled profile per request."""
+    frames, index, exported = [], {}, []
+    for profile in profiles:
+        local = []
+        for name, filename, line in profile['frames']:
+            key = (name, filename, line)
+            if key not in index:
+                index[key] = len(frames)
+                frames.append({'name': name, 'file': filename, 'line': line})
+            local.append(index[key])
+        weights = profile['weights']
+        exported.append({
+            'type': 'sampled',
+            'name': f"{profile['method']} {profile['path']} ({profile['duration_ms']} ms, {profile['reason']})",
+            'unit': 'milliseconds',
+            'startValue': 0,
+            'endValue': round(sum(weights), 3),
+            'samples': [[local[i] for i in sample] for sample in profile['samples']],
+            'weights': weights
+        })
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'shared': {'frames': frames},
+        'profiles': exported,
+        'name': exported[0]['name'] if len(exported) == 1 else f'{len(exported)} requests',
+        'exporter': 'fleet-management request profiler'
+    }
+
+
+def to_pstats(profiles):
+    """Marshalled pstats data (pstats.Stats, snakeviz) built from the samples of `profiles`.
+
+    Times are the sampled times; call counts are sample counts, sampling
+    cannot see the real number of calls.
+    """
+    stats = {}
+    for profile in profiles:
+        functions = [(filename, line, name) for name, filename, line in profile['frames']]
+        for sample, weight, count in zip(profile['samples'], profile['weights'], profile['counts']):
+            seconds = weight / 1000
+            stack = [functions[i] for i in sample]
+            seen = set()
+            for position, function in enumerate(stack):
+                cc, nc, tt, ct, callers = stats.setdefault(function, (0, 0, 0.0, 0.0, {}))
+                leaf = position == len(stack) - 1
+                if function in seen:
+                    # Recursion: the time is already counted by the outer call
+                    stats[function] = (cc, nc, tt + (seconds if leaf else 0.0), ct, callers)
+                    continue
+                seen.add(function)
+                stats[function] = (cc + count, nc + count, tt + (seconds if leaf else 0.0), ct + seconds, callers)
+                if position:
+                    caller = stack[position - 1]
+                    c_nc, c_cc, c_tt, c_ct = callers.get(caller, (0, 0, 0.0, 0.0))
+                    callers[caller] = (c_nc + count, c_cc + count, c_tt + (seconds if leaf else 0.0),
+                                       c_ct + seconds)
+    return marshal.dumps(stats)
+
+
+request_profiler = RequestProfiler()
@@ -0,0 +1,205 @@
+import hashlib
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from flask import g, request
+from sqlalchemy import event
+from app import db
+
+_SPACES = re.compile(r'\s+')
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PARAMETER = r'(?:\?|%s|%\(\w+\)s|:\w+)'
+_LISTS = re.compile(rf'\(\s*{_PARAMETER}(?:\s*,\s*{_PARAMETER})+\s*\)')
+_COLUMNS = re.compile(r'^SELECT .+? FROM ')
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement):
+    """Statement with literals and expanded IN lists collapsed, identical for every turn of an N+1 loop."""
+    statement = _LITERALS.sub('?', _SPACES.sub(' ', statement).strip())
+    return _LISTS.sub('(?)', statement)
+
+
+class QueryLog:
+    """Queries run while a request, or an assert_max_queries block, is active."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = {}
+
+    def add(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        entry = self.statements.setdefault(fingerprint(statement), [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def repeated(self, threshold):
+        """(fingerprint, count, seconds) of the statements run at least `threshold` times, most frequent first."""
+        return sorted(((statement, count, seconds) for statement, (count, seconds) in self.statements.items()
+                       if count >= threshold), key=lambda entry: -entry[1])
+
+
+class QueryStats:
+    """Per-request SQL query count and time, hooked on the engine's cursor events.
+
+    Statements repeated QUERY_REPEAT_THRESHOLD times or more within one
+    request are reported as possible N+1 loads, once per endpoint and
+    statement. Totals are aggregated per endpoint for stats(). Database time
+    is the time spent in cursor.execute, rows fetched later are not counted.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self.enabled = False
+        self.threshold = 10
+        self.headers = False
+
+    def init_app(self, app):
+        config = app.config
+        self.enabled = config['QUERY_STATS']
+        self.threshold = config['QUERY_REPEAT_THRESHOLD']
+        self.headers = app.debug if config['QUERY_STATS_HEADERS'] is None else config['QUERY_STATS_HEADERS']
+
+        # Listening always costs a thread-local lookup per query, it keeps assert_max_queries usable
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+
+        if self.enabled:
+            app.before_request(self._start_request)
+            app.after_request(self._finish_request)
+            app.teardown_request(self._teardown_request)
+
+    # Collection
+
+    def push(self):
+        log = QueryLog()
+        self._stack().append(log)
+        return log
+
+    def pop(self, log):
+        stack = self._stack()
+        if log in stack:
+            stack.remove(log)
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if getattr(self._local, 'stack', None):
+            conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        stack = getattr(self._local, 'stack', None)
+        if not stack or not conn.info.get('query_started'):
+            return
+        seconds = time.perf_counter() - conn.info['query_started'].pop()
+        for log in stack:
+            log.add(statement, seconds)
+
+    # Requests
+
+    def _start_request(self):
+        g.query_log = self.push()
+
+    def _finish_request(self, response):
+        log = g.pop('query_log', None)
+        if log is None:
+            return response
+        self.pop(log)
+
+        endpoint = f'{request.method} {request.url_rule.rule}' if request.url_rule else 'unmatched'
+        repeated = log.repeated(self.threshold)
+        self._record(endpoint, log, repeated)
+
+        if self.headers:
+            response.headers['X-Query-Count'] = str(log.count)
+            response.headers['X-Query-Time'] = f'{log.seconds * 1000:.1f}'
+            if repeated:
+                response.headers['X-Query-Repeated'] = f'{repeated[0][1]} {_short(repeated[0][0])}'
+            response.headers.add('Server-Timing', f'db;dur={log.seconds * 1000:.1f};desc="{log.count} queries"')
+        return response
+
+    def _teardown_request(self, exc):
+        # after_request is skipped when the request failed before a response existed
+        log = g.pop('query_log', None)
+        if log is not None:
+            self.pop(log)
+
+    def _record(self, endpoint, log, repeated):
+        with self._lock:
+            stats = self._endpoints.setdefault(endpoint, {
+                'requests': 0, 'queries': 0, 'max_queries': 0, 'db_seconds': 0.0, 'repeated_requests': 0,
+                'repeated_statements': {}
+            })
+            stats['requests'] += 1
+            stats['queries'] += log.count
+            stats['max_queries'] = max(stats['max_queries'], log.count)
+            stats['db_seconds'] += log.seconds
+            if repeated:
+                stats['repeated_requests'] += 1
+            new = []
+            for statement, count, _ in repeated:
+                key = _short(statement)
+                if key not in stats['repeated_statements']:
+                    stats['repeated_statements'][key] = {'statement': _summary(statement, 300), 'max_count': 0}
+                    new.append((statement, count))
+                entry = stats['repeated_statements'][key]
+                entry['max_count'] = max(entry['max_count'], count)
+        for statement, count in new:
+            print(f"Possible N+1 on {endpoint}: {count} x {_summary(statement)}")
+
+    def stats(self):
+        with self._lock:
+            endpoints = {endpoint: dict(stats, repeated_statements=dict(stats['repeated_statements']))
+                         for endpoint, stats in self._endpoints.items()}
+        for stats in endpoints.values():
+            stats['avg_queries'] = stats['queries'] / stats['requests']
+            stats['avg_db_ms'] = stats['db_seconds'] * 1000 / stats['requests']
+        return {'enabled': self.enabled, 'repeat_threshold': self.threshold, 'endpoints': endpoints}
+
+
+def _short(statement):
+    return hashlib.sha1(statement.encode('utf-8')).hexdigest()[:12]
+
+
+def _summary(statement, length=200):
+    """Statement without its column list, the FROM and WHERE clauses tell which load it is."""
+    return _COLUMNS.sub('SELECT ... FROM ', statement)[:length]
+
+
+@contextmanager
+def assert_max_queries(limit, repeated=None):
+    """Fail with AssertionError when the block runs more than `limit` queries, or one
+    statement more than `repeated` times (an N+1 load).
+
+        with assert_max_queries(6, repeated=2):
+            client.get('/api/missions', headers=headers)
+    """
+    log = query_stats.push()
+    try:
+        yield log
+    finally:
+        query_stats.pop(log)
+
+    problems = []
+    if log.count > limit:
+        problems.append(f'{log.count} queries, at most {limit} expected')
+    if repeated is not None:
+        problems.extend(f'{count} x {_summary(statement)}' for statement, count, _ in log.repeated(repeated + 1))
+    if problems:
+        top = [f'{count} x {_summary(statement)}' for statement, count, _ in log.repeated(2)[:5]]
+        raise AssertionError('; '.join(problems) + ('\nMost repeated: ' + '\n  '.join(top) if top else ''))
+
+
+query_stats = QueryStats()
@@ -0,0 +1,494 @@
+"""Road graph read from a local OpenStreetMap extract, and map matching of GPS traces on it.
+
+The drivable ways of the extract become directed edges between their
+consecutive nodes, projected to meters on a flat plane around the extract's
+center (fine for a city or a region, not for a continent). Edges are
+registered in a uniform grid for candidate lookups.
+
+Matching is the hidden Markov model of Newson & Krumm (2009), solved with
+Viterbi: the candidates of a fix are the nearest edges within a search
+radius, scored on their distance to the fix (Gaussian, sigma meters), and a
+move between two candidates is scored on how much the driving distance
+between them differs from the straight distance between the fixes
+(exponential, beta meters). Driving distances come from Dijkstra runs that
+stop once every candidate of the next fix is reached. A fix without
+candidates, or that no road reaches, breaks the trace: each piece is matched
+on its own and the gap between them counts as a straight line.
+"""
+import bz2
+import gzip
+import heapq
+import math
+import xml.etree.ElementTree as ElementTree
+from array import array
+
+import numpy as np
+
+from app.utils.geofence_index import METERS_PER_DEGREE
+
+# highway=* values a car can drive on
+DRIVABLE = frozenset((
+    'motorway', 'motorway_link', 'trunk', 'trunk_link', 'primary', 'primary_link',
+    'secondary', 'secondary_link', 'tertiary', 'tertiary_link', 'unclassified',
+    'residential', 'living_street', 'service', 'road'
+))
+NO_ACCESS = frozenset(('no', 'private'))
+
+GRAPH_CACHE_VERSION = 1
+
+# A move between fixes driving longer than this many times the straight distance
+# (plus a few search radii) is not considered
+MAX_DETOUR = 3.0
+
+# Meters added to a move that turns back on its road, when scoring it: noise
+# behind a fix is otherwise matched as a U-turn as easily as staying put
+UTURN_PENALTY_M = 100.0
+
+
+def _open(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def _oneway(tags):
+    """1 when the way is driven in node order only, -1 against it, 0 both ways."""
+    value = tags.get('oneway')
+    if value in ('yes', 'true', '1'):
+        return 1
+    if value in ('-1', 'reverse'):
+        return -1
+    if value == 'no':
+        return 0
+    if tags.get('highway') in ('motorway', 'motorway_link') or tags.get('junction') in ('roundabout', 'circular'):
+        return 1
+    return 0
+
+
+def _drivable(tags):
+    return (tags.get('highway') in DRIVABLE and tags.get('area') != 'yes'
+            and tags.get('access') not in NO_ACCESS and tags.get('motor_vehicle') not in NO_ACCESS)
+
+
+def read_osm(path):
+    """Nodes and drivable ways of an extract: (node ids, latitudes, longitudes, [(node ids, oneway)]).
+
+    .osm, .osm.gz and .osm.bz2 files are read with the standard library;
+    .osm.pbf files need the osmium package.
+    """
+    if path.endswith('.pbf'):
+        return _read_pbf(path)
+
+    ids, latitudes, longitudes = array('q'), array('d'), array('d')
+    ways = []
+    refs, tags = [], {}
+    root = None
+    with _open(path) as source:
+        for event, element in ElementTree.iterparse(source, events=('start', 'end')):
+            if root is None:
+                root = element
+            if event == 'start':
+                continue
+            kind = element.tag
+            if kind == 'nd':
+                refs.append(int(element.get('ref')))
+            elif kind == 'tag':
+                tags[element.get('k')] = element.get('v')
+            elif kind in ('node', 'way', 'relation'):
+                if kind == 'node':
+                    ids.append(int(element.get('id')))
+                    latitudes.append(float(element.get('lat')))
+                    longitudes.append(float(element.get('lon')))
+                elif kind == 'way' and len(refs) > 1 and _drivable(tags):
+                    ways.append((refs, _oneway(tags)))
+                refs, tags = [], {}
+                root.clear()  # the parsed elements are not needed any more
+
+    return np.frombuffer(ids, dtype=np.int64), np.frombuffer(latitudes), np.frombuffer(longitudes), ways
+
+
+def _read_pbf(path):
+    try:
+        import osmium
+    except ImportError:
+        raise RuntimeError('Reading .osm.pbf extracts needs the osmium package; '
+                           'install it or convert the extract to .osm')
+
+    class Handler(osmium.SimpleHandler):
+        def __init__(self):
+            super().__init__()
+            self.ids, self.latitudes, self.longitudes = array('q'), array('d'), array('d')
+            self.ways = []
+
+        def way(self, way):
+            tags = {tag.k: tag.v for tag in way.tags}
+            if len(way.nodes) < 2 or not _drivable(tags):
+                return
+            refs = []
+            for node in way.nodes:
+                if node.location.valid():
+                    refs.append(node.ref)
+                    self.ids.append(node.ref)
+                    self.latitudes.append(node.location.lat)
+                    self.longitudes.append(node.location.lon)
+            self.ways.append((refs, _oneway(tags)))
+
+    handler = Handler()
+    handler.apply_file(path, locations=True)
+    return (np.frombuffer(handler.ids, dtype=np.int64), np.frombuffer(handler.latitudes),
+            np.frombuffer(handler.longitudes), handler.ways)
+
+
+def build_graph(node_ids, latitudes, longitudes, ways, cell_m=100.0):
+    """RoadGraph of the ways, keeping only the nodes they use. Nodes missing from the extract split their way."""
+    node_ids, first = np.unique(node_ids, return_index=True)
+    latitudes, longitudes = latitudes[first], longitudes[first]
+
+    refs = np.fromiter((ref for way_refs, _ in ways for ref in way_refs), dtype=np.int64)
+    way_of = np.repeat(np.arange(len(ways)), [len(way_refs) for way_refs, _ in ways])
+    oneway = np.array([direction for _, direction in ways], dtype=np.int8)
+
+    position = np.minimum(np.searchsorted(node_ids, refs), max(len(node_ids) - 1, 0))
+    found = node_ids[position] == refs if len(node_ids) else np.zeros(len(refs), dtype=bool)
+    pair = (way_of[:-1] == way_of[1:]) & found[:-1] & found[1:] & (position[:-1] != position[1:])
+    a, b, direction = position[:-1][pair], position[1:][pair], oneway[way_of[:-1][pair]]
+
+    source = np.concatenate((a[direction >= 0], b[direction <= 0]))
+    target = np.concatenate((b[direction >= 0], a[direction <= 0]))
+
+    used, inverse = np.unique(np.concatenate((source, target)), return_inverse=True)
+    source, target = inverse[:len(source)], inverse[len(source):]
+    return RoadGraph(latitudes[used], longitudes[used], source, target, cell_m)
+
+
+def load_graph(path, cell_m=100.0):
+    """Graph saved by save_graph()."""
+    with np.load(path) as data:
+        if int(data['version']) != GRAPH_CACHE_VERSION:
+            raise ValueError(f'{path} was saved by another version')
+        return RoadGraph(data['latitude'], data['longitude'], data['source'], data['target'], cell_m)
+
+
+def save_graph(graph, path):
+    np.savez(path, version=GRAPH_CACHE_VERSION, latitude=graph.latitude, longitude=graph.longitude,
+             source=graph.source, target=graph.target)
+
+
+class RoadGraph:
+    """Directed road edges between projected nodes, with a grid of `cell_m` meters over the edges."""
+
+    def __init__(self, latitude, longitude, source, target, cell_m=100.0):
+        self.latitude = np.asarray(latitude, dtype=np.float64)
+        self.longitude = np.asarray(longitude, dtype=np.float64)
+        self.source = np.asarray(source, dtype=np.int64)
+        self.target = np.asarray(target, dtype=np.int64)
+        self.cell_m = cell_m
+
+        self.origin = (float(self.latitude.mean()), float(self.longitude.mean())) if len(self.latitude) else (0.0, 0.0)
+        self._scale = math.cos(math.radians(self.origin[0]))
+        self.x, self.y = self.project(self.latitude, self.longitude)
+        self.dx = self.x[self.target] - self.x[self.source]
+        self.dy = self.y[self.target] - self.y[self.source]
+        self.length = np.hypot(self.dx, self.dy)
+        self._length_sq = np.maximum(self.length ** 2, 1e-9)
+
+        # Outgoing edges per node for Dijkstra, as Python lists: faster to walk than arrays
+        self._out = [[] for _ in range(len(self.x))]
+        for node, next_node, length in zip(self.source.tolist(), self.target.tolist(), self.length.tolist()):
+            self._out[node].append((next_node, length))
+        self._build_cells()
+
+    def _build_cells(self):
+        x0, x1 = np.minimum(self.x[self.source], self.x[self.target]), np.maximum(self.x[self.source], self.x[self.target])
+        y0, y1 = np.minimum(self.y[self.source], self.y[self.target]), np.maximum(self.y[self.source], self.y[self.target])
+        columns = np.floor(np.stack((x0, x1)) / self.cell_m).astype(np.int64)
+        rows = np.floor(np.stack((y0, y1)) / self.cell_m).astype(np.int64)
+        cells = {}
+        for edge, (c0, c1, r0, r1) in enumerate(zip(columns[0].tolist(), columns[1].tolist(),
+                                                     rows[0].tolist(), rows[1].tolist())):
+            for column in range(c0, c1 + 1):
+                for row in range(r0, r1 + 1):
+                    cells.setdefault((column, row), []).append(edge)
+        self.cells = {key: np.array(edges, dtype=np.int64) for key, edges in cells.items()}
+
+    def __len__(self):
+        return len(self.source)
+
+    def project(self, latitude, longitude):
+        """(x, y) meters east and north of the graph origin."""
+        x = (np.asarray(longitude, dtype=np.float64) - self.origin[1]) * METERS_PER_DEGREE * self._scale
+        y = (np.asarray(latitude, dtype=np.float64) - self.origin[0]) * METERS_PER_DEGREE
+        return x, y
+
+    def unproject(self, x, y):
+        return (self.origin[0] + np.asarray(y) / METERS_PER_DEGREE,
+                self.origin[1] + np.asarray(x) / (METERS_PER_DEGREE * self._scale))
+
+    def candidates(self, x, y, radius_m, limit):
+        """Edges within radius_m of each point, nearest first, at most `limit` per point.
+
+        Returns arrays sorted by point: point index, edge, position along the
+        edge (0 to 1) and distance in meters.
+        """
+        reach = int(math.ceil(radius_m / self.cell_m))
+        points, edges = [], []
+        for index, (px, py) in enumerate(zip(np.floor(x / self.cell_m).astype(np.int64).tolist(),
+                                             np.floor(y / self.cell_m).astype(np.int64).tolist())):
+            for column in range(px - reach, px + reach + 1):
+                for row in range(py - reach, py + reach + 1):
+                    found = self.cells.get((column, row))
+                    if found is not None:
+                        edges.append(found)
+                        points.append(np.full(len(found), index, dtype=np.int64))
+        if not edges:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0), np.zeros(0)
+
+        # An edge crossing several cells is found once per cell
+        pairs = np.unique(np.concatenate(points) * len(self.source) + np.concatenate(edges))
+        point, edge = pairs // len(self.source), pairs % len(self.source)
+
+        # Projection of each point on each of its edges, all at once
+        source = self.source[edge]
+        offset_x, offset_y = x[point] - self.x[source], y[point] - self.y[source]
+        along = np.clip((offset_x * self.dx[edge] + offset_y * self.dy[edge]) / self._length_sq[edge], 0.0, 1.0)
+        distance = np.hypot(offset_x - along * self.dx[edge], offset_y - along * self.dy[edge])
+
+        near = distance <= radius_m
+        point, edge, along, distance = point[near], edge[near], along[near], distance[near]
+        order = np.lexsort((distance, point))
+        point, edge, along, distance = point[order], edge[order], along[order], distance[order]
+        # Rank of each candidate among those of its point
+        starts = np.searchsorted(point, point, side='left')
+        keep = np.arange(len(point)) - starts < limit
+        return point[keep], edge[keep], along[keep], distance[keep]
+
+    def _shortest(self, start, targets, limit):
+        """Dijkstra from `start` until every target is settled or `limit` meters.
+
+        Returns (distances, previous nodes, first node after start) of the nodes reached.
+        """
+        distances, previous, first = {start: 0.0}, {}, {}
+        remaining = set(targets)
+        remaining.discard(start)
+        heap = [(0.0, start)]
+        settled = set()
+        out = self._out
+        while heap and remaining:
+            distance, node = heapq.heappop(heap)
+            if node in settled:
+                continue
+            settled.add(node)
+            remaining.discard(node)
+            for next_node, length in out[node]:
+                candidate = distance + length
+                if candidate <= limit and candidate < distances.get(next_node, math.inf):
+                    distances[next_node] = candidate
+                    previous[next_node] = node
+                    first[next_node] = next_node if node == start else first[node]
+                    heapq.heappush(heap, (candidate, next_node))
+        return distances, previous, first
+
+    def match(self, latitudes, longitudes, times=None, sigma_m=10.0, beta_m=30.0, radius_m=50.0, candidates=8,
+              spacing_m=100.0, max_speed_kmh=200.0):
+        """Snap a trace (points in time order) to the roads.
+
+        Fixes closer than spacing_m to the last one used are skipped: between
+        close fixes, noise weighs more than movement. With `times` (seconds),
+        a fix reached faster than max_speed_kmh from the last one used is a
+        GPS jump and skipped too. Returns (latitudes, longitudes) of the
+        matched geometry, its length in meters, and the numbers of fixes
+        matched and used.
+        """
+        x, y = self.project(latitudes, longitudes)
+        max_speed = max_speed_kmh / 3.6
+        kept = [0] if len(x) else []
+        for index in range(1, len(x)):
+            step = math.hypot(x[index] - x[kept[-1]], y[index] - y[kept[-1]])
+            if step <= spacing_m and index < len(x) - 1:
+                continue
+            if times is not None and step > max_speed * max(times[index] - times[kept[-1]], 1e-3) + radius_m:
+                continue
+            if step > spacing_m or index == len(x) - 1:
+                kept.append(index)
+        x, y = x[kept], y[kept]
+
+        point, edge, along, distance = self.candidates(x, y, radius_m, candidates)
+        bounds = np.searchsorted(point, np.arange(len(x) + 1))
+        emission = -0.5 * (distance / sigma_m) ** 2
+        source = self.source[edge]
+        snap_x, snap_y = self.x[source] + along * self.dx[edge], self.y[source] + along * self.dy[edge]
+        edge_list, along_list = edge.tolist(), along.tolist()
+        lengths, sources, targets = self.length.tolist(), self.source, self.target
+        # Candidates this close are the same place: moving back a little, even
+        # across a node, is noise and the vehicle stays put
+        jitter = 2 * sigma_m
+
+        pieces, run = [], None
+        previous_index = None
+        for index in range(len(x)):
+            first, last = int(bounds[index]), int(bounds[index + 1])
+            if first == last:
+                continue  # no road near this fix
+            if run is not None:
+                straight = math.hypot(x[index] - x[previous_index], y[index] - y[previous_index])
+                limit = straight * MAX_DETOUR + 4 * radius_m
+                prev_first, prev_last = run['slices'][-1]
+                routes = np.full((prev_last - prev_first, last - first), np.inf)
+                uturns = np.zeros(routes.shape, dtype=bool)
+                trees = {}
+                wanted = [int(sources[edge_list[j]]) for j in range(first, last)]
+                for i in range(prev_first, prev_last):
+                    e1, t1 = edge_list[i], along_list[i]
+                    rest = (1.0 - t1) * lengths[e1]
+                    begin, end = int(sources[e1]), int(targets[e1])
+                    if end not in trees:
+                        trees[end] = self._shortest(end, wanted, limit)
+                    reached, previous, first_hop = trees[end]
+                    row, turned = routes[i - prev_first], uturns[i - prev_first]
+                    for j in range(first, last):
+                        e2, t2 = edge_list[j], along_list[j]
+                        if e1 == e2 and t2 >= t1:
+                            row[j - first] = (t2 - t1) * lengths[e1]
+                            continue
+                        node = wanted[j - first]
+                        between = reached.get(node)
+                        if between is not None:
+                            row[j - first] = rest + between + t2 * lengths[e2]
+                            # Turning back onto the road just left, leaving e1 or entering e2
+                            if node == end:
+                                turned[j - first] = int(targets[e2]) == begin
+                            else:
+                                turned[j - first] = first_hop[node] == begin or previous[node] == int(targets[e2])
+
+                gap = np.hypot(snap_x[prev_first:prev_last, None] - snap_x[None, first:last],
+                               snap_y[prev_first:prev_last, None] - snap_y[None, first:last])
+                stays = (gap <= jitter) & (routes > gap)
+                routes[stays] = 0.0
+                transition = -(np.abs(routes - straight) + np.where(uturns & ~stays, UTURN_PENALTY_M, 0.0)) / beta_m
+                transition[routes > limit] = -np.inf
+                total = run['score'][:, None] + transition
+                best = np.argmax(total, axis=0)
+                score = total[best, np.arange(last - first)]
+                if np.isfinite(score).any():
+                    run['slices'].append((first, last))
+                    run['back'].append(best)
+                    run['steps'].append((stays, trees, prev_first, first))
+                    run['score'] = score + emission[first:last]
+                    previous_index = index
+                    continue
+                # No road links the two fixes: the trace breaks here
+                pieces.append(self._backtrack(run))
+            run = {'slices': [(first, last)], 'back': [], 'steps': [], 'score': emission[first:last].copy()}
+            previous_index = index
+        if run is not None:
+            pieces.append(self._backtrack(run))
+
+        line_x, line_y, length, matched = [], [], 0.0, 0
+        for chosen, steps in pieces:
+            matched += len(chosen)
+            piece_x, piece_y = self._geometry(chosen, steps, edge_list, along_list, snap_x, snap_y)
+            if line_x:
+                line_x.append(piece_x[0])  # straight across the gap
+                line_y.append(piece_y[0])
+            line_x.extend(piece_x)
+            line_y.extend(piece_y)
+        line_x, line_y = np.array(line_x), np.array(line_y)
+        if len(line_x):
+            steps = np.hypot(np.diff(line_x), np.diff(line_y))
+            length = float(steps.sum())
+            # A fix snapped onto a node repeats it
+            kept = np.concatenate(([True], steps > 0.01))
+            line_x, line_y = line_x[kept], line_y[kept]
+        latitudes, longitudes = self.unproject(line_x, line_y)
+        return latitudes, longitudes, length, matched, len(x)
+
+    @staticmethod
+    def _backtrack(run):
+        """The candidate chosen for each fix of a run, and the steps between them."""
+        first, last = run['slices'][-1]
+        position = int(np.argmax(run['score']))
+        chosen = [first + position]
+        for step in range(len(run['back']) - 1, -1, -1):
+            position = int(run['back'][step][position])
+            chosen.append(run['slices'][step][0] + position)
+        chosen.reverse()
+        return chosen, run['steps']
+
+    def _geometry(self, chosen, steps, edge_list, along_list, snap_x, snap_y):
+        """Vertices along the roads through the chosen candidates.
+
+        The line only grows from its head, the furthest position reached: a
+        candidate behind it on the same edge is noise and adds nothing.
+        """
+        head_edge, head_along = edge_list[chosen[0]], along_list[chosen[0]]
+        line_x, line_y = [snap_x[chosen[0]]], [snap_y[chosen[0]]]
+        for (stays, trees, prev_first, first), i, j in zip(steps, chosen, chosen[1:]):
+            if stays[i - prev_first, j - first]:
+                continue
+            e1, e2, t2 = edge_list[i], edge_list[j], along_list[j]
+            if e2 == head_edge:
+                if t2 > head_along:
+                    line_x.append(snap_x[j])
+                    line_y.append(snap_y[j])
+                    head_along = t2
+                continue
+            if not (e1 == e2 and t2 >= along_list[i]):
+                # Walk back the Dijkstra tree from the next edge's start to this edge's end
+                end, previous = int(self.target[e1]), trees[int(self.target[e1])][1]
+                node, nodes = int(self.source[e2]), []
+                while node != end:
+                    nodes.append(node)
+                    node = previous[node]
+                nodes.append(end)
+                nodes.reverse()
+                if head_edge != e1 and int(self.target[head_edge]) in nodes:
+                    # The head already went past the start of this route
+                    nodes = nodes[nodes.index(int(self.target[head_edge])):]
+                for node in nodes:
+                    line_x.append(self.x[node])
+                    line_y.append(self.y[node])
+            line_x.append(snap_x[j])
+            line_y.append(snap_y[j])
+            head_edge, head_along = e2, t2
+        return line_x, line_y
+
+
+def encode_polyline(latitudes, longitudes, precision=5):
+    """Encoded polyline (Google's format) of the points."""
+    factor = 10 ** precision
+    result, last_lat, last_lon = [], 0, 0
+    for latitude, longitude in zip(latitudes, longitudes):
+        lat, lon = int(round(latitude * factor)), int(round(longitude * factor))
+        for delta in (lat - last_lat, lon - last_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                result.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            result.append(chr(value + 63))
+        last_lat, last_lon = lat, lon
+    return ''.join(result)
+
+
+def decode_polyline(encoded, precision=5):
+    """[[lat, lon], ...] of an encoded polyline."""
+    factor = 10 ** precision
+    points, index, lat, lon = [], 0, 0, 0
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift, value = 0, 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                value |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(value >> 1) if value & 1 else value >> 1)
+        lat += deltas[0]
+        lon += deltas[1]
+        points.append([lat / factor, lon / factor])
+    return points
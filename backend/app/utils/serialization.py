@@ -0,0 +1,284 @@
+from flask import request
+from sqlalchemy.orm import joinedload, selectinload
+from app.models.user import User
+from app.models.vehicle import Vehicle
+from app.models.mission import Mission
+from app.models.location import Location
+from app.models.anomaly import Anomaly
+from app.models.reimbursement import Reimbursement
+
+# Maximum nesting allowed through ?expand= or ?depth=
+MAX_EXPAND_DEPTH = 3
+
+# Serializable resources: model, relations (name -> target resource) and hidden columns
+RESOURCES = {
+    'users': {
+        'model': User,
+        'relations': {},
+        'exclude': {'password_hash'}
+    },
+    'vehicles': {
+        'model': Vehicle,
+        'relations': {'driver': 'users'},
+        'exclude': set()
+    },
+    'missions': {
+        'model': Mission,
+        'relations': {'assigned_user': 'users', 'vehicle': 'vehicles', 'creator': 'users'},
+        'exclude': set()
+    },
+    'reimbursements': {
+        'model': Reimbursement,
+        'relations': {'mission': 'missions', 'user': 'users'},
+        'exclude': set()
+    },
+    'anomalies': {
+        'model': Anomaly,
+        'relations': {'vehicle': 'vehicles', 'mission': 'missions'},
+        'exclude': set()
+    },
+    'locations': {
+        'model': Location,
+        'relations': {'vehicle': 'vehicles', 'mission': 'missions'},
+        'exclude': set()
+    }
+}
+
+# Shape produced by the legacy nested to_dict() of each resource
+LEGACY_EXPAND = {
+    'users': (),
+    'vehicles': ('driver',),
+    'missions': ('assigned_user', 'vehicle', 'vehicle.driver'),
+    'reimbursements': ('mission', 'mission.assigned_user', 'mission.vehicle',
+                       'mission.vehicle.driver', 'user'),
+    'anomalies': (),
+    'locations': ()
+}
+
+
+class SerializationOptions:
+    """Requested response shape for a list or detail endpoint."""
+
+    def __init__(self, resource, expand=(), fields=None, sideload=False):
+        self.resource = resource
+        self.expand = tuple(sorted(set(expand)))
+        self.fields = fields or {}
+        self.sideload = sideload
+
+    def load_options(self):
+        """Eager-loading options matching the requested shape."""
+        paths = self.expand if self.sideload else LEGACY_EXPAND[self.resource]
+        return eager_load_options(self.resource, paths)
+
+
+def _split(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def _all_paths(resource, depth, prefix=''):
+    """Every relation path of a resource down to `depth` levels."""
+    if depth <= 0:
+        return []
+
+    paths = []
+    for relation, target in RESOURCES[resource]['relations'].items():
+        path = f'{prefix}{relation}'
+        paths.append(path)
+        paths.extend(_all_paths(target, depth - 1, prefix=f'{path}.'))
+    return paths
+
+
+def _resolve_path(resource, path):
+    """Validate a dotted relation path and return the resources it traverses."""
+    parts = path.split('.')
+    if len(parts) > MAX_EXPAND_DEPTH:
+        raise ValueError(f'Expansion too deep: {path} (max depth {MAX_EXPAND_DEPTH})')
+
+    current = resource
+    traversed = []
+    for part in parts:
+        relations = RESOURCES[current]['relations']
+        if part not in relations:
+            raise ValueError(f'Unknown relation "{part}" for {current}')
+        current = relations[part]
+        traversed.append(current)
+    return traversed
+
+
+def allowed_fields(resource):
+    """Column names that may appear in a sparse fieldset."""
+    spec = RESOURCES[resource]
+    return [column.key for column in spec['model'].__table__.columns if column.key not in spec['exclude']]
+
+
+def parse_serialization_args(resource, args=None):
+    """Build SerializationOptions from ?expand=, ?depth= and ?fields= query arguments.
+
+    Supported forms:
+        ?expand=mission,mission.vehicle       dotted relation paths
+        ?depth=2                              expand every relation down to 2 levels
+        ?fields=id,status                     sparse fieldset of the primary resource
+        ?fields[vehicles]=id,license_plate    sparse fieldset of an included resource
+
+    Without any of these arguments the legacy nested representation is kept.
+    Raises ValueError on unknown relations or fields.
+    """
+    args = request.args if args is None else args
+
+    expand = []
+    for value in args.getlist('expand'):
+        expand.extend(_split(value))
+
+    depth = args.get('depth')
+    if depth is not None:
+        try:
+            depth = int(depth)
+        except ValueError:
+            raise ValueError('depth must be an integer')
+        if depth < 0 or depth > MAX_EXPAND_DEPTH:
+            raise ValueError(f'depth must be between 0 and {MAX_EXPAND_DEPTH}')
+        expand.extend(_all_paths(resource, depth))
+
+    fields = {}
+    for key in args.keys():
+        if key == 'fields':
+            target = resource
+        elif key.startswith('fields[') and key.endswith(']'):
+            target = key[len('fields['):-1]
+        else:
+            continue
+
+        if target not in RESOURCES:
+            raise ValueError(f'Unknown resource in fields: {target}')
+
+        requested = _split(args.get(key))
+        unknown = set(requested) - set(allowed_fields(target))
+        if unknown:
+            raise ValueError(f'Unknown fields for {target}: {", ".join(sorted(unknown))}')
+        fields[target] = requested
+
+    # Expanding "a.b" implies expanding "a"
+    full_expand = set()
+    for path in expand:
+        _resolve_path(resource, path)
+        parts = path.split('.')
+        for i in range(1, len(parts) + 1):
+            full_expand.add('.'.join(parts[:i]))
+
+    sideload = bool(full_expand or fields or depth is not None)
+    return SerializationOptions(resource, full_expand, fields, sideload)
+
+
+def eager_load_options(resource, paths):
+    """Translate relation paths into joinedload/selectinload loader options.
+
+    Many-to-one relations are joined in the same statement, collections are
+    loaded with one extra IN query per level.
+    """
+    options = []
+    for path in sorted(set(paths)):
+        loader = None
+        current = resource
+        for part in path.split('.'):
+            model = RESOURCES[current]['model']
+            attribute = getattr(model, part)
+            strategy = selectinload if attribute.property.uselist else joinedload
+            loader = strategy(attribute) if loader is None else getattr(loader, strategy.__name__)(attribute)
+            current = RESOURCES[current]['relations'][part]
+        if loader is not None:
+            options.append(loader)
+    return options
+
+
+def _flat_dict(obj, resource, fields):
+    # Resources with a nested legacy shape accept expand=() to skip their relations
+    data = obj.to_dict(expand=()) if LEGACY_EXPAND[resource] else obj.to_dict()
+    for hidden in RESOURCES[resource]['exclude']:
+        data.pop(hidden, None)
+
+    wanted = fields.get(resource)
+    if wanted:
+        data = {key: value for key, value in data.items() if key == 'id' or key in wanted}
+    return data
+
+
+def _sideload(obj, resource, relations, options, included):
+    """Add the relations of `obj` selected by the expand paths to `included`."""
+    for relation, subpaths in relations.items():
+        target = RESOURCES[resource]['relations'][relation]
+        related = getattr(obj, relation)
+        if related is None:
+            continue
+
+        bucket = included.setdefault(target, {})
+        key = str(related.id)
+        if key not in bucket:
+            bucket[key] = _flat_dict(related, target, options.fields)
+        if subpaths:
+            _sideload(related, target, subpaths, options, included)
+
+
+def _relation_tree(paths):
+    """Turn ('a', 'a.b', 'c') into {'a': {'b': {}}, 'c': {}}."""
+    tree = {}
+    for path in paths:
+        node = tree
+        for part in path.split('.'):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def serialize(items, options):
+    """Serialize a list of model instances according to `options`.
+
+    Returns (data, included). In legacy mode `included` is None and each row is
+    the nested to_dict() output. In sideload mode every row is flat and the
+    expanded entities are deduplicated into `included[resource][id]`.
+    """
+    if not options.sideload:
+        return [item.to_dict() for item in items], None
+
+    tree = _relation_tree(options.expand)
+    included = {}
+    data = []
+    for item in items:
+        data.append(_flat_dict(item, options.resource, options.fields))
+        _sideload(item, options.resource, tree, options, included)
+
+    return data, included
+
+
+def serialize_one(item, options):
+    """Serialize a single model instance according to `options`."""
+    data, included = serialize([item], options)
+    return data[0], included
+
+
+# Columnar layout of point lists (?shape=columns): short name -> point dict key
+POINT_COLUMNS = {
+    'ts': 'timestamp',
+    'lat': 'latitude',
+    'lon': 'longitude',
+    'alt': 'altitude',
+    'speed': 'speed',
+    'heading': 'heading',
+    'accuracy': 'accuracy'
+}
+
+
+def wants_columns(args=None):
+    """True for ?shape=columns, False for ?shape=rows or no argument. Raises ValueError otherwise."""
+    args = request.args if args is None else args
+    shape = args.get('shape', 'rows')
+    if shape not in ('rows', 'columns'):
+        raise ValueError('shape must be rows or columns')
+    return shape == 'columns'
+
+
+def columnar_points(points, columns=tuple(POINT_COLUMNS)):
+    """Point dicts as parallel arrays: {'ts': [...], 'lat': [...], 'lon': [...], ...}.
+
+    Much smaller and faster to encode and decode than one object per point
+    for routes and histories of thousands of points.
+    """
+    return {name: [point.get(POINT_COLUMNS[name]) for point in points] for name in columns}
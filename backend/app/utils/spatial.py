@@ -0,0 +1,52 @@
+from flask import current_app
+from sqlalchemy import text
+from app import db
+
+# Geography columns maintained by PostgreSQL itself from the Float lat/lon
+# columns, so the ORM models and every write path stay unchanged:
+# (table, column, geography type, expression, GiST index name)
+SPATIAL_COLUMNS = [
+    ('locations', 'geog', 'Point',
+     'ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography',
+     'ix_locations_geog'),
+    ('vehicles', 'current_geog', 'Point',
+     'ST_SetSRID(ST_MakePoint(current_longitude, current_latitude), 4326)::geography',
+     'ix_vehicles_current_geog'),
+    ('missions', 'start_geog', 'Point',
+     'ST_SetSRID(ST_MakePoint(start_longitude, start_latitude), 4326)::geography',
+     'ix_missions_start_geog'),
+    ('missions', 'end_geog', 'Point',
+     'ST_SetSRID(ST_MakePoint(end_longitude, end_latitude), 4326)::geography',
+     'ix_missions_end_geog'),
+    ('missions', 'route_geog', 'LineString',
+     'ST_SetSRID(ST_MakeLine(ST_MakePoint(start_longitude, start_latitude), '
+     'ST_MakePoint(end_longitude, end_latitude)), 4326)::geography',
+     'ix_missions_route_geog')
+]
+
+
+def postgis_enabled():
+    """True when SPATIAL_BACKEND is 'postgis' and the database is PostgreSQL."""
+    return (current_app.config.get('SPATIAL_BACKEND') == 'postgis'
+            and db.engine.dialect.name == 'postgresql')
+
+
+def ensure_spatial_schema():
+    """Create the PostGIS extension, geography columns and GiST indexes when enabled."""
+    if current_app.config.get('SPATIAL_BACKEND') != 'postgis':
+        return
+
+    if db.engine.dialect.name != 'postgresql':
+        print(f"SPATIAL_BACKEND=postgis needs PostgreSQL, using the SQL fallback on {db.engine.dialect.name}")
+        return
+
+    with db.engine.begin() as connection:
+        connection.execute(text('CREATE EXTENSION IF NOT EXISTS postgis'))
+        for table, column, geometry_type, expression, index_name in SPATIAL_COLUMNS:
+            connection.execute(text(
+                f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} '
+                f'geography({geometry_type}, 4326) GENERATED ALWAYS AS ({expression}) STORED'
+            ))
+            connection.execute(text(
+                f'CREATE INDEX IF NOT EXISTS {index_name} ON {table} USING GIST ({column})'
+            ))
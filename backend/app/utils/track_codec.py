@@ -0,0 +1,242 @@
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+try:
+    import numpy as np
+except ImportError:  # decoded columns are then plain Python lists
+    np = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Blob layout: header (magic, version, codec, point count), then the
+# compressed columns back to back, widest first so each one is aligned:
+#   timestamp  int64  µs since epoch, delta + zigzag
+#   latitude   int32  1e-7 degrees, delta + zigzag (wrapping)
+#   longitude  int32  1e-7 degrees, delta + zigzag (wrapping)
+#   altitude   int32  decimeters
+#   speed      uint16 0.1 km/h
+#   heading    uint16 0.01 degrees
+#   accuracy   uint16 0.1 m
+# Missing altitudes are INT32_MIN, missing uint16 values 0xFFFF.
+HEADER = struct.Struct('<4sBBHI')
+TRACK_MAGIC = b'FTRK'
+TRACK_VERSION = 1
+CODECS = {'zlib': 0, 'zstd': 1}
+
+COORDINATE_SCALE = 10_000_000
+ALTITUDE_SCALE = 10
+SPEED_SCALE = 10
+HEADING_SCALE = 100
+ACCURACY_SCALE = 10
+MISSING_INT32 = -2 ** 31
+MISSING_UINT16 = 0xFFFF
+
+EPOCH = datetime(1970, 1, 1)
+LITTLE_ENDIAN = sys.byteorder == 'little'
+
+
+def _compress(payload, codec, level):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ValueError('zstd compression needs the zstandard package')
+        return zstandard.ZstdCompressor(level=level).compress(payload)
+    return zlib.compress(payload, level)
+
+
+def _decompress(payload, codec_id):
+    if codec_id == CODECS['zstd']:
+        if zstandard is None:
+            raise ValueError('This track is zstd compressed, install the zstandard package')
+        return zstandard.ZstdDecompressor().decompress(payload)
+    return zlib.decompress(payload)
+
+
+def _quantize(values, scale, missing, low, high):
+    return [missing if value is None else max(low, min(high, round(value * scale))) for value in values]
+
+
+def _zigzag_deltas(values, bits):
+    """Deltas wrapped to `bits`, zigzag encoded so small negative steps stay small."""
+    mask = (1 << bits) - 1
+    sign = 1 << (bits - 1)
+    encoded = []
+    previous = 0
+    for value in values:
+        delta = (value - previous) & mask
+        if delta & sign:
+            delta -= 1 << bits
+        encoded.append(((delta << 1) ^ (delta >> (bits - 1))) & mask)
+        previous = value
+    return encoded
+
+
+def _column(typecode, values):
+    column = array(typecode, values)
+    if not LITTLE_ENDIAN:
+        column.byteswap()
+    return column.tobytes()
+
+
+def encode_track(points, codec='zlib', level=6):
+    """Encode location points (dicts sorted by timestamp) into a compressed columnar blob."""
+    timestamps = [(point['timestamp'] - EPOCH) // timedelta(microseconds=1) for point in points]
+    latitudes = [round(point['latitude'] * COORDINATE_SCALE) for point in points]
+    longitudes = [round(point['longitude'] * COORDINATE_SCALE) for point in points]
+
+    payload = b''.join([
+        _column('Q', _zigzag_deltas(timestamps, 64)),
+        _column('I', _zigzag_deltas(latitudes, 32)),
+        _column('I', _zigzag_deltas(longitudes, 32)),
+        _column('i', _quantize([point.get('altitude') for point in points],
+                               ALTITUDE_SCALE, MISSING_INT32, MISSING_INT32 + 1, 2 ** 31 - 1)),
+        _column('H', _quantize([point.get('speed') for point in points],
+                               SPEED_SCALE, MISSING_UINT16, 0, MISSING_UINT16 - 1)),
+        _column('H', _quantize([None if point.get('heading') is None else point['heading'] % 360
+                                for point in points], HEADING_SCALE, MISSING_UINT16, 0, 35999)),
+        _column('H', _quantize([point.get('accuracy') for point in points],
+                               ACCURACY_SCALE, MISSING_UINT16, 0, MISSING_UINT16 - 1))
+    ])
+    return HEADER.pack(TRACK_MAGIC, TRACK_VERSION, CODECS[codec], 0, len(points)) + _compress(payload, codec, level)
+
+
+def decode_track(blob):
+    """Decode a track blob into columns.
+
+    Returns a dict of equal-length columns: 'timestamp' (µs since epoch),
+    'latitude', 'longitude', 'altitude', 'speed', 'heading', 'accuracy'.
+    With NumPy these are arrays read straight from the decompressed buffer
+    (missing values are NaN), otherwise lists (missing values are None).
+    """
+    magic, version, codec_id, _, count = HEADER.unpack_from(blob)
+    if magic != TRACK_MAGIC or version != TRACK_VERSION:
+        raise ValueError('Not a track blob of a supported version')
+    payload = _decompress(memoryview(blob)[HEADER.size:], codec_id)
+    if np is not None:
+        return _decode_numpy(payload, count)
+    return _decode_python(payload, count)
+
+
+def _decode_numpy(payload, count):
+    offset = 0
+
+    def column(dtype):
+        nonlocal offset
+        values = np.frombuffer(payload, dtype=dtype, count=count, offset=offset)
+        offset += values.nbytes
+        return values
+
+    def undelta(zigzag, signed):
+        deltas = (zigzag >> 1).view(signed) ^ -(zigzag & 1).view(signed)
+        return np.cumsum(deltas, dtype=signed)
+
+    def scaled(values, missing, scale):
+        result = values / scale
+        result[values == missing] = np.nan
+        return result
+
+    timestamps = undelta(column('<u8'), np.int64)
+    latitudes = undelta(column('<u4'), np.int32) / COORDINATE_SCALE
+    longitudes = undelta(column('<u4'), np.int32) / COORDINATE_SCALE
+    return {
+        'timestamp': timestamps,
+        'latitude': latitudes,
+        'longitude': longitudes,
+        'altitude': scaled(column('<i4'), MISSING_INT32, ALTITUDE_SCALE),
+        'speed': scaled(column('<u2'), MISSING_UINT16, SPEED_SCALE),
+        'heading': scaled(column('<u2'), MISSING_UINT16, HEADING_SCALE),
+        'accuracy': scaled(column('<u2'), MISSING_UINT16, ACCURACY_SCALE)
+    }
+
+
+def _decode_python(payload, count):
+    offset = 0
+
+    def column(typecode):
+        nonlocal offset
+        values = array(typecode)
+        size = values.itemsize * count
+        values.frombytes(payload[offset:offset + size])
+        if not LITTLE_ENDIAN:
+            values.byteswap()
+        offset += size
+        return values
+
+    def undelta(zigzag, bits):
+        mask = (1 << bits) - 1
+        sign = 1 << (bits - 1)
+        values = []
+        for value in accumulate(((z >> 1) ^ -(z & 1) for z in zigzag), lambda a, b: (a + b) & mask):
+            value &= mask
+            values.append(value - (1 << bits) if value & sign else value)
+        return values
+
+    def scaled(values, missing, scale):
+        return [None if value == missing else value / scale for value in values]
+
+    return {
+        'timestamp': undelta(column('Q'), 64),
+        'latitude': [value / COORDINATE_SCALE for value in undelta(column('I'), 32)],
+        'longitude': [value / COORDINATE_SCALE for value in undelta(column('I'), 32)],
+        'altitude': scaled(column('i'), MISSING_INT32, ALTITUDE_SCALE),
+        'speed': scaled(column('H'), MISSING_UINT16, SPEED_SCALE),
+        'heading': scaled(column('H'), MISSING_UINT16, HEADING_SCALE),
+        'accuracy': scaled(column('H'), MISSING_UINT16, ACCURACY_SCALE)
+    }
+
+
+def slice_track(columns, start=None, end=None):
+    """Restrict decoded columns to start <= timestamp <= end (datetimes)."""
+    timestamps = columns['timestamp']
+    low = 0 if start is None else _bisect(timestamps, (start - EPOCH) // timedelta(microseconds=1), 'left')
+    high = len(timestamps) if end is None else _bisect(timestamps, (end - EPOCH) // timedelta(microseconds=1), 'right')
+    return {name: values[low:high] for name, values in columns.items()}
+
+
+def _bisect(timestamps, value, side):
+    if np is not None and isinstance(timestamps, np.ndarray):
+        return int(np.searchsorted(timestamps, value, side=side))
+    return (bisect_left if side == 'left' else bisect_right)(timestamps, value)
+
+
+def track_points(columns):
+    """Decoded columns as (timestamp datetime, latitude, longitude, altitude, speed, heading, accuracy) tuples."""
+    names = ('timestamp', 'latitude', 'longitude', 'altitude', 'speed', 'heading', 'accuracy')
+    lists = [columns[name].tolist() if hasattr(columns[name], 'tolist') else columns[name] for name in names]
+    optional = lambda value: None if value is None or value != value else value
+    return [
+        (EPOCH + timedelta(microseconds=timestamp), latitude, longitude,
+         optional(altitude), optional(speed), optional(heading), optional(accuracy))
+        for timestamp, latitude, longitude, altitude, speed, heading, accuracy in zip(*lists)
+    ]
+
+
+def column_timestamps(columns):
+    """The timestamp column as a list of µs since epoch."""
+    values = columns['timestamp']
+    return values.tolist() if hasattr(values, 'tolist') else list(values)
+
+
+def column_values(columns, name):
+    """One decoded column as a list, missing values as None and timestamps as ISO 8601 strings.
+
+    NumPy columns are converted array by array, without a Python object per point until tolist().
+    """
+    values = columns[name]
+    if np is not None and isinstance(values, np.ndarray):
+        if name == 'timestamp':
+            unit = 'us' if (values % 1_000_000).any() else 's'
+            return np.datetime_as_string(values.astype('datetime64[us]'), unit=unit).tolist()
+        result = values.astype(object)
+        result[np.isnan(values)] = None
+        return result.tolist()
+    if name == 'timestamp':
+        return [(EPOCH + timedelta(microseconds=value)).isoformat() for value in values]
+    return list(values)
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite: latency, throughput and allocations of the hot API endpoints.
+
+Generates a synthetic fleet (generate_fleet_data's FleetGenerator) in a fresh
+SQLite database, or reuses --database, boots the app in-process and sends
+--requests requests per scenario through the Flask test client after
+--warmup untimed ones. Reports p50/p95/p99 latency, single-client
+throughput, response size and SQL queries per request, then replays a few requests under
+tracemalloc for the peak and retained Python allocations per request.
+
+Read scenarios run first, on the untouched dataset; the writing ones
+(location ingest, anomaly detection) run last. Results are saved as JSON
+with sorted keys so runs on two commits can be diffed, or compared:
+
+    python benchmarks/bench_api.py --vehicles 50 --days 2 --output before.json
+    python benchmarks/bench_api.py --vehicles 50 --days 2 --output after.json --compare before.json
+    python benchmarks/bench_api.py --compare before.json after.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# name -> (method, url); writing scenarios last so reads see the generated data only
+SCENARIOS = [
+    ('locations_current', 'GET', '/api/locations/current'),
+    ('map_fleet', 'GET', '/api/map/fleet'),
+    ('map_heatmap', 'GET', '/api/map/heatmap?hours=24'),
+    ('map_folium_embed', 'GET', '/api/map/folium-embed'),
+    ('dashboard_stats', 'GET', '/api/dashboard/stats'),
+    ('dashboard_recent_activity', 'GET', '/api/dashboard/recent-activity'),
+    ('dashboard_mission_analytics', 'GET', '/api/dashboard/mission-analytics'),
+    ('dashboard_vehicle_analytics', 'GET', '/api/dashboard/vehicle-analytics'),
+    ('locations_ingest', 'POST', '/api/locations'),
+    ('anomalies_detect', 'POST', '/api/anomalies/detect'),
+]
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def prepare_dataset(db, args):
+    """Generate the fleet unless this seed's data is already in the database, returns row counts."""
+    from app.models.anomaly import Anomaly
+    from app.models.location import Location
+    from app.models.mission import Mission
+    from app.models.user import User
+    from app.models.vehicle import Vehicle
+    from app.services.fleet_generator import FleetGenerator
+
+    generator = FleetGenerator(vehicles=args.vehicles, days=args.days, hz=args.hz, seed=args.seed,
+                               end=args.end, password=args.password)
+    try:
+        print(f"Generating about {generator.estimated_points():,} location points...")
+        counts = generator.run(progress=None)
+        print(f"  done in {counts.pop('seconds')}s")
+    except ValueError:
+        print(f"Reusing the seed {args.seed} dataset already in the database")
+    return {model.__tablename__: db.session.query(model).count()
+            for model in (User, Vehicle, Mission, Location, Anomaly)}
+
+
+def ingest_body(vehicles, rng):
+    """A fresh GPS point for one of the generated vehicles, close to its last position."""
+    vehicle_id, latitude, longitude = vehicles[rng.randrange(len(vehicles))]
+    return {
+        'vehicle_id': vehicle_id,
+        'latitude': round((latitude or 33.57) + rng.uniform(-0.001, 0.001), 7),
+        'longitude': round((longitude or -7.59) + rng.uniform(-0.001, 0.001), 7),
+        'speed': round(rng.uniform(0, 90), 1),
+        'heading': round(rng.uniform(0, 360), 1),
+        'accuracy': 5.0,
+        'timestamp': datetime.utcnow().isoformat()
+    }
+
+
+def run_scenario(client, method, url, headers, body, requests, warmup, allocations):
+    def send():
+        response = client.open(url, method=method, headers=headers, json=body() if body else None)
+        size = len(response.get_data())
+        response.close()
+        return response.status_code, size
+
+    for _ in range(warmup):
+        send()
+
+    latencies, statuses, sizes = [], {}, []
+    for _ in range(requests):
+        started = time.perf_counter()
+        status, size = send()
+        latencies.append((time.perf_counter() - started) * 1000)
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        sizes.append(size)
+
+    from app.utils.query_stats import query_stats
+    log = query_stats.push()
+    send()
+    query_stats.pop(log)
+
+    peaks, retained = [], []
+    if allocations:
+        tracemalloc.start()
+        for _ in range(allocations):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            send()
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(current - before)
+        tracemalloc.stop()
+
+    total = sum(latencies) / 1000
+    return {
+        'method': method,
+        'url': url,
+        'requests': requests,
+        'statuses': statuses,
+        'errors': sum(count for status, count in statuses.items() if int(status) >= 400),
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'max_ms': round(max(latencies), 2),
+        'throughput_rps': round(requests / total, 1) if total else None,
+        'response_kb': round(sum(sizes) / len(sizes) / 1024, 1),
+        'queries': log.count,
+        'db_ms': round(log.seconds * 1000, 2),
+        'alloc_peak_kb': round(percentile(peaks, 0.5) / 1024, 1) if peaks else None,
+        'alloc_retained_kb': round(percentile(retained, 0.5) / 1024, 1) if retained else None
+    }
+
+
+def compare(baseline, current):
+    """Print the relative change of each scenario between two result files."""
+    print(f"\n{'scenario':30s} {'p50':>16s} {'p95':>16s} {'rps':>16s} {'alloc':>16s}")
+    for name, result in current['scenarios'].items():
+        before = baseline['scenarios'].get(name)
+        if before is None:
+            print(f"{name:30s} (not in the baseline)")
+            continue
+        cells = []
+        for key in ('p50_ms', 'p95_ms', 'throughput_rps', 'alloc_peak_kb'):
+            old, new = before.get(key), result.get(key)
+            if not old or new is None:
+                cells.append(f"{'-':>16s}")
+            else:
+                cells.append(f"{new:>8} {(new - old) / old * 100:+6.1f}%")
+        print(f"{name:30s} " + ' '.join(cells))
+    if baseline.get('dataset') != current.get('dataset'):
+        print('Warning: the two runs used different datasets')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--vehicles', type=int, default=20)
+    parser.add_argument('--days', type=int, default=2)
+    parser.add_argument('--hz', type=float, default=0.2, help='GPS fixes per second while driving')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--end', type=datetime.fromisoformat,
+                        help='End of the generated period (UTC), default the start of the current hour')
+    parser.add_argument('--password', default='password123')
+    parser.add_argument('--database', help='Database URL to use (and fill if empty), default a fresh SQLite file')
+    parser.add_argument('--requests', type=int, default=50, help='Timed requests per scenario')
+    parser.add_argument('--warmup', type=int, default=3, help='Untimed requests per scenario')
+    parser.add_argument('--allocations', type=int, default=5,
+                        help='Requests per scenario replayed under tracemalloc, 0 skips them')
+    parser.add_argument('--only', help='Comma separated scenario names')
+    parser.add_argument('--accept-encoding', default='gzip, deflate, br', help="Sent with every request, '' for none")
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--compare', nargs='+', metavar='RESULTS',
+                        help='Baseline results to compare this run with, or two result files to compare only')
+    args = parser.parse_args()
+    # Same dataset for every run within the hour, the endpoints' time windows barely move
+    args.end = args.end or datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+
+    if args.compare and len(args.compare) == 2:
+        with open(args.compare[0]) as old, open(args.compare[1]) as new:
+            compare(json.load(old), json.load(new))
+        return
+
+    names = [name for name, _, _ in SCENARIOS]
+    selected = args.only.split(',') if args.only else names
+    unknown = set(selected) - set(names)
+    if unknown:
+        sys.exit(f"Unknown scenarios: {', '.join(sorted(unknown))} (choose from {', '.join(names)})")
+
+    if args.database:
+        os.environ['BENCHMARK_DATABASE_URL'] = args.database
+    else:
+        workdir = tempfile.mkdtemp(prefix='bench_api_')
+        os.environ['BENCHMARK_DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    from app import create_app, db
+    from app.models.vehicle import Vehicle
+
+    app = create_app('benchmark')
+    with app.app_context():
+        db.create_all()
+        dataset = prepare_dataset(db, args)
+        vehicles = db.session.query(Vehicle.id, Vehicle.current_latitude, Vehicle.current_longitude).filter(
+            Vehicle.license_plate.like(f'%-{args.seed}')
+        ).all()
+        db.session.remove()
+
+        client = app.test_client()
+        response = client.post('/api/auth/login', json={'username': f'sim{args.seed}-manager-00001',
+                                                        'password': args.password})
+        if response.status_code != 200:
+            sys.exit(f"Login failed: {response.get_data(as_text=True)}")
+        headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+        if args.accept_encoding:
+            headers['Accept-Encoding'] = args.accept_encoding
+
+        rng = random.Random(args.seed)
+        bodies = {'locations_ingest': lambda: ingest_body(vehicles, rng)}
+        results = {}
+        for name, method, url in SCENARIOS:
+            if name not in selected:
+                continue
+            result = run_scenario(client, method, url, headers, bodies.get(name), args.requests, args.warmup,
+                                  args.allocations)
+            results[name] = result
+            errors = f"  {result['errors']} errors {result['statuses']}" if result['errors'] else ''
+            print(f"  {name:30s} p50 {result['p50_ms']:8.2f} ms  p95 {result['p95_ms']:8.2f} ms  "
+                  f"p99 {result['p99_ms']:8.2f} ms  {result['throughput_rps'] or 0:8.1f} req/s  "
+                  f"{result['response_kb']:8.1f} KB  {result['queries']:4d} queries  peak {result['alloc_peak_kb'] or 0:8.1f} KB{errors}")
+
+        report = {
+            'revision': git_revision(),
+            'created_at': datetime.utcnow().replace(microsecond=0).isoformat(),
+            'environment': {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+                'database': db.engine.dialect.name,
+                'json_provider': type(app.json).__name__,
+                'compression': app.config['COMPRESS_RESPONSES']
+            },
+            'dataset': dict(dataset, vehicles_generated=args.vehicles, days=args.days, hz=args.hz, seed=args.seed,
+                            end=args.end.isoformat()),
+            'settings': {'requests': args.requests, 'warmup': args.warmup, 'allocations': args.allocations,
+                         'accept_encoding': args.accept_encoding},
+            'scenarios': results
+        }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write('\n')
+    if args.compare:
+        with open(args.compare[0]) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark: crash recovery from the telemetry journal.
+
+Writes --points GPS points to a journal directory the way ingest workers do
+(plus --duplicates points journaled twice, as after a replay that crashed
+before its checkpoint), leaves it unowned like a crashed process would, then
+times the replay into an empty SQLite database.
+
+    python benchmarks/bench_journal_recovery.py --points 10000000
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def write_journal(directory, points, vehicles, duplicates, fsync):
+    from app.services.telemetry_journal import JournalWriter, encode_point
+
+    writer = JournalWriter(directory, fsync=fsync)
+    start = datetime(2024, 1, 1)
+    chunk = []
+
+    def point(i):
+        return {
+            'vehicle_id': i % vehicles + 1,
+            'mission_id': None,
+            'timestamp': start + timedelta(seconds=i // vehicles),
+            'latitude': 33.9 + (i % 1000) * 1e-4,
+            'longitude': -6.8 - (i % 777) * 1e-4,
+            'altitude': None,
+            'speed': float(i % 120),
+            'heading': float(i % 360),
+            'accuracy': 5.0
+        }
+
+    for i in list(range(points)) + list(range(duplicates)):
+        chunk.append(encode_point(point(i)))
+        if len(chunk) == 10000:
+            writer.append(b''.join(chunk))
+            chunk = []
+    if chunk:
+        writer.append(b''.join(chunk))
+    writer.close()
+    # The lock file of a process that is gone
+    open(os.path.join(directory, 'lock'), 'w').close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--points', type=int, default=1000000)
+    parser.add_argument('--duplicates', type=int, default=10000)
+    parser.add_argument('--vehicles', type=int, default=200)
+    parser.add_argument('--batch', type=int, default=20000)
+    parser.add_argument('--fsync', default='interval', choices=['always', 'interval', 'never'])
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_journal_')
+    journal_dir = os.path.join(workdir, 'journal')
+    os.environ['BENCHMARK_DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['JOURNAL_DIR'] = journal_dir
+
+    from app import create_app, db
+    from app.models.location import Location
+    from app.models.vehicle import Vehicle
+    from app.services.telemetry_journal import telemetry_journal
+    from app.utils.database import init_db
+
+    app = create_app('benchmark')
+    init_db(app)
+    with app.app_context():
+        for i in range(Vehicle.query.count(), args.vehicles):
+            db.session.add(Vehicle(license_plate=f'BENCH-{i:04d}', brand='Bench', model='Van', year=2024))
+        db.session.commit()
+
+    try:
+        print(f"Journaling {args.points + args.duplicates} points...")
+        started = time.perf_counter()
+        write_journal(os.path.join(journal_dir, 'crashed-worker'), args.points, args.vehicles,
+                      args.duplicates, args.fsync)
+        write_seconds = time.perf_counter() - started
+        journal_bytes = sum(os.path.getsize(os.path.join(root, name))
+                            for root, _, names in os.walk(journal_dir) for name in names)
+
+        print("Replaying...")
+        with app.app_context():
+            started = time.perf_counter()
+            recovered = telemetry_journal.recover_orphans(args.batch)
+            replay_seconds = time.perf_counter() - started
+            stored = db.session.query(Location).count()
+
+        result = {
+            'points': args.points,
+            'duplicates': args.duplicates,
+            'journal_mb': round(journal_bytes / 1e6, 1),
+            'write_seconds': round(write_seconds, 2),
+            'write_points_per_sec': round((args.points + args.duplicates) / write_seconds),
+            'replayed': recovered,
+            'stored': stored,
+            'replay_seconds': round(replay_seconds, 2),
+            'replay_points_per_sec': round(recovered / replay_seconds)
+        }
+        print(f"  journal {result['journal_mb']} MB written at {result['write_points_per_sec']} points/s")
+        print(f"  replayed {recovered} points in {result['replay_seconds']} s "
+              f"({result['replay_points_per_sec']} points/s), {stored} stored")
+
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(result, f, indent=2)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark: JSON serialization of a location history response.
+
+Serializes a history payload of --points points (the dicts returned by
+LocationService) through the response() of each JSON provider: Flask's
+default stdlib provider (the current output), the stdlib fallback and
+orjson, in the row layout and in the columnar layout (?shape=columns).
+Every output is checked to decode to the same data as the current one.
+
+    python benchmarks/bench_json.py --points 100000
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from app.utils.json_provider import IsoJSONProvider, OrjsonProvider, orjson
+from app.utils.serialization import columnar_points
+
+
+def history_payload(points):
+    random.seed(42)
+    started = datetime(2024, 1, 1)
+    latitude, longitude, heading = 33.97, -6.85, 90.0
+    locations = []
+    for second in range(points):
+        heading = (heading + random.gauss(0, 3)) % 360
+        latitude += 0.0001 * math.cos(math.radians(heading))
+        longitude += 0.0001 * math.sin(math.radians(heading))
+        locations.append({
+            'id': second + 1,
+            'latitude': round(latitude, 7),
+            'longitude': round(longitude, 7),
+            'altitude': round(50 + 10 * math.sin(second / 300), 1),
+            'speed': round(random.uniform(0, 120), 1),
+            'heading': round(heading, 2),
+            'accuracy': 5.0,
+            'timestamp': (started + timedelta(seconds=second)).isoformat(),
+            'vehicle_id': 1,
+            'mission_id': 1,
+            'created_at': started.isoformat()
+        })
+    vehicle = {'id': 1, 'license_plate': 'AB-123-CD', 'brand': 'Renault', 'model': 'Clio'}
+    return {'vehicle': vehicle, 'locations': locations, 'count': points}
+
+
+def measure(provider, payload, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = provider.response(payload)
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings), response.get_data()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--points', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5, help='Serializations per variant, the fastest is kept')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    rows = history_payload(args.points)
+    columns = dict(rows, locations=columnar_points(rows['locations']))
+    providers = [('flask (current)', DefaultJSONProvider(app)), ('stdlib iso', IsoJSONProvider(app))]
+    if orjson is not None:
+        providers.append(('orjson', OrjsonProvider(app)))
+    else:
+        print('orjson is not installed, skipping it')
+
+    reference = None
+    baseline_ms = None
+    results = []
+    for layout, payload in (('rows', rows), ('columns', columns)):
+        for name, provider in providers:
+            milliseconds, body = measure(provider, payload, args.repeat)
+            decoded = json.loads(body)
+            if layout == 'rows':
+                reference = reference or decoded
+                assert decoded == reference, f'{name} output differs from the current one'
+            else:
+                expected = columnar_points(reference['locations'])
+                assert decoded['locations'] == expected, f'{name} columnar output differs'
+            baseline_ms = baseline_ms or milliseconds
+            results.append({'provider': name, 'layout': layout, 'ms': round(milliseconds, 1),
+                            'kb': round(len(body) / 1024), 'speedup': round(baseline_ms / milliseconds, 1)})
+            print(f"  {name:16s} {layout:8s} {milliseconds:8.1f} ms  {len(body) / 1024:8.0f} KB  "
+                  f"x{baseline_ms / milliseconds:.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'points': args.points, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
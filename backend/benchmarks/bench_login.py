@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Benchmark: login throughput against telemetry ingest latency under a mixed load.
+
+Starts the app on a local threaded server, then runs --login-clients threads
+posting to /api/auth/login while --ingest-clients threads post GPS points to
+/api/locations. Each configuration of PASSWORD_HASH_WORKERS runs in its own
+process (0 = hashing inline on the request threads).
+
+    python benchmarks/bench_login.py --workers 0 2 4 --duration 20
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DRIVERS = 50
+PASSWORD = 'driver-password'
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def post(url, payload, token=None):
+    """POST JSON and return (status, decoded body or None)."""
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(), headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            return response.status, json.loads(response.read() or b'null')
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+
+def run_child(args):
+    """Run one configuration and print its results as JSON on the last line."""
+    from werkzeug.serving import make_server
+    from app import create_app, db
+    from app.models.user import User
+    from app.models.vehicle import Vehicle
+    from app.utils.password_hashing import password_hasher
+    from app.utils.database import init_db
+
+    app = create_app('benchmark')
+    init_db(app)
+    with app.app_context():
+        for i in range(DRIVERS):
+            user = User(username=f'driver{i}', email=f'driver{i}@bench.local',
+                        first_name='Bench', last_name=f'Driver {i}')
+            user.set_password(PASSWORD)
+            db.session.add(user)
+        db.session.commit()
+        vehicle_ids = [vehicle.id for vehicle in Vehicle.query.all()]
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+    status, body = post(f'{base_url}/api/auth/login', {'username': 'admin', 'password': 'admin123'})
+    assert status == 200, status
+    ingest_token = body['access_token']
+
+    deadline = time.perf_counter() + args.duration
+    lock = threading.Lock()
+    logins = {'ok': 0, 'busy': 0, 'failed': 0}
+    ingest_latencies = []
+    ingest_errors = [0]
+
+    def login_client(index):
+        while time.perf_counter() < deadline:
+            status, _ = post(f'{base_url}/api/auth/login',
+                             {'username': f'driver{index % DRIVERS}', 'password': PASSWORD})
+            key = 'ok' if status == 200 else 'busy' if status == 503 else 'failed'
+            with lock:
+                logins[key] += 1
+            if status == 503:
+                time.sleep(0.05)
+
+    def ingest_client(index):
+        vehicle_id = vehicle_ids[index % len(vehicle_ids)]
+        step = 0
+        while time.perf_counter() < deadline:
+            step += 1
+            started = time.perf_counter()
+            status, _ = post(f'{base_url}/api/locations', {
+                'vehicle_id': vehicle_id,
+                'latitude': 33.97 + step * 1e-5,
+                'longitude': -6.85,
+                'speed': 40
+            }, token=ingest_token)
+            with lock:
+                ingest_latencies.append((time.perf_counter() - started) * 1000)
+                if status != 201:
+                    ingest_errors[0] += 1
+            time.sleep(args.ingest_interval)
+
+    threads = [threading.Thread(target=login_client, args=(i,)) for i in range(args.login_clients)]
+    threads += [threading.Thread(target=ingest_client, args=(i,)) for i in range(args.ingest_clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    result = {
+        'workers': app.config['PASSWORD_HASH_WORKERS'],
+        'logins_per_sec': round(logins['ok'] / elapsed, 2),
+        'logins': logins,
+        'ingest_requests': len(ingest_latencies),
+        'ingest_errors': ingest_errors[0],
+        'ingest_p50_ms': round(percentile(ingest_latencies, 0.50), 2),
+        'ingest_p95_ms': round(percentile(ingest_latencies, 0.95), 2),
+        'ingest_p99_ms': round(percentile(ingest_latencies, 0.99), 2),
+        'hashing': password_hasher.stats()
+    }
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 2])
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--login-clients', type=int, default=32)
+    parser.add_argument('--ingest-clients', type=int, default=8)
+    parser.add_argument('--ingest-interval', type=float, default=0.01)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    results = []
+    for workers in args.workers:
+        workdir = tempfile.mkdtemp(prefix='bench_login_')
+        env = dict(os.environ,
+                   PASSWORD_HASH_WORKERS=str(workers),
+                   BENCHMARK_DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+        command = [sys.executable, os.path.abspath(__file__), '--child',
+                   '--duration', str(args.duration),
+                   '--login-clients', str(args.login_clients),
+                   '--ingest-clients', str(args.ingest_clients),
+                   '--ingest-interval', str(args.ingest_interval)]
+        print(f"Running with PASSWORD_HASH_WORKERS={workers}...")
+        output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        results.append(result)
+        print(f"  logins/s {result['logins_per_sec']:8.2f}   rejected {result['logins']['busy']:5d}   "
+              f"ingest p50 {result['ingest_p50_ms']:7.2f} ms  p95 {result['ingest_p95_ms']:7.2f} ms  "
+              f"p99 {result['ingest_p99_ms']:7.2f} ms   ingest errors {result['ingest_errors']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-page cost of keyset pagination on a large anomalies table.
+
+Fills a dedicated SQLite database with --rows anomalies (1M by default), then
+times GET /api/anomalies/noauth pages at several depths through the cursor,
+and compares with the OFFSET query a naive page-number implementation runs.
+
+    python benchmarks/bench_pagination.py --rows 1000000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def fill_anomalies(db, rows, chunk=50000):
+    """Bulk insert `rows` anomalies through a Core executemany."""
+    from app.models.anomaly import Anomaly
+    from app.models.vehicle import Vehicle
+
+    vehicle = Vehicle(license_plate='BENCH-001', brand='Bench', model='Mark')
+    db.session.add(vehicle)
+    db.session.commit()
+
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    table = Anomaly.__table__
+    inserted = 0
+    while inserted < rows:
+        batch = []
+        for i in range(inserted, min(rows, inserted + chunk)):
+            detected_at = start + timedelta(seconds=i * 30)
+            batch.append({
+                'type': rng.choice(['speeding', 'idle', 'deviation', 'delay']),
+                'description': 'benchmark anomaly',
+                'severity': rng.choice(['low', 'medium', 'high', 'critical']),
+                'detected_at': detected_at,
+                'created_at': detected_at,
+                'vehicle_id': vehicle.id,
+                'is_resolved': False
+            })
+        db.session.execute(table.insert(), batch)
+        db.session.commit()
+        inserted += len(batch)
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_pagination_')
+    os.environ['BENCHMARK_DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    from app import create_app, db
+    from app.models.anomaly import Anomaly
+    from app.utils.pagination import encode_cursor
+    from sqlalchemy import text
+
+    app = create_app('benchmark')
+    with app.app_context():
+        db.create_all()
+
+        print(f"Inserting {args.rows} anomalies...")
+        started = time.perf_counter()
+        fill_anomalies(db, args.rows)
+        print(f"  done in {time.perf_counter() - started:.1f}s")
+
+        client = app.test_client()
+        results = []
+        for fraction in (0.0, 0.1, 0.5, 0.9, 0.999):
+            position = int(args.rows * fraction)
+            cursor = ''
+            if position:
+                # Cursor of the row just before `position` in -detected_at order
+                row = db.session.execute(
+                    text('SELECT id, detected_at FROM anomalies ORDER BY detected_at DESC, id DESC '
+                         'LIMIT 1 OFFSET :offset'),
+                    {'offset': position - 1}
+                ).one()
+                detected_at = row.detected_at
+                if isinstance(detected_at, str):
+                    detected_at = datetime.fromisoformat(detected_at)
+                cursor = encode_cursor('-detected_at', detected_at, row.id)
+
+            url = f'/api/anomalies/noauth?limit={args.limit}&count=estimate'
+            if cursor:
+                url += f'&cursor={cursor}'
+
+            def keyset_page():
+                response = client.get(url)
+                assert response.status_code == 200, response.get_data(as_text=True)
+
+            def offset_page():
+                db.session.query(Anomaly).order_by(
+                    Anomaly.detected_at.desc(), Anomaly.id.desc()
+                ).offset(position).limit(args.limit).all()
+                db.session.query(Anomaly).count()
+
+            keyset_ms = timed(keyset_page, args.repeat)
+            offset_ms = timed(offset_page, args.repeat)
+            results.append({
+                'position': position,
+                'keyset_ms': round(keyset_ms, 2),
+                'offset_ms': round(offset_ms, 2)
+            })
+            print(f"  page at row {position:>9}: keyset {keyset_ms:8.2f} ms   offset+count {offset_ms:8.2f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'rows': args.rows, 'limit': args.limit, 'pages': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
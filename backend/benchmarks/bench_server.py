@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Flask development server against the production server.
+
+Starts each server as a subprocess on a fresh SQLite database, waits for
+/health/ready, then runs --clients concurrent clients against --path for
+--duration seconds and reports requests/sec and latency percentiles.
+
+    python benchmarks/bench_server.py --workers 4 --threads 4 --clients 32
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def wait_ready(base_url, process, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('Server exited before becoming ready')
+        try:
+            with urllib.request.urlopen(f'{base_url}/health/ready', timeout=2) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.2)
+    raise RuntimeError('Server did not become ready')
+
+
+def load(base_url, path, clients, duration):
+    deadline = time.perf_counter() + duration
+    lock = threading.Lock()
+    latencies = []
+    errors = [0]
+
+    def client():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(f'{base_url}{path}', timeout=30) as response:
+                    response.read()
+                ok = True
+            except (urllib.error.URLError, ConnectionError, OSError):
+                ok = False
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+        'requests': len(latencies),
+        'errors': errors[0],
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2)
+    }
+
+
+def run_server(name, command, env, args):
+    port = int(env['API_PORT'])
+    base_url = f'http://127.0.0.1:{port}'
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(base_url, process)
+        load(base_url, args.path, args.clients, min(2.0, args.duration))  # warm up
+        result = load(base_url, args.path, args.clients, args.duration)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    result['server'] = name
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--path', default='/api/vehicles/noauth?limit=20')
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    servers = [
+        ('development', [sys.executable, 'run_server.py']),
+        ('production', [sys.executable, 'serve.py', '--host', '127.0.0.1',
+                        '--workers', str(args.workers), '--threads', str(args.threads)])
+    ]
+
+    results = []
+    for name, command in servers:
+        workdir = tempfile.mkdtemp(prefix='bench_server_')
+        env = dict(os.environ,
+                   FLASK_ENV='production',
+                   API_PORT=str(free_port()),
+                   DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+                   PASSWORD_HASH_WORKERS='0')
+        print(f"Running {name} server...")
+        result = run_server(name, command, env, args)
+        results.append(result)
+        print(f"  {result['requests_per_sec']:8.1f} req/s   p50 {result['p50_ms']:7.2f} ms   "
+              f"p95 {result['p95_ms']:7.2f} ms   p99 {result['p99_ms']:7.2f} ms   errors {result['errors']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
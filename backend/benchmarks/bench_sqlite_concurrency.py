@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark: mixed read/write throughput on SQLite before and after tuning.
+
+Runs --writers processes inserting GPS points (one commit per point, like the
+ingest endpoint) and --readers processes running dashboard-style queries
+against the same database file for --duration seconds. The "default" profile
+uses SQLite's rollback journal with synchronous=FULL and default caches, the
+"tuned" profile the WAL settings from config.py.
+
+    python benchmarks/bench_sqlite_concurrency.py --writers 4 --readers 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROFILES = {
+    'default': {
+        'SQLITE_JOURNAL_MODE': 'DELETE',
+        'SQLITE_SYNCHRONOUS': 'FULL',
+        'SQLITE_CACHE_SIZE': '-2000',
+        'SQLITE_MMAP_SIZE': '0'
+    },
+    'tuned': {}
+}
+
+
+def setup():
+    from app import create_app
+    from app.utils.database import init_db
+    init_db(create_app('benchmark'))
+
+
+def worker(role, duration, results):
+    from sqlalchemy import func
+    from app import create_app, db
+    from app.models.location import Location
+    from app.models.vehicle import Vehicle
+
+    app = create_app('benchmark')
+    ops = errors = 0
+    latencies = []
+    with app.app_context():
+        vehicle_ids = [vehicle_id for (vehicle_id,) in db.session.query(Vehicle.id).all()]
+        deadline = time.perf_counter() + duration
+        step = 0
+        while time.perf_counter() < deadline:
+            step += 1
+            started = time.perf_counter()
+            try:
+                if role == 'writer':
+                    vehicle_id = vehicle_ids[step % len(vehicle_ids)]
+                    db.session.add(Location(vehicle_id=vehicle_id, latitude=33.97, longitude=-6.85,
+                                            speed=40, timestamp=datetime.utcnow()))
+                    vehicle = db.session.get(Vehicle, vehicle_id)
+                    vehicle.current_latitude = 33.97
+                    vehicle.current_longitude = -6.85
+                    db.session.commit()
+                else:
+                    db.session.query(Location.vehicle_id, func.count(Location.id), func.max(Location.timestamp)) \
+                        .group_by(Location.vehicle_id).all()
+                    db.session.query(Vehicle).all()
+                    db.session.rollback()
+                ops += 1
+                latencies.append((time.perf_counter() - started) * 1000)
+            except Exception:
+                db.session.rollback()
+                errors += 1
+    results.put((role, ops, errors, latencies))
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def run_profile(name, args):
+    workdir = tempfile.mkdtemp(prefix='bench_sqlite_')
+    os.environ['BENCHMARK_DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['PASSWORD_HASH_WORKERS'] = '0'
+    for key in PROFILES['default']:
+        os.environ.pop(key, None)
+    os.environ.update(PROFILES[name])
+
+    # Every step runs in a fresh process so config.py picks up the profile
+    context = multiprocessing.get_context('spawn')
+    setup_process = context.Process(target=setup)
+    setup_process.start()
+    setup_process.join()
+
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=('writer', args.duration, results)) for _ in range(args.writers)]
+    processes += [context.Process(target=worker, args=('reader', args.duration, results)) for _ in range(args.readers)]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    summary = {'profile': name}
+    for role in ('writer', 'reader'):
+        rows = [row for row in collected if row[0] == role]
+        latencies = [value for row in rows for value in row[3]]
+        summary[f'{role}_ops_per_sec'] = round(sum(row[1] for row in rows) / args.duration, 1)
+        summary[f'{role}_errors'] = sum(row[2] for row in rows)
+        summary[f'{role}_p95_ms'] = round(percentile(latencies, 0.95), 2)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    results = []
+    for name in ('default', 'tuned'):
+        print(f"Running {name} profile...")
+        summary = run_profile(name, args)
+        results.append(summary)
+        print(f"  writes {summary['writer_ops_per_sec']:8.1f}/s (p95 {summary['writer_p95_ms']:7.2f} ms, "
+              f"{summary['writer_errors']} errors)   reads {summary['reader_ops_per_sec']:8.1f}/s "
+              f"(p95 {summary['reader_p95_ms']:7.2f} ms, {summary['reader_errors']} errors)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Benchmark: storage and route read time of location rows against trip tracks.
+
+Fills an SQLite database with --missions completed missions of --points GPS
+fixes at 1 Hz, measures the database size (after VACUUM) and the latency of
+GET /api/map/mission/<id>/route, compacts everything into trip tracks and
+measures both again.
+
+    python benchmarks/bench_trip_tracks.py --missions 50 --points 3600
+"""
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def fill(app, missions, points):
+    from app import db
+    from app.models.location import Location
+    from app.models.mission import Mission
+    from app.models.vehicle import Vehicle
+
+    random.seed(42)
+    started = datetime.utcnow() - timedelta(days=3)
+    with app.app_context():
+        vehicle_ids = [vehicle.id for vehicle in Vehicle.query.all()]
+        mission_ids = []
+        for index in range(missions):
+            start = started + timedelta(hours=index)
+            mission = Mission(title=f'Bench {index}', status='completed',
+                              start_latitude=33.97, start_longitude=-6.85, end_latitude=34.02, end_longitude=-6.83,
+                              scheduled_start=start, scheduled_end=start + timedelta(seconds=points),
+                              actual_start=start, actual_end=start + timedelta(seconds=points),
+                              assigned_user_id=1, created_by=1, vehicle_id=vehicle_ids[index % len(vehicle_ids)])
+            db.session.add(mission)
+            db.session.flush()
+            mission_ids.append(mission.id)
+
+            # A smooth drive: speed and heading drift, the position follows them
+            latitude, longitude, speed, heading = 33.97, -6.85, 40.0, 90.0
+            rows = []
+            for second in range(points):
+                speed = min(120.0, max(0.0, speed + random.gauss(0, 1.5)))
+                heading = (heading + random.gauss(0, 3)) % 360
+                step = speed / 3.6 / 111320
+                latitude += step * math.cos(math.radians(heading))
+                longitude += step * math.sin(math.radians(heading)) / math.cos(math.radians(latitude))
+                rows.append({
+                    'vehicle_id': mission.vehicle_id, 'mission_id': mission.id,
+                    'timestamp': start + timedelta(seconds=second),
+                    'latitude': round(latitude, 7), 'longitude': round(longitude, 7),
+                    'altitude': round(50 + 10 * math.sin(second / 300), 1),
+                    'speed': round(speed, 1), 'heading': round(heading, 2), 'accuracy': 5.0,
+                    'created_at': datetime.utcnow()
+                })
+            db.session.execute(Location.__table__.insert(), rows)
+            db.session.commit()
+    return mission_ids
+
+
+def database_bytes(app):
+    from app import db
+    with app.app_context():
+        with db.engine.connect() as connection:
+            connection.exec_driver_sql('PRAGMA wal_checkpoint(TRUNCATE)')
+            connection.exec_driver_sql('VACUUM')
+            page_count = connection.exec_driver_sql('PRAGMA page_count').scalar()
+            page_size = connection.exec_driver_sql('PRAGMA page_size').scalar()
+    return page_count * page_size
+
+
+def read_routes(client, headers, mission_ids, repeat):
+    latencies = []
+    for _ in range(repeat):
+        for mission_id in mission_ids:
+            started = time.perf_counter()
+            response = client.get(f'/api/map/mission/{mission_id}/route', headers=headers)
+            latencies.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 200, response.status_code
+    return {
+        'p50_ms': round(percentile(latencies, 0.5), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'points': len(response.json['actual_route'])
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--missions', type=int, default=50)
+    parser.add_argument('--points', type=int, default=3600, help='GPS fixes per mission (1 Hz)')
+    parser.add_argument('--repeat', type=int, default=3, help='Reads of each mission route')
+    parser.add_argument('--codec', default='zlib', choices=['zlib', 'zstd'])
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_tracks_')
+    os.environ['BENCHMARK_DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['TRIP_TRACK_CODEC'] = args.codec
+    os.environ['TRIP_COMPACT_MISSION_GRACE_HOURS'] = '0'
+
+    from app import create_app
+    from app.services.track_service import TrackService
+    from app.utils.database import init_db
+
+    try:
+        app = create_app('benchmark')
+        init_db(app)
+        print(f"Writing {args.missions} missions of {args.points} points...")
+        mission_ids = fill(app, args.missions, args.points)
+
+        client = app.test_client()
+        token = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'}).json['access_token']
+        headers = {'Authorization': f'Bearer {token}'}
+
+        rows_bytes = database_bytes(app)
+        rows_reads = read_routes(client, headers, mission_ids, args.repeat)
+
+        with app.app_context():
+            started = time.perf_counter()
+            result, _ = TrackService.compact()
+            compact_seconds = time.perf_counter() - started
+        tracks_bytes = database_bytes(app)
+        tracks_reads = read_routes(client, headers, mission_ids, args.repeat)
+
+        result = {
+            'points': args.missions * args.points,
+            'codec': args.codec,
+            'rows_mb': round(rows_bytes / 1e6, 2),
+            'tracks_mb': round(tracks_bytes / 1e6, 2),
+            'track_blob_mb': round(result['bytes'] / 1e6, 2),
+            'bytes_per_point_rows': round(rows_bytes / (args.missions * args.points), 1),
+            'bytes_per_point_track': round(result['bytes'] / (args.missions * args.points), 2),
+            'compact_seconds': round(compact_seconds, 2),
+            'route_rows': rows_reads,
+            'route_tracks': tracks_reads
+        }
+        print(f"  database with rows   {result['rows_mb']:8.2f} MB ({result['bytes_per_point_rows']} B/point)")
+        print(f"  database with tracks {result['tracks_mb']:8.2f} MB, blobs {result['track_blob_mb']} MB "
+              f"({result['bytes_per_point_track']} B/point), compacted in {result['compact_seconds']} s")
+        print(f"  route read p50 {rows_reads['p50_ms']} ms -> {tracks_reads['p50_ms']} ms, "
+              f"p95 {rows_reads['p95_ms']} ms -> {tracks_reads['p95_ms']} ms ({tracks_reads['points']} points)")
+
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(result, f, indent=2)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Check the SQL query budget of the main endpoints, for CI.
+
+Generates a small synthetic fleet (FLEET_VEHICLES vehicles over the day
+up to the last noon UTC, so every run sees the same data) in a fresh SQLite
+database, calls each endpoint of QUERY_BUDGETS as a manager inside
+assert_max_queries and exits with status 1 when one runs more queries than
+its budget, or repeats a statement more often than allowed: a new per-row
+lazy load (N+1) shows up as either.
+
+    python check_query_budgets.py --verbose
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+FLEET_VEHICLES = 10
+
+# url -> (max queries, max runs of one statement or None) on the generated fleet.
+# Budgets marked N+1 still load rows one by one: lower them when the loop is fixed.
+QUERY_BUDGETS = {
+    '/api/missions': (6, 2),
+    '/api/vehicles': (4, 2),
+    '/api/anomalies': (2, 1),
+    '/api/anomalies/recent': (2, 1),
+    '/api/reimbursements': (2, 1),
+    '/api/locations/current': (25, None),  # N+1: latest location and driver per vehicle
+    '/api/map/fleet': (45, None),  # N+1: latest location, driver and mission per vehicle
+    '/api/map/real-time-tracking': (15, None),  # N+1: vehicle per location
+    '/api/map/active-missions': (10, None),  # N+1: driver, vehicle and location per mission
+    '/api/map/heatmap': (2, 1),  # recent locations, then the compacted tracks of the period
+    '/api/map/fleet-analysis': (1, 1),
+    '/api/map/mission/1/route': (9, 2),
+    '/api/map/vehicle/1/route': (8, 2),
+    '/api/dashboard/recent-activity': (9, None),  # N+1: user and vehicle per mission
+    '/api/dashboard/mission-analytics': (5, 2),
+    '/api/dashboard/vehicle-analytics': (13, None),  # N+1: mission count per vehicle
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--verbose', action='store_true', help='Print the query count of every endpoint')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='query_budgets_')
+    try:
+        failures = check(workdir, args.verbose)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    sys.exit(1 if failures else 0)
+
+
+def check(workdir, verbose):
+    """Run every endpoint of QUERY_BUDGETS on a fleet generated in `workdir`, return the failure count."""
+    os.environ['BENCHMARK_DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'check.db')}"
+    from app import create_app, db
+    from app.services.fleet_generator import FleetGenerator
+    from app.utils.query_stats import assert_max_queries
+
+    now = datetime.utcnow()
+    noon = now.replace(hour=12, minute=0, second=0, microsecond=0)
+    end = noon if noon <= now else noon - timedelta(days=1)
+
+    app = create_app('benchmark')
+    with app.app_context():
+        db.create_all()
+        FleetGenerator(vehicles=FLEET_VEHICLES, days=1, hz=0.02, end=end).run(progress=None)
+
+    client = app.test_client()
+    response = client.post('/api/auth/login', json={'username': 'sim42-manager-00001',
+                                                    'password': 'password123'})
+    headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+    failures = 0
+    for url, (limit, repeated) in QUERY_BUDGETS.items():
+        try:
+            with assert_max_queries(limit, repeated) as log:
+                response = client.get(url, headers=headers)
+            if response.status_code != 200:
+                raise AssertionError(f'status {response.status_code}')
+        except AssertionError as e:
+            failures += 1
+            print(f"FAIL {url}: {e}")
+            continue
+        if verbose:
+            print(f"ok   {url}: {log.count}/{limit} queries")
+
+    print(f"{len(QUERY_BUDGETS) - failures}/{len(QUERY_BUDGETS)} endpoints within their query budget")
+    return failures
+
+
+if __name__ == '__main__':
+    main()
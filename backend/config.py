@@ -13,16 +13,199 @@ class Config:
     FRONTEND_URL = os.environ.get('FRONTEND_URL') or 'http://localhost:3000'
     API_PORT = int(os.environ.get('API_PORT') or 5000)
     
+    # SQLite connection settings: WAL lets readers run alongside a writer,
+    # NORMAL sync is durable in WAL mode, cache_size < 0 is in KiB. An empty
+    # value leaves that pragma at SQLite's default
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT = os.environ.get('SQLITE_BUSY_TIMEOUT', '5000')
+    SQLITE_CACHE_SIZE = os.environ.get('SQLITE_CACHE_SIZE', '-65536')
+    SQLITE_MMAP_SIZE = os.environ.get('SQLITE_MMAP_SIZE', '268435456')
+    SQLITE_FOREIGN_KEYS = os.environ.get('SQLITE_FOREIGN_KEYS', 'false').lower() == 'true'
+    
+    # 'postgis' pushes spatial queries down to PostGIS (PostgreSQL only),
+    # anything else keeps the portable SQL/Python implementation
+    SPATIAL_BACKEND = os.environ.get('SPATIAL_BACKEND') or 'sql'
+    
+    # Connection pool for server databases (PostgreSQL)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 10)
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW') or 20)
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT') or 30)
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE') or 1800)
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    
+    # Location ingest: 'sync' commits each point in the request, 'queued' hands
+    # points to a background writer that commits every INGEST_FLUSH_INTERVAL_MS
+    # or INGEST_BATCH_SIZE points; a full queue answers 429. INGEST_SPOOL_DIR
+    # keeps accepted points on disk until they are committed.
+    INGEST_MODE = os.environ.get('INGEST_MODE') or 'sync'
+    INGEST_QUEUE_SIZE = int(os.environ.get('INGEST_QUEUE_SIZE') or 20000)
+    INGEST_BATCH_SIZE = int(os.environ.get('INGEST_BATCH_SIZE') or 500)
+    INGEST_FLUSH_INTERVAL_MS = int(os.environ.get('INGEST_FLUSH_INTERVAL_MS') or 200)
+    INGEST_SPOOL_DIR = os.environ.get('INGEST_SPOOL_DIR') or None
+    INGEST_SPOOL_FSYNC = os.environ.get('INGEST_SPOOL_FSYNC', 'false').lower() == 'true'
+    
+    # INGEST_MODE=journal appends points to a segmented on-disk journal under
+    # JOURNAL_DIR and a replayer commits it; JOURNAL_FSYNC is 'always',
+    # 'interval' (every JOURNAL_FSYNC_INTERVAL_MS) or 'never'
+    JOURNAL_DIR = os.environ.get('JOURNAL_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'journal')
+    JOURNAL_SEGMENT_BYTES = int(os.environ.get('JOURNAL_SEGMENT_BYTES') or 64 * 1024 * 1024)
+    JOURNAL_FSYNC = os.environ.get('JOURNAL_FSYNC') or 'interval'
+    JOURNAL_FSYNC_INTERVAL_MS = int(os.environ.get('JOURNAL_FSYNC_INTERVAL_MS') or 100)
+    JOURNAL_REPLAY_BATCH = int(os.environ.get('JOURNAL_REPLAY_BATCH') or 5000)
+    JOURNAL_REPLAY_INTERVAL_MS = int(os.environ.get('JOURNAL_REPLAY_INTERVAL_MS') or 200)
+    
+    # Trip tracks: finished missions (after the grace period) and mission-less
+    # days older than TRIP_COMPACT_AFTER_DAYS are compacted into columnar
+    # blobs compressed with TRIP_TRACK_CODEC ('zlib', or 'zstd' with zstandard)
+    TRIP_TRACK_CODEC = os.environ.get('TRIP_TRACK_CODEC') or 'zlib'
+    TRIP_TRACK_LEVEL = int(os.environ.get('TRIP_TRACK_LEVEL') or 6)
+    TRIP_COMPACT_AFTER_DAYS = int(os.environ.get('TRIP_COMPACT_AFTER_DAYS') or 2)
+    TRIP_COMPACT_MISSION_GRACE_HOURS = int(os.environ.get('TRIP_COMPACT_MISSION_GRACE_HOURS') or 1)
+    
+    # JSON responses: 'auto' uses orjson when installed, 'orjson' requires it,
+    # 'stdlib' keeps Python's json module (datetimes are ISO 8601 either way)
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER') or 'auto'
+    
+    # Response compression: brotli (when installed) or gzip as the client accepts,
+    # for text bodies of at least COMPRESS_MIN_SIZE bytes
+    COMPRESS_RESPONSES = os.environ.get('COMPRESS_RESPONSES', 'true').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE') or 1024)
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL') or 6)
+    COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY') or 5)
+    
+    # SQL instrumentation: query count and time per request, aggregated per endpoint;
+    # a statement repeated QUERY_REPEAT_THRESHOLD times in one request is logged as a
+    # possible N+1. QUERY_STATS_HEADERS adds X-Query-* and Server-Timing headers
+    # (default: in debug mode only)
+    QUERY_STATS = os.environ.get('QUERY_STATS', 'true').lower() == 'true'
+    QUERY_REPEAT_THRESHOLD = int(os.environ.get('QUERY_REPEAT_THRESHOLD') or 10)
+    QUERY_STATS_HEADERS = (os.environ['QUERY_STATS_HEADERS'].lower() == 'true'
+                           if os.environ.get('QUERY_STATS_HEADERS') else None)
+    
+    # Request profiler (opt-in): a sampler thread reads the stacks of running requests every
+    # PROFILE_INTERVAL_MS; requests slower than PROFILE_SLOW_MS, and a PROFILE_SAMPLE_RATE
+    # share of the others, keep their profile. The last PROFILE_BUFFER_SIZE are kept in
+    # memory, or in PROFILE_DIR when several workers should share them
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE') or 0.01)
+    PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS') or 1000)
+    PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS') or 5)
+    PROFILE_BUFFER_SIZE = int(os.environ.get('PROFILE_BUFFER_SIZE') or 50)
+    PROFILE_DIR = os.environ.get('PROFILE_DIR') or None
+    
+    # /metrics in the Prometheus text format; METRICS_TOKEN, when set, is required as a
+    # bearer token. With several worker processes set METRICS_DIR to a directory they
+    # share: each writes its values there every METRICS_SYNC_SECONDS and any of them
+    # serves the total
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+    METRICS_DIR = os.environ.get('METRICS_DIR') or None
+    METRICS_SYNC_SECONDS = float(os.environ.get('METRICS_SYNC_SECONDS') or 5)
+    
+    # Background jobs (app/services/scheduler.py), run on SCHEDULER_WORKERS threads of the
+    # serving processes; the scheduled_jobs table makes one process run each job. Triggers are
+    # 'every 30s' / 'every 5m' / 'every 2h', a five-field cron expression in UTC, or 'off'.
+    # LOCATION_RETENTION_DAYS=0 keeps every location, SIMULATION_TICK_SECONDS=0 keeps the
+    # simulated fleet still between manual runs. Trip compaction is off by default: the heatmap,
+    # spatial queries and the mission map only read uncompacted locations
+    SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', 'true').lower() == 'true'
+    SCHEDULER_WORKERS = int(os.environ.get('SCHEDULER_WORKERS') or 2)
+    SCHEDULER_POLL_SECONDS = float(os.environ.get('SCHEDULER_POLL_SECONDS') or 10)
+    SCHEDULER_LEASE_SECONDS = float(os.environ.get('SCHEDULER_LEASE_SECONDS') or 600)
+    SCHEDULER_JITTER_SECONDS = float(os.environ.get('SCHEDULER_JITTER_SECONDS') or 5)
+    SCHEDULE_ANOMALY_DETECTION = os.environ.get('SCHEDULE_ANOMALY_DETECTION') or 'every 1m'
+    SCHEDULE_SCHEDULE_DELAYS = os.environ.get('SCHEDULE_SCHEDULE_DELAYS') or 'every 5m'
+    SCHEDULE_TRIP_COMPACTION = os.environ.get('SCHEDULE_TRIP_COMPACTION') or 'off'
+    SCHEDULE_LOCATION_RETENTION = os.environ.get('SCHEDULE_LOCATION_RETENTION') or '30 3 * * *'
+    SCHEDULE_TRIP_SEGMENTATION = os.environ.get('SCHEDULE_TRIP_SEGMENTATION') or 'every 1m'
+    SCHEDULE_MAP_MATCHING = os.environ.get('SCHEDULE_MAP_MATCHING') or 'every 5m'
+    LOCATION_RETENTION_DAYS = int(os.environ.get('LOCATION_RETENTION_DAYS') or 0)
+    SIMULATION_TICK_SECONDS = int(os.environ.get('SIMULATION_TICK_SECONDS') or 0)
+    
+    # Geofences: every committed location point is checked against the active fences,
+    # indexed in a grid of GEOFENCE_CELL_DEG degrees; each process looks for changed
+    # fences every GEOFENCE_REFRESH_SECONDS
+    GEOFENCES_ENABLED = os.environ.get('GEOFENCES_ENABLED', 'true').lower() == 'true'
+    GEOFENCE_CELL_DEG = float(os.environ.get('GEOFENCE_CELL_DEG') or 0.01)
+    GEOFENCE_REFRESH_SECONDS = float(os.environ.get('GEOFENCE_REFRESH_SECONDS') or 10)
+    
+    # Trips and stops: a vehicle staying TRIP_STOP_MIN_SECONDS within TRIP_STOP_RADIUS_M,
+    # below TRIP_MOVING_SPEED_KMH, is stopped; a silence over TRIP_GAP_SECONDS ends a trip.
+    # A stop within TRIP_ENDPOINT_RADIUS_M of its mission's start or end is at that endpoint.
+    # Each run reads at most TRIP_SEGMENT_MAX_POINTS new points, TRIP_SEGMENT_BATCH at a time,
+    # and reads again the last TRIP_SEGMENT_OVERLAP ids for points committed out of id order
+    TRIP_STOP_RADIUS_M = float(os.environ.get('TRIP_STOP_RADIUS_M') or 100)
+    TRIP_STOP_MIN_SECONDS = float(os.environ.get('TRIP_STOP_MIN_SECONDS') or 180)
+    TRIP_MOVING_SPEED_KMH = float(os.environ.get('TRIP_MOVING_SPEED_KMH') or 5)
+    TRIP_GAP_SECONDS = float(os.environ.get('TRIP_GAP_SECONDS') or 600)
+    TRIP_ENDPOINT_RADIUS_M = float(os.environ.get('TRIP_ENDPOINT_RADIUS_M') or 300)
+    TRIP_SEGMENT_BATCH = int(os.environ.get('TRIP_SEGMENT_BATCH') or 50000)
+    TRIP_SEGMENT_MAX_POINTS = int(os.environ.get('TRIP_SEGMENT_MAX_POINTS') or 500000)
+    TRIP_SEGMENT_OVERLAP = int(os.environ.get('TRIP_SEGMENT_OVERLAP') or 10000)
+    
+    # History exports of append-only tables (locations) read again the last EXPORT_ID_OVERLAP
+    # ids below their watermark, for rows committed after higher ids were exported
+    EXPORT_ID_OVERLAP = int(os.environ.get('EXPORT_ID_OVERLAP') or 10000)
+    
+    # Map matching: closed trips are snapped to the roads of ROAD_GRAPH_PATH, a local
+    # OpenStreetMap extract (.osm, .osm.gz, .osm.bz2, or .osm.pbf with osmium), unset disables it.
+    # GPS noise MAP_MATCH_SIGMA_M, detour tolerance MAP_MATCH_BETA_M, roads searched within
+    # MAP_MATCH_RADIUS_M of a point (at most MAP_MATCH_CANDIDATES), points closer than
+    # MAP_MATCH_SPACING_M to the last one skipped; each run matches MAP_MATCH_BATCH trips
+    ROAD_GRAPH_PATH = os.environ.get('ROAD_GRAPH_PATH') or None
+    MAP_MATCH_SIGMA_M = float(os.environ.get('MAP_MATCH_SIGMA_M') or 10)
+    MAP_MATCH_BETA_M = float(os.environ.get('MAP_MATCH_BETA_M') or 30)
+    MAP_MATCH_RADIUS_M = float(os.environ.get('MAP_MATCH_RADIUS_M') or 50)
+    MAP_MATCH_CANDIDATES = int(os.environ.get('MAP_MATCH_CANDIDATES') or 8)
+    MAP_MATCH_SPACING_M = float(os.environ.get('MAP_MATCH_SPACING_M') or 100)
+    MAP_MATCH_MAX_SPEED_KMH = float(os.environ.get('MAP_MATCH_MAX_SPEED_KMH') or 200)
+    MAP_MATCH_BATCH = int(os.environ.get('MAP_MATCH_BATCH') or 200)
+    
+    # Seconds a user's (role, is_active) stays cached per process, 0 disables the cache
+    AUTH_USER_CACHE_TTL = int(os.environ.get('AUTH_USER_CACHE_TTL') or 30)
+    
+    # Password hashing: werkzeug method string, process pool size (0 = inline),
+    # queued + running operations before logins get a 503, and wait timeout in seconds
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'pbkdf2:sha256:600000'
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or 2)
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING') or 64)
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT') or 10)
+    
+    # Production server (serve.py / gunicorn.conf.py): worker processes, threads
+    # per worker, request timeout and seconds granted to finish requests on reload
+    SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS') or (os.cpu_count() or 1) * 2 + 1)
+    SERVER_THREADS = int(os.environ.get('SERVER_THREADS') or 4)
+    SERVER_TIMEOUT = int(os.environ.get('SERVER_TIMEOUT') or 60)
+    SERVER_GRACEFUL_TIMEOUT = int(os.environ.get('SERVER_GRACEFUL_TIMEOUT') or 30)
+    SERVER_MAX_REQUESTS = int(os.environ.get('SERVER_MAX_REQUESTS') or 0)
+    
+    # List endpoints
+    DEFAULT_PAGE_SIZE = int(os.environ.get('DEFAULT_PAGE_SIZE') or 100)
+    MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE') or 1000)
+    COUNT_ESTIMATE_CAP = int(os.environ.get('COUNT_ESTIMATE_CAP') or 10000)
+    
 class DevelopmentConfig(Config):
     DEBUG = True
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///fleet_management_dev.db'
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///fleet_management_dev.db'
+    
+class ProductionConfig(Config):
+    DEBUG = False
     
 class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    PASSWORD_HASH_WORKERS = 0
+    SCHEDULER_ENABLED = False
+    
+class BenchmarkConfig(Config):
+    SQLALCHEMY_DATABASE_URI = os.environ.get('BENCHMARK_DATABASE_URL') or 'sqlite:///fleet_management_bench.db'
+    SCHEDULER_ENABLED = False
 
 config = {
     'development': DevelopmentConfig,
+    'production': ProductionConfig,
     'testing': TestingConfig,
+    'benchmark': BenchmarkConfig,
     'default': DevelopmentConfig
 }
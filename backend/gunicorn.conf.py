@@ -0,0 +1,50 @@
+"""
+Gunicorn settings for the production server.
+
+Workers are preforked from a master that has already imported the app, so
+every worker must drop the database connections inherited through fork().
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Graceful reload: `kill -HUP <master>` restarts the workers with the new
+settings, each finishing its in-flight requests within SERVER_GRACEFUL_TIMEOUT.
+To load new code with preload_app, start a new master with `kill -USR2 <master>`
+then stop the old one with `kill -TERM <old master>`.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+
+bind = f"0.0.0.0:{Config.API_PORT}"
+workers = Config.SERVER_WORKERS
+threads = Config.SERVER_THREADS
+worker_class = 'gthread'
+timeout = Config.SERVER_TIMEOUT
+graceful_timeout = Config.SERVER_GRACEFUL_TIMEOUT
+max_requests = Config.SERVER_MAX_REQUESTS
+max_requests_jitter = max_requests // 10
+preload_app = True
+accesslog = '-'
+
+
+def on_starting(server):
+    """Create tables and seed data once, in the master, before any worker exists."""
+    from wsgi import app
+    from app import db
+    from app.utils.database import init_db
+
+    init_db(app)
+    with app.app_context():
+        db.engine.dispose()
+
+
+def post_fork(server, worker):
+    """Forget the pooled connections copied from the master without closing them."""
+    from wsgi import app
+    from app import db
+
+    with app.app_context():
+        db.engine.dispose(close=False)
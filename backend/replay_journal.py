@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Replay the telemetry journal into the database without starting the server.
+
+Commits every journal directory under JOURNAL_DIR that no running process
+owns, then removes it. Points are upserted on (vehicle_id, timestamp), so
+replaying a journal twice stores each point once.
+
+    python replay_journal.py --dir journal
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from app.services.telemetry_journal import telemetry_journal
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', default=os.getenv('FLASK_ENV', 'default'))
+    parser.add_argument('--dir', help='Journal directory (default: JOURNAL_DIR)')
+    parser.add_argument('--batch', type=int, default=20000, help='Records per transaction')
+    args = parser.parse_args()
+
+    app = create_app(args.config)
+    if args.dir:
+        telemetry_journal.directory = os.path.abspath(args.dir)
+
+    with app.app_context():
+        started = time.perf_counter()
+        recovered = telemetry_journal.recover_orphans(args.batch)
+        elapsed = time.perf_counter() - started
+
+    print(f"Replayed {recovered} points from {telemetry_journal.directory} in {elapsed:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Run the backend with a production server.
+
+Uses gunicorn (preforking master, threaded workers) where it is available and
+falls back to waitress, a multi-threaded single-process server, on Windows.
+
+    python serve.py --workers 4 --threads 8 --port 5000
+"""
+import argparse
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+
+from config import Config
+
+
+def run_gunicorn(args):
+    command = [
+        sys.executable, '-m', 'gunicorn',
+        '--config', os.path.join(BACKEND_DIR, 'gunicorn.conf.py'),
+        '--chdir', BACKEND_DIR,
+        '--bind', f'{args.host}:{args.port}',
+        '--workers', str(args.workers),
+        '--threads', str(args.threads),
+        'wsgi:app'
+    ]
+    os.execv(sys.executable, command)
+
+
+def run_waitress(args):
+    from waitress import serve
+    from wsgi import app
+    from app.utils.database import init_db
+
+    init_db(app)
+    print(f"Serving on http://{args.host}:{args.port} with waitress ({args.workers * args.threads} threads)")
+    serve(app, host=args.host, port=args.port, threads=args.workers * args.threads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=Config.API_PORT)
+    parser.add_argument('--workers', type=int, default=Config.SERVER_WORKERS)
+    parser.add_argument('--threads', type=int, default=Config.SERVER_THREADS)
+    parser.add_argument('--server', choices=['auto', 'gunicorn', 'waitress'], default='auto')
+    args = parser.parse_args()
+
+    os.environ.setdefault('FLASK_ENV', 'production')
+
+    server = args.server
+    if server == 'auto':
+        try:
+            import gunicorn  # noqa: F401
+            server = 'gunicorn'
+        except ImportError:
+            server = 'waitress'
+
+    if server == 'gunicorn':
+        run_gunicorn(args)
+    else:
+        run_waitress(args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())